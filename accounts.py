@@ -0,0 +1,375 @@
+"""
+The Google account the assistant acts for. The desktop app and the command
+line have one, LocalAccount, backed by the app-wide clients in services.py.
+The service mode (server.py) keeps a UserAccount per user: their own
+credentials, Calendar client, calendar registry, event mirror and assistant
+calendar, held in a bounded AccountPool.
+
+Every account has the same methods: credentials(), authorized_http(),
+calendar_service(), calendar_registry(), event_store() and
+assistant_calendar_id().
+"""
+import hashlib
+import hmac
+import json
+import os
+import re
+import secrets
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+
+import config
+from services import (
+    ThreadLocalHttp, authorized_http, build_calendar_service, get_assistant_calendar_id, get_calendar_service,
+    get_credentials, get_or_create_calendar, save_credentials
+)
+
+# Accounts (Calendar clients and open event mirrors) kept in memory by the service
+DEFAULT_POOL_SIZE = 64
+
+# User IDs become file names, so only these characters are allowed
+_USER_ID = re.compile(r"[A-Za-z0-9][A-Za-z0-9_.@+-]{0,127}")
+
+
+class UnknownUser(Exception):
+    """
+    Raised when a user has no stored credentials.
+    """
+
+
+def check_user_id(user_id):
+    """
+    Returns `user_id` if it can be used as a file name; raises ValueError otherwise.
+    """
+    if not isinstance(user_id, str) or not _USER_ID.fullmatch(user_id):
+        raise ValueError(f"Invalid user ID: {user_id!r}")
+    return user_id
+
+
+class CredentialStore:
+    """
+    Each user's OAuth token, one authorized-user JSON file per user, readable
+    only by the service's own account, and the hash of the API key the
+    service issued them.
+    """
+
+    def __init__(self, directory=None):
+        self.directory = directory or config.cache_path("users")
+        os.makedirs(self.directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._key_hashes = {}  # user ID -> SHA-256 of their API key, as read from disk
+
+    def user_directory(self, user_id):
+        """
+        Returns the user's directory, which also holds their event mirror.
+        """
+        path = os.path.join(self.directory, check_user_id(user_id))
+        os.makedirs(path, exist_ok=True)
+        return path
+
+    def token_path(self, user_id):
+        return os.path.join(self.user_directory(user_id), "token.json")
+
+    def save(self, user_id, info):
+        """
+        Validates and stores an authorized-user token (token, refresh_token,
+        client_id, client_secret, ...). Raises ValueError if it is incomplete.
+        """
+        from google.oauth2.credentials import Credentials
+
+        creds = Credentials.from_authorized_user_info(info, config.SCOPES)
+        path = self.token_path(user_id)
+        with self._lock:
+            save_credentials(creds, path)
+        return creds
+
+    def save_refreshed(self, user_id, creds):
+        """
+        Writes back credentials that were refreshed while in use, unless the
+        user has stored other ones (or none) since. Returns whether it did.
+        """
+        path = self.token_path(user_id)
+        with self._lock:
+            try:
+                with open(path) as token_file:
+                    stored = json.load(token_file)
+            except (OSError, ValueError):
+                return False
+            if stored.get('refresh_token') != creds.refresh_token:
+                return False
+            save_credentials(creds, path)
+            return True
+
+    def load(self, user_id):
+        """
+        Returns the user's credentials. They are refreshed on first use when
+        expired, and AccountPool writes them back then.
+        Raises UnknownUser if the user has none stored.
+        """
+        from google.oauth2.credentials import Credentials
+
+        path = self.token_path(user_id)
+        if not os.path.exists(path):
+            raise UnknownUser(user_id)
+        with open(path) as token_file:
+            return Credentials.from_authorized_user_info(json.load(token_file), config.SCOPES)
+
+    def delete(self, user_id):
+        with self._lock:
+            for path in (self.token_path(user_id), self._key_path(user_id)):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+            self._key_hashes.pop(user_id, None)
+
+    def _key_path(self, user_id):
+        # Not user_directory(): looking up a key must not create directories for made-up users
+        return os.path.join(self.directory, check_user_id(user_id), "api_key.sha256")
+
+    def issue_key(self, user_id):
+        """
+        Returns a new API key for the user, "<user ID>:<secret>"; their previous key stops working.
+        Only its hash is stored.
+        """
+        key = f"{check_user_id(user_id)}:{secrets.token_urlsafe(32)}"
+        digest = hashlib.sha256(key.encode()).hexdigest()
+        self.user_directory(user_id)
+        path = self._key_path(user_id)
+        tmp_path = f"{path}.tmp"
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "w") as f:
+            f.write(digest)
+        os.replace(tmp_path, path)
+        with self._lock:
+            self._key_hashes[user_id] = digest
+        return key
+
+    def user_for_key(self, key):
+        """
+        Returns the user an API key was issued to, or None if it is not a current key.
+        """
+        user_id = key.partition(":")[0]
+        try:
+            check_user_id(user_id)
+        except ValueError:
+            return None
+        with self._lock:
+            digest = self._key_hashes.get(user_id)
+        if digest is None:
+            try:
+                with open(self._key_path(user_id)) as key_file:
+                    digest = key_file.read().strip()
+            except FileNotFoundError:
+                return None
+            with self._lock:
+                self._key_hashes[user_id] = digest
+        if not hmac.compare_digest(hashlib.sha256(key.encode()).hexdigest(), digest):
+            return None
+        return user_id
+
+
+class LocalAccount:
+    """
+    The single user of the desktop app and the command line.
+    """
+
+    user_id = None
+
+    def credentials(self):
+        return get_credentials()
+
+    def authorized_http(self, timeout=None):
+        return authorized_http(timeout)
+
+    def calendar_service(self):
+        return get_calendar_service()
+
+    def calendar_registry(self):
+        from calendar_registry import get_calendar_registry
+        return get_calendar_registry()
+
+    def event_store(self):
+        from event_store import get_event_store
+        return get_event_store()
+
+    def assistant_calendar_id(self, timeout=None):
+        return get_assistant_calendar_id(timeout)
+
+    def close(self):
+        pass
+
+
+class UserAccount:
+    """
+    One service user. Clients are built on first use and are safe to share
+    between the threads serving that user's requests. `saved_token` is the
+    access token last written to the user's token file.
+    """
+
+    def __init__(self, user_id, creds, directory):
+        self.user_id = user_id
+        self.creds = creds
+        self.saved_token = creds.token
+        self.directory = directory
+        self._lock = threading.RLock()
+        self._service = None
+        self._registry = None
+        self._store = None
+        self._calendar_id = None
+
+    def credentials(self):
+        return self.creds
+
+    def authorized_http(self, timeout=None):
+        import httplib2
+        from google_auth_httplib2 import AuthorizedHttp
+        from transport import RetryingHttp
+
+        return RetryingHttp(AuthorizedHttp(self.creds, http=httplib2.Http(timeout=timeout)))
+
+    def calendar_service(self):
+        with self._lock:
+            if self._service is None:
+                self._service = build_calendar_service(self.creds, http=ThreadLocalHttp(self.authorized_http))
+            return self._service
+
+    def calendar_registry(self):
+        from calendar_registry import CalendarRegistry
+
+        with self._lock:
+            if self._registry is None:
+                self._registry = CalendarRegistry(service_factory=self.calendar_service)
+            return self._registry
+
+    def event_store(self):
+        from event_store import EventStore
+
+        with self._lock:
+            if self._store is None:
+                self._store = EventStore(os.path.join(self.directory, "events.sqlite3"),
+                                         service_factory=self.calendar_service, http_factory=self.authorized_http)
+            return self._store
+
+    def assistant_calendar_id(self, timeout=None):
+        """
+        The user's assistant calendar, created on first use. A failed lookup is retried next time.
+        """
+        with self._lock:
+            if self._calendar_id is None:
+                self._calendar_id = get_or_create_calendar(registry=self.calendar_registry(),
+                                                           service=self.calendar_service())
+            return self._calendar_id
+
+    def close(self):
+        with self._lock:
+            if self._store is not None:
+                self._store.close()
+                self._store = None
+
+
+class AccountPool:
+    """
+    Keeps the accounts of the most recently active users, up to `size`.
+    Accounts are handed out with lease(); the least recently used idle
+    account is closed when the pool is full. Accounts in use are never
+    closed, so the pool can briefly hold more than `size`.
+    """
+
+    def __init__(self, store, size=DEFAULT_POOL_SIZE):
+        self.store = store
+        self.size = size
+        self._lock = threading.Lock()
+        self._accounts = OrderedDict()  # user ID -> account, least recently used first
+        self._leases = {}               # user ID -> requests using the account
+
+    @contextmanager
+    def lease(self, user_id):
+        """
+        Yields the user's account for the duration of one request.
+        Raises UnknownUser if the user has no stored credentials.
+        """
+        account = self._checkout(user_id)
+        try:
+            yield account
+        finally:
+            self._save_refreshed(account)
+            with self._lock:
+                self._leases[user_id] -= 1
+                if not self._leases[user_id]:
+                    del self._leases[user_id]
+                # Discarded while this request was using it
+                retired = user_id not in self._leases and self._accounts.get(user_id) is not account
+            if retired:
+                account.close()
+            self._evict()
+
+    def _checkout(self, user_id):
+        with self._lock:
+            account = self._accounts.get(user_id)
+            if account is not None:
+                self._accounts.move_to_end(user_id)
+                self._leases[user_id] = self._leases.get(user_id, 0) + 1
+                return account
+        # Reading the token touches the disk; done outside the lock
+        account = UserAccount(user_id, self.store.load(user_id), self.store.user_directory(user_id))
+        with self._lock:
+            account = self._accounts.setdefault(user_id, account)
+            self._accounts.move_to_end(user_id)
+            self._leases[user_id] = self._leases.get(user_id, 0) + 1
+            return account
+
+    def _save_refreshed(self, account):
+        # AuthorizedHttp refreshes expired credentials in place; the token file keeps up
+        token = account.creds.token
+        if token == account.saved_token:
+            return
+        try:
+            self.store.save_refreshed(account.user_id, account.creds)
+        except OSError as e:
+            print(f"Error saving refreshed credentials for {account.user_id}: {e}")
+        account.saved_token = token
+
+    def _evict(self):
+        closing = []
+        with self._lock:
+            for user_id in list(self._accounts):
+                if len(self._accounts) <= self.size:
+                    break
+                if user_id not in self._leases:
+                    closing.append(self._accounts.pop(user_id))
+        for account in closing:
+            account.close()
+
+    def discard(self, user_id):
+        """
+        Drops a user's account, e.g. after their credentials change; it is
+        closed once no request is using it.
+        """
+        with self._lock:
+            account = self._accounts.pop(user_id, None)
+            in_use = user_id in self._leases
+        if account is not None and not in_use:
+            account.close()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._accounts)
+
+    def close(self):
+        with self._lock:
+            accounts = list(self._accounts.values())
+            self._accounts.clear()
+        for account in accounts:
+            account.close()
+
+
+_local_account = LocalAccount()
+
+
+def get_local_account():
+    """
+    Returns the account of the desktop app and the command line.
+    """
+    return _local_account
@@ -0,0 +1,452 @@
+"""
+Schedule analytics over a columnar snapshot of the mirrored events, for
+questions like "how many hours of meetings did I have per week this
+quarter?" or "which day is busiest?". The numbers are computed here and the
+model only phrases them.
+
+The snapshot holds one NumPy column per field (start and end in epoch
+seconds, local day and minute of the start, calendar index and interned
+title) in a single file that is memory-mapped when read. It covers
+SNAPSHOT_PAST_DAYS back and SNAPSHOT_AHEAD_DAYS ahead, recurring series
+expanded, and is rebuilt once the mirror has synced changes.
+"""
+import json
+import os
+import re
+import struct
+import threading
+from datetime import date, datetime, timedelta
+
+import numpy as np
+
+from event_fetch import parse_datetime
+from event_index import tokenize
+from prompt_context import query_horizon
+
+# Days of history and of the future the snapshot covers
+SNAPSHOT_PAST_DAYS = 3 * 366
+SNAPSHOT_AHEAD_DAYS = 366
+# Window of an analytics question that names no period: the last twelve weeks
+DEFAULT_ANALYTICS_DAYS = 84
+# Rows of per-period totals sent to the model; earlier periods are summed up
+MAX_PERIOD_ROWS = 60
+
+MAGIC = b"EVCOLS1\n"
+# Column blocks start at multiples of this many bytes
+ALIGNMENT = 64
+COLUMNS = [
+    ("start", "<i8"),     # epoch seconds
+    ("end", "<i8"),
+    ("day", "<i4"),       # local date of the start, as days since 1970-01-01
+    ("minute", "<i2"),    # local minute of the day of the start
+    ("calendar", "<i2"),  # index into the snapshot's calendar IDs
+    ("title", "<i4"),     # index into the snapshot's titles
+    ("all_day", "u1"),
+]
+WEEKDAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+
+# Aggregate phrasing only: 'weekly', 'total' or 'conflicts' alone also name events ('weekly team sync')
+_ANALYTICS_PATTERN = re.compile(
+    r"\b(how many (?:hours|meetings|events)|how much (?:time|of my time)|(?:time|hours) (?:do|did) i spend|"
+    r"busiest|quietest|per (?:day|week|month)|on average|double[- ]booked|breakdown of)\b", re.IGNORECASE
+)
+# Questions about what already happened; their window ends now, not at the end of 'this quarter'
+_PAST_TENSE = re.compile(r"\b(did|had|was|were|spent|went|attended)\b")
+_LAST_COUNT = re.compile(r"\b(?:last|past|previous)\s+(\d+)\s+(days?|weeks?|months?|years?)\b")
+# Words of analytics questions that say nothing about which events are meant
+ANALYTICS_WORDS = frozenset(tokenize("""
+hours minutes time spend spent spending much many busiest busy quietest per each day daily week weekly month monthly
+quarter year yearly average total overlap overlapping overlaps double booked conflict conflicts breakdown stats
+statistics last past previous this during far most least calendar calendars schedule had has so than
+""")) | {day.lower() for day in WEEKDAYS}
+
+
+def _day_number(when):
+    return (when - date(1970, 1, 1)).days
+
+
+def _align(offset):
+    return -(-offset // ALIGNMENT) * ALIGNMENT
+
+
+class EventColumns:
+    """
+    Events of several calendars as parallel NumPy columns sorted by start.
+    `titles` and `calendars` hold the strings the title and calendar columns
+    index; `meta` records what the snapshot was built from.
+    """
+
+    def __init__(self, columns, titles, calendars, meta=None):
+        self.columns = columns
+        self.titles = titles
+        self.calendars = calendars
+        self.meta = meta or {}
+        self._title_tokens = None
+
+    def __len__(self):
+        return len(self.columns['start'])
+
+    @classmethod
+    def build(cls, calendars, meta=None):
+        """
+        Builds the columns from (calendar ID, events) pairs, the events being
+        Calendar API dicts. Cancelled events are left out.
+        """
+        values = {name: [] for name, _ in COLUMNS}
+        titles = {}
+        calendar_ids = []
+        for calendar_id, events in calendars:
+            calendar = len(calendar_ids)
+            calendar_ids.append(calendar_id)
+            for event in events:
+                start, end = event.get('start') or {}, event.get('end') or {}
+                if event.get('status') == 'cancelled' or not start:
+                    continue
+                if 'dateTime' in start:
+                    start_time = parse_datetime(start['dateTime'])
+                    end_time = parse_datetime(end['dateTime']) if 'dateTime' in end else start_time
+                    local = start_time.astimezone() if start_time.tzinfo else start_time
+                    values['day'].append(_day_number(local.date()))
+                    values['minute'].append(local.hour * 60 + local.minute)
+                    values['all_day'].append(0)
+                else:
+                    start_day = date.fromisoformat(start['date'])
+                    start_time = datetime.combine(start_day, datetime.min.time())
+                    end_time = datetime.combine(date.fromisoformat(end['date']) if 'date' in end
+                                                else start_day + timedelta(days=1), datetime.min.time())
+                    values['day'].append(_day_number(start_day))
+                    values['minute'].append(0)
+                    values['all_day'].append(1)
+                values['start'].append(int(start_time.timestamp()))
+                values['end'].append(int(end_time.timestamp()))
+                values['calendar'].append(calendar)
+                values['title'].append(titles.setdefault(event.get('summary') or "(No title)", len(titles)))
+
+        columns = {name: np.array(values[name], dtype=dtype) for name, dtype in COLUMNS}
+        order = np.argsort(columns['start'], kind="stable")
+        return cls({name: column[order] for name, column in columns.items()}, list(titles), calendar_ids, meta)
+
+    def save(self, path):
+        """
+        Writes the snapshot to `path`: a header line of JSON, then one
+        aligned block per column. The file is replaced in one step, so
+        readers still mapping the old one are not disturbed.
+        """
+        blocks = []
+        offset = 0
+        for name, dtype in COLUMNS:
+            column = np.ascontiguousarray(self.columns[name], dtype=dtype)
+            blocks.append((offset, column))
+            offset = _align(offset + column.nbytes)
+        header = json.dumps({
+            'count': len(self), 'titles': self.titles, 'calendars': self.calendars, 'meta': self.meta,
+            'columns': {name: [dtype, block_offset] for (name, dtype), (block_offset, _) in zip(COLUMNS, blocks)},
+        }).encode()
+        data_start = _align(len(MAGIC) + 8 + len(header))
+
+        temporary = f"{path}.tmp"
+        with open(temporary, "wb") as snapshot:
+            snapshot.write(MAGIC + struct.pack("<Q", len(header)) + header)
+            for block_offset, column in blocks:
+                snapshot.seek(data_start + block_offset)
+                snapshot.write(column.tobytes())
+            snapshot.truncate(data_start + offset)
+            snapshot.flush()
+            os.fsync(snapshot.fileno())
+        os.replace(temporary, path)
+
+    @classmethod
+    def load(cls, path):
+        """
+        Opens a saved snapshot; the columns are memory-mapped, not read.
+        Raises ValueError if the file is not a snapshot.
+        """
+        with open(path, "rb") as snapshot:
+            if snapshot.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"{path} is not an event snapshot")
+            (length,) = struct.unpack("<Q", snapshot.read(8))
+            header = json.loads(snapshot.read(length))
+        data_start = _align(len(MAGIC) + 8 + length)
+        columns = {}
+        for name, (dtype, offset) in header['columns'].items():
+            if header['count']:
+                columns[name] = np.memmap(path, dtype=dtype, mode="r", offset=data_start + offset,
+                                          shape=(header['count'],))
+            else:
+                columns[name] = np.empty(0, dtype=dtype)
+        return cls(columns, header['titles'], header['calendars'], header['meta'])
+
+    def titles_matching(self, terms):
+        """
+        A boolean per title: whether it contains any of the (tokenized) `terms`.
+        """
+        if self._title_tokens is None:
+            self._title_tokens = [set(tokenize(title)) for title in self.titles]
+        terms = set(terms)
+        return np.fromiter((bool(terms & tokens) for tokens in self._title_tokens), bool, len(self.titles))
+
+    def select(self, time_min, time_max, calendars=None, titles=None, all_day=False):
+        """
+        Row numbers of the events starting in [time_min, time_max) (datetimes),
+        in start order. `calendars` limits them to some calendar IDs, `titles`
+        to the titles a boolean per title marks (see titles_matching). All-day
+        events are left out unless `all_day`.
+        """
+        start = self.columns['start']
+        first, last = np.searchsorted(start, [time_min.timestamp(), time_max.timestamp()])
+        keep = np.ones(last - first, bool)
+        if not all_day:
+            keep &= self.columns['all_day'][first:last] == 0
+        if calendars is not None:
+            wanted = np.array([calendar in calendars for calendar in self.calendars], bool)
+            keep &= wanted[self.columns['calendar'][first:last]]
+        if titles is not None:
+            keep &= titles[self.columns['title'][first:last]]
+        return first + np.flatnonzero(keep)
+
+    def hours(self, rows):
+        return (self.columns['end'][rows] - self.columns['start'][rows]).clip(0) / 3600
+
+    def totals(self, rows, period="week"):
+        """
+        Hours and number of the selected events per day, week (starting on
+        Monday) or month of their start. Returns (periods, hours, counts):
+        the periods as datetime64[D] of their first day, in order.
+        """
+        days = self.columns['day'][rows].astype("datetime64[D]")
+        if period == "week":
+            # 1970-01-01 was a Thursday
+            keys = days - ((days.astype(np.int64) + 3) % 7)
+        elif period == "month":
+            keys = days.astype("datetime64[M]").astype("datetime64[D]")
+        else:
+            keys = days
+        periods, inverse = np.unique(keys, return_inverse=True)
+        hours = np.bincount(inverse, weights=self.hours(rows), minlength=len(periods))
+        return periods, hours, np.bincount(inverse, minlength=len(periods))
+
+    def histogram(self, rows, by="weekday"):
+        """
+        Hours and number of the selected events per weekday (Monday first),
+        hour of the day of their start, calendar or title. Returns (hours,
+        counts), indexed by the bucket.
+        """
+        if by == "weekday":
+            buckets, size = (self.columns['day'][rows].astype(np.int64) + 3) % 7, 7
+        elif by == "hour":
+            buckets, size = self.columns['minute'][rows] // 60, 24
+        elif by == "calendar":
+            buckets, size = self.columns['calendar'][rows], len(self.calendars)
+        elif by == "title":
+            buckets, size = self.columns['title'][rows], len(self.titles)
+        else:
+            raise ValueError(f"Unknown histogram bucket {by!r}")
+        return (np.bincount(buckets, weights=self.hours(rows), minlength=size),
+                np.bincount(buckets, minlength=size))
+
+    def overlaps(self, rows):
+        """
+        Events among the selected ones that start before an earlier one ends.
+        Returns (overlapping, earlier, hours): the row numbers of those events,
+        of the earlier event each overlaps, and the hours booked twice.
+        """
+        start = self.columns['start'][rows]
+        end = self.columns['end'][rows]
+        if len(rows) < 2:
+            return rows[:0], rows[:0], 0.0
+        # For every event, the one ending last among those that started before it
+        latest = np.maximum.accumulate(np.where(end == np.maximum.accumulate(end), np.arange(len(end)), 0))
+        previous = latest[:-1]
+        clash = np.flatnonzero(start[1:] < end[previous]) + 1
+        booked_twice = np.minimum(end[clash], end[previous[clash - 1]]) - start[clash]
+        return rows[clash], rows[previous[clash - 1]], float(booked_twice.sum()) / 3600
+
+
+_snapshots = {}
+_snapshots_lock = threading.Lock()
+
+
+def snapshot_path(event_store):
+    return os.path.splitext(event_store.path)[0] + ".columns"
+
+
+def load_snapshot(event_store, calendar_ids, today=None):
+    """
+    The columnar snapshot of an event store's calendars, loaded from its
+    file next to the store and rebuilt when a sync has changed the mirror
+    since, the calendars changed or it was built on an earlier day.
+    """
+    today = today or date.today()
+    revisions = {calendar_id: event_store.revision(calendar_id) for calendar_id in calendar_ids}
+    meta = {'built': today.isoformat(), 'revisions': revisions}
+    path = snapshot_path(event_store)
+    with _snapshots_lock:
+        snapshot = _snapshots.get(path)
+        if snapshot is None and os.path.exists(path):
+            try:
+                snapshot = EventColumns.load(path)
+            except (OSError, ValueError, KeyError) as e:
+                print(f"Error loading event snapshot: {e}")
+        if snapshot is None or snapshot.meta != meta or snapshot.calendars != list(calendar_ids):
+            time_min = datetime.combine(today - timedelta(days=SNAPSHOT_PAST_DAYS), datetime.min.time())
+            time_max = datetime.combine(today + timedelta(days=SNAPSHOT_AHEAD_DAYS), datetime.min.time())
+            snapshot = EventColumns.build(
+                ((calendar_id, event_store.iter_events(calendar_id, time_min, time_max))
+                 for calendar_id in calendar_ids), meta)
+            try:
+                snapshot.save(path)
+            except OSError as e:
+                print(f"Error saving event snapshot: {e}")
+        _snapshots[path] = snapshot
+        return snapshot
+
+
+def is_analytics_question(query):
+    """
+    Whether the question asks for totals, averages, the busiest times or
+    overlaps rather than about particular events.
+    """
+    return bool(_ANALYTICS_PATTERN.search(query))
+
+
+def _month_start(day, months=0):
+    month = day.year * 12 + day.month - 1 + months
+    return date(month // 12, month % 12 + 1, 1)
+
+
+def analytics_window(query, now=None):
+    """
+    The (start, end) an analytics question is about, as naive local
+    datetimes: 'last 3 months', 'last week', 'this quarter', 'this year' and
+    the like, or the coming days query_horizon reads from 'tomorrow' or
+    'next week'; the last DEFAULT_ANALYTICS_DAYS days when it names no period.
+    A past-tense question ('did I have ... this quarter') stops at now.
+    """
+    now = now or datetime.now()
+    today = now.date()
+    text = query.lower()
+    midnight = datetime.min.time()
+
+    match = _LAST_COUNT.search(text)
+    if match:
+        count, unit = int(match.group(1)), match.group(2).rstrip("s")
+        if unit == "month":
+            return datetime.combine(_month_start(today, -count), midnight), now
+        days = {"day": 1, "week": 7, "year": 365}[unit] * count
+        return now - timedelta(days=days), now
+
+    monday = today - timedelta(days=today.weekday())
+    quarter = _month_start(today, -((today.month - 1) % 3))
+    periods = [
+        ("last week", monday - timedelta(days=7), monday),
+        ("this week", monday, monday + timedelta(days=7)),
+        ("last month", _month_start(today, -1), _month_start(today)),
+        ("this month", _month_start(today), _month_start(today, 1)),
+        ("last quarter", _month_start(quarter, -3), quarter),
+        ("this quarter", quarter, _month_start(quarter, 3)),
+        ("last year", date(today.year - 1, 1, 1), date(today.year, 1, 1)),
+        ("this year", date(today.year, 1, 1), date(today.year + 1, 1, 1)),
+    ]
+    for phrase, start, end in periods:
+        if phrase in text:
+            end = datetime.combine(end, midnight)
+            if _PAST_TENSE.search(text):
+                end = min(end, now)
+            return datetime.combine(start, midnight), end
+    if re.search(r"\b(today|tonight|tomorrow|next|coming|upcoming|weekend)\b", text):
+        return query_horizon(query, now)
+    return now - timedelta(days=DEFAULT_ANALYTICS_DAYS), now
+
+
+def analytics_period(query, window):
+    """
+    Period of the totals: the one the question asks for, otherwise days for
+    a window of two weeks or less, weeks up to half a year and months beyond.
+    """
+    text = query.lower()
+    for period, pattern in (("day", r"\b(per|each|a) day\b|\bdaily\b"), ("week", r"\b(per|each|a) week\b|\bweekly\b"),
+                            ("month", r"\b(per|each|a) month\b|\bmonthly\b")):
+        if re.search(pattern, text):
+            return period
+    days = (window[1] - window[0]).days
+    return "day" if days <= 14 else "week" if days <= 183 else "month"
+
+
+def _period_label(first_day, period):
+    day = first_day.astype(datetime)
+    if period == "month":
+        return day.strftime("%Y-%m")
+    if period == "week":
+        return f"week of {day:%a %Y-%m-%d}"
+    return day.strftime("%a %Y-%m-%d")
+
+
+def analytics_summary(snapshot, query, now=None):
+    """
+    The numbers an analytics question needs, computed on the snapshot and
+    written out for the model: totals for the question's window and per
+    period, hours per weekday and hour of the day, the busiest day and the
+    events booked over each other. Events are limited to those whose titles
+    mention the question's other words, when any do.
+    """
+    window = analytics_window(query, now)
+    period = analytics_period(query, window)
+    terms = [term for term in tokenize(query)
+             if term not in ANALYTICS_WORDS and len(term) > 1 and not term.isdigit()]
+    found = [term for term in terms if snapshot.titles_matching([term]).any()]
+    titles = snapshot.titles_matching(found) if found else None
+    rows = snapshot.select(*window, titles=titles)
+    all_day_rows = snapshot.select(*window, titles=titles, all_day=True)
+    all_day = len(all_day_rows) - len(rows)
+
+    if found:
+        scope = f"events whose titles mention {', '.join(repr(term) for term in found)}"
+    else:
+        scope = "all events"
+    lines = [f"Computed exactly from {scope} starting between {window[0]:%Y-%m-%d %H:%M} and "
+             f"{window[1]:%Y-%m-%d %H:%M}, across all calendars. Use these numbers as given; do not recompute them."]
+    missing = [term for term in terms if term not in found]
+    if missing:
+        lines.append(f"No event titles mention {', '.join(repr(term) for term in missing)}.")
+    hours = snapshot.hours(rows)
+    lines.append(f"Total: {hours.sum():.1f} hours in {len(rows)} timed events"
+                 + (f", plus {all_day} all-day events" if all_day else "") + ".")
+    if not len(rows):
+        return "\n".join(lines)
+
+    periods, period_hours, counts = snapshot.totals(rows, period)
+    first_day = np.datetime64(window[0].date(), "D")
+    last_day = np.datetime64((window[1] - timedelta(microseconds=1)).date(), "D")
+    span_days = int((last_day - first_day).astype(int)) + 1
+    span_periods = {"day": span_days, "week": span_days / 7, "month": span_days / 30.44}[period]
+    lines.append(f"Average per {period}: {hours.sum() / max(span_periods, 1):.1f} hours "
+                 f"({len(rows) / max(span_periods, 1):.1f} events), counting {period}s without events.")
+    lines.append(f"\nHours per {period} (events):")
+    shown = range(max(0, len(periods) - MAX_PERIOD_ROWS), len(periods))
+    if shown.start:
+        lines.append(f"(earlier {shown.start} {period}s: {period_hours[:shown.start].sum():.1f} hours, "
+                     f"{counts[:shown.start].sum()} events)")
+    lines += [f"{_period_label(periods[index], period)}: {period_hours[index]:.1f} ({counts[index]})"
+              for index in shown]
+
+    weekday_hours, weekday_counts = snapshot.histogram(rows, "weekday")
+    lines.append("\nHours per weekday (events): " + ", ".join(
+        f"{WEEKDAYS[day][:3]} {weekday_hours[day]:.1f} ({weekday_counts[day]})" for day in range(7)))
+    busiest = int(np.argmax(weekday_hours))
+    lines.append(f"Busiest weekday: {WEEKDAYS[busiest]}.")
+    day_periods, day_hours, day_counts = snapshot.totals(rows, "day")
+    top = int(np.argmax(day_hours))
+    lines.append(f"Busiest day: {_period_label(day_periods[top], 'day')}, {day_hours[top]:.1f} hours "
+                 f"in {day_counts[top]} events.")
+    hour_hours, _ = snapshot.histogram(rows, "hour")
+    lines.append("Hours of events by hour of the day they start: " + ", ".join(
+        f"{hour:02d}h {hour_hours[hour]:.1f}" for hour in range(24) if hour_hours[hour]))
+
+    overlapping, earlier, booked_twice = snapshot.overlaps(rows)
+    lines.append(f"\n{len(overlapping)} events start before an earlier one ends, "
+                 f"{booked_twice:.1f} hours booked twice.")
+    for row, other in list(zip(overlapping, earlier))[:5]:
+        start = datetime.fromtimestamp(int(snapshot.columns['start'][row]))
+        lines.append(f"{start:%Y-%m-%d %H:%M} {snapshot.titles[snapshot.columns['title'][row]]} overlaps "
+                     f"{snapshot.titles[snapshot.columns['title'][other]]}")
+    return "\n".join(lines)
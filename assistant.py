@@ -0,0 +1,483 @@
+import json
+import threading
+import openai
+from datetime import datetime, timedelta
+from config import OPENAI_API_KEY
+from accounts import get_local_account
+from analytics import analytics_summary, is_analytics_question, load_snapshot
+from availability import BusyIndex, format_slots, is_availability_question, requested_duration
+from event_batch import insert_events
+from event_store import DEFAULT_MAX_SYNC_AGE
+from fast_parser import fast_parse_events
+from journal import get_journal
+from event_schema import EVENTS_FUNCTION, EventRecord
+from llm import StreamStats, split_json_items, stream_chat, stream_function_call
+from llm_cache import get_llm_cache
+from prompt_context import (
+    DEFAULT_HORIZON_DAYS, build_calendar_context, build_matches_context, estimate_tokens, event_rows, query_horizon
+)
+from tracing import current_span, traced
+
+openai.api_key = OPENAI_API_KEY
+
+# Prompt tokens the earlier turns may use; the oldest turns are dropped first
+HISTORY_TOKEN_BUDGET = 3000
+# Prompt tokens the changes since the snapshot may use before it is rebuilt
+DELTA_TOKEN_BUDGET = 300
+
+CHAT_INSTRUCTIONS = (
+    "You are an intelligent calendar assistant with access to the user's calendars. "
+    "Always respond in 12h time format. Provide clear and actionable responses. "
+    "The user may ask follow-up questions about earlier answers."
+)
+
+
+def get_day_of_week(day_name):
+   """
+   Helper function to map day name to day of the week.
+   0 = Monday, 1 = Tuesday, ..., 6 = Sunday.
+   """
+   days = {
+       "Monday": 0,
+       "Tuesday": 1,
+       "Wednesday": 2,
+       "Thursday": 3,
+       "Friday": 4,
+       "Saturday": 5,
+       "Sunday": 6
+   }
+   return days.get(day_name, -1)
+
+def get_color_id(color_name):
+   """
+   Maps user-friendly color names to Google Calendar color IDs.
+   """
+   color_map = {
+       "Default": None, "Lavender": "1", "Sage": "2", "Grape": "3", "Flamingo": "4",
+       "Banana": "5", "Tangerine": "6", "Peacock": "7", "Graphite": "8", "Blueberry": "9", "Basil": "10", "Tomato": "11"
+   }
+   return color_map.get(color_name, None)
+
+def get_selected_calendar_id(selected_calendar_name, account=None):
+    """
+    Get the calendar ID based on the selected calendar name.
+    """
+    try:
+        return (account or get_local_account()).calendar_registry().get_id(selected_calendar_name)
+    except Exception as e:
+        print(f"Error fetching calendar ID: {e}")
+    return None
+
+
+
+def _report(task, message):
+    if task is not None:
+        task.report(message)
+
+
+def _check_cancelled(task):
+    if task is not None:
+        task.check_cancelled()
+
+
+def _emit(task, value):
+    if task is not None:
+        task.emit(value)
+
+
+
+@traced("suggest_events")
+def suggest_events(user_input, task=None):
+    """
+    Turns free-form input into validated EventRecords. Inputs the local fast
+    parser is confident about never reach GPT-4; everything else is sent to it,
+    and GPT-4 answers by calling propose_events with the events as JSON. The
+    reply is streamed and each event is emitted to the task as soon as it is complete.
+    Returns (records, problems): the events, and why any proposed event was left out.
+    """
+    # Get the current date for reference
+    now = datetime.now()
+    current_date = now.strftime("%Y-%m-%d")
+    current_year = now.year
+    suggest_span = current_span().set(input_chars=len(user_input))
+
+    # Simple inputs like 'gym every Monday 6pm' are parsed locally, skipping GPT-4
+    fast_records = fast_parse_events(user_input, now)
+    if fast_records is not None:
+        suggest_span.set(source="fast_parser", events=len(fast_records))
+        for record in fast_records:
+            _emit(task, record)
+        return fast_records, []
+
+    # The reply is a function call, so its format is enforced by the schema
+    messages = [
+        {
+            "role": "system",
+            "content": (
+                f"You are a scheduling assistant. The current date is {current_date}, and the current year is {current_year}. "
+                "Call propose_events with every event in the user's request. "
+                "Leave start_time and end_time empty if no time is given; an event with only a start or end time lasts one hour. "
+                "Set end_date only for recurring events that end, from phrases like 'for 6 months' or 'until December 2025'."
+            ),
+        },
+        {"role": "user", "content": f"Classify and process: {user_input}"},
+    ]
+    prompt = messages[0]["content"]
+    records = []
+    problems = []
+
+    def accept(item):
+        try:
+            record = EventRecord.from_dict(json.loads(item), now)
+        except ValueError as e:
+            print(f"Error reading proposed event: {e}")
+            problems.append(str(e))
+            return
+        records.append(record)
+        _emit(task, record)
+
+    # Repeated requests on the same day are answered from the cache
+    cache = get_llm_cache()
+    cached_output = cache.get(prompt, user_input, current_date)
+    if cached_output is not None:
+        for item in split_json_items([cached_output]):
+            accept(item)
+        suggest_span.set(source="cache", events=len(records), problems=len(problems))
+        return records, problems
+
+    stats = StreamStats("suggest_events")
+    chunks = []
+
+    def fragments():
+        for fragment in stream_function_call(messages, EVENTS_FUNCTION, stats=stats):
+            chunks.append(fragment)
+            yield fragment
+
+    for item in split_json_items(fragments(), stats=stats):
+        _check_cancelled(task)
+        accept(item)
+    suggest_span.set(source="gpt-4", events=len(records), problems=len(problems),
+                     first_event_ms=stats.time_to_first_block and round(stats.time_to_first_block * 1000, 1))
+
+    if not records and not problems and "".join(chunks).strip():
+        problems.append(f"GPT-4 returned no events: {''.join(chunks).strip()[:200]}")
+    if records:
+        # Events are cached in their validated, repaired form
+        cache.put(prompt, user_input, current_date, json.dumps({"events": [record.to_dict() for record in records]}))
+    return records, problems
+
+
+@traced("create_suggested_events")
+def create_suggested_events(records, selected_calendar, selected_color, task=None, account=None):
+    """
+    Creates confirmed events in the selected calendar using batch requests, so a
+    semester of classes takes one or two round trips.
+    Returns (created, failures): dicts keyed by the position in records,
+    holding the created event or the reason it was not created.
+    """
+    account = account or get_local_account()
+    calendar_id = get_selected_calendar_id(selected_calendar, account) or account.assistant_calendar_id()
+    _check_cancelled(task)
+
+    color_id = get_color_id(selected_color)
+    items = [(calendar_id, record.to_api_body(color_id)) for record in records]
+    _report(task, f"Creating {len(items)} events...")
+    created, failures = insert_events(items, service=account.calendar_service())
+    current_span().set(events=len(records), created=len(created))
+    return created, failures
+
+
+def queue_suggested_events(records, selected_calendar, selected_color, journal=None):
+    """
+    Writes confirmed events to the journal and returns their event IDs
+    without touching the network; the journal's flusher creates them.
+    """
+    journal = journal or get_journal()
+    color_id = get_color_id(selected_color)
+    return journal.add([(selected_calendar, record.to_api_body(color_id), record.to_dict()) for record in records])
+
+
+def calendar_events(time_min, time_max, max_age=DEFAULT_MAX_SYNC_AGE, task=None, account=None):
+    """
+    Events of all calendars between time_min and time_max, read from the
+    local mirror after syncing the calendars not synced in the last `max_age` seconds.
+    """
+    account = account or get_local_account()
+    calendar_ids = [calendar['id'] for calendar in account.calendar_registry().calendars()]
+    event_store = account.event_store()
+    failures = event_store.sync(calendar_ids, max_age=max_age)
+    for failed_id, error in failures.items():
+        print(f"Error syncing events for calendar {failed_id}: {error}")
+    _check_cancelled(task)
+    return list(event_store.events_between(calendar_ids, time_min=time_min, time_max=time_max))
+
+
+def question_context(user_query, now, event_store, calendar_ids, listed_window=None):
+    """
+    The calendar part of the prompt for a question, read from the mirror:
+    free slots for availability questions; otherwise the events of the
+    question's time window, within a token budget, and the events matching
+    it by keyword, after totals, busiest times and overlaps for analytics
+    questions. The part of the window `listed_window` (start, end) covers
+    is left out, e.g. when a chat session already listed it.
+    """
+    # Only the window the question is about goes into the prompt, within a token budget
+    window_start, window_end = query_horizon(user_query, now)
+    query_span = current_span()
+    if is_availability_question(user_query):
+        # Free time is computed locally; the model only phrases the answer
+        events = event_store.events_between(calendar_ids, time_min=window_start, time_max=window_end)
+        min_duration = requested_duration(user_query)
+        slots = BusyIndex.from_events(events).free_slots(window_start, window_end, min_duration)
+        query_span.set(context="free_slots", slots=len(slots))
+        return (
+            f"Free slots of at least {int(min_duration.total_seconds() // 60)} minutes between "
+            f"{window_start:%Y-%m-%d %H:%M} and {window_end:%Y-%m-%d %H:%M}, within working hours, "
+            "computed exactly from all of the user's calendars. Use these slots as given; "
+            "do not recompute availability.\n\n"
+            f"{format_slots(slots)}"
+        )
+
+    parts = []
+    tokens = 0
+    if is_analytics_question(user_query):
+        # Aggregates come from the columnar snapshot; the model only phrases them
+        summary = analytics_summary(load_snapshot(event_store, calendar_ids, now.date()), user_query, now)
+        query_span.set(analytics_tokens=estimate_tokens(summary))
+        tokens += estimate_tokens(summary)
+        parts.append(summary)
+    if listed_window and listed_window[0] <= window_start < listed_window[1]:
+        window_start = listed_window[1]
+    if window_start < window_end:
+        events = event_store.events_between(calendar_ids, time_min=window_start, time_max=window_end)
+        context = build_calendar_context(events, window=(window_start, window_end))
+        query_span.set(context="events", context_events=context.events_included,
+                       context_dropped=context.events_dropped)
+        tokens += context.tokens_used
+        parts.append(
+            f"Events from {window_start:%Y-%m-%d %H:%M} to {window_end:%Y-%m-%d %H:%M} are listed below, "
+            "one per line as date|time (24h)|title|location|repeats; a repeats value means the row "
+            "stands for that many occurrences of a recurring event.\n\n"
+            f"{context.text}"
+        )
+    # Events the question names, found by keyword wherever they are in the calendar
+    matches = build_matches_context(event_store.search(user_query, calendar_ids, now=now))
+    tokens += matches.tokens_used if matches.events_included else 0
+    query_span.set(matches=matches.events_included, context_tokens=tokens)
+    if matches.events_included:
+        parts.append(
+            "Events whose title, description or location match the query, at any date, "
+            f"in the same layout:\n\n{matches.text}"
+        )
+    return "\n\n".join(parts)
+
+
+@traced("answer_calendar_query")
+def answer_calendar_query(user_query, task=None, account=None):
+    """
+    Interact with the AI to process user queries while considering all calendars.
+    Returns the AI's answer.
+    """
+    # Get the current date and time for context
+    now = datetime.now()
+    current_date = now.strftime("%Y-%m-%d")
+    current_time = now.strftime("%H:%M:%S")
+    current_year = now.year
+
+    # Fetch all calendars
+    account = account or get_local_account()
+    calendars = account.calendar_registry().calendars()
+    calendar_names = [calendar['summary'] for calendar in calendars]
+
+    # Bring the local mirror up to date (only changes go over the network) and read from it
+    _report(task, "Syncing calendars...")
+    event_store = account.event_store()
+    calendar_ids = [calendar['id'] for calendar in calendars]
+    failures = event_store.sync(calendar_ids)
+    for failed_id, error in failures.items():
+        print(f"Error syncing events for calendar {failed_id}: {error}")
+
+    calendar_context = question_context(user_query, now, event_store, calendar_ids)
+
+    _check_cancelled(task)
+    _report(task, "Asking GPT-4...")
+
+    # Prepare AI query
+    messages = [
+        {
+            "role": "system",
+            "content": (
+                f"You are an intelligent calendar assistant with access to the user's calendars. Always respond in 12h time format "
+                f"The current date is {current_date}, and the current time is {current_time}. "
+                f"The user has the following calendars: {', '.join(calendar_names)}. "
+                "Provide clear and actionable responses. "
+                f"{calendar_context}"
+            )
+        },
+        {"role": "user", "content": f"User's query: {user_query}"}
+    ]
+
+    # Stream the answer so it can be shown token by token
+    chunks = []
+    for delta in stream_chat(messages):
+        _check_cancelled(task)
+        chunks.append(delta)
+        _emit(task, delta)
+
+    return "".join(chunks).strip()
+
+
+class ChatSession:
+    """
+    A conversation about the calendars of one account. ask() runs one turn;
+    turns of a session run one at a time.
+
+    Every request of a session starts with the same messages, so OpenAI's
+    prompt caching can reuse the prefix it has already processed, and
+    follow-up questions pay only for what comes after it:
+
+        system          instructions and calendar names       same every turn
+        system          the events from today to +14 days     same until rebuilt
+        user/assistant  earlier questions and answers         oldest dropped first
+        system          changes to those events since then    only when there are some
+        user            current time, context for the question, the question
+
+    The current time goes in the last message, since a timestamp at the top
+    would make every prompt unique. The snapshot of the events is rebuilt
+    when the day or the calendars change, or when the changes since it
+    outgrow DELTA_TOKEN_BUDGET.
+    """
+
+    def __init__(self, account=None, history_budget=HISTORY_TOKEN_BUDGET, delta_budget=DELTA_TOKEN_BUDGET):
+        self.account = account or get_local_account()
+        self.history_budget = history_budget
+        self.delta_budget = delta_budget
+        self.history = []      # (question, answer) pairs, oldest first
+        self._snapshot = None  # the events the prefix lists, see _take_snapshot
+        self._generation = 0   # bumped by reset(), so a turn still running stays out of the new conversation
+        self._lock = threading.Lock()
+        self._turn_lock = threading.Lock()
+
+    def reset(self):
+        """
+        Starts a new conversation.
+        """
+        with self._lock:
+            self.history = []
+            self._snapshot = None
+            self._generation += 1
+
+    def _take_snapshot(self, now, calendar_names, calendar_ids, event_store):
+        start = now.replace(hour=0, minute=0, second=0, microsecond=0)
+        window = (start, start + timedelta(days=DEFAULT_HORIZON_DAYS + 1))
+        events = list(event_store.events_between(calendar_ids, *window))
+        context = build_calendar_context(events, window=window)
+        rows = event_rows(events)
+        prefix = [
+            {"role": "system", "content": f"{CHAT_INSTRUCTIONS} The user has the following calendars: "
+                                          f"{', '.join(calendar_names)}."},
+            {"role": "system", "content": (
+                f"Events from {window[0]:%Y-%m-%d} to {window[1]:%Y-%m-%d} as of {now:%Y-%m-%d %H:%M}, "
+                "one per line as date|time (24h)|title|location|repeats; a repeats value means the row "
+                "stands for that many occurrences of a recurring event.\n\n"
+                f"{context.text}"
+            )},
+        ]
+        self._snapshot = {
+            'day': start.date(), 'calendars': (tuple(calendar_ids), tuple(calendar_names)), 'window': window,
+            'prefix': prefix, 'rows': [row for _, row in rows],
+            # Questions about later times, left out for the budget, still get their own listing
+            'listed': (window[0], context.listed_until or window[1]),
+        }
+        return self._snapshot
+
+    def _changes(self, snapshot, event_store):
+        """
+        The rows added to and removed from the snapshot's window since it was taken, as one message.
+        """
+        rows = [row for _, row in event_rows(event_store.events_between(snapshot['calendars'][0],
+                                                                        *snapshot['window']))]
+        current, listed = set(rows), set(snapshot['rows'])
+        lines = [f"+ {row}" for row in rows if row not in listed]
+        lines += [f"- {row}" for row in snapshot['rows'] if row not in current]
+        if not lines:
+            return None, 0
+        return ("Changes to the calendar since the listing above, in the same layout "
+                "(+ added, - removed):\n" + "\n".join(lines)), len(lines)
+
+    def _trim_history(self):
+        tokens = sum(estimate_tokens(question) + estimate_tokens(answer) for question, answer in self.history)
+        while self.history and tokens > self.history_budget:
+            question, answer = self.history.pop(0)
+            tokens -= estimate_tokens(question) + estimate_tokens(answer)
+        return tokens
+
+    def messages(self, user_query, now, calendar_names, calendar_ids, event_store):
+        """
+        The messages of the next turn, rebuilding the snapshot first if it is out of date.
+        """
+        with self._lock:
+            snapshot = self._snapshot
+            rebuilt = (snapshot is None or snapshot['day'] != now.date()
+                       or snapshot['calendars'] != (tuple(calendar_ids), tuple(calendar_names)))
+            changes, changed_rows = None, 0
+            if not rebuilt:
+                changes, changed_rows = self._changes(snapshot, event_store)
+                rebuilt = bool(changes) and estimate_tokens(changes) > self.delta_budget
+            if rebuilt:
+                snapshot = self._take_snapshot(now, calendar_names, calendar_ids, event_store)
+                changes, changed_rows = None, 0
+
+            history_tokens = self._trim_history()
+            messages = list(snapshot['prefix'])
+            for question, answer in self.history:
+                messages.append({"role": "user", "content": question})
+                messages.append({"role": "assistant", "content": answer})
+            turns = len(self.history)
+        if changes:
+            messages.append({"role": "system", "content": changes})
+        context = question_context(user_query, now, event_store, calendar_ids, listed_window=snapshot['listed'])
+        parts = [f"The current time is {now:%A %Y-%m-%d %H:%M}.", context, f"User's query: {user_query}"]
+        messages.append({"role": "user", "content": "\n\n".join(part for part in parts if part)})
+        current_span().set(
+            snapshot="rebuilt" if rebuilt else "reused", history_turns=turns, history_tokens=history_tokens,
+            prefix_tokens=sum(estimate_tokens(message['content']) for message in snapshot['prefix']),
+            changed_rows=changed_rows,
+        )
+        return messages
+
+    @traced("chat_session.ask")
+    def ask(self, user_query, task=None):
+        """
+        Answers a question in the context of the conversation so far, streaming
+        the answer through `task`. Returns the answer.
+        """
+        with self._turn_lock:
+            generation = self._generation
+            now = datetime.now()
+            calendars = self.account.calendar_registry().calendars()
+            calendar_names = [calendar['summary'] for calendar in calendars]
+            calendar_ids = [calendar['id'] for calendar in calendars]
+
+            # Bring the local mirror up to date (only changes go over the network) and read from it
+            _report(task, "Syncing calendars...")
+            event_store = self.account.event_store()
+            failures = event_store.sync(calendar_ids)
+            for failed_id, error in failures.items():
+                print(f"Error syncing events for calendar {failed_id}: {error}")
+
+            messages = self.messages(user_query, now, calendar_names, calendar_ids, event_store)
+            _check_cancelled(task)
+            _report(task, "Asking GPT-4...")
+
+            chunks = []
+            for delta in stream_chat(messages):
+                _check_cancelled(task)
+                chunks.append(delta)
+                _emit(task, delta)
+            answer = "".join(chunks).strip()
+            # A cancelled turn never gets here, so only answered questions join the history
+            with self._lock:
+                if generation == self._generation:
+                    self.history.append((user_query, answer))
+            return answer
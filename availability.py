@@ -0,0 +1,147 @@
+import re
+from bisect import bisect_right
+from datetime import datetime, time, timedelta
+
+from event_fetch import event_timestamp, parse_datetime
+
+# Hours considered for free slots unless the caller says otherwise
+DEFAULT_WORKING_HOURS = (time(8, 0), time(20, 0))
+DEFAULT_SLOT_MINUTES = 60
+
+_AVAILABILITY_PATTERN = re.compile(
+    r"\b(free|available|availability|open slot|have time|find time|when can i|fit in)\b", re.IGNORECASE
+)
+
+
+def _epoch(value):
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str):
+        return parse_datetime(value).timestamp()
+    return value.timestamp()
+
+
+class BusyIndex:
+    """
+    Sorted, non-overlapping busy intervals across all calendars.
+    Lookups binary-search for the first relevant interval and then walk only
+    the intervals that overlap the query range: O(log n + k).
+    """
+
+    def __init__(self, intervals=()):
+        merged = []
+        for start, end in sorted((_epoch(s), _epoch(e)) for s, e in intervals):
+            if end <= start:
+                continue
+            if merged and start <= merged[-1][1]:
+                merged[-1][1] = max(merged[-1][1], end)
+            else:
+                merged.append([start, end])
+        self._starts = [start for start, _ in merged]
+        self._ends = [end for _, end in merged]
+
+    def __len__(self):
+        return len(self._starts)
+
+    @classmethod
+    def from_events(cls, events):
+        """
+        Builds the index from Calendar events. Events marked as 'free'
+        (transparent), cancelled or declined, and all-day events, do not block time.
+        """
+        intervals = []
+        for event in events:
+            if event.get('transparency') == 'transparent' or event.get('status') == 'cancelled':
+                continue
+            if 'dateTime' not in event.get('start', {}):
+                continue
+            if any(attendee.get('self') and attendee.get('responseStatus') == 'declined'
+                   for attendee in event.get('attendees', [])):
+                continue
+            intervals.append((event_timestamp(event['start']), event_timestamp(event['end'])))
+        return cls(intervals)
+
+    def busy_between(self, time_min, time_max):
+        """
+        Yields the (start, end) epoch intervals that overlap [time_min, time_max).
+        """
+        lo, hi = _epoch(time_min), _epoch(time_max)
+        # First interval whose end lies after lo; ends are sorted because intervals are disjoint
+        index = bisect_right(self._ends, lo)
+        while index < len(self._starts) and self._starts[index] < hi:
+            yield self._starts[index], self._ends[index]
+            index += 1
+
+    def free_between(self, time_min, time_max, min_duration=timedelta(minutes=DEFAULT_SLOT_MINUTES)):
+        """
+        Yields free (start, end) epoch intervals of at least `min_duration` in
+        [time_min, time_max).
+        """
+        lo, hi = _epoch(time_min), _epoch(time_max)
+        minimum = min_duration.total_seconds()
+        cursor = lo
+        for start, end in self.busy_between(lo, hi):
+            if start - cursor >= minimum:
+                yield cursor, start
+            cursor = max(cursor, end)
+        if hi - cursor >= minimum:
+            yield cursor, hi
+
+    def free_slots(self, time_min, time_max, min_duration=timedelta(minutes=DEFAULT_SLOT_MINUTES),
+                   working_hours=DEFAULT_WORKING_HOURS, weekdays=None):
+        """
+        Returns free slots of at least `min_duration` between two naive local
+        datetimes, restricted to `working_hours` (a (start, end) pair of times,
+        or None for the whole day) and optionally to the given weekdays (0=Monday).
+        """
+        slots = []
+        day = time_min.replace(hour=0, minute=0, second=0, microsecond=0)
+        while day < time_max:
+            if weekdays is None or day.weekday() in weekdays:
+                if working_hours:
+                    day_start = day.replace(hour=working_hours[0].hour, minute=working_hours[0].minute)
+                    day_end = day.replace(hour=working_hours[1].hour, minute=working_hours[1].minute)
+                else:
+                    day_start, day_end = day, day + timedelta(days=1)
+                window_start, window_end = max(day_start, time_min), min(day_end, time_max)
+                if window_start < window_end:
+                    for start, end in self.free_between(window_start, window_end, min_duration):
+                        slots.append((datetime.fromtimestamp(start), datetime.fromtimestamp(end)))
+            day += timedelta(days=1)
+        return slots
+
+
+def is_availability_question(query):
+    """
+    True for questions like 'When do I have time to grocery shop?'.
+    """
+    return bool(_AVAILABILITY_PATTERN.search(query))
+
+
+def requested_duration(query, default_minutes=DEFAULT_SLOT_MINUTES):
+    """
+    Reads the slot length a question asks for, e.g. '2 hours' or '45 min'.
+    """
+    text = query.lower()
+    if "half an hour" in text or "half hour" in text:
+        return timedelta(minutes=30)
+    match = re.search(r"(\d+(?:\.\d+)?)\s*(hours?|hrs?|h|minutes?|mins?)\b", text)
+    if match:
+        amount = float(match.group(1))
+        return timedelta(hours=amount) if match.group(2).startswith("h") else timedelta(minutes=amount)
+    if re.search(r"\ban hour\b", text):
+        return timedelta(hours=1)
+    return timedelta(minutes=default_minutes)
+
+
+def format_slots(slots, limit=15):
+    """
+    Formats free slots as short 12-hour lines for display or a prompt.
+    """
+    def clock(moment):
+        return f"{moment:%I:%M %p}".lstrip("0")
+
+    lines = [f"{start:%a %b} {start.day}: {clock(start)}-{clock(end)}" for start, end in slots[:limit]]
+    if len(slots) > limit:
+        lines.append(f"...and {len(slots) - limit} more")
+    return "\n".join(lines) if lines else "No free slots in this period."
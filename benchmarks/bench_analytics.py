@@ -0,0 +1,167 @@
+"""
+Schedule analytics over years of history: building, saving and opening the
+columnar snapshot, and the time per aggregate (hours per week, per weekday,
+overlaps) on the NumPy columns vs. a loop over the event dicts. Also the
+prompt tokens of the computed summary vs. the event listing a question about
+a quarter would otherwise send.
+
+    python -m benchmarks.bench_analytics --years 3 --calendars 5
+"""
+import argparse
+import os
+import random
+import shutil
+import tempfile
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from analytics import EventColumns, analytics_summary, analytics_window
+from benchmarks.bench_suite import percentile
+from prompt_context import build_calendar_context, estimate_tokens
+
+TITLES = ["Team meeting", "Design review", "1:1 with Sam", "Lunch", "Gym", "Customer call", "Focus time",
+          "Sprint planning meeting", "Yoga class", "Board meeting", "Piano lesson"]
+QUESTION = "How many hours of meetings did I have per week last quarter?"
+
+
+def synthetic_calendars(calendars, years, now, seed=0):
+    """
+    (calendar ID, events) pairs: a few events on most days, over `years` up to now.
+    """
+    generator = random.Random(seed)
+    first = now - timedelta(days=365 * years)
+    result = []
+    for calendar in range(calendars):
+        events = []
+        day = datetime(first.year, first.month, first.day, 8)
+        while day < now:
+            for _ in range(generator.randrange(9)):
+                start = (day + timedelta(minutes=30 * generator.randrange(20))).astimezone()
+                end = start + timedelta(minutes=30 * generator.randrange(1, 5))
+                events.append({'summary': generator.choice(TITLES), 'start': {'dateTime': start.isoformat()},
+                               'end': {'dateTime': end.isoformat()}})
+            if generator.random() < 0.03:
+                events.append({'summary': "Holiday", 'start': {'date': day.date().isoformat()},
+                               'end': {'date': (day.date() + timedelta(days=1)).isoformat()}})
+            day += timedelta(days=1)
+        events.sort(key=lambda event: event['start'].get('dateTime') or event['start']['date'])
+        result.append((f"cal{calendar}@example.com", events))
+    return result
+
+
+def timed(function, repeat=20):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return percentile(times, 0.5)
+
+
+def dict_weekly_hours(events, time_min, time_max):
+    totals = defaultdict(float)
+    for event in events:
+        if 'dateTime' not in event['start']:
+            continue
+        start = datetime.fromisoformat(event['start']['dateTime']).replace(tzinfo=None)
+        if time_min <= start < time_max:
+            end = datetime.fromisoformat(event['end']['dateTime']).replace(tzinfo=None)
+            totals[start.date() - timedelta(days=start.weekday())] += (end - start).total_seconds() / 3600
+    return totals
+
+
+def dict_weekday_hours(events, time_min, time_max):
+    totals = [0.0] * 7
+    for event in events:
+        if 'dateTime' not in event['start']:
+            continue
+        start = datetime.fromisoformat(event['start']['dateTime']).replace(tzinfo=None)
+        if time_min <= start < time_max:
+            end = datetime.fromisoformat(event['end']['dateTime']).replace(tzinfo=None)
+            totals[start.weekday()] += (end - start).total_seconds() / 3600
+    return totals
+
+
+def dict_overlaps(events, time_min, time_max):
+    timed_events = sorted(
+        (datetime.fromisoformat(event['start']['dateTime']), datetime.fromisoformat(event['end']['dateTime']))
+        for event in events if 'dateTime' in event['start'])
+    count = 0
+    latest = None
+    for start, end in timed_events:
+        if not time_min <= start.replace(tzinfo=None) < time_max:
+            continue
+        if latest is not None and start < latest:
+            count += 1
+        latest = end if latest is None else max(latest, end)
+    return count
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("--years", type=int, default=3)
+    arg_parser.add_argument("--calendars", type=int, default=5)
+    args = arg_parser.parse_args()
+
+    now = datetime.now()
+    calendars = synthetic_calendars(args.calendars, args.years, now)
+    events = [event for _, calendar_events in calendars for event in calendar_events]
+    history = (now - timedelta(days=365 * args.years), now)
+
+    directory = tempfile.mkdtemp(prefix="bench_analytics_")
+    try:
+        path = os.path.join(directory, "events.columns")
+        start = time.perf_counter()
+        built = EventColumns.build(calendars)
+        build_time = time.perf_counter() - start
+        start = time.perf_counter()
+        built.save(path)
+        save_time = time.perf_counter() - start
+        start = time.perf_counter()
+        snapshot = EventColumns.load(path)
+        load_time = time.perf_counter() - start
+        size = os.path.getsize(path)
+
+        print(f"{len(events)} events over {args.years} years in {args.calendars} calendars, "
+              f"{len(snapshot.titles)} distinct titles")
+        print(f"snapshot: build {build_time * 1000:.0f}ms, save {save_time * 1000:.1f}ms, "
+              f"open {load_time * 1000:.2f}ms, {size / 1e6:.1f}MB ({size / len(events):.0f} bytes per event)")
+
+        all_rows = lambda: snapshot.select(*history)
+        aggregates = [
+            ("hours per week, all history",
+             lambda: snapshot.totals(all_rows(), "week"), lambda: dict_weekly_hours(events, *history)),
+            ("hours per weekday, all history",
+             lambda: snapshot.histogram(all_rows(), "weekday"), lambda: dict_weekday_hours(events, *history)),
+            ("overlaps, all history",
+             lambda: snapshot.overlaps(all_rows()), lambda: dict_overlaps(events, *history)),
+            ("chat summary, last quarter", lambda: analytics_summary(snapshot, QUESTION, now), None),
+        ]
+        print(f"\n{'aggregate':<32} {'columns':>9} {'event dicts':>12}")
+        for label, columnar, loop in aggregates:
+            columnar_time = timed(columnar)
+            loop_time = f"{timed(loop, repeat=3) * 1000:>10.1f}ms" if loop else f"{'-':>12}"
+            print(f"{label:<32} {columnar_time * 1000:>7.2f}ms {loop_time}")
+
+        weekly = snapshot.totals(all_rows(), "week")[1].sum()
+        looped = sum(dict_weekly_hours(events, *history).values())
+        print(f"\nhours in all, columns vs. loop: {weekly:.1f} vs. {looped:.1f}")
+
+        window = analytics_window(QUESTION, now)
+        in_window = [event for event in events
+                     if window[0] <= datetime.fromisoformat(event['start'].get('dateTime') or
+                                                            event['start']['date']).replace(tzinfo=None) < window[1]]
+        listing = build_calendar_context(sorted(in_window, key=lambda event: event['start'].get('dateTime') or
+                                                event['start']['date']), window=window)
+        summary = analytics_summary(snapshot, QUESTION, now)
+        print(f"prompt for {QUESTION!r}:")
+        print(f"  event listing: {listing.tokens_used} tokens, {listing.events_included} of {len(in_window)} "
+              f"events ({listing.events_dropped} left out for the budget)")
+        print(f"  computed summary: {estimate_tokens(summary)} tokens, covering all {len(in_window)} events")
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""
+Compares creating events one request at a time with batched inserts against
+the local fake Calendar API, e.g. a semester of class meetings.
+
+    python -m benchmarks.bench_batch_insert --events 60 --latency 0.1
+"""
+import argparse
+import time
+from datetime import datetime, timedelta
+
+import httplib2
+
+from benchmarks.fake_google import FakeCalendarServer, FakeCalendarState
+from event_batch import insert_events
+from services import build_calendar_service
+
+
+def semester(count, calendar_id):
+    start = datetime(2026, 1, 12, 9)
+    items = []
+    for index in range(count):
+        event_start = start + timedelta(days=(index % 5) + 7 * (index // 5))
+        items.append((calendar_id, {
+            'summary': f"Class meeting {index}",
+            'start': {'dateTime': event_start.isoformat(), 'timeZone': "UTC"},
+            'end': {'dateTime': (event_start + timedelta(minutes=50)).isoformat(), 'timeZone': "UTC"},
+        }))
+    return items
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument("--events", type=int, default=60)
+    arg_parser.add_argument("--latency", type=float, default=0.1, help="Simulated seconds per round trip")
+    arg_parser.add_argument("--failures", type=int, default=3, help="Events whose first insert fails with a 503")
+    args = arg_parser.parse_args()
+
+    state = FakeCalendarState(latency=args.latency)
+    state.add_calendar("classes@example.com", "Classes")
+    items = semester(args.events, "classes@example.com")
+    with FakeCalendarServer(state) as server:
+        service = build_calendar_service(None, http=httplib2.Http(), api_endpoint=server.url)
+
+        start = time.perf_counter()
+        for calendar_id, body in items:
+            service.events().insert(calendarId=calendar_id, body=body).execute()
+        one_by_one = time.perf_counter() - start
+        one_by_one_requests = state.request_count
+
+        state.request_count = 0
+        for _, body in items[:args.failures]:
+            state.insert_errors[body['summary']] = [503]
+        start = time.perf_counter()
+        created, failures = insert_events(items, service=service, backoff=0.0)
+        batched = time.perf_counter() - start
+
+    print(f"{args.events} events, {args.latency * 1000:.0f} ms per round trip, "
+          f"{args.failures} transient failures in the batched run")
+    print(f"{'one request per event':<24} {one_by_one:>7.2f}s {one_by_one_requests:>4} round trips")
+    print(f"{'batched':<24} {batched:>7.2f}s {state.request_count:>4} round trips, "
+          f"{len(created)} created, {len(failures)} failed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Prompts sent for a multi-turn conversation with the calendar, against the
+local fake Calendar and OpenAI servers: one stateless answer_calendar_query
+per question vs. one ChatSession. An event is created halfway through.
+
+For every turn it reports the prompt tokens and how many of them repeat the
+start of the previous prompt. OpenAI caches such prefixes once they reach
+1024 tokens.
+
+    python -m benchmarks.bench_chat_session --calendars 5 --events 200
+"""
+import argparse
+import os
+import shutil
+import tempfile
+from datetime import datetime, timedelta
+
+from benchmarks.bench_suite import run_in_process, scenario_environment
+from benchmarks.fake_google import FakeCalendarServer, FakeCalendarState
+from benchmarks.fake_openai import FakeOpenAIServer, FakeOpenAIState
+
+QUESTIONS = [
+    "What do I have tomorrow?",
+    "And the day after?",
+    "Which of those are on Calendar 1?",
+    "When is my next dentist appointment?",
+    "Could I move anything to make room on Friday afternoon?",
+    "Summarize my week.",
+]
+# Turn before which an event is created, as if confirmed mid-conversation
+CHANGE_BEFORE = 3
+# Shortest prefix OpenAI caches, in tokens
+MIN_CACHED_PREFIX = 1024
+
+
+def converse(scenario, count, concurrency):
+    """
+    Runs in a fresh process (see bench_suite.run_in_process): the questions
+    once without and once with a session.
+    """
+    import contextlib
+    import io
+
+    from assistant import ChatSession, answer_calendar_query, create_suggested_events
+    from event_schema import EventRecord
+
+    tomorrow = (datetime.now() + timedelta(days=1)).strftime("%Y-%m-%d")
+    with contextlib.redirect_stdout(io.StringIO()):
+        for label, ask in [("stateless", answer_calendar_query), ("session", ChatSession().ask)]:
+            for turn, question in enumerate(QUESTIONS):
+                if turn == CHANGE_BEFORE:
+                    record = EventRecord.from_dict({'title': f"Dentist appointment ({label})",
+                                                    'start_date': tomorrow, 'start_time': "16:00"})
+                    create_suggested_events([record], "Calendar Assistant Calendar", "Default")
+                ask(question)
+    return []
+
+
+def serialized(messages):
+    return "".join(f"{message['role']}: {message['content']}\n" for message in messages)
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("--calendars", type=int, default=5)
+    arg_parser.add_argument("--events", type=int, default=200, help="Events per calendar")
+    args = arg_parser.parse_args()
+
+    google_state = FakeCalendarState()
+    google_state.populate(args.calendars, args.events)
+    openai_state = FakeOpenAIState(first_token_latency=0, token_latency=0)
+    cache_dir = tempfile.mkdtemp(prefix="bench_chat_session_")
+    try:
+        with FakeCalendarServer(google_state) as google, FakeOpenAIServer(openai_state) as openai_server:
+            environment = scenario_environment(cache_dir, google.url, openai_server.url)
+            run_in_process(environment, {}, len(QUESTIONS), 1, function=converse)
+    finally:
+        shutil.rmtree(cache_dir, ignore_errors=True)
+
+    prompts = [serialized(request['messages']) for request in openai_state.requests]
+    print(f"{args.calendars} calendars, {args.events} events each; an event is created before turn "
+          f"{CHANGE_BEFORE + 1}")
+    print(f"{'':<10} {'turn':>4} {'prompt':>7} {'repeated prefix':>16}")
+    for label, offset in [("stateless", 0), ("session", len(QUESTIONS))]:
+        total = cached = 0
+        for turn in range(len(QUESTIONS)):
+            prompt = prompts[offset + turn]
+            previous = prompts[offset + turn - 1] if turn else ""
+            tokens = len(prompt) // 4
+            prefix = len(os.path.commonprefix([prompt, previous])) // 4
+            total += tokens
+            cached += prefix if prefix >= MIN_CACHED_PREFIX else 0
+            print(f"{label:<10} {turn + 1:>4} {tokens:>7} {prefix:>16}")
+        print(f"{label:<10} total {total} prompt tokens, {cached} ({cached / total:.0%}) in cacheable prefixes\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+Measures the local fast-path parser against the labeled corpus in
+parse_corpus.jsonl: how many inputs skip GPT-4, how accurate those parses are,
+and the latency saved compared to a GPT-4 round trip on the fake endpoint.
+
+    python -m benchmarks.bench_fast_parser --first-token-latency 0.8
+"""
+import argparse
+import json
+import os
+import time
+from datetime import datetime
+
+import openai
+
+from benchmarks.fake_openai import FakeOpenAIServer, FakeOpenAIState
+from fast_parser import fast_parse
+from llm import MODEL
+
+CORPUS_PATH = os.path.join(os.path.dirname(__file__), "parse_corpus.jsonl")
+
+
+def load_corpus(path=CORPUS_PATH):
+    with open(path) as corpus_file:
+        return [json.loads(line) for line in corpus_file if line.strip()]
+
+
+def evaluate(corpus, repeat):
+    """
+    Parses every entry `repeat` times. Returns per-entry results and the mean
+    parse time in seconds.
+    """
+    results = []
+    start = time.perf_counter()
+    for _ in range(repeat):
+        results = [fast_parse(entry['text'], datetime.fromisoformat(entry['now'])) for entry in corpus]
+    elapsed = time.perf_counter() - start
+    return results, elapsed / (repeat * len(corpus))
+
+
+def llm_round_trip(samples):
+    """
+    Mean time for a complete, non-streamed GPT-4 reply from the fake endpoint.
+    """
+    timings = []
+    for _ in range(samples):
+        start = time.perf_counter()
+        openai.ChatCompletion.create(model=MODEL, messages=[{"role": "user", "content": "Classify and process: gym"}])
+        timings.append(time.perf_counter() - start)
+    return sum(timings) / len(timings)
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument("--corpus", default=CORPUS_PATH)
+    arg_parser.add_argument("--repeat", type=int, default=200, help="Parses of the corpus to time")
+    arg_parser.add_argument("--first-token-latency", type=float, default=0.8)
+    arg_parser.add_argument("--token-latency", type=float, default=0.01)
+    arg_parser.add_argument("--llm-samples", type=int, default=3)
+    arg_parser.add_argument("--verbose", action="store_true", help="List every disagreement with the labels")
+    args = arg_parser.parse_args()
+
+    corpus = load_corpus(args.corpus)
+    results, parse_time = evaluate(corpus, args.repeat)
+
+    fast = correct = false_fast = missed = 0
+    for entry, result in zip(corpus, results):
+        if result.is_confident:
+            fast += 1
+            wrong = {key: (value, result.fields.get(key)) for key, value in entry['expected'].items()
+                     if result.fields.get(key) != value}
+            if not entry['fast_path']:
+                false_fast += 1
+            elif not wrong:
+                correct += 1
+            if args.verbose and (wrong or not entry['fast_path']):
+                print(f"wrong: {entry['text']!r} {wrong or 'should go to GPT-4'}")
+        elif entry['fast_path']:
+            missed += 1
+            if args.verbose:
+                print(f"missed: {entry['text']!r} {result.confidence} {result.reasons}")
+
+    state = FakeOpenAIState(first_token_latency=args.first_token_latency, token_latency=args.token_latency)
+    with FakeOpenAIServer(state) as server:
+        openai.api_base = server.url
+        openai.api_key = "fake"
+        llm_time = llm_round_trip(args.llm_samples)
+
+    total = len(corpus)
+    print(f"corpus: {total} inputs, {sum(entry['fast_path'] for entry in corpus)} labeled as simple")
+    print(f"fast path: {fast}/{total} parsed locally ({fast / total:.0%}), "
+          f"{correct}/{fast or 1} field-exact, {false_fast} should have gone to GPT-4, {missed} simple inputs missed")
+    print(f"local parse: {parse_time * 1e6:.0f} us per input")
+    print(f"GPT-4 round trip (fake): {llm_time * 1000:.0f} ms")
+    print(f"latency saved: {fast * (llm_time - parse_time):.1f} s over the corpus, "
+          f"{fast / total * (llm_time - parse_time) * 1000:.0f} ms per input on average")
+
+
+if __name__ == "__main__":
+    main()
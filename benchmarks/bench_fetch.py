@@ -0,0 +1,57 @@
+"""
+Compares sequential and concurrent multi-calendar event fetches against the
+local fake Calendar API.
+
+    python -m benchmarks.bench_fetch --latency 0.05
+"""
+import argparse
+import time
+
+import httplib2
+
+from benchmarks.fake_google import FakeCalendarServer, FakeCalendarState
+from event_fetch import fetch_events_for_calendars
+from services import build_calendar_service
+
+
+def plain_http(timeout=None):
+    return httplib2.Http(timeout=timeout)
+
+
+def time_fetch(service, calendar_ids, max_workers, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        events, failures = fetch_events_for_calendars(
+            calendar_ids, service=service, http_factory=plain_http,
+            max_workers=max_workers, singleEvents=True, orderBy='startTime'
+        )
+        best = min(best, time.perf_counter() - start)
+        assert not failures, failures
+        assert len(events) == len(calendar_ids)
+    return best
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument("--latency", type=float, default=0.05, help="Simulated seconds per API call")
+    arg_parser.add_argument("--events", type=int, default=50, help="Events per calendar")
+    arg_parser.add_argument("--workers", type=int, default=8)
+    arg_parser.add_argument("--repeat", type=int, default=3)
+    arg_parser.add_argument("--counts", default="1,5,10,25,50")
+    args = arg_parser.parse_args()
+
+    print(f"{'calendars':>10} {'sequential':>12} {'concurrent':>12} {'speedup':>8}")
+    for count in (int(c) for c in args.counts.split(",")):
+        state = FakeCalendarState(latency=args.latency)
+        state.populate(count, args.events)
+        with FakeCalendarServer(state) as server:
+            service = build_calendar_service(None, http=plain_http(), api_endpoint=server.url)
+            calendar_ids = list(state.calendars)
+            sequential = time_fetch(service, calendar_ids, 1, args.repeat)
+            concurrent = time_fetch(service, calendar_ids, args.workers, args.repeat)
+        print(f"{count:>10} {sequential:>11.3f}s {concurrent:>11.3f}s {sequential / concurrent:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
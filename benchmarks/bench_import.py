@@ -0,0 +1,158 @@
+"""
+Bulk import of generated .ics and .csv schedules against the local fake
+Calendar API: time to import them, peak memory of reading them as the files
+grow, and a second import of the same files, which should create nothing.
+Some events of the .ics file are already in the calendar, created by hand.
+
+    python -m benchmarks.bench_import --events 10000 --latency 0.05
+"""
+import argparse
+import os
+import shutil
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+import httplib2
+
+from benchmarks.fake_google import FakeCalendarServer, FakeCalendarState
+from event_store import EventStore
+from importer import describe, file_bodies, import_events, ics_body, read_ics
+from services import build_calendar_service
+
+CALENDAR_ID = "import@example.com"
+TITLES = ["Lecture", "Lab", "Office hours", "Team meeting", "Dentist", "Gym", "Book club", "Piano lesson"]
+# Every this many events of the .ics file is a weekly series with an exception date
+SERIES_EVERY = 50
+# Every this many events of the .ics file is already in the calendar
+EXISTING_EVERY = 100
+
+
+class BenchAccount:
+    """
+    The parts of an account the importer uses, backed by the fake server.
+    """
+
+    def __init__(self, url, directory):
+        self.service = build_calendar_service(None, http=httplib2.Http(timeout=30), api_endpoint=url)
+        self.store = EventStore(os.path.join(directory, "events.sqlite3"), service_factory=lambda: self.service,
+                                http_factory=lambda timeout=None: httplib2.Http(timeout=timeout))
+
+    def calendar_service(self):
+        return self.service
+
+    def event_store(self):
+        return self.store
+
+
+def event_start(index):
+    return datetime(2027, 1, 4, 8) + timedelta(hours=index * 3)
+
+
+def write_ics(path, count):
+    with open(path, "w", newline="") as ics:
+        ics.write("BEGIN:VCALENDAR\r\nVERSION:2.0\r\nPRODID:-//bench//import//EN\r\n")
+        for index in range(count):
+            start = event_start(index)
+            lines = [
+                "BEGIN:VEVENT",
+                f"UID:bench-{index}@example.com",
+                f"DTSTART;TZID=America/New_York:{start:%Y%m%dT%H%M%S}",
+                f"DTEND;TZID=America/New_York:{start + timedelta(minutes=50):%Y%m%dT%H%M%S}",
+                f"SUMMARY:{TITLES[index % len(TITLES)]} {index}",
+                "DESCRIPTION:Imported from the old calendar\\, with notes that run long enough to be folded onto",
+                " a second line",
+                "LOCATION:Room 4",
+            ]
+            if index % SERIES_EVERY == 0:
+                lines += ["RRULE:FREQ=WEEKLY;COUNT=12",
+                          f"EXDATE;TZID=America/New_York:{start + timedelta(weeks=2):%Y%m%dT%H%M%S}"]
+            lines += ["BEGIN:VALARM", "ACTION:DISPLAY", "TRIGGER:-PT15M", "END:VALARM", "END:VEVENT"]
+            ics.write("\r\n".join(lines) + "\r\n")
+        ics.write("END:VCALENDAR\r\n")
+
+
+def write_csv(path, count):
+    with open(path, "w", newline="") as rows:
+        rows.write("Subject,Start Date,Start Time,End Date,End Time,All Day Event,Description,Location\n")
+        for index in range(count):
+            start = event_start(index) + timedelta(minutes=30)
+            all_day = index % 10 == 0
+            rows.write(f"Shift {index},{start:%m/%d/%Y},{'' if all_day else f'{start:%I:%M %p}'},"
+                       f"{start:%m/%d/%Y},{'' if all_day else f'{start + timedelta(hours=2):%I:%M %p}'},"
+                       f"{'True' if all_day else 'False'},\"Rota, week {index // 40}\",Store\n")
+
+
+def reader_peak(path):
+    """
+    Peak memory, in bytes, of reading every event body of a file.
+    """
+    # Caches filled on first use, like the time zone data, are not counted
+    next(file_bodies(path, "2"))
+    tracemalloc.start()
+    for _ in file_bodies(path, "2"):
+        pass
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak
+
+
+def run_import(path, account, chunk_size):
+    start = time.perf_counter()
+    counts = None
+    for counts in import_events(file_bodies(path, "2"), CALENDAR_ID, account=account, chunk_size=chunk_size):
+        pass
+    return counts, time.perf_counter() - start
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("--events", type=int, default=10000, help="Events in the .ics file")
+    arg_parser.add_argument("--csv-events", type=int, default=2000, help="Rows in the .csv file")
+    arg_parser.add_argument("--latency", type=float, default=0.05, help="Simulated seconds per round trip")
+    arg_parser.add_argument("--chunk-size", type=int, default=500)
+    args = arg_parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix="bench_import_")
+    try:
+        ics_path = os.path.join(directory, "schedule.ics")
+        csv_path = os.path.join(directory, "rota.csv")
+        write_ics(ics_path, args.events)
+        write_csv(csv_path, args.csv_events)
+
+        print(f"{'file':<28} {'size':>8} {'reader peak':>12}")
+        for count in sorted({args.events // 10, args.events}):
+            path = os.path.join(directory, f"peak{count}.ics")
+            write_ics(path, count)
+            print(f"{f'{count} events (.ics)':<28} {os.path.getsize(path) / 1e6:>6.1f}MB "
+                  f"{reader_peak(path) / 1e3:>10.0f}kB")
+
+        state = FakeCalendarState(latency=args.latency)
+        state.add_calendar(CALENDAR_ID, "Import")
+        # Events entered by hand before the import: same title and start, another ID
+        with open(ics_path, newline="") as ics:
+            for index, event in enumerate(read_ics(ics)):
+                if index % EXISTING_EVERY == 0:
+                    state.put_event(CALENDAR_ID, dict(ics_body(event), id=f"manual{index}", status='confirmed'))
+        before = len(state.events[CALENDAR_ID])
+
+        with FakeCalendarServer(state) as server:
+            account = BenchAccount(server.url, directory)
+            print(f"\n{args.latency * 1000:.0f} ms per round trip, {before} events already in the calendar")
+            print(f"{'import':<28} {'time':>8} {'events/s':>9} {'batches':>8}  result")
+            for label, path in [("schedule.ics", ics_path), ("rota.csv", csv_path),
+                                ("schedule.ics again", ics_path), ("rota.csv again", csv_path)]:
+                batches = state.batch_count
+                counts, elapsed = run_import(path, account, args.chunk_size)
+                print(f"{label:<28} {elapsed:>7.1f}s {counts['read'] / elapsed:>9.0f} "
+                      f"{state.batch_count - batches:>8}  {describe(counts)}")
+            account.store.close()
+        created = len(state.events[CALENDAR_ID]) - before
+        print(f"\n{created} events created in all, {args.events - before + args.csv_events} expected")
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
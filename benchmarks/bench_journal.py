@@ -0,0 +1,174 @@
+"""
+Confirming events over a flaky link, against the local fake Calendar API:
+creating them directly (the confirm waits for the batch request and its
+retries) vs. writing them to the journal and letting its flusher create
+them. The fake fails, drops and loses the answers of a share of requests.
+Reports confirm latency, how many events end up created, lost or
+duplicated, and the flusher's throughput; then kills a flusher halfway
+through and restarts it from the file to check nothing is created twice.
+
+    python -m benchmarks.bench_journal --events 300 --error-rate 0.2
+"""
+import argparse
+import os
+import shutil
+import tempfile
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+
+import httplib2
+
+from benchmarks.bench_suite import percentile
+from benchmarks.fake_google import FakeCalendarServer, FakeCalendarState
+from benchmarks.faults import FaultInjector
+from event_batch import insert_events
+from journal import EventJournal
+from services import build_calendar_service
+
+CALENDAR_ID = "bench@example.com"
+
+
+class BenchAccount:
+    """
+    The parts of an account the journal uses, backed by the fake server.
+    """
+
+    def __init__(self, url):
+        self.service = build_calendar_service(None, http=httplib2.Http(timeout=5), api_endpoint=url)
+
+    def calendar_service(self):
+        return self.service
+
+    def calendar_registry(self):
+        return self
+
+    def get_id(self, name):
+        return None
+
+    def assistant_calendar_id(self):
+        return CALENDAR_ID
+
+
+def event_body(label, index):
+    start = datetime(2026, 1, 12, 9) + timedelta(hours=index)
+    return {
+        'summary': f"{label} {index}",
+        'start': {'dateTime': start.isoformat(), 'timeZone': "UTC"},
+        'end': {'dateTime': (start + timedelta(minutes=50)).isoformat(), 'timeZone': "UTC"},
+    }
+
+
+def outcome(state, label, count):
+    """
+    (created, lost, duplicated) events with this label on the fake server.
+    """
+    summaries = Counter(event['summary'] for event in state.events[CALENDAR_ID].values()
+                        if event['summary'].startswith(f"{label} "))
+    return len(summaries), count - len(summaries), sum(summaries.values()) - len(summaries)
+
+
+def direct(state, account, count):
+    """
+    Confirms one event at a time, each waiting for insert_events and its retries.
+    """
+    latencies = []
+    for index in range(count):
+        start = time.perf_counter()
+        insert_events([(CALENDAR_ID, event_body("direct", index))], service=account.calendar_service(),
+                      backoff=0.05)
+        latencies.append(time.perf_counter() - start)
+    return latencies, outcome(state, "direct", count)
+
+
+def journaled(state, account, path, count, backoff):
+    """
+    Confirms one event at a time into the journal; returns once the flusher has sent them all.
+    """
+    journal = EventJournal(path, account=account, backoff=backoff, max_backoff=backoff * 8)
+    journal.start()
+    latencies = []
+    start = time.perf_counter()
+    for index in range(count):
+        confirm_start = time.perf_counter()
+        journal.add([(None, event_body("journal", index), None)])
+        latencies.append(time.perf_counter() - confirm_start)
+    journal.wait()
+    drained = time.perf_counter() - start
+    journal.close()
+    return latencies, outcome(state, "journal", count), drained
+
+
+def restarted(state, account, path, count, backoff):
+    """
+    Journals `count` events, stops the flusher after the first round as if the
+    app was killed (leaving a torn line behind), then reopens the file.
+    """
+    journal = EventJournal(path, account=account, backoff=backoff, max_backoff=backoff * 8)
+    journal.add([(None, event_body("restart", index), None) for index in range(count)])
+    rounds = []
+    journal.add_listener(lambda done, failed, pending: rounds.append(pending))
+    journal.start()
+    while not rounds:
+        time.sleep(0.01)
+    journal.close()
+    left = len(journal.pending())
+    # Forget some "done" lines too, as if they never reached the disk
+    with open(path) as journal_file:
+        lines = journal_file.readlines()
+    kept = [line for index, line in enumerate(lines) if '"done"' not in line or index % 2]
+    with open(path, "w") as journal_file:
+        journal_file.writelines(kept)
+        journal_file.write('{"op": "put", "id": "torn')
+
+    journal = EventJournal(path, account=account, backoff=backoff, max_backoff=backoff * 8)
+    resumed = len(journal.pending())
+    journal.start()
+    journal.wait()
+    journal.close()
+    return left, resumed, outcome(state, "restart", count)
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("--events", type=int, default=300)
+    arg_parser.add_argument("--latency", type=float, default=0.05, help="Simulated seconds per round trip")
+    arg_parser.add_argument("--error-rate", type=float, default=0.2, help="Share of requests answered 503")
+    arg_parser.add_argument("--drop-rate", type=float, default=0.05, help="Share of requests dropped unanswered")
+    arg_parser.add_argument("--lost-rate", type=float, default=0.05,
+                            help="Share of requests run whose answer never arrives")
+    arg_parser.add_argument("--backoff", type=float, default=0.1, help="Journal's first retry delay in seconds")
+    args = arg_parser.parse_args()
+
+    faults = FaultInjector(error_rate=args.error_rate, drop_rate=args.drop_rate, lost_rate=args.lost_rate)
+    state = FakeCalendarState(latency=args.latency, faults=faults)
+    state.add_calendar(CALENDAR_ID, "Bench")
+    directory = tempfile.mkdtemp(prefix="bench_journal_")
+    try:
+        with FakeCalendarServer(state) as server:
+            account = BenchAccount(server.url)
+            direct_latencies, direct_outcome = direct(state, account, args.events)
+            journal_latencies, journal_outcome, drained = journaled(
+                state, account, os.path.join(directory, "journal.jsonl"), args.events, args.backoff)
+            left, resumed, restart_outcome = restarted(
+                state, account, os.path.join(directory, "restart.jsonl"), args.events, args.backoff)
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+    print(f"{args.events} events, {args.latency * 1000:.0f} ms per round trip, {args.error_rate:.0%} 503s, "
+          f"{args.drop_rate:.0%} dropped, {args.lost_rate:.0%} answers lost")
+    print(f"{'confirm':<10} {'p50':>9} {'p95':>9} {'created':>8} {'lost':>6} {'duplicated':>10}")
+    for label, latencies, (created, lost, duplicated) in [
+        ("direct", direct_latencies, direct_outcome),
+        ("journal", journal_latencies, journal_outcome),
+    ]:
+        print(f"{label:<10} {percentile(latencies, 0.5) * 1000:>7.2f}ms {percentile(latencies, 0.95) * 1000:>7.2f}ms "
+              f"{created:>8} {lost:>6} {duplicated:>10}")
+    print(f"journal flusher: all {args.events} events sent in {drained:.2f}s ({args.events / drained:.0f} events/s)")
+    created, lost, duplicated = restart_outcome
+    print(f"restart: {left} events pending when stopped, {resumed} replayed (some already created), "
+          f"{created} created, {lost} lost, {duplicated} duplicated")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+Compares server-side expansion of recurring events (singleEvents=True) with
+syncing their masters and expanding occurrences locally, against the local
+fake Calendar API: bytes downloaded, and time to read the next 90 days.
+
+    python -m benchmarks.bench_recurrence --series 300
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import httplib2
+
+from benchmarks.fake_google import FakeCalendarServer, FakeCalendarState
+from event_fetch import iter_event_pages
+from event_store import EventStore
+from recurrence import SeriesCache, expand_event
+from services import build_calendar_service
+
+DAYS = ["MO", "TU", "WE", "TH", "FR"]
+
+
+def add_series(state, count, start):
+    events = []
+    for index in range(count):
+        first = start + timedelta(days=index % 7, hours=8 + index % 10)
+        events.append({
+            'id': f"series{index}",
+            'updated': "2026-01-01T00:00:00Z",
+            'status': 'confirmed',
+            'summary': f"Recurring meeting {index}",
+            'start': {'dateTime': first.isoformat(), 'timeZone': "America/New_York"},
+            'end': {'dateTime': (first + timedelta(minutes=45)).isoformat(), 'timeZone': "America/New_York"},
+            'recurrence': [f"RRULE:FREQ=WEEKLY;BYDAY={DAYS[index % 5]},{DAYS[(index + 2) % 5]}"],
+        })
+    state.add_calendar("work@example.com", "Work", events)
+
+
+def downloaded_bytes(service, **list_kwargs):
+    total = 0
+    items = 0
+    for page in iter_event_pages("work@example.com", service=service, http=httplib2.Http(),
+                                 max_results=2500, **list_kwargs):
+        total += len(json.dumps(page))
+        items += len(page.get('items', []))
+    return total, items
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument("--series", type=int, default=300, help="Weekly recurring series")
+    arg_parser.add_argument("--days", type=int, default=90, help="Window read after syncing")
+    args = arg_parser.parse_args()
+
+    start = datetime(2026, 1, 5)
+    state = FakeCalendarState()
+    add_series(state, args.series, start)
+    with FakeCalendarServer(state) as server:
+        service = build_calendar_service(None, http=httplib2.Http(), api_endpoint=server.url)
+        expanded_bytes, expanded_items = downloaded_bytes(service, singleEvents=True)
+        master_bytes, master_items = downloaded_bytes(service)
+
+        store = EventStore(os.path.join(tempfile.mkdtemp(), "events.sqlite3"), service_factory=lambda: service)
+        store.sync(["work@example.com"], http_factory=lambda timeout=None: httplib2.Http())
+
+    time_min = datetime(2026, 10, 17)
+    time_max = time_min + timedelta(days=args.days)
+    masters = list(json.loads(data) for (data,) in store._conn.execute("SELECT data FROM events"))
+
+    cache = SeriesCache()
+    timings = []
+    for _ in range(3):
+        begin = time.perf_counter()
+        occurrences = sum(1 for master in masters for _ in expand_event(master, time_min, time_max, cache=cache))
+        timings.append(time.perf_counter() - begin)
+    begin = time.perf_counter()
+    store_count = sum(1 for _ in store.events_between(["work@example.com"], time_min, time_max))
+    store_time = time.perf_counter() - begin
+
+    print(f"{args.series} weekly series")
+    print(f"{'singleEvents=True':<22} {expanded_items:>7} items {expanded_bytes / 1024:>9.0f} KiB downloaded")
+    print(f"{'masters only':<22} {master_items:>7} items {master_bytes / 1024:>9.0f} KiB downloaded "
+          f"({expanded_bytes / master_bytes:.0f}x smaller)")
+    print(f"expand next {args.days} days: {occurrences} occurrences, "
+          f"{timings[0] * 1000:.0f} ms cold, {min(timings[1:]) * 1000:.0f} ms cached")
+    print(f"EventStore.events_between over the same window: {store_count} events in {store_time * 1000:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""
+Keyword retrieval over the event mirror as calendars grow: time to build
+the index, to update it on a sync and to search it, and the calendar part of
+the chat prompt for "when is my next dentist appointment?" with and without
+the events the search finds. The dentist appointment is months away, outside
+the listing the question gets by date alone.
+
+    python -m benchmarks.bench_retrieval --sizes 1000 10000 50000
+"""
+import argparse
+import os
+import random
+import shutil
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+import httplib2
+
+from benchmarks.bench_suite import percentile
+from benchmarks.fake_google import FakeCalendarServer, FakeCalendarState
+from event_store import EventStore
+from prompt_context import build_calendar_context, build_matches_context, query_horizon
+from services import build_calendar_service
+
+CALENDAR_ID = "work@example.com"
+TITLES = [
+    "Team standup", "Design review", "1:1 with Sam", "Lunch", "Gym", "Project sync", "Customer call",
+    "Focus time", "Sprint planning", "Yoga class", "Coffee chat", "Board meeting", "Piano lesson",
+]
+LOCATIONS = ["Room 4", "Cafe", "Zoom", "Downtown office", ""]
+QUESTION = "When is my next dentist appointment?"
+QUERIES = [QUESTION, "yoga class downtown", "piano", "customer call on zoom", "board meeting agenda"]
+
+
+def synthetic_events(count, start, seed=0):
+    generator = random.Random(seed)
+    events = []
+    for index in range(count):
+        event_start = start + timedelta(hours=index * 3 + generator.randrange(3))
+        events.append({
+            'id': f"e{index}",
+            'status': 'confirmed',
+            'summary': generator.choice(TITLES),
+            'location': generator.choice(LOCATIONS),
+            'start': {'dateTime': event_start.isoformat()},
+            'end': {'dateTime': (event_start + timedelta(minutes=45)).isoformat()},
+        })
+    dentist = start + timedelta(days=120, hours=9)
+    events.append({'id': "dentist", 'status': 'confirmed', 'summary': "Dentist appointment",
+                   'location': "Smile Dental", 'description': "Six-month checkup",
+                   'start': {'dateTime': dentist.isoformat()},
+                   'end': {'dateTime': (dentist + timedelta(hours=1)).isoformat()}})
+    return events
+
+
+def measure(size, directory):
+    state = FakeCalendarState()
+    start = datetime.now(timezone.utc).replace(minute=0, second=0, microsecond=0) + timedelta(hours=1)
+    state.add_calendar(CALENDAR_ID, "Work", synthetic_events(size, start))
+    with FakeCalendarServer(state) as server:
+        service = build_calendar_service(None, http=httplib2.Http(), api_endpoint=server.url)
+        store = EventStore(os.path.join(directory, f"events{size}.sqlite3"), service_factory=lambda: service)
+        http_factory = lambda timeout=None: httplib2.Http()
+        # The fake serves a large calendar slowly; the first sync gets more than the usual timeout
+        store.sync([CALENDAR_ID], http_factory=http_factory, timeout=300)
+
+        build_start = time.perf_counter()
+        store.search_index()
+        build_time = time.perf_counter() - build_start
+
+        query_times = []
+        for _ in range(20):
+            for query in QUERIES:
+                query_start = time.perf_counter()
+                store.search(query, [CALENDAR_ID])
+                query_times.append(time.perf_counter() - query_start)
+
+        # Ten events change on the server; the next sync updates the index in place
+        for index in range(10):
+            event = dict(state.events[CALENDAR_ID][f"e{index}"], summary=f"Dentist follow-up {index}")
+            state.put_event(CALENDAR_ID, event)
+        sync_start = time.perf_counter()
+        store.sync([CALENDAR_ID], max_age=0, http_factory=http_factory)
+        sync_time = time.perf_counter() - sync_start
+        updated = sum("follow-up" in event['summary'] for event in store.search("dentist follow-up", limit=20))
+
+        now = datetime.now()
+        window = query_horizon(QUESTION, now)
+        listing = build_calendar_context(store.events_between([CALENDAR_ID], *window), window=window)
+        matches = build_matches_context(store.search(QUESTION, [CALENDAR_ID], now=now))
+        store.close()
+    return {
+        'build': build_time, 'query': percentile(query_times, 0.5), 'sync': sync_time, 'updated': updated,
+        'listing_tokens': listing.tokens_used, 'matches_tokens': matches.tokens_used,
+        'listed': "Dentist appointment" in listing.text, 'found': "Dentist appointment" in matches.text,
+    }
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 50000],
+                            help="Events in the calendar")
+    args = arg_parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix="bench_retrieval_")
+    try:
+        print(f"{'events':>7} {'build':>9} {'search p50':>11} {'resync (10 changed)':>20} "
+              f"{'listing':>8} {'+matches':>9} {'dentist: listed / found':>24}")
+        for size in args.sizes:
+            result = measure(size, directory)
+            print(f"{size:>7} {result['build'] * 1000:>7.0f}ms {result['query'] * 1000:>9.2f}ms "
+                  f"{result['sync'] * 1000:>14.0f}ms ({result['updated']:>2}) "
+                  f"{result['listing_tokens']:>8} {result['matches_tokens']:>9} "
+                  f"{'yes' if result['listed'] else 'no':>15} / {'yes' if result['found'] else 'no'}")
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+    print("listing and +matches are prompt tokens; the listing is capped by its token budget")
+
+
+if __name__ == "__main__":
+    main()
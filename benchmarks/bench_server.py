@@ -0,0 +1,174 @@
+"""
+Load test of the service mode (server.py) against the fake Calendar and
+OpenAI servers. Many users send a mix of parse, create and chat requests at
+once; then one user floods the server while the others keep their usual
+pace, to show that fair scheduling keeps their latency steady.
+
+    python -m benchmarks.bench_server --users 20 --requests 10
+"""
+import argparse
+import asyncio
+import json
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import aiohttp
+
+from benchmarks.bench_suite import FAST_INPUTS, GPT_INPUTS, QUESTIONS, percentile, scenario_environment
+from benchmarks.fake_google import FakeCalendarServer, FakeCalendarState
+from benchmarks.fake_openai import FakeOpenAIServer, FakeOpenAIState
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TOKEN = {'token': "fake", 'refresh_token': "fake", 'client_id': "fake", 'client_secret': "fake",
+         'expiry': "2099-01-01T00:00:00Z"}
+# Service token the benchmark registers users with
+SERVER_TOKEN = "bench"
+
+
+def free_port():
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        return probe.getsockname()[1]
+
+
+def request_for(index):
+    """
+    (operation, path, body) of a user's index-th request: mostly parses, some creates and chats.
+    """
+    kind = index % 5
+    if kind in (0, 1):
+        return "parse (GPT-4)", "/v1/events/parse", {'text': f"{GPT_INPUTS[index % len(GPT_INPUTS)]} ({index})"}
+    if kind == 2:
+        return "parse (local)", "/v1/events/parse", {'text': FAST_INPUTS[index % len(FAST_INPUTS)]}
+    if kind == 3:
+        today = datetime.now().strftime("%Y-%m-%d")
+        return "create", "/v1/events", {'events': [{'title': f"Load test {index}", 'start_date': today,
+                                                     'start_time': "09:00"}]}
+    return "chat", "/v1/chat", {'query': QUESTIONS[index % len(QUESTIONS)]}
+
+
+async def send(session, url, user_id, key, index, timings):
+    operation, path, body = request_for(index)
+    start = time.perf_counter()
+    async with session.post(url + path, json=body, headers={"Authorization": f"Bearer {key}"}) as response:
+        await response.read()
+        timings.append((user_id, operation, response.status, time.perf_counter() - start))
+
+
+async def user_session(session, url, user_id, key, count, pause, timings):
+    for index in range(count):
+        await send(session, url, user_id, key, index, timings)
+        await asyncio.sleep(pause)
+
+
+async def flood(session, url, user_id, key, count, timings):
+    await asyncio.gather(*(send(session, url, user_id, key, index, timings) for index in range(count)))
+
+
+def report(label, timings, wall_time):
+    print(f"\n{label} ({wall_time:.1f}s, {len(timings) / wall_time:.1f} requests/s)")
+    print(f"{'group':<22} {'count':>6} {'p50':>9} {'p95':>9} {'429':>5} {'errors':>6}")
+    groups = {}
+    for user_id, operation, status, seconds in timings:
+        groups.setdefault(operation, []).append((status, seconds))
+    for group, rows in sorted(groups.items()):
+        ok = [seconds for status, seconds in rows if status == 200]
+        limited = sum(1 for status, _ in rows if status == 429)
+        errors = len(rows) - len(ok) - limited
+        p50 = f"{percentile(ok, 0.5) * 1000:.0f}ms" if ok else "n/a"
+        p95 = f"{percentile(ok, 0.95) * 1000:.0f}ms" if ok else "n/a"
+        print(f"{group:<22} {len(rows):>6} {p50:>9} {p95:>9} {limited:>5} {errors:>6}")
+
+
+async def run(url, args):
+    connector = aiohttp.TCPConnector(limit=0)
+    async with aiohttp.ClientSession(connector=connector) as session:
+        users = [f"user{index}@example.com" for index in range(args.users)]
+        keys = {}
+        for user_id in users + ["heavy@example.com"]:
+            headers = {"X-User-Id": user_id, "Authorization": f"Bearer {SERVER_TOKEN}"}
+            async with session.put(url + "/v1/credentials", json=TOKEN, headers=headers) as response:
+                response.raise_for_status()
+                keys[user_id] = (await response.json())['api_key']
+
+        timings = []
+        start = time.perf_counter()
+        await asyncio.gather(*(user_session(session, url, user_id, keys[user_id], args.requests, 0, timings)
+                               for user_id in users))
+        report(f"{args.users} users, {args.requests} requests each", timings, time.perf_counter() - start)
+
+        # The same users at a steady pace while one user sends everything at once
+        timings = []
+        start = time.perf_counter()
+        await asyncio.gather(
+            flood(session, url, "heavy@example.com", keys["heavy@example.com"], args.flood, timings),
+            *(user_session(session, url, user_id, keys[user_id], args.requests, 0.1, timings) for user_id in users),
+        )
+        labelled = [(user_id, "flooding user" if user_id == "heavy@example.com" else "other users", status, seconds)
+                    for user_id, _, status, seconds in timings]
+        report(f"one user sending {args.flood} requests at once", labelled, time.perf_counter() - start)
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("--users", type=int, default=20)
+    arg_parser.add_argument("--requests", type=int, default=10, help="Requests per user")
+    arg_parser.add_argument("--flood", type=int, default=200, help="Requests the flooding user sends at once")
+    arg_parser.add_argument("--workers", type=int, default=32, help="Server worker threads")
+    arg_parser.add_argument("--per-minute", type=int, default=600, help="Requests per minute each user may send")
+    arg_parser.add_argument("--burst", type=int, default=1000,
+                            help="Requests a user may send at once; lower it to see the rate limit answer 429")
+    arg_parser.add_argument("--latency", type=float, default=0.02, help="Calendar API seconds per request")
+    arg_parser.add_argument("--first-token-latency", type=float, default=0.3)
+    arg_parser.add_argument("--token-latency", type=float, default=0.005)
+    args = arg_parser.parse_args()
+
+    google_state = FakeCalendarState(latency=args.latency)
+    google_state.populate(3, 100)
+    openai_state = FakeOpenAIState(first_token_latency=args.first_token_latency, token_latency=args.token_latency)
+    cache_dir = tempfile.mkdtemp(prefix="bench_server_")
+    port = free_port()
+    url = f"http://127.0.0.1:{port}"
+    try:
+        with FakeCalendarServer(google_state) as google, FakeOpenAIServer(openai_state) as openai_server:
+            environment = dict(os.environ, **scenario_environment(cache_dir, google.url, openai_server.url),
+                               USER_REQUESTS_PER_MINUTE=str(args.per_minute),
+                               CALENDAR_ASSISTANT_SERVER_TOKEN=SERVER_TOKEN)
+            # The server reads its configuration from the environment at startup, like a deployment
+            server = subprocess.Popen(
+                [sys.executable, "server.py", "--port", str(port), "--workers", str(args.workers),
+                 "--user-burst", str(args.burst)],
+                cwd=ROOT, env=environment, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+            )
+            try:
+                asyncio.run(wait_until_up(url))
+                asyncio.run(run(url, args))
+            finally:
+                server.terminate()
+                server.wait()
+    finally:
+        shutil.rmtree(cache_dir, ignore_errors=True)
+
+
+async def wait_until_up(url, timeout=30):
+    deadline = time.monotonic() + timeout
+    async with aiohttp.ClientSession() as session:
+        while True:
+            try:
+                async with session.get(url + "/healthz") as response:
+                    print(f"server up: {json.dumps(await response.json())}")
+                    return
+            except aiohttp.ClientConnectionError:
+                if time.monotonic() > deadline:
+                    raise
+                await asyncio.sleep(0.2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+Measures time to first visible output for event suggestions and chat answers,
+blocking vs. streamed, against the local fake OpenAI endpoint.
+
+    python -m benchmarks.bench_streaming --events 5
+"""
+import argparse
+import json
+import time
+
+import openai
+
+from benchmarks.fake_openai import DEFAULT_EVENT, DEFAULT_REPLY, FakeOpenAIServer, FakeOpenAIState, function_reply
+from event_schema import EVENTS_FUNCTION
+from llm import MODEL, StreamStats, split_json_items, stream_chat, stream_function_call
+
+MESSAGES = [{"role": "user", "content": "Classify and process: gym every Monday 6pm"}]
+
+
+def blocking_first_output():
+    start = time.perf_counter()
+    response = openai.ChatCompletion.create(
+        model=MODEL, messages=MESSAGES, functions=[EVENTS_FUNCTION], function_call={"name": EVENTS_FUNCTION["name"]}
+    )
+    json.loads(response['choices'][0]['message']['function_call']['arguments'])
+    return time.perf_counter() - start
+
+
+def streamed_first_block():
+    stats = StreamStats("bench")
+    for _ in split_json_items(stream_function_call(MESSAGES, EVENTS_FUNCTION, stats=stats), stats=stats):
+        pass
+    return stats.time_to_first_block, stats.total_time
+
+
+def streamed_first_token():
+    stats = StreamStats("bench")
+    for _ in stream_chat(MESSAGES, stats=stats):
+        pass
+    return stats.time_to_first_token, stats.total_time
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument("--events", type=int, default=5, help="Events in the fake reply")
+    arg_parser.add_argument("--first-token-latency", type=float, default=0.5)
+    arg_parser.add_argument("--token-latency", type=float, default=0.01)
+    args = arg_parser.parse_args()
+
+    state = FakeOpenAIState(
+        reply=DEFAULT_REPLY * args.events,
+        arguments=function_reply([DEFAULT_EVENT] * args.events),
+        first_token_latency=args.first_token_latency,
+        token_latency=args.token_latency,
+    )
+    with FakeOpenAIServer(state) as server:
+        openai.api_base = server.url
+        openai.api_key = "fake"
+        blocking = blocking_first_output()
+        first_block, block_total = streamed_first_block()
+        first_token, token_total = streamed_first_token()
+
+    print(f"reply: {args.events} events, {len(state.arguments)} characters")
+    print(f"{'mode':<28} {'first output':>13} {'total':>9}")
+    print(f"{'blocking':<28} {blocking * 1000:>10.0f} ms {blocking * 1000:>6.0f} ms")
+    print(f"{'streamed, first event':<28} {first_block * 1000:>10.0f} ms {block_total * 1000:>6.0f} ms")
+    print(f"{'streamed, first chat token':<28} {first_token * 1000:>10.0f} ms {token_total * 1000:>6.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
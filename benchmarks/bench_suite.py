@@ -0,0 +1,253 @@
+"""
+End-to-end benchmark of the assistant's three user actions against the local
+fake Calendar and OpenAI servers, across calendar counts and event volumes:
+
+    process_input       suggest_events on input that needs GPT-4
+    process_input_fast  suggest_events on input the local parser handles
+    confirm_event       create_suggested_events for a handful of events
+    chat_with_calendar  answer_calendar_query, including the incremental sync
+
+Reports p50/p95 latency and throughput per operation and writes them as JSON,
+so runs can be compared between releases:
+
+    python -m benchmarks.bench_suite --output results.json
+    python -m benchmarks.bench_suite --baseline results.json
+"""
+import argparse
+import json
+import math
+import multiprocessing
+import os
+import platform
+import shutil
+import subprocess
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+from benchmarks.fake_google import FakeCalendarServer, FakeCalendarState
+from benchmarks.fake_openai import FakeOpenAIServer, FakeOpenAIState
+
+OPERATIONS = ("process_input", "process_input_fast", "confirm_event", "chat_with_calendar")
+
+# Inputs that need GPT-4; a number is appended so every call misses the cache
+GPT_INPUTS = [
+    "Lunch with Sam sometime next week or the week after",
+    "Move my dentist appointment to whenever I'm free on Thursday",
+    "Plan a study group around the midterm",
+]
+FAST_INPUTS = ["Gym every Monday 6pm", "Dentist next Tuesday 3pm", "Team sync every Friday at 10am"]
+QUESTIONS = ["What do I have tomorrow?", "When am I free this week for an hour?"]
+# Events created per confirm_event call
+CONFIRM_BATCH = 5
+
+
+def percentile(values, fraction):
+    """
+    Nearest-rank percentile of a list of numbers.
+    """
+    ordered = sorted(values)
+    return ordered[max(math.ceil(fraction * len(ordered)) - 1, 0)]
+
+
+def summarize(operation, latencies, wall_time, errors, **scenario):
+    """
+    One result row; the latency fields are None if every call failed.
+    """
+    def ms(seconds):
+        return round(seconds * 1000, 2) if latencies else None
+
+    return dict(
+        scenario, operation=operation, count=len(latencies), errors=errors,
+        p50_ms=ms(latencies and percentile(latencies, 0.5)),
+        p95_ms=ms(latencies and percentile(latencies, 0.95)),
+        mean_ms=ms(latencies and sum(latencies) / len(latencies)),
+        max_ms=ms(latencies and max(latencies)),
+        throughput_per_s=round(len(latencies) / wall_time, 2),
+    )
+
+
+def measure(call, count, concurrency):
+    """
+    Runs call(i) for i in range(count) on `concurrency` threads.
+    Returns (latencies of the calls that succeeded, wall time, errors).
+    """
+    def timed(index):
+        start = time.perf_counter()
+        try:
+            call(index)
+        except Exception as e:
+            print(f"Error in benchmark call: {e}")
+            return None
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(timed, range(count)))
+    wall_time = time.perf_counter() - start
+    latencies = [result for result in results if result is not None]
+    return latencies, wall_time, len(results) - len(latencies)
+
+
+def run_scenario(scenario, count, concurrency):
+    """
+    Runs every operation in a fresh process whose configuration (cache
+    directory, API endpoints, rate limits) comes from the environment, so no
+    state carries over between scenarios.
+    """
+    import contextlib
+    import io
+
+    from assistant import answer_calendar_query, create_suggested_events, suggest_events
+    from event_schema import EventRecord
+    from llm_cache import get_llm_cache
+
+    today = datetime.now()
+    records = [EventRecord.from_dict({'title': f"Benchmark event {index}", 'start_date': today.strftime("%Y-%m-%d"),
+                                      'start_time': "09:00"}, today)
+               for index in range(CONFIRM_BATCH)]
+    calls = {
+        'process_input': lambda index: suggest_events(f"{GPT_INPUTS[index % len(GPT_INPUTS)]} ({index})"),
+        'process_input_fast': lambda index: suggest_events(FAST_INPUTS[index % len(FAST_INPUTS)]),
+        'confirm_event': lambda index: create_suggested_events(records, "Calendar Assistant Calendar", "Default"),
+        'chat_with_calendar': lambda index: answer_calendar_query(QUESTIONS[index % len(QUESTIONS)]),
+    }
+
+    results = []
+    # The assistant's debug output would swamp the report
+    with contextlib.redirect_stdout(io.StringIO()):
+        # Warm up: resolve the assistant calendar and run the first, full sync
+        create_suggested_events(records[:1], "Calendar Assistant Calendar", "Default")
+        answer_calendar_query(QUESTIONS[0])
+        get_llm_cache().clear()
+        for operation in OPERATIONS:
+            latencies, wall_time, errors = measure(calls[operation], count, concurrency)
+            results.append(summarize(operation, latencies, wall_time, errors, **scenario))
+    return results
+
+
+def scenario_environment(cache_dir, google_url, openai_url):
+    """
+    Environment for a scenario process: its own cache directory with a
+    token that needs no OAuth flow, the fake endpoints, and rate limits high
+    enough that the client never throttles the benchmark.
+    """
+    with open(os.path.join(cache_dir, "token.json"), "w") as token_file:
+        json.dump({'token': "fake", 'refresh_token': "fake", 'client_id': "fake", 'client_secret': "fake",
+                   'expiry': "2099-01-01T00:00:00Z"},
+                  token_file)
+    return {
+        'CALENDAR_ASSISTANT_CACHE_DIR': cache_dir,
+        'GOOGLE_TOKEN_PATH': os.path.join(cache_dir, "token.json"),
+        'GOOGLE_API_ENDPOINT': google_url,
+        'OPENAI_API_BASE': openai_url,
+        'OPENAI_API_KEY': "fake",
+        'CALENDAR_QUERIES_PER_MINUTE': "1000000",
+        'OPENAI_REQUESTS_PER_MINUTE': "1000000",
+        'OPENAI_TOKENS_PER_MINUTE': "1000000000",
+    }
+
+
+def run_in_process(environment, scenario, count, concurrency, function=run_scenario):
+    """
+    Runs function(scenario, count, concurrency) in a fresh process with `environment` added.
+    """
+    saved = {name: os.environ.get(name) for name in environment}
+    os.environ.update(environment)
+    try:
+        with multiprocessing.get_context("spawn").Pool(1) as pool:
+            return pool.apply(function, (scenario, count, concurrency))
+    finally:
+        for name, value in saved.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline_path):
+    """
+    Prints the p50 and p95 change of every operation against a previous run.
+    """
+    with open(baseline_path) as baseline_file:
+        baseline = json.load(baseline_file)
+
+    def key(row):
+        return row['operation'], row['calendars'], row['events_per_calendar']
+
+    previous = {key(row): row for row in baseline['results']}
+    print(f"\nagainst {baseline_path} ({baseline['meta'].get('revision')}):")
+    for row in results:
+        before = previous.get(key(row))
+        if before and before['p50_ms'] and before['p95_ms'] and row['p50_ms'] is not None:
+            print(f"{row['operation']:<20} {row['calendars']:>4} cal {row['events_per_calendar']:>5} ev  "
+                  f"p50 {row['p50_ms'] / before['p50_ms'] - 1:+7.1%}  p95 {row['p95_ms'] / before['p95_ms'] - 1:+7.1%}")
+
+
+def _ms(value):
+    return "n/a" if value is None else f"{value:.1f}ms"
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("--calendars", default="1,5,20", help="Calendar counts to run")
+    arg_parser.add_argument("--events", default="50,500", help="Events per calendar to run")
+    arg_parser.add_argument("--count", type=int, default=20, help="Calls per operation")
+    arg_parser.add_argument("--concurrency", type=int, default=4, help="Calls in flight at once")
+    arg_parser.add_argument("--latency", type=float, default=0.02, help="Calendar API seconds per request")
+    arg_parser.add_argument("--first-token-latency", type=float, default=0.3)
+    arg_parser.add_argument("--token-latency", type=float, default=0.005)
+    arg_parser.add_argument("--output", help="Write the results to this JSON file")
+    arg_parser.add_argument("--baseline", help="Compare against the JSON results of an earlier run")
+    args = arg_parser.parse_args()
+
+    results = []
+    print(f"{'operation':<20} {'calendars':>9} {'events':>7} {'p50':>9} {'p95':>9} {'ops/s':>7} {'errors':>6}")
+    for calendars in (int(value) for value in args.calendars.split(",")):
+        for events in (int(value) for value in args.events.split(",")):
+            google_state = FakeCalendarState(latency=args.latency)
+            google_state.populate(calendars, events)
+            openai_state = FakeOpenAIState(first_token_latency=args.first_token_latency,
+                                           token_latency=args.token_latency)
+            cache_dir = tempfile.mkdtemp(prefix="bench_suite_")
+            try:
+                with FakeCalendarServer(google_state) as google, FakeOpenAIServer(openai_state) as openai_server:
+                    environment = scenario_environment(cache_dir, google.url, openai_server.url)
+                    scenario = {'calendars': calendars, 'events_per_calendar': events}
+                    rows = run_in_process(environment, scenario, args.count, args.concurrency)
+            finally:
+                shutil.rmtree(cache_dir, ignore_errors=True)
+            for row in rows:
+                print(f"{row['operation']:<20} {calendars:>9} {events:>7} {_ms(row['p50_ms']):>9} "
+                      f"{_ms(row['p95_ms']):>9} {row['throughput_per_s']:>7.1f} {row['errors']:>6}")
+            results.extend(rows)
+
+    report = {
+        'meta': {
+            'revision': git_revision(),
+            'created': datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'settings': vars(args),
+        },
+        'results': results,
+    }
+    if args.output:
+        with open(args.output, "w") as output_file:
+            json.dump(report, output_file, indent=2)
+        print(f"\nwrote {args.output}")
+    if args.baseline:
+        compare(results, args.baseline)
+
+
+if __name__ == "__main__":
+    main()
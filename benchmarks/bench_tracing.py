@@ -0,0 +1,78 @@
+"""
+Cost of tracing: time per span with tracing off and with each exporter on,
+and the overhead it adds to parsing the inputs of parse_corpus.jsonl with
+the local fast parser (the cheapest traced step).
+
+    python -m benchmarks.bench_tracing --repeat 50
+"""
+import argparse
+import os
+import shutil
+import tempfile
+import time
+from datetime import datetime
+
+import tracing
+from benchmarks.bench_fast_parser import CORPUS_PATH, load_corpus
+from fast_parser import fast_parse_events
+
+
+def time_spans(count):
+    """
+    Mean seconds to open and close one span with an attribute.
+    """
+    start = time.perf_counter()
+    for index in range(count):
+        with tracing.span("bench", index=index) as current:
+            current.set(done=True)
+    return (time.perf_counter() - start) / count
+
+
+def time_parsing(corpus, repeat):
+    """
+    Mean seconds to parse one corpus entry with fast_parse_events.
+    """
+    inputs = [(entry['text'], datetime.fromisoformat(entry['now'])) for entry in corpus]
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for text, now in inputs:
+            fast_parse_events(text, now)
+    return (time.perf_counter() - start) / (repeat * len(inputs))
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument("--corpus", default=CORPUS_PATH)
+    arg_parser.add_argument("--spans", type=int, default=200000, help="Spans timed per configuration")
+    arg_parser.add_argument("--repeat", type=int, default=50, help="Parses of the corpus per configuration")
+    args = arg_parser.parse_args()
+    corpus = load_corpus(args.corpus)
+
+    directory = tempfile.mkdtemp(prefix="bench_tracing_")
+    configurations = [
+        ("off", lambda: None),
+        ("recent spans (app panel)", tracing.RecentSpans),
+        ("prometheus", tracing.PrometheusExporter),
+        ("log file", lambda: tracing.LogExporter(os.path.join(directory, "traces.jsonl"))),
+        ("otlp file", lambda: tracing.OTLPExporter(path=os.path.join(directory, "traces.otlp.jsonl"))),
+    ]
+
+    print(f"{'exporter':<26} {'per span':>10} {'per parse':>10} {'overhead':>9}")
+    baseline = None
+    for label, factory in configurations:
+        exporter = factory()
+        if exporter is not None:
+            tracing.add_exporter(exporter)
+        try:
+            per_span = time_spans(args.spans)
+            per_parse = time_parsing(corpus, args.repeat)
+        finally:
+            if exporter is not None:
+                tracing.remove_exporter(exporter)
+        baseline = baseline or per_parse
+        print(f"{label:<26} {per_span * 1e6:>8.2f}us {per_parse * 1e6:>8.1f}us {per_parse / baseline - 1:>+9.1%}")
+    shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""
+Runs Calendar and OpenAI requests against fake servers that inject faults,
+with the default clients and through the shared transport: how many requests
+succeed, how long they take, and the retry and throttling counters.
+
+    python -m benchmarks.bench_transport --requests 200 --error-rate 0.1
+"""
+import argparse
+import contextlib
+import io
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import httplib2
+import openai
+import requests
+
+from benchmarks.fake_google import FakeCalendarServer, FakeCalendarState
+from benchmarks.fake_openai import FakeOpenAIServer, FakeOpenAIState
+from benchmarks.faults import FaultInjector
+from llm import MODEL
+from services import build_calendar_service
+from transport import RetryingHttp, RetryingSession, Transport
+
+
+def run(requests_count, threads, call):
+    """
+    Makes `requests_count` calls from `threads` threads. Returns (successes, seconds).
+    """
+    def attempt(_):
+        try:
+            call()
+            return True
+        except Exception:
+            return False
+
+    start = time.perf_counter()
+    # Retry messages are printed by the transport; keep the report readable
+    with contextlib.redirect_stdout(io.StringIO()), ThreadPoolExecutor(threads) as pool:
+        successes = sum(pool.map(attempt, range(requests_count)))
+    return successes, time.perf_counter() - start
+
+
+def calendar_reads(server, http_factory):
+    services = {}
+
+    def call():
+        key = threading.get_ident()
+        if key not in services:
+            services[key] = build_calendar_service(None, http=http_factory(), api_endpoint=server.url)
+        services[key].events().list(calendarId="cal0@example.com", maxResults=10).execute()
+    return call
+
+
+def completions():
+    openai.ChatCompletion.create(model=MODEL, messages=[{"role": "user", "content": "When am I free?"}])
+
+
+def report(label, requests_count, successes, seconds, transport=None):
+    line = f"{label:<34} {successes:>4}/{requests_count} ok {seconds:>6.2f}s"
+    if transport is not None:
+        line += f"  {transport.stats.summary()}"
+    print(line)
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument("--requests", type=int, default=200)
+    arg_parser.add_argument("--threads", type=int, default=8)
+    arg_parser.add_argument("--error-rate", type=float, default=0.1, help="Share of requests answered with a 5xx")
+    arg_parser.add_argument("--drop-rate", type=float, default=0.02, help="Share of connections dropped")
+    arg_parser.add_argument("--quota", type=int, default=40, help="Requests per second the quota run allows")
+    args = arg_parser.parse_args()
+    count = args.requests
+
+    def faults():
+        return FaultInjector(error_rate=args.error_rate, statuses=(500, 503), drop_rate=args.drop_rate, seed=1)
+
+    print(f"{count} requests from {args.threads} threads, {args.error_rate:.0%} 5xx, "
+          f"{args.drop_rate:.0%} dropped connections")
+
+    state = FakeCalendarState(latency=0.005, faults=faults())
+    state.populate(1, 20)
+    with FakeCalendarServer(state) as server:
+        successes, seconds = run(count, args.threads, calendar_reads(server, httplib2.Http))
+        report("Calendar, default client", count, successes, seconds)
+
+        state.faults = faults()
+        transport = Transport("Calendar API", rate=1000, burst=100, backoff=0.05)
+        successes, seconds = run(count, args.threads,
+                                 calendar_reads(server, lambda: RetryingHttp(httplib2.Http(), transport)))
+        report("Calendar, transport", count, successes, seconds, transport)
+
+        # Over quota, the server answers 429 unless the client keeps under the limit;
+        # a burst plus a second's refill stays within the quota's one-second window
+        quota_count = args.quota * 3
+        burst = args.quota // 2
+        for label, limit in (("Calendar quota, retries only", 1000),
+                             ("Calendar quota, rate limited", (args.quota - burst) * 0.9)):
+            state.faults = FaultInjector(quota=(args.quota, 1.0), retry_after=1)
+            transport = Transport("Calendar API", rate=limit, burst=burst, backoff=0.05)
+            successes, seconds = run(quota_count, args.threads,
+                                     calendar_reads(server, lambda: RetryingHttp(httplib2.Http(), transport)))
+            report(label, quota_count, successes, seconds, transport)
+
+    openai_state = FakeOpenAIState(first_token_latency=0.005, token_latency=0.0, faults=faults())
+    with FakeOpenAIServer(openai_state) as server:
+        openai.api_base = server.url
+        openai.api_key = "fake"
+
+        openai.requestssession = requests.Session
+        successes, seconds = run(count, args.threads, completions)
+        report("OpenAI, default session", count, successes, seconds)
+
+        openai_state.faults = faults()
+        transport = Transport("OpenAI", rate=1000, burst=100, backoff=0.05, idempotent_methods={"POST"})
+        openai.requestssession = RetryingSession(transport)
+        successes, seconds = run(count, args.threads, completions)
+        report("OpenAI, transport", count, successes, seconds, transport)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,333 @@
+"""
+Local stand-in for the parts of the Google Calendar API the assistant uses.
+Point a client at it with build_calendar_service(..., api_endpoint=server.url).
+"""
+import json
+import re
+from email.parser import BytesParser
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs, unquote
+
+from benchmarks.faults import DROP, LOST, FaultInjector
+from event_fetch import event_timestamp, parse_datetime
+from recurrence import expand_event
+
+
+class FakeCalendarState:
+    """
+    In-memory calendars and events served by FakeCalendarServer.
+    """
+
+    def __init__(self, latency=0.0, faults=None):
+        self.latency = latency
+        self.faults = faults or FaultInjector()
+        self.calendar_latency = {}  # calendar ID -> extra seconds per request
+        self.calendars = {}         # calendar ID -> calendarList entry
+        self.events = {}            # calendar ID -> {event ID -> event}
+        self.versions = {}          # (calendar ID, event ID) -> version of last change
+        self.calendar_versions = {} # calendar ID -> version of last calendarList change
+        self.version = 0
+        self.min_sync_version = 0   # sync tokens older than this get 410 Gone
+        self.request_count = 0
+        self.batch_count = 0
+        self.insert_errors = {}     # event summary -> statuses to answer inserts with, one per attempt
+        self.expanded = {}          # (calendar ID, version, window) -> singleEvents=true listing
+        self.lock = threading.RLock()
+
+    def add_calendar(self, calendar_id, summary=None, events=()):
+        with self.lock:
+            self.version += 1
+            self.calendars[calendar_id] = {'id': calendar_id, 'summary': summary or calendar_id}
+            self.calendar_versions[calendar_id] = self.version
+            self.events.setdefault(calendar_id, {})
+        for event in events:
+            self.put_event(calendar_id, event)
+
+    def put_event(self, calendar_id, event):
+        """
+        Adds or replaces an event, recording the change for sync tokens.
+        """
+        with self.lock:
+            self.version += 1
+            self.events.setdefault(calendar_id, {})[event['id']] = event
+            self.versions[(calendar_id, event['id'])] = self.version
+
+    def cancel_event(self, calendar_id, event_id):
+        event = dict(self.events[calendar_id][event_id], status='cancelled')
+        self.put_event(calendar_id, event)
+
+    def populate(self, calendar_count, events_per_calendar, start=None):
+        """
+        Fills the state with hourly events spread over the coming days.
+        """
+        start = start or datetime.now(timezone.utc).replace(minute=0, second=0, microsecond=0)
+        for c in range(calendar_count):
+            events = []
+            for e in range(events_per_calendar):
+                event_start = start + timedelta(hours=e * 5 + c)
+                events.append({
+                    'id': f"c{c}e{e}",
+                    'status': 'confirmed',
+                    'summary': f"Event {e} on calendar {c}",
+                    'start': {'dateTime': event_start.isoformat()},
+                    'end': {'dateTime': (event_start + timedelta(hours=1)).isoformat()},
+                })
+            self.add_calendar(f"cal{c}@example.com", f"Calendar {c}", events)
+
+
+def _event_start(event):
+    when = event.get('start') or event.get('originalStartTime') or {}
+    return when.get('dateTime', when.get('date', ''))
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    routes = []
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, body, headers=None):
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _dispatch(self, method):
+        state = self.server.state
+        url = urlparse(self.path)
+        length = int(self.headers.get("Content-Length") or 0)
+        data = self.rfile.read(length) if length else b""
+        with state.lock:
+            state.request_count += 1
+        fault = state.faults.next()
+        if fault == DROP:
+            self.close_connection = True
+            return
+        if fault == LOST:
+            # Runs the request, but the answer never arrives
+            if method == "POST" and url.path.startswith("/batch/"):
+                self._batch(state, data, answer=False)
+            else:
+                _call(state, method, self.path, json.loads(data) if data else None)
+            self.close_connection = True
+            return
+        if fault:
+            reason = "rateLimitExceeded" if fault == 429 else "backendError"
+            return self._send(fault, {'error': {'code': fault, 'message': reason, 'errors': [{'reason': reason}]}},
+                              state.faults.headers(fault))
+        if method == "POST" and url.path.startswith("/batch/"):
+            return self._batch(state, data)
+        body = json.loads(data) if data else None
+        status, response = _call(state, method, self.path, body)
+        self._send(status, response)
+
+    def _batch(self, state, data, answer=True):
+        """
+        Answers a multipart/mixed batch request, running each part through the routes.
+        """
+        with state.lock:
+            state.batch_count += 1
+        # The parts of a batch are served together, so the round trip is paid once
+        if state.latency:
+            time.sleep(state.latency)
+        message = BytesParser().parsebytes(
+            f"Content-Type: {self.headers['Content-Type']}\r\n\r\n".encode() + data
+        )
+        boundary = "batch_fake_boundary"
+        parts = []
+        for part in message.get_payload():
+            head, _, body = part.get_payload().partition("\r\n\r\n")
+            if not body and "\n\n" in head:
+                head, _, body = part.get_payload().partition("\n\n")
+            method, path = head.splitlines()[0].split(" ")[:2]
+            status, response = _call(state, method, path, json.loads(body) if body.strip() else None,
+                                     simulate_latency=False)
+            content_id = part['Content-ID'].strip("<>")
+            parts.append(
+                f"--{boundary}\r\nContent-Type: application/http\r\n"
+                f"Content-ID: <response-{content_id}>\r\n\r\n"
+                f"HTTP/1.1 {status} {'OK' if status < 400 else 'Error'}\r\n"
+                f"Content-Type: application/json; charset=UTF-8\r\n\r\n"
+                f"{json.dumps(response)}\r\n"
+            )
+        if not answer:
+            return
+        payload = ("".join(parts) + f"--{boundary}--\r\n").encode()
+        self.send_response(200)
+        self.send_header("Content-Type", f"multipart/mixed; boundary={boundary}")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_GET(self):
+        self._dispatch("GET")
+
+    def do_POST(self):
+        self._dispatch("POST")
+
+
+def _call(state, method, path, body, simulate_latency=True):
+    """
+    Runs one API call against the routes. Returns (status, response body).
+    """
+    url = urlparse(path)
+    query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+    for route_method, pattern, handler in _Handler.routes:
+        match = re.fullmatch(pattern, url.path)
+        if route_method == method and match:
+            args = [unquote(group) for group in match.groups()]
+            delay = state.latency + sum(state.calendar_latency.get(arg, 0) for arg in args)
+            if delay and simulate_latency:
+                time.sleep(delay)
+            return handler(state, query, body, *args)
+    return 404, {'error': {'code': 404, 'message': f"No route for {method} {url.path}"}}
+
+
+def route(method, pattern):
+    def register(handler):
+        _Handler.routes.append((method, pattern, handler))
+        return handler
+    return register
+
+
+def _expand_series(items, query):
+    """
+    Replaces recurring masters with their occurrences, as the real API does for
+    singleEvents=true; open-ended series are expanded for two years.
+    """
+    time_min = parse_datetime(query['timeMin']) if 'timeMin' in query else None
+    time_max = (parse_datetime(query['timeMax']) if 'timeMax' in query
+                else datetime.now(timezone.utc) + timedelta(days=730))
+    skip = {}
+    for event in items:
+        if event.get('recurringEventId'):
+            skip.setdefault(event['recurringEventId'], set()).add(event_timestamp(event.get('originalStartTime')))
+    expanded = []
+    for event in items:
+        if event.get('recurrence'):
+            expanded.extend(expand_event(event, time_min, time_max, skip=skip.get(event['id'], ())))
+        elif event.get('status') != 'cancelled':
+            expanded.append(event)
+    return expanded
+
+
+@route("GET", r"/calendar/v3/users/me/calendarList")
+def list_calendars(state, query, body):
+    with state.lock:
+        items = list(state.calendars.values())
+        if 'syncToken' in query:
+            since = int(query['syncToken'])
+            items = [calendar for calendar in items if state.calendar_versions[calendar['id']] > since]
+        return 200, {'items': items, 'nextSyncToken': str(state.version)}
+
+
+@route("POST", r"/calendar/v3/calendars")
+def insert_calendar(state, query, body):
+    with state.lock:
+        calendar_id = f"cal{len(state.calendars)}-{state.version + 1}@example.com"
+        state.add_calendar(calendar_id, body.get('summary'))
+        return 200, dict(state.calendars[calendar_id], timeZone=body.get('timeZone', "UTC"))
+
+
+@route("GET", r"/calendar/v3/calendars/([^/]+)/events")
+def list_events(state, query, body, calendar_id):
+    if calendar_id not in state.events:
+        return 404, {'error': {'code': 404, 'message': "Not Found"}}
+    with state.lock:
+        items = list(state.events[calendar_id].values())
+        version = state.version
+        if 'syncToken' in query:
+            since = int(query['syncToken'])
+            if since < state.min_sync_version:
+                return 410, {'error': {'code': 410, 'message': "Sync token is no longer valid"}}
+            items = [event for event in items if state.versions[(calendar_id, event['id'])] > since]
+        else:
+            # Cancelled occurrences of a series are listed so clients can skip them
+            items = [event for event in items
+                     if event.get('status') != 'cancelled' or event.get('recurringEventId')]
+    if query.get('singleEvents') == 'true':
+        key = (calendar_id, version, query.get('syncToken'), query.get('timeMin'), query.get('timeMax'))
+        if key not in state.expanded:
+            state.expanded[key] = _expand_series(items, query)
+        items = state.expanded[key]
+    if 'timeMin' in query:
+        items = [event for event in items if _event_start(event) >= query['timeMin'][:19]]
+    if 'timeMax' in query:
+        items = [event for event in items if _event_start(event) < query['timeMax'][:19]]
+    items.sort(key=_event_start)
+
+    offset = int(query.get('pageToken', 0))
+    page_size = int(query.get('maxResults', 250))
+    response = {'items': items[offset:offset + page_size]}
+    if offset + page_size < len(items):
+        response['nextPageToken'] = str(offset + page_size)
+    else:
+        response['nextSyncToken'] = str(version)
+    return 200, response
+
+
+@route("POST", r"/calendar/v3/calendars/([^/]+)/events")
+def insert_event(state, query, body, calendar_id):
+    with state.lock:
+        errors = state.insert_errors.get(body.get('summary'))
+        if errors:
+            status = errors.pop(0)
+            return status, {'error': {'code': status, 'message': "Backend Error" if status >= 500 else "Bad Request",
+                                      'errors': [{'reason': "backendError" if status >= 500 else "invalid"}]}}
+        if body.get('id') and body['id'] in state.events.get(calendar_id, {}):
+            return 409, {'error': {'code': 409, 'message': "The requested identifier already exists.",
+                                   'errors': [{'reason': "duplicate"}]}}
+        event = dict(body, id=body.get('id') or f"evt{state.version + 1}", status='confirmed')
+        state.put_event(calendar_id, event)
+    return 200, event
+
+
+@route("POST", r"/calendar/v3/freeBusy")
+def query_free_busy(state, query, body):
+    calendars = {}
+    for item in body.get('items', []):
+        events = state.events.get(item['id'], {}).values()
+        busy = [
+            {'start': event['start']['dateTime'], 'end': event['end']['dateTime']}
+            for event in sorted(events, key=_event_start)
+            if event.get('status') != 'cancelled' and 'dateTime' in event['start']
+            and event['end']['dateTime'][:19] > body['timeMin'][:19]
+            and event['start']['dateTime'][:19] < body['timeMax'][:19]
+        ]
+        calendars[item['id']] = {'busy': busy}
+    return 200, {'kind': 'calendar#freeBusy', 'timeMin': body['timeMin'], 'timeMax': body['timeMax'],
+                 'calendars': calendars}
+
+
+class FakeCalendarServer:
+    """
+    Serves a FakeCalendarState on a local port in a background thread.
+    """
+
+    def __init__(self, state=None, host="127.0.0.1", port=0):
+        self.state = state or FakeCalendarState()
+        self.httpd = ThreadingHTTPServer((host, port), _Handler)
+        self.httpd.daemon_threads = True
+        self.httpd.state = self.state
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/calendar/v3/"
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.httpd.shutdown()
+        self.httpd.server_close()
@@ -0,0 +1,171 @@
+"""
+Local stand-in for the OpenAI chat completions endpoint, with configurable
+latency and server-sent-event streaming.
+Point the client at it with openai.api_base = server.url.
+"""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from benchmarks.faults import DROP, LOST, FaultInjector
+
+DEFAULT_REPLY = "You have a free hour on Monday at 6 PM, after which the evening is open. "
+
+# One event as a propose_events call lists it
+DEFAULT_EVENT = {
+    "title": "Gym",
+    "start_date": "2026-10-19",
+    "end_date": "",
+    "start_time": "18:00",
+    "end_time": "19:00",
+    "summary": "Workout",
+    "location": "Gym",
+    "recurrence": "every Monday",
+}
+
+
+def function_reply(events):
+    """
+    Arguments of a propose_events call for the given event dicts.
+    """
+    return json.dumps({"events": events})
+
+
+class FakeOpenAIState:
+    """
+    Canned replies and timing for FakeOpenAIServer.
+    `reply` (chat answers) and `arguments` (function calls) are strings or
+    functions of the request messages. With `truncate_after` set, streams
+    break off after that many chunks, without the closing [DONE].
+    """
+
+    def __init__(self, reply=DEFAULT_REPLY, first_token_latency=0.5, token_latency=0.02, chunk_size=4,
+                 arguments=None, faults=None, truncate_after=None):
+        self.reply = reply
+        self.arguments = arguments if arguments is not None else function_reply([DEFAULT_EVENT])
+        self.first_token_latency = first_token_latency
+        self.token_latency = token_latency
+        self.chunk_size = chunk_size
+        self.truncate_after = truncate_after
+        self.faults = faults or FaultInjector()
+        self.requests = []
+        self.lock = threading.Lock()
+
+    def reply_for(self, body):
+        reply = self.arguments if body.get('functions') else self.reply
+        return reply(body['messages']) if callable(reply) else reply
+
+
+def _chunks(text, size):
+    for offset in range(0, len(text), size):
+        yield text[offset:offset + size]
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        state = self.server.state
+        length = int(self.headers.get("Content-Length") or 0)
+        body = json.loads(self.rfile.read(length) or b"{}")
+        with state.lock:
+            state.requests.append(body)
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            return self._send_json(404, {'error': {'message': f"No route for {self.path}"}})
+        fault = state.faults.next()
+        # Completions change nothing on the server, so a lost answer is a dropped request
+        if fault in (DROP, LOST):
+            self.close_connection = True
+            return
+        if fault:
+            error_type = "rate_limit_exceeded" if fault == 429 else "server_error"
+            return self._send_json(fault, {'error': {'message': f"Injected {fault}", 'type': error_type}},
+                                   state.faults.headers(fault))
+
+        reply = state.reply_for(body)
+        time.sleep(state.first_token_latency)
+        if body.get('stream'):
+            return self._stream(state, body, reply)
+
+        # A non-streamed answer arrives only once every token has been generated
+        time.sleep(state.token_latency * len(list(_chunks(reply, state.chunk_size))))
+        message = {'role': "assistant", 'content': reply}
+        if body.get('functions'):
+            message = {'role': "assistant", 'content': None,
+                       'function_call': {'name': body['functions'][0]['name'], 'arguments': reply}}
+        self._send_json(200, {
+            'id': "chatcmpl-fake",
+            'object': "chat.completion",
+            'model': body.get('model'),
+            'choices': [{'index': 0, 'message': message, 'finish_reason': "stop"}],
+            'usage': {'prompt_tokens': sum(len(m['content'] or "") // 4 for m in body['messages']),
+                      'completion_tokens': len(reply) // 4},
+        })
+
+    def _send_json(self, status, payload, headers=None):
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _stream(self, state, body, reply):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        for index, piece in enumerate(_chunks(reply, state.chunk_size)):
+            if index == state.truncate_after:
+                self.close_connection = True
+                return
+            if index:
+                time.sleep(state.token_latency)
+            delta = {'content': piece}
+            if body.get('functions'):
+                delta = {'function_call': {'arguments': piece}}
+                if not index:
+                    delta['function_call']['name'] = body['functions'][0]['name']
+            chunk = {
+                'id': "chatcmpl-fake",
+                'object': "chat.completion.chunk",
+                'model': body.get('model'),
+                'choices': [{'index': 0, 'delta': delta, 'finish_reason': None}],
+            }
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+            self.wfile.flush()
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+        self.close_connection = True
+
+
+class FakeOpenAIServer:
+    """
+    Serves a FakeOpenAIState on a local port in a background thread.
+    """
+
+    def __init__(self, state=None, host="127.0.0.1", port=0):
+        self.state = state or FakeOpenAIState()
+        self.httpd = ThreadingHTTPServer((host, port), _Handler)
+        self.httpd.daemon_threads = True
+        self.httpd.state = self.state
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.httpd.shutdown()
+        self.httpd.server_close()
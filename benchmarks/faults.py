@@ -0,0 +1,75 @@
+"""
+Fault injection for the fake API servers: random or scripted error
+responses, dropped connections, lost responses and a server-side quota that
+answers 429.
+"""
+import random
+import threading
+import time
+from collections import deque
+
+# Outcome that closes the connection without answering
+DROP = "drop"
+# Outcome that runs the request but closes the connection instead of answering
+LOST = "lost"
+
+
+class FaultInjector:
+    """
+    Decides, request by request, whether a fake server fails instead of answering.
+    `error_rate` of requests get one of `statuses`, `drop_rate` are dropped
+    and `lost_rate` are run without an answer reaching the client.
+    With `quota` set to (requests, seconds), requests over the quota get a 429
+    with a Retry-After header. Scripted outcomes from fail_next come first.
+    """
+
+    def __init__(self, error_rate=0.0, statuses=(503,), drop_rate=0.0, quota=None, retry_after=1, seed=0,
+                 lost_rate=0.0):
+        self.error_rate = error_rate
+        self.statuses = statuses
+        self.drop_rate = drop_rate
+        self.lost_rate = lost_rate
+        self.quota = quota
+        self.retry_after = retry_after
+        self.random = random.Random(seed)
+        self.script = deque()
+        self.recent = deque()
+        self.injected = 0
+        self.lock = threading.Lock()
+
+    def fail_next(self, *outcomes):
+        """
+        Makes the next requests fail with these statuses (or DROP or LOST), in order.
+        """
+        with self.lock:
+            self.script.extend(outcomes)
+
+    def next(self):
+        """
+        Outcome for the next request: None to answer it, a status code, DROP or LOST.
+        """
+        with self.lock:
+            outcome = self.script.popleft() if self.script else None
+            if outcome is None and self.quota:
+                limit, window = self.quota
+                now = time.monotonic()
+                while self.recent and self.recent[0] <= now - window:
+                    self.recent.popleft()
+                if len(self.recent) >= limit:
+                    outcome = 429
+                else:
+                    self.recent.append(now)
+            if outcome is None:
+                roll = self.random.random()
+                if roll < self.drop_rate:
+                    outcome = DROP
+                elif roll < self.drop_rate + self.error_rate:
+                    outcome = self.random.choice(self.statuses)
+                elif roll < self.drop_rate + self.error_rate + self.lost_rate:
+                    outcome = LOST
+            if outcome is not None:
+                self.injected += 1
+            return outcome
+
+    def headers(self, status):
+        return {"Retry-After": str(self.retry_after)} if status == 429 and self.retry_after is not None else {}
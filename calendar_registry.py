@@ -0,0 +1,170 @@
+import time
+import threading
+
+from googleapiclient.errors import HttpError
+
+from services import get_calendar_service
+
+# How long a fetched calendar list is trusted before it is re-synced
+DEFAULT_TTL_SECONDS = 300
+
+
+class CalendarRegistry:
+    """
+    Caches the user's calendar list and indexes it by name.
+    Refreshes are incremental: after the first full listing only the entries
+    changed since the last calendarList sync token are fetched.
+    """
+
+    def __init__(self, service_factory=get_calendar_service, ttl=DEFAULT_TTL_SECONDS):
+        self._service_factory = service_factory
+        self.ttl = ttl
+        self._lock = threading.RLock()
+        self._calendars = {}   # calendar ID -> calendarList entry, in listing order
+        self._by_summary = {}  # summary -> [calendar IDs]
+        self._sync_token = None
+        self._fetched_at = None
+
+    def _is_stale(self):
+        return self._fetched_at is None or time.monotonic() - self._fetched_at > self.ttl
+
+    def _list_pages(self, http=None, **kwargs):
+        """
+        Yields calendarList pages until the last one, which carries nextSyncToken.
+        """
+        calendar_service = self._service_factory()
+        page_token = None
+        while True:
+            page = calendar_service.calendarList().list(pageToken=page_token, **kwargs).execute(http=http)
+            yield page
+            page_token = page.get('nextPageToken')
+            if not page_token:
+                return
+
+    def _rebuild_index(self):
+        by_summary = {}
+        for calendar_id, calendar in self._calendars.items():
+            by_summary.setdefault(calendar.get('summary', calendar_id), []).append(calendar_id)
+        self._by_summary = by_summary
+
+    def refresh(self, full=False, http=None):
+        """
+        Re-syncs the calendar list. Uses the stored sync token unless a full
+        listing is requested or the server reports the token has expired.
+        """
+        with self._lock:
+            if self._sync_token and not full:
+                try:
+                    changed = {}
+                    next_sync_token = None
+                    for page in self._list_pages(http=http, syncToken=self._sync_token):
+                        for calendar in page.get('items', []):
+                            changed[calendar['id']] = calendar
+                        next_sync_token = page.get('nextSyncToken', next_sync_token)
+                    for calendar_id, calendar in changed.items():
+                        if calendar.get('deleted'):
+                            self._calendars.pop(calendar_id, None)
+                        else:
+                            self._calendars[calendar_id] = calendar
+                    self._sync_token = next_sync_token
+                    self._fetched_at = time.monotonic()
+                    self._rebuild_index()
+                    return
+                except HttpError as e:
+                    if e.resp.status != 410:
+                        raise
+                    # Sync token expired; fall through to a full listing
+
+            calendars = {}
+            next_sync_token = None
+            for page in self._list_pages(http=http):
+                for calendar in page.get('items', []):
+                    calendars[calendar['id']] = calendar
+                next_sync_token = page.get('nextSyncToken', next_sync_token)
+            self._calendars = calendars
+            self._sync_token = next_sync_token
+            self._fetched_at = time.monotonic()
+            self._rebuild_index()
+
+    def _ensure_fresh(self, http=None):
+        with self._lock:
+            if self._is_stale():
+                self.refresh(http=http)
+
+    def invalidate(self):
+        """
+        Marks the cached list as stale so the next lookup re-syncs.
+        """
+        with self._lock:
+            self._fetched_at = None
+
+    def calendars(self, http=None):
+        """
+        Returns the cached calendarList entries.
+        """
+        self._ensure_fresh(http=http)
+        with self._lock:
+            return list(self._calendars.values())
+
+    def ids_for_name(self, summary, http=None):
+        """
+        Returns every calendar ID whose summary matches; names are not unique.
+        """
+        self._ensure_fresh(http=http)
+        with self._lock:
+            return list(self._by_summary.get(summary, []))
+
+    def display_name(self, calendar):
+        """
+        Returns the calendar's summary, qualified with its ID when another
+        calendar shares the same summary.
+        """
+        summary = calendar.get('summary', calendar['id'])
+        with self._lock:
+            if len(self._by_summary.get(summary, [])) > 1:
+                return f"{summary} ({calendar['id']})"
+        return summary
+
+    def display_names(self, http=None):
+        """
+        Returns a unique display name for every calendar, in listing order.
+        """
+        return [self.display_name(calendar) for calendar in self.calendars(http=http)]
+
+    def get_id(self, name, http=None):
+        """
+        Resolves a summary or display name to a calendar ID.
+        For duplicate summaries the first calendar in listing order wins.
+        """
+        ids = self.ids_for_name(name, http=http)
+        if ids:
+            return ids[0]
+        with self._lock:
+            for calendar in self._calendars.values():
+                if self.display_name(calendar) == name:
+                    return calendar['id']
+        return None
+
+    def add(self, calendar):
+        """
+        Records a calendar created by this client without waiting for a re-sync.
+        """
+        with self._lock:
+            self._calendars[calendar['id']] = calendar
+            self._rebuild_index()
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_calendar_registry():
+    """
+    Returns the registry shared by every calendar lookup in the app.
+    """
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = CalendarRegistry()
+    return _registry
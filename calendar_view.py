@@ -0,0 +1,396 @@
+from datetime import date, datetime, time, timedelta
+
+from PyQt5.QtCore import QAbstractTableModel, QModelIndex, QRect, Qt, pyqtSignal
+from PyQt5.QtGui import QColor, QFont
+from PyQt5.QtWidgets import (
+    QComboBox, QHBoxLayout, QHeaderView, QLabel, QPushButton, QStyledItemDelegate, QTableView,
+    QVBoxLayout, QWidget
+)
+
+from event_fetch import parse_datetime
+
+DAY, WEEK, MONTH = "Day", "Week", "Month"
+
+# Google Calendar's event colors by colorId
+EVENT_COLORS = {
+    "1": "#7986cb", "2": "#33b679", "3": "#8e24aa", "4": "#e67c73", "5": "#f6bf26", "6": "#f4511e",
+    "7": "#039be5", "8": "#616161", "9": "#3f51b5", "10": "#0b8043", "11": "#d50000",
+}
+DEFAULT_EVENT_COLOR = "#039be5"
+
+# Day and week views have an all-day row followed by one row per hour
+ALL_DAY_ROW = 0
+HOUR_ROW_HEIGHT = 44
+# Hour scrolled to when a day or week is shown
+FIRST_VISIBLE_HOUR = 8
+MONTH_WEEKS = 6
+CHIP_HEIGHT = 16
+
+# Role under which a cell's CalendarEntry list is stored
+ENTRIES_ROLE = Qt.UserRole
+
+
+def _local(when):
+    """
+    Returns (naive local datetime, all_day) for an event 'start'/'end' object.
+    """
+    if 'dateTime' in when:
+        value = parse_datetime(when['dateTime'])
+        if value.tzinfo is not None:
+            value = value.astimezone().replace(tzinfo=None)
+        return value, False
+    return datetime.strptime(when['date'], "%Y-%m-%d"), True
+
+
+def _clock(value):
+    return value.strftime("%I:%M %p").lstrip("0")
+
+
+class CalendarEntry:
+    """
+    What the view needs of one event: its ID, title, local start and end,
+    and color. Entries with the same key() draw the same.
+    """
+
+    __slots__ = ("id", "title", "start", "end", "all_day", "color", "location")
+
+    def __init__(self, event_id, title, start, end, all_day, color, location=""):
+        self.id = event_id
+        self.title = title
+        self.start = start
+        self.end = end
+        self.all_day = all_day
+        self.color = color
+        self.location = location
+
+    @classmethod
+    def from_event(cls, event):
+        start, all_day = _local(event['start'])
+        end, _ = _local(event.get('end') or event['start'])
+        if end <= start:
+            end = start + (timedelta(days=1) if all_day else timedelta(minutes=30))
+        return cls(
+            event['id'], event.get('summary') or "(No title)", start, end, all_day,
+            EVENT_COLORS.get(event.get('colorId'), DEFAULT_EVENT_COLOR), event.get('location') or "",
+        )
+
+    def key(self):
+        return (self.title, self.start, self.end, self.all_day, self.color, self.location)
+
+    def describe(self):
+        when = "All day" if self.all_day else f"{_clock(self.start)} - {_clock(self.end)}"
+        return f"{when}  {self.title}" + (f" ({self.location})" if self.location else "")
+
+
+class CalendarModel(QAbstractTableModel):
+    """
+    Events laid out as a grid: one column per day, and one row per hour
+    (day and week) or per week (month). Each cell holds the entries that
+    overlap it. Changing the range resets the model; replacing the events
+    only signals the cells whose entries changed.
+    """
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.mode = WEEK
+        self.anchor = date.today()
+        self.first_day = self.first_day_of(self.mode, self.anchor)
+        self._entries = {}  # event ID -> CalendarEntry
+        self._cells = {}    # (row, column) -> [CalendarEntry], ordered by start
+
+    @staticmethod
+    def first_day_of(mode, anchor):
+        if mode == DAY:
+            return anchor
+        if mode == WEEK:
+            return anchor - timedelta(days=anchor.weekday())
+        first = anchor.replace(day=1)
+        return first - timedelta(days=first.weekday())
+
+    def day_count(self):
+        return {DAY: 1, WEEK: 7, MONTH: 7 * MONTH_WEEKS}[self.mode]
+
+    def time_range(self):
+        """
+        The (start, end) datetimes covered by the grid.
+        """
+        start = datetime.combine(self.first_day, time())
+        return start, start + timedelta(days=self.day_count())
+
+    def set_range(self, mode, anchor):
+        self.beginResetModel()
+        self.mode = mode
+        self.anchor = anchor
+        self.first_day = self.first_day_of(mode, anchor)
+        self._cells = {}
+        for entry in self._entries.values():
+            self._place(entry)
+        self.endResetModel()
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return MONTH_WEEKS if self.mode == MONTH else 25
+
+    def columnCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return 1 if self.mode == DAY else 7
+
+    def date_at(self, row, column):
+        if self.mode == MONTH:
+            return self.first_day + timedelta(days=row * 7 + column)
+        return self.first_day + timedelta(days=column)
+
+    def _cells_of(self, entry):
+        """
+        The (row, column) cells an entry covers in the current range.
+        """
+        first = entry.start.date()
+        last = (entry.end - timedelta(microseconds=1)).date()
+        cells = []
+        for column in range(self.day_count()):
+            day = self.first_day + timedelta(days=column)
+            if day < first or day > last:
+                continue
+            if self.mode == MONTH:
+                cells.append((column // 7, column % 7))
+            elif entry.all_day:
+                cells.append((ALL_DAY_ROW, column))
+            else:
+                day_start = datetime.combine(day, time())
+                start_hour = 0 if day > first else entry.start.hour
+                end = min(entry.end, day_start + timedelta(days=1))
+                end_hour = max((end - day_start - timedelta(microseconds=1)).seconds // 3600, start_hour)
+                cells.extend((hour + 1, column) for hour in range(start_hour, end_hour + 1))
+        return cells
+
+    def _place(self, entry):
+        cells = self._cells_of(entry)
+        for cell in cells:
+            entries = self._cells.setdefault(cell, [])
+            entries.append(entry)
+            entries.sort(key=lambda item: (not item.all_day, item.start, item.title))
+        return cells
+
+    def _remove(self, entry):
+        cells = self._cells_of(entry)
+        for cell in cells:
+            entries = self._cells.get(cell, [])
+            if entry in entries:
+                entries.remove(entry)
+        return cells
+
+    def set_events(self, events):
+        """
+        Replaces the shown events with `events` (API-shaped dicts), updating
+        only the cells of events that were added, changed or removed.
+        Returns the number of cells that changed.
+        """
+        new_entries = {}
+        for event in events:
+            try:
+                new_entries[event['id']] = CalendarEntry.from_event(event)
+            except (KeyError, ValueError) as e:
+                print(f"Error showing event {event.get('id')}: {e}")
+
+        changed = set()
+        for event_id, entry in self._entries.items():
+            new_entry = new_entries.get(event_id)
+            if new_entry is None or new_entry.key() != entry.key():
+                changed.update(self._remove(entry))
+            else:
+                new_entries[event_id] = entry
+        for event_id, entry in new_entries.items():
+            if self._entries.get(event_id) is not entry:
+                changed.update(self._place(entry))
+        self._entries = new_entries
+
+        for row, column in changed:
+            index = self.index(row, column)
+            self.dataChanged.emit(index, index, [ENTRIES_ROLE, Qt.ToolTipRole])
+        return len(changed)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        if role == ENTRIES_ROLE:
+            return self._cells.get((index.row(), index.column()), [])
+        if role == Qt.ToolTipRole:
+            entries = self._cells.get((index.row(), index.column()))
+            return "\n".join(entry.describe() for entry in entries) if entries else None
+        return None
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role != Qt.DisplayRole:
+            return None
+        if orientation == Qt.Horizontal:
+            day = self.first_day + timedelta(days=section)
+            return day.strftime("%a") if self.mode == MONTH else day.strftime("%a %m/%d")
+        if self.mode == MONTH:
+            return None
+        if section == ALL_DAY_ROW:
+            return "All day"
+        return time(section - 1).strftime("%I %p").lstrip("0")
+
+
+class EventDelegate(QStyledItemDelegate):
+    """
+    Draws the entries of one cell. Only visible cells are ever painted,
+    so the cost of a repaint does not grow with the number of events.
+    """
+
+    def paint(self, painter, option, index):
+        model = index.model()
+        rect = option.rect
+        painter.save()
+        day = model.date_at(index.row(), index.column())
+        if day == date.today():
+            painter.fillRect(rect, QColor("#e8f0fe"))
+        elif model.mode == MONTH and day.month != model.anchor.month:
+            painter.fillRect(rect, QColor("#f5f5f5"))
+        painter.setPen(QColor("#dadce0"))
+        painter.drawLine(rect.bottomLeft(), rect.bottomRight())
+        painter.drawLine(rect.topRight(), rect.bottomRight())
+
+        entries = index.data(ENTRIES_ROLE)
+        if model.mode == MONTH:
+            self._paint_month(painter, rect, day, entries)
+        else:
+            self._paint_hour(painter, rect, day, index.row(), entries)
+        painter.restore()
+
+    def _chip(self, painter, rect, entry, text):
+        painter.fillRect(rect, QColor(entry.color))
+        if text:
+            painter.setPen(QColor("white"))
+            painter.drawText(rect.adjusted(3, 0, -2, 0), Qt.AlignLeft | Qt.AlignVCenter, text)
+
+    def _paint_month(self, painter, rect, day, entries):
+        font = QFont(painter.font())
+        font.setPointSizeF(max(font.pointSizeF() - 1, 7))
+        painter.setFont(font)
+        painter.setPen(QColor("#3c4043"))
+        painter.drawText(rect.adjusted(4, 2, -4, 0), Qt.AlignLeft | Qt.AlignTop, str(day.day))
+        top = rect.top() + CHIP_HEIGHT + 2
+        fits = max((rect.bottom() - top) // (CHIP_HEIGHT + 2), 0)
+        shown = entries if len(entries) <= fits else entries[:max(fits - 1, 0)]
+        for entry in shown:
+            label = entry.title if entry.all_day or entry.start.date() != day else \
+                f"{_clock(entry.start)} {entry.title}"
+            self._chip(painter, QRect(rect.left() + 2, top, rect.width() - 4, CHIP_HEIGHT), entry, label)
+            top += CHIP_HEIGHT + 2
+        if len(shown) < len(entries):
+            painter.setPen(QColor("#3c4043"))
+            painter.drawText(QRect(rect.left() + 4, top, rect.width() - 8, CHIP_HEIGHT),
+                             Qt.AlignLeft | Qt.AlignVCenter, f"+{len(entries) - len(shown)} more")
+
+    def _paint_hour(self, painter, rect, day, row, entries):
+        if not entries:
+            return
+        width = (rect.width() - 4) / len(entries)
+        hour_start = datetime.combine(day, time()) + timedelta(hours=max(row - 1, 0))
+        for position, entry in enumerate(entries):
+            chip = QRect(int(rect.left() + 2 + position * width), rect.top() + 1,
+                         max(int(width) - 2, 1), rect.height() - 2)
+            # The title is written where the event starts (or at the top of the day it continues into)
+            starts_here = row == ALL_DAY_ROW or entry.start >= hour_start or hour_start.hour == 0
+            self._chip(painter, chip, entry, entry.describe() if starts_here else "")
+
+
+class CalendarView(QWidget):
+    """
+    Native day, week and month view of the user's events. It asks for the
+    events of the range it shows through `range_changed(start, end)`; call
+    set_events with them. `web_requested` asks for the Google Calendar web page.
+    """
+
+    range_changed = pyqtSignal(object, object)
+    web_requested = pyqtSignal()
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.model = CalendarModel(self)
+
+        self.table = QTableView()
+        self.table.setModel(self.model)
+        self.table.setItemDelegate(EventDelegate(self.table))
+        self.table.setShowGrid(False)
+        self.table.setSelectionMode(QTableView.NoSelection)
+        self.table.setEditTriggers(QTableView.NoEditTriggers)
+        self.table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+        self.table.verticalHeader().setDefaultSectionSize(HOUR_ROW_HEIGHT)
+
+        self.title_label = QLabel("")
+        self.mode_selector = QComboBox()
+        self.mode_selector.addItems([DAY, WEEK, MONTH])
+        self.mode_selector.setCurrentText(WEEK)
+        self.mode_selector.currentTextChanged.connect(lambda mode: self.show_range(mode, self.model.anchor))
+        previous_button = QPushButton("<")
+        previous_button.clicked.connect(lambda: self.step(-1))
+        next_button = QPushButton(">")
+        next_button.clicked.connect(lambda: self.step(1))
+        today_button = QPushButton("Today")
+        today_button.clicked.connect(lambda: self.show_range(self.model.mode, date.today()))
+        web_button = QPushButton("Google Calendar")
+        web_button.setToolTip("Open calendar.google.com in a tab")
+        web_button.clicked.connect(self.web_requested.emit)
+
+        toolbar = QHBoxLayout()
+        toolbar.addWidget(today_button)
+        toolbar.addWidget(previous_button)
+        toolbar.addWidget(next_button)
+        toolbar.addWidget(self.title_label, 1)
+        toolbar.addWidget(self.mode_selector)
+        toolbar.addWidget(web_button)
+        layout = QVBoxLayout()
+        layout.setContentsMargins(0, 0, 0, 0)
+        layout.addLayout(toolbar)
+        layout.addWidget(self.table)
+        self.setLayout(layout)
+        self._update_layout()
+
+    def time_range(self):
+        return self.model.time_range()
+
+    def set_events(self, events):
+        return self.model.set_events(events)
+
+    def step(self, direction):
+        """
+        Moves one day, week or month forward (1) or back (-1).
+        """
+        anchor = self.model.anchor
+        if self.model.mode == DAY:
+            anchor += timedelta(days=direction)
+        elif self.model.mode == WEEK:
+            anchor += timedelta(days=7 * direction)
+        else:
+            month = anchor.month - 1 + direction
+            anchor = date(anchor.year + month // 12, month % 12 + 1, 1)
+        self.show_range(self.model.mode, anchor)
+
+    def show_range(self, mode, anchor):
+        if (mode, self.model.first_day_of(mode, anchor)) == (self.model.mode, self.model.first_day):
+            return
+        self.model.set_range(mode, anchor)
+        self._update_layout()
+        self.range_changed.emit(*self.time_range())
+
+    def _update_layout(self):
+        month = self.model.mode == MONTH
+        header = self.table.verticalHeader()
+        header.setSectionResizeMode(QHeaderView.Stretch if month else QHeaderView.Fixed)
+        if not month:
+            # Fixed rows, so only the rows in the viewport are laid out and painted
+            header.setDefaultSectionSize(HOUR_ROW_HEIGHT)
+        header.setVisible(not month)
+        start, end = self.time_range()
+        if month:
+            self.title_label.setText(self.model.anchor.strftime("%B %Y"))
+        elif self.model.mode == DAY:
+            self.title_label.setText(start.strftime("%A, %B %d, %Y"))
+        else:
+            self.title_label.setText(f"{start:%b %d} - {end - timedelta(days=1):%b %d, %Y}")
+        if not month:
+            self.table.scrollTo(self.model.index(FIRST_VISIBLE_HOUR + 1, 0), QTableView.PositionAtTop)
@@ -0,0 +1,150 @@
+"""
+Headless entry point: turns natural-language requests, one per line, into
+calendar events without loading Qt. Prints one JSON result per input line.
+
+    python cli.py requests.txt --dry-run
+    echo "Dentist next Tuesday 3pm" | python cli.py --calendar Work
+"""
+import argparse
+import contextlib
+import json
+import sys
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from assistant import get_color_id, get_selected_calendar_id, suggest_events
+from event_batch import MAX_BATCH_SIZE, insert_events
+from services import get_assistant_calendar_id
+from tracing import configure as configure_tracing
+
+# Lines parsed at the same time; each may need a GPT-4 round trip
+DEFAULT_WORKERS = 4
+
+
+def read_requests(stream):
+    """
+    Yields (line number, text) for every non-empty line that is not a # comment.
+    """
+    for number, line in enumerate(stream, 1):
+        text = line.strip()
+        if text and not text.startswith("#"):
+            yield number, text
+
+
+def _parse(text):
+    try:
+        return suggest_events(text)
+    except Exception as e:
+        print(f"Error parsing request: {e}")
+        return [], [str(e)]
+
+
+def parse_requests(requests, workers=DEFAULT_WORKERS):
+    """
+    Parses requests on a thread pool, yielding (line number, text, records,
+    problems) in input order. Only a few lines are read ahead, so input of
+    any length is processed as it streams in.
+    """
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        for number, text in requests:
+            pending.append((number, text, pool.submit(_parse, text)))
+            if len(pending) >= workers * 2:
+                number, text, future = pending.popleft()
+                yield (number, text) + future.result()
+        while pending:
+            number, text, future = pending.popleft()
+            yield (number, text) + future.result()
+
+
+def _status(events, problems, dry_run):
+    if not events:
+        return "failed"
+    if dry_run:
+        return "parsed" if not problems else "partial"
+    created = sum('id' in event for event in events)
+    if created == len(events) and not problems:
+        return "created"
+    return "partial" if created else "failed"
+
+
+def run(requests, out, calendar_id=None, color=None, dry_run=False, workers=DEFAULT_WORKERS,
+        batch_size=MAX_BATCH_SIZE, service=None):
+    """
+    Streams (line number, text) requests through parsing, validation and
+    insertion, writing one JSON object per request to `out` in input order.
+    Events from consecutive lines are inserted together in batches of up to
+    `batch_size`. With `dry_run`, nothing is inserted.
+    Returns the number of requests that did not fully succeed.
+    """
+    color_id = get_color_id(color)
+    buffered = []
+    queued = 0
+    unsuccessful = 0
+
+    def flush():
+        nonlocal queued, unsuccessful
+        created, failures = {}, {}
+        if not dry_run:
+            items = [(calendar_id, record.to_api_body(color_id))
+                     for _, _, records, _ in buffered for record in records]
+            if items:
+                created, failures = insert_events(items, service=service, batch_size=batch_size)
+        index = 0
+        for number, text, records, problems in buffered:
+            events = []
+            for record in records:
+                event = record.to_dict()
+                if index in created:
+                    event['id'] = created[index].get('id')
+                    event['htmlLink'] = created[index].get('htmlLink')
+                elif index in failures:
+                    event['error'] = failures[index]
+                events.append(event)
+                index += 1
+            status = _status(events, problems, dry_run)
+            if status not in ("created", "parsed"):
+                unsuccessful += 1
+            result = {'line': number, 'input': text, 'status': status, 'events': events, 'errors': problems}
+            out.write(json.dumps(result) + "\n")
+        out.flush()
+        buffered.clear()
+        queued = 0
+
+    for number, text, records, problems in parse_requests(requests, workers):
+        buffered.append((number, text, records, problems))
+        queued += len(records)
+        if dry_run or queued >= batch_size:
+            flush()
+    flush()
+    return unsuccessful
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("input", nargs="?", default="-", help="File with one request per line; - for stdin")
+    arg_parser.add_argument("--dry-run", action="store_true", help="Parse and validate only; create nothing")
+    arg_parser.add_argument("--calendar", help="Calendar name (defaults to the assistant calendar)")
+    arg_parser.add_argument("--color", help="Event color, e.g. Sage or Tomato")
+    arg_parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="Requests parsed at once")
+    args = arg_parser.parse_args(argv)
+
+    configure_tracing()
+    out = sys.stdout
+    source = sys.stdin if args.input == "-" else open(args.input, encoding="utf-8")
+    # Progress and debug messages go to stderr so stdout stays one JSON object per line
+    with source, contextlib.redirect_stdout(sys.stderr):
+        calendar_id = None
+        if not args.dry_run:
+            calendar_id = (get_selected_calendar_id(args.calendar) if args.calendar
+                           else get_assistant_calendar_id())
+            if not calendar_id:
+                print(f"Error: calendar {args.calendar or 'for the assistant'} not found")
+                return 2
+        unsuccessful = run(read_requests(source), out, calendar_id=calendar_id, color=args.color,
+                           dry_run=args.dry_run, workers=args.workers)
+    return 1 if unsuccessful else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
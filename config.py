@@ -0,0 +1,50 @@
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Google Calendar API setup
+SCOPES = ['https://www.googleapis.com/auth/calendar']
+
+OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+GOOGLE_CLIENT_SECRET_PATH = os.getenv("GOOGLE_CLIENT_SECRET_PATH")
+
+# Optional override of the Calendar API base URL, e.g. a local fake server
+GOOGLE_API_ENDPOINT = os.getenv("GOOGLE_API_ENDPOINT")
+
+# Client-side rate limits; raise them to match the quotas of your Google Cloud project and OpenAI tier
+CALENDAR_QUERIES_PER_MINUTE = float(os.getenv("CALENDAR_QUERIES_PER_MINUTE") or "600")
+OPENAI_REQUESTS_PER_MINUTE = float(os.getenv("OPENAI_REQUESTS_PER_MINUTE") or "500")
+OPENAI_TOKENS_PER_MINUTE = float(os.getenv("OPENAI_TOKENS_PER_MINUTE") or "10000")
+
+# Trace exporters, comma separated: log, prometheus, otlp. Tracing is off when empty
+TRACE_EXPORTERS = os.getenv("CALENDAR_ASSISTANT_TRACE", "")
+# File the log exporter appends spans to; defaults to traces.jsonl in the cache directory
+TRACE_LOG_PATH = os.getenv("CALENDAR_ASSISTANT_TRACE_LOG")
+# Port serving /metrics for the prometheus exporter; 0 keeps the metrics in-process
+METRICS_PORT = int(os.getenv("CALENDAR_ASSISTANT_METRICS_PORT") or "0")
+# OpenTelemetry collector the otlp exporter sends to; without one, spans go to a file in the cache directory
+OTLP_ENDPOINT = os.getenv("OTEL_EXPORTER_OTLP_ENDPOINT")
+
+# Service mode (server.py): requests one user may make per minute, and how many of them run at once
+USER_REQUESTS_PER_MINUTE = float(os.getenv("USER_REQUESTS_PER_MINUTE") or "60")
+USER_CONCURRENCY = int(os.getenv("USER_CONCURRENCY") or "2")
+# Service token that registers users of the service and lets a trusted proxy name them; without it the
+# service trusts X-User-Id and only listens on 127.0.0.1
+SERVER_TOKEN = os.getenv("CALENDAR_ASSISTANT_SERVER_TOKEN")
+
+# Name of the calendar the assistant creates events in by default
+ASSISTANT_CALENDAR_NAME = "Calendar Assistant Calendar"
+
+# Local state (OAuth tokens, caches) lives here; an empty setting counts as unset
+CACHE_DIR = (os.getenv("CALENDAR_ASSISTANT_CACHE_DIR")
+             or os.path.join(os.path.expanduser("~"), ".calendar_assistant"))
+GOOGLE_TOKEN_PATH = os.getenv("GOOGLE_TOKEN_PATH") or os.path.join(CACHE_DIR, "token.json")
+
+
+def cache_path(*parts):
+    """
+    Returns a path inside the cache directory, creating the directory if needed.
+    """
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    return os.path.join(CACHE_DIR, *parts)
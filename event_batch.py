@@ -0,0 +1,134 @@
+import random
+import time
+from urllib.parse import urlparse
+
+from services import get_calendar_service
+from tracing import current_span, traced
+
+# Google Calendar accepts at most 50 calls in one batch request
+MAX_BATCH_SIZE = 50
+# Rounds of retries for items that failed with a transient error
+DEFAULT_MAX_ATTEMPTS = 3
+# First retry delay in seconds; doubled every round, with jitter
+DEFAULT_BACKOFF = 1.0
+
+_RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+_RATE_LIMIT_REASONS = {"rateLimitExceeded", "userRateLimitExceeded"}
+
+
+def new_batch_request(service, callback=None):
+    """
+    Returns a batch request for `service` that is sent to the same host as its
+    other calls. The client's own new_batch_http_request always targets
+    www.googleapis.com, which would bypass GOOGLE_API_ENDPOINT.
+    """
+    from googleapiclient.http import BatchHttpRequest
+
+    base = urlparse(service._baseUrl)
+    batch_uri = f"{base.scheme}://{base.netloc}/batch{base.path.rstrip('/')}"
+    return BatchHttpRequest(callback=callback, batch_uri=batch_uri)
+
+
+def _is_retryable(error):
+    status = getattr(getattr(error, 'resp', None), 'status', None)
+    if status in _RETRYABLE_STATUSES:
+        return True
+    if status == 403:
+        reasons = {detail.get('reason') for detail in (getattr(error, 'error_details', None) or [])
+                   if isinstance(detail, dict)}
+        return bool(reasons & _RATE_LIMIT_REASONS)
+    return False
+
+
+def _describe(error):
+    status = getattr(getattr(error, 'resp', None), 'status', None)
+    reason = error._get_reason() if hasattr(error, '_get_reason') else str(error)
+    return f"{status}: {reason}" if status else reason
+
+
+def _is_conflict(error):
+    return getattr(getattr(error, 'resp', None), 'status', None) == 409
+
+
+def send_insert_batches(items, indexes, service, http=None, batch_size=MAX_BATCH_SIZE, existing_ok=False):
+    """
+    One round of batch requests inserting items[index] for every index in
+    `indexes`. With `existing_ok`, an insert answered 409 (an event with the
+    body's client-specified ID already exists) counts as created, its body
+    standing in for the event.
+
+    Returns (created, failures, retry, batches): created events and error
+    messages keyed by index, the indexes worth sending again and the number
+    of batch requests sent.
+    """
+    created = {}
+    failures = {}
+    retry = []
+    batches = 0
+
+    def callback(request_id, response, exception):
+        index = int(request_id)
+        if exception is None:
+            created[index] = response
+        elif existing_ok and _is_conflict(exception):
+            created[index] = items[index][1]
+        else:
+            failures[index] = _describe(exception)
+            if _is_retryable(exception):
+                retry.append(index)
+
+    for offset in range(0, len(indexes), batch_size):
+        batch = new_batch_request(service, callback=callback)
+        batches += 1
+        for index in indexes[offset:offset + batch_size]:
+            calendar_id, body = items[index]
+            batch.add(service.events().insert(calendarId=calendar_id, body=body), request_id=str(index))
+        try:
+            batch.execute(http=http)
+        except Exception as e:
+            # The whole batch request failed; every item in it can be sent again
+            print(f"Error sending batch of events: {e}")
+            for index in indexes[offset:offset + batch_size]:
+                if index not in created:
+                    failures[index] = str(e)
+                    retry.append(index)
+    return created, failures, sorted(set(retry)), batches
+
+
+@traced("calendar.insert_events")
+def insert_events(items, service=None, http=None, batch_size=MAX_BATCH_SIZE,
+                  max_attempts=DEFAULT_MAX_ATTEMPTS, backoff=DEFAULT_BACKOFF, existing_ok=False):
+    """
+    Creates events with as few round trips as possible.
+    `items` is a list of (calendar_id, event body) pairs, sent in batches of up
+    to `batch_size`. Items that fail with a transient error (rate limits, 5xx)
+    are retried in new, smaller batches; other errors are final. See
+    send_insert_batches for `existing_ok`.
+
+    Returns (created, failures): dicts keyed by the item's index in `items`,
+    holding the created event or the error message.
+    """
+    service = service or get_calendar_service()
+    created = {}
+    failures = {}
+    pending = list(range(len(items)))
+    insert_span = current_span().set(events=len(items))
+    batches = 0
+
+    for attempt in range(max_attempts):
+        if not pending:
+            break
+        if attempt:
+            time.sleep(backoff * (2 ** (attempt - 1)) * random.uniform(0.5, 1.5))
+        round_created, round_failures, pending, round_batches = send_insert_batches(
+            items, pending, service, http=http, batch_size=batch_size, existing_ok=existing_ok)
+        batches += round_batches
+        created.update(round_created)
+        for index in round_created:
+            failures.pop(index, None)
+        failures.update(round_failures)
+        if pending and attempt + 1 < max_attempts:
+            print(f"Retrying {len(pending)} events after transient errors")
+
+    insert_span.set(batches=batches, created=len(created), failed=len(failures))
+    return created, failures
@@ -0,0 +1,166 @@
+import heapq
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+from datetime import datetime
+
+from services import get_calendar_service, authorized_http
+
+# Upper bound on simultaneous events().list requests
+DEFAULT_MAX_WORKERS = 8
+# Seconds a single calendar may take before it is left out of the result
+DEFAULT_CALENDAR_TIMEOUT = 10
+# Events requested per page (the API allows up to 2500)
+DEFAULT_PAGE_SIZE = 250
+
+
+def parse_datetime(value):
+    """
+    Parses an RFC 3339 dateTime from the API. Python before 3.11 cannot read
+    the 'Z' suffix Google uses for UTC, so it is spelled out first.
+    """
+    if value.endswith(("Z", "z")):
+        value = value[:-1] + "+00:00"
+    return datetime.fromisoformat(value)
+
+
+def event_timestamp(when):
+    """
+    Converts an event 'start'/'end' object to epoch seconds.
+    All-day dates are taken as local midnight.
+    """
+    if not when:
+        return None
+    if 'dateTime' in when:
+        return parse_datetime(when['dateTime']).timestamp()
+    if 'date' in when:
+        return datetime.strptime(when['date'], "%Y-%m-%d").timestamp()
+    return None
+
+
+def event_start_key(event):
+    """
+    Sort key ordering events by start time; events without a start sort first.
+    """
+    return event_timestamp(event.get('start')) or 0.0
+
+
+def to_rfc3339(value):
+    """
+    Formats a datetime for timeMin/timeMax; naive datetimes are taken as local time.
+    Strings are passed through unchanged.
+    """
+    if value is None or isinstance(value, str):
+        return value
+    if value.tzinfo is None:
+        value = value.astimezone()
+    return value.isoformat()
+
+
+def iter_event_pages(calendar_id, service=None, http=None, max_results=DEFAULT_PAGE_SIZE, **list_kwargs):
+    """
+    Yields raw events().list pages, requesting the next page only when the
+    previous one has been consumed. The last page carries nextSyncToken.
+    """
+    calendar_service = service or get_calendar_service()
+    page_token = None
+    while True:
+        page = calendar_service.events().list(
+            calendarId=calendar_id, maxResults=max_results, pageToken=page_token, **list_kwargs
+        ).execute(http=http)
+        yield page
+        page_token = page.get('nextPageToken')
+        if not page_token:
+            return
+
+
+def iter_events(calendar_id, service=None, http=None, time_min=None, time_max=None,
+                max_results=DEFAULT_PAGE_SIZE, **list_kwargs):
+    """
+    Lazily yields every event of a calendar within [time_min, time_max),
+    following nextPageToken so long calendars are not cut off after one page.
+    At most one page is held in memory.
+    """
+    if time_min is not None:
+        list_kwargs['timeMin'] = to_rfc3339(time_min)
+    if time_max is not None:
+        list_kwargs['timeMax'] = to_rfc3339(time_max)
+    for page in iter_event_pages(calendar_id, service=service, http=http, max_results=max_results, **list_kwargs):
+        yield from page.get('items', [])
+
+
+def merge_event_streams(streams):
+    """
+    Merges event iterators that are each sorted by start time into a single
+    sorted stream (k-way merge), holding only one pending event per stream.
+    """
+    return heapq.merge(*streams, key=event_start_key)
+
+
+def fetch_calendar_events(calendar_id, service=None, http=None, **list_kwargs):
+    """
+    Fetches all events of a single calendar, across every page.
+    """
+    return list(iter_events(calendar_id, service=service, http=http, **list_kwargs))
+
+
+def map_calendars(func, calendar_ids, http_factory=authorized_http,
+                  max_workers=DEFAULT_MAX_WORKERS, timeout=DEFAULT_CALENDAR_TIMEOUT):
+    """
+    Runs func(calendar_id, http) for several calendars concurrently on a bounded
+    thread pool. Each worker thread keeps its own HTTP connection, since httplib2
+    objects cannot be shared between threads. A calendar that fails or does not
+    answer within `timeout` seconds is reported in the failures instead of
+    delaying the others.
+
+    Returns (results, failures), both keyed by calendar ID.
+    """
+    calendar_ids = list(calendar_ids)
+    if not calendar_ids:
+        return {}, {}
+
+    local = threading.local()
+
+    def run(calendar_id):
+        if not hasattr(local, 'http'):
+            local.http = http_factory(timeout=timeout)
+        return func(calendar_id, local.http)
+
+    workers = max(1, min(max_workers, len(calendar_ids)))
+    executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="calendar-fetch")
+    try:
+        futures = {executor.submit(run, calendar_id): calendar_id for calendar_id in calendar_ids}
+        # Socket timeouts bound each request; this bounds queueing behind slow ones too
+        deadline = timeout * -(-len(calendar_ids) // workers)
+        done, not_done = wait(futures, timeout=deadline)
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    results = {}
+    failures = {}
+    for future in done:
+        calendar_id = futures[future]
+        try:
+            results[calendar_id] = future.result()
+        except Exception as e:
+            failures[calendar_id] = e
+    for future in not_done:
+        failures[futures[future]] = TimeoutError(f"No response within {timeout}s")
+
+    return results, failures
+
+
+def fetch_events_for_calendars(calendar_ids, service=None, http_factory=authorized_http,
+                               max_workers=DEFAULT_MAX_WORKERS, timeout=DEFAULT_CALENDAR_TIMEOUT,
+                               **list_kwargs):
+    """
+    Fetches events from several calendars concurrently.
+
+    Returns (events_by_calendar, failures), both keyed by calendar ID.
+    """
+    calendar_service = service or get_calendar_service()
+
+    def fetch(calendar_id, http):
+        return fetch_calendar_events(calendar_id, service=calendar_service, http=http, **list_kwargs)
+
+    return map_calendars(fetch, calendar_ids, http_factory=http_factory,
+                         max_workers=max_workers, timeout=timeout)
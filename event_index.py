@@ -0,0 +1,176 @@
+"""
+Keyword retrieval over the mirrored events, so a question like "when is my
+next dentist thing?" finds the matching events wherever they are in the
+calendar without sending every event to the model.
+
+Events are ranked with BM25 over their title (counted twice), description
+and location. The index lives in NumPy arrays of (document, term, count)
+postings; added events are appended, and changed or deleted ones are
+marked dead and dropped when the arrays are next compacted.
+"""
+import re
+import threading
+
+import numpy as np
+
+# Results returned by search() by default
+DEFAULT_LIMIT = 10
+# BM25 parameters: term frequency saturation and document length normalization
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+_WORD = re.compile(r"[^\W_]+")
+# Words of questions that say nothing about which event is meant
+STOP_WORDS = frozenset("""
+a about after all am an and any are at be before by can do does did event events for from have how i in is it
+its me my next of on or our the their them there thing things this to upcoming was what when where which who will
+with you your
+""".split())
+
+
+def tokenize(text):
+    """
+    Lowercased words of `text` without stop words, with a trailing plural 's' removed.
+    """
+    tokens = []
+    for word in _WORD.findall(text.lower()):
+        if word in STOP_WORDS:
+            continue
+        if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+            word = word[:-1]
+        tokens.append(word)
+    return tokens
+
+
+def event_terms(event):
+    """
+    The tokens an event is indexed under.
+    """
+    title = event.get('summary') or ""
+    return tokenize(f"{title} {title} {event.get('description') or ''} {event.get('location') or ''}")
+
+
+class EventIndex:
+    """
+    BM25 index of events keyed by (calendar ID, event ID). Safe to update and
+    search from several threads.
+    """
+
+    def __init__(self, k1=BM25_K1, b=BM25_B):
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.Lock()
+        self._terms = {}       # term -> term ID
+        self._keys = []        # document number -> key
+        self._documents = {}   # key -> document number of its live document
+        self._postings = (np.empty(0, np.int32), np.empty(0, np.int32), np.empty(0, np.float32))
+        self._lengths = np.empty(0, np.float32)
+        self._alive = np.empty(0, bool)
+        # Added since the arrays were last built: (document, term, count) rows and document lengths
+        self._new_postings = []
+        self._new_lengths = []
+        self._dead = 0
+
+    def __len__(self):
+        with self._lock:
+            return len(self._documents)
+
+    def _remove(self, key):
+        document = self._documents.pop(key, None)
+        if document is None:
+            return
+        if document < len(self._alive):
+            self._alive[document] = False
+        else:
+            self._new_lengths[document - len(self._alive)] = None
+        self._dead += 1
+
+    def update(self, changed=(), removed=()):
+        """
+        Indexes `changed` (key, event) pairs, replacing any earlier version,
+        and forgets the `removed` keys.
+        """
+        with self._lock:
+            for key in removed:
+                self._remove(key)
+            for key, event in changed:
+                self._remove(key)
+                counts = {}
+                for term in event_terms(event):
+                    term_id = self._terms.setdefault(term, len(self._terms))
+                    counts[term_id] = counts.get(term_id, 0) + 1
+                document = len(self._keys)
+                self._keys.append(key)
+                self._documents[key] = document
+                self._new_lengths.append(sum(counts.values()))
+                self._new_postings.extend((document, term_id, count) for term_id, count in counts.items())
+
+    def remove_where(self, predicate):
+        """
+        Forgets every key for which predicate(key) is true, e.g. a calendar's events before a full sync.
+        """
+        with self._lock:
+            for key in [key for key in self._documents if predicate(key)]:
+                self._remove(key)
+
+    def _build(self):
+        """
+        Appends the new documents to the arrays, and drops dead ones once they outnumber the live ones.
+        """
+        if self._new_lengths:
+            added = np.array(self._new_postings, dtype=np.float64).reshape(-1, 3)
+            documents, terms, counts = self._postings
+            self._postings = (
+                np.concatenate([documents, added[:, 0].astype(np.int32)]),
+                np.concatenate([terms, added[:, 1].astype(np.int32)]),
+                np.concatenate([counts, added[:, 2].astype(np.float32)]),
+            )
+            new_alive = np.array([length is not None for length in self._new_lengths])
+            self._lengths = np.concatenate([self._lengths, np.array(
+                [length or 0 for length in self._new_lengths], dtype=np.float32)])
+            self._alive = np.concatenate([self._alive, new_alive])
+            self._new_postings = []
+            self._new_lengths = []
+        if self._dead > len(self._documents):
+            self._compact()
+
+    def _compact(self):
+        renumber = np.cumsum(self._alive) - 1
+        documents, terms, counts = self._postings
+        keep = self._alive[documents]
+        self._postings = (renumber[documents[keep]].astype(np.int32), terms[keep], counts[keep])
+        self._lengths = self._lengths[self._alive]
+        self._keys = [key for key, alive in zip(self._keys, self._alive) if alive]
+        self._documents = {key: document for document, key in enumerate(self._keys)}
+        self._alive = np.ones(len(self._keys), bool)
+        self._dead = 0
+
+    def search(self, query, limit=DEFAULT_LIMIT):
+        """
+        Returns up to `limit` (key, score) pairs of the events that best match `query`, best first.
+        """
+        with self._lock:
+            query_terms = [self._terms[term] for term in set(tokenize(query)) if term in self._terms]
+            if not query_terms or not self._documents:
+                return []
+            self._build()
+            documents, terms, counts = self._postings
+            alive = self._alive[documents]
+            live_count = int(self._alive.sum())
+            average_length = float(self._lengths[self._alive].mean()) or 1.0
+
+            matching = np.isin(terms, query_terms) & alive
+            hit_documents = documents[matching]
+            hit_terms = terms[matching]
+            frequency = counts[matching]
+            document_frequency = np.bincount(hit_terms, minlength=len(self._terms))
+            idf = np.log1p((live_count - document_frequency + 0.5) / (document_frequency + 0.5))
+            norm = self.k1 * (1 - self.b + self.b * self._lengths[hit_documents] / average_length)
+            weights = idf[hit_terms] * frequency * (self.k1 + 1) / (frequency + norm)
+            scores = np.bincount(hit_documents, weights=weights, minlength=len(self._keys))
+
+            hits = np.flatnonzero(scores > 0)
+            if len(hits) > limit:
+                hits = hits[np.argpartition(-scores[hits], limit - 1)[:limit]]
+            hits = hits[np.argsort(-scores[hits], kind="stable")]
+            return [(self._keys[document], float(scores[document])) for document in hits]
@@ -0,0 +1,275 @@
+import re
+from datetime import datetime, time, timedelta
+
+from dateutil import parser
+
+from parsing import parse_recurrence, parse_relative_date
+from tracing import span
+
+# Function GPT-4 is made to call; its arguments are the proposed events
+EVENTS_FUNCTION = {
+    "name": "propose_events",
+    "description": "Propose the calendar events described in the user's request.",
+    "parameters": {
+        "type": "object",
+        "properties": {
+            "events": {
+                "type": "array",
+                "items": {
+                    "type": "object",
+                    "properties": {
+                        "title": {"type": "string"},
+                        "start_date": {"type": "string", "description": "YYYY-MM-DD"},
+                        "end_date": {
+                            "type": "string",
+                            "description": "YYYY-MM-DD last day of a recurring series, derived from phrases like "
+                                           "'for 6 months' or 'until December 2025'; empty if none",
+                        },
+                        "start_time": {"type": "string", "description": "HH:MM, 24-hour; empty if no time is given"},
+                        "end_time": {"type": "string", "description": "HH:MM, 24-hour; empty if no time is given"},
+                        "summary": {"type": "string"},
+                        "location": {"type": "string"},
+                        "recurrence": {
+                            "type": "string",
+                            "description": "Empty for a one-off event, otherwise e.g. 'every Monday and Wednesday', "
+                                           "'every 2 weeks', 'every month'",
+                        },
+                    },
+                    "required": ["title", "start_date"],
+                },
+            },
+        },
+        "required": ["events"],
+    },
+}
+
+# Order of the fields in the 'Key: value' text shown for confirmation
+_TEXT_FIELDS = [
+    ("Title", "title"), ("Start Date", "start_date"), ("End Date", "end_date"), ("Start Time", "start_time"),
+    ("End Time", "end_time"), ("Summary", "summary"), ("Location", "location"), ("Recurring", "recurrence"),
+]
+_CLOCK = re.compile(r"^(\d{1,2})(?::(\d{2}))?(?::\d{2})?\s*([ap])?\.?\s*m?\.?$", re.IGNORECASE)
+_RELATIVE_DATE = re.compile(r"^(?:today|tomorrow|(?:this |next )?(?:mon|tues|wednes|thurs|fri|satur|sun)day)$",
+                            re.IGNORECASE)
+
+
+class EventRecord:
+    """
+    One proposed event, validated once when it arrives from GPT-4 or the local
+    parser and shared by every later step: confirmation text, labels and the
+    Calendar API body. A one-off event has an empty recurrence; an event
+    without times is all-day. `repairs` lists the fields that had to be fixed.
+    """
+
+    __slots__ = ("title", "start_date", "end_date", "start_time", "end_time",
+                 "summary", "location", "recurrence", "repairs")
+
+    def __init__(self, title, start_date, end_date=None, start_time=None, end_time=None,
+                 summary="", location="", recurrence="", repairs=()):
+        self.title = title
+        self.start_date = start_date
+        self.end_date = end_date
+        self.start_time = start_time
+        self.end_time = end_time
+        self.summary = summary
+        self.location = location
+        self.recurrence = recurrence
+        self.repairs = list(repairs)
+
+    @classmethod
+    def from_dict(cls, data, today=None):
+        """
+        Validates function call arguments (or the same fields under their
+        'Start Date' style names) into a record, repairing what it can.
+        Raises ValueError if the event has no usable start date.
+        """
+        with span("parse.validate", fields=len(data)) as parse_span:
+            record = validate_event(data, today)
+            parse_span.set(repairs=len(record.repairs))
+            return record
+
+    @property
+    def all_day(self):
+        return self.start_time is None
+
+    def start(self):
+        return datetime.combine(self.start_date, self.start_time or time())
+
+    def end(self):
+        if self.all_day:
+            return datetime.combine(self.start_date + timedelta(days=1), time())
+        end = datetime.combine(self.start_date, self.end_time)
+        # An end before the start runs past midnight
+        return end if end > self.start() else end + timedelta(days=1)
+
+    def to_dict(self):
+        return {
+            "title": self.title,
+            "start_date": self.start_date.isoformat(),
+            "end_date": self.end_date.isoformat() if self.end_date else "",
+            "start_time": self.start_time.strftime("%H:%M") if self.start_time else "",
+            "end_time": self.end_time.strftime("%H:%M") if self.end_time else "",
+            "summary": self.summary,
+            "location": self.location,
+            "recurrence": self.recurrence,
+        }
+
+    def to_text(self):
+        """
+        The event in the 'Key: value' layout shown for confirmation.
+        """
+        values = self.to_dict()
+        for key in ("start_time", "end_time"):
+            moment = getattr(self, key)
+            values[key] = moment.strftime("%I:%M %p").lstrip("0") if moment else ""
+        values["recurrence"] = f"Yes, {self.recurrence}" if self.recurrence else "No"
+        return "\n".join(["Event:"] + [f"{label}: {values[key]}" for label, key in _TEXT_FIELDS])
+
+    def label(self):
+        """
+        One-line description for the pending list.
+        """
+        when = self.start_date.isoformat()
+        if not self.all_day:
+            when += " " + self.start_time.strftime("%I:%M %p").lstrip("0")
+        return f"{self.title} - {when}"
+
+    def to_api_body(self, color_id=None):
+        """
+        The Google Calendar event body for this record.
+        """
+        if self.all_day:
+            start = {'date': self.start_date.isoformat()}
+            end = {'date': (self.start_date + timedelta(days=1)).isoformat()}
+        else:
+            user_time_zone = datetime.now().astimezone().tzname()
+            start = {'dateTime': self.start().isoformat(), 'timeZone': user_time_zone}
+            end = {'dateTime': self.end().isoformat(), 'timeZone': user_time_zone}
+        event = {
+            'summary': self.title,
+            'description': self.summary or "Not provided",
+            'start': start,
+            'end': end,
+            'location': self.location or "Not specified",
+        }
+        if self.recurrence:
+            recurrence_rules = parse_recurrence(self.recurrence, start_date=self.start_date, end_date=self.end_date)
+            if recurrence_rules:
+                event['recurrence'] = recurrence_rules
+        if color_id:
+            event['colorId'] = color_id
+        return event
+
+    def __repr__(self):
+        return f"EventRecord({self.to_dict()!r}, repairs={self.repairs!r})"
+
+
+def _field(data, name):
+    """
+    Looks a field up by its function argument name or its 'Start Date' style label.
+    """
+    for key, value in data.items():
+        if key.strip().lower().replace(" ", "_") == name:
+            return "" if value is None else str(value).strip()
+    return ""
+
+
+def _parse_date(value, today):
+    """
+    Reads a date, accepting the YYYY-MM-DD the model is asked for and the
+    looser forms it sometimes returns ('Oct 20', 'next Friday', '10/20/2026').
+    Returns (date, repaired) or (None, False).
+    """
+    if not value:
+        return None, False
+    try:
+        return datetime.strptime(value, "%Y-%m-%d").date(), False
+    except ValueError:
+        pass
+    if _RELATIVE_DATE.match(value):
+        if value.lower() == "today":
+            return today.date(), True
+        return datetime.strptime(parse_relative_date(value, today=today), "%Y-%m-%d").date(), True
+    try:
+        return parser.parse(value, default=today).date(), True
+    except (ValueError, OverflowError):
+        return None, False
+
+
+def _parse_time(value):
+    """
+    Reads '18:30', '6:30 PM' or '6pm'. Returns (time, repaired) or (None, False).
+    """
+    if not value:
+        return None, False
+    match = _CLOCK.match(value.strip())
+    if match:
+        hour, minute, meridiem = int(match.group(1)), int(match.group(2) or 0), (match.group(3) or "").lower()
+        if meridiem == "p" and hour < 12:
+            hour += 12
+        elif meridiem == "a" and hour == 12:
+            hour = 0
+        if hour < 24 and minute < 60:
+            return time(hour, minute), bool(meridiem) or match.group(2) is None
+    try:
+        return parser.parse(value).time(), True
+    except (ValueError, OverflowError):
+        return None, False
+
+
+def validate_event(data, today=None):
+    """
+    Turns one proposed event into an EventRecord. Fields that can be fixed
+    locally are repaired (and listed in `repairs`) rather than sent back to
+    the model: loose date and time formats, a missing title, a missing or
+    inverted end time, an end date before the start.
+    Raises ValueError if there is no usable start date.
+    """
+    today = today or datetime.now()
+    repairs = []
+
+    title = _field(data, "title")
+    if not title:
+        title = "Untitled Event"
+        repairs.append("title")
+
+    start_date, repaired = _parse_date(_field(data, "start_date"), today)
+    if start_date is None:
+        raise ValueError(f"Event '{title}' has no valid start date: {_field(data, 'start_date')!r}")
+    if repaired:
+        repairs.append("start_date")
+
+    end_date, repaired = _parse_date(_field(data, "end_date"), today)
+    if repaired or (_field(data, "end_date") and end_date is None):
+        repairs.append("end_date")
+    if end_date is not None and end_date < start_date:
+        end_date = None
+        repairs.append("end_date")
+
+    start_time, start_repaired = _parse_time(_field(data, "start_time"))
+    end_time, end_repaired = _parse_time(_field(data, "end_time"))
+    if start_repaired or (_field(data, "start_time") and start_time is None):
+        repairs.append("start_time")
+    if end_repaired or (_field(data, "end_time") and end_time is None):
+        repairs.append("end_time")
+    if start_time == time() and end_time == time():
+        # '12am to 12am' is how an event without a time used to be written
+        start_time = end_time = None
+        repairs += [key for key in ("start_time", "end_time") if key not in repairs]
+    if start_time is None and end_time is not None:
+        start_time = (datetime.combine(start_date, end_time) - timedelta(hours=1)).time()
+        repairs.append("start_time")
+    if start_time is not None and (end_time is None or end_time == start_time):
+        end_time = (datetime.combine(start_date, start_time) + timedelta(hours=1)).time()
+        repairs.append("end_time")
+
+    recurrence = _field(data, "recurrence") or _field(data, "recurring")
+    recurrence = re.sub(r"^yes\b[,:]?\s*", "", recurrence, flags=re.IGNORECASE)
+    if recurrence.lower() in ("no", "none", "false", "n/a"):
+        recurrence = ""
+
+    return EventRecord(
+        title, start_date, end_date, start_time, end_time,
+        summary=_field(data, "summary"), location=_field(data, "location"),
+        recurrence=recurrence, repairs=repairs,
+    )
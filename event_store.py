@@ -0,0 +1,374 @@
+import json
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta
+
+from googleapiclient.errors import HttpError
+
+import config
+from event_fetch import (
+    map_calendars, iter_event_pages, merge_event_streams, event_timestamp,
+    DEFAULT_MAX_WORKERS, DEFAULT_CALENDAR_TIMEOUT
+)
+from event_index import DEFAULT_LIMIT, EventIndex
+from recurrence import expand_event, parse_series
+from services import get_calendar_service, authorized_http
+from tracing import activate, current_span, traced
+
+# Skip re-syncing a calendar that was synced this recently (seconds)
+DEFAULT_MAX_SYNC_AGE = 30
+
+# How far ahead search() looks for the next occurrence of a matching series
+SERIES_LOOKAHEAD = timedelta(days=2 * 366)
+
+# Bumped when the layout of the mirror changes; older mirrors are dropped and resynced
+SCHEMA_VERSION = 3
+
+# Row kinds: single events, recurring masters (start_ts/end_ts span the whole
+# series, end_ts is NULL when it never ends), exceptions that replace one
+# occurrence of a master, and cancelled occurrences
+EVENT, MASTER, EXCEPTION, CANCELLED = "event", "master", "exception", "cancelled"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    calendar_id TEXT NOT NULL,
+    event_id TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    master_id TEXT,
+    original_ts REAL,
+    start_ts REAL,
+    end_ts REAL,
+    data TEXT NOT NULL,
+    PRIMARY KEY (calendar_id, event_id)
+);
+CREATE INDEX IF NOT EXISTS events_by_start ON events (calendar_id, kind, start_ts);
+CREATE INDEX IF NOT EXISTS events_by_master ON events (calendar_id, master_id);
+CREATE TABLE IF NOT EXISTS sync_state (
+    calendar_id TEXT PRIMARY KEY,
+    sync_token TEXT,
+    synced_at REAL,
+    revision INTEGER NOT NULL DEFAULT 0
+);
+"""
+
+
+class SyncTokenExpired(Exception):
+    """
+    Raised when the server answers 410 Gone and a full resync is required.
+    """
+
+
+def fetch_changes(calendar_id, sync_token=None, service=None, http=None):
+    """
+    Downloads a calendar's events: everything when no sync token is given,
+    otherwise only what changed since the token was issued. Recurring events
+    arrive once, as their master with its rules, plus any exceptions; their
+    occurrences are expanded locally.
+
+    Returns (items, next_sync_token).
+    """
+    items = []
+    next_sync_token = None
+    try:
+        for page in iter_event_pages(calendar_id, service=service, http=http,
+                                     syncToken=sync_token):
+            items.extend(page.get('items', []))
+            next_sync_token = page.get('nextSyncToken', next_sync_token)
+    except HttpError as e:
+        if sync_token and e.resp.status == 410:
+            raise SyncTokenExpired(calendar_id) from e
+        raise
+    return items, next_sync_token
+
+
+def _expand(master, time_min, time_max, skip):
+    """
+    Occurrences of a master in the window; a series whose rules cannot be
+    read is left out rather than failing the whole read.
+    """
+    try:
+        yield from expand_event(master, time_min, time_max, skip=skip)
+    except Exception as e:
+        print(f"Error expanding recurring event {master.get('id')}: {e}")
+
+
+class EventStore:
+    """
+    SQLite mirror of the user's events, one partition per calendar.
+    The first sync of a calendar downloads everything; later syncs apply only
+    the changes reported for the stored sync token. Recurring series are kept
+    as masters and expanded within the window being read.
+    """
+
+    def __init__(self, path=None, service_factory=get_calendar_service, http_factory=authorized_http):
+        self.path = path or config.cache_path("events.sqlite3")
+        self._service_factory = service_factory
+        self._http_factory = http_factory
+        self._lock = threading.RLock()
+        self._index = None
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        # WAL lets streaming readers on their own connections run alongside sync writes
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        if self._conn.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+            self._conn.executescript("DROP TABLE IF EXISTS events; DROP TABLE IF EXISTS sync_state;")
+            self._conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        self._conn.executescript(_SCHEMA)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def sync_state(self, calendar_id):
+        """
+        Returns (sync_token, synced_at) for a calendar, or (None, None).
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT sync_token, synced_at FROM sync_state WHERE calendar_id = ?", (calendar_id,)
+            ).fetchone()
+        return row if row else (None, None)
+
+    def revision(self, calendar_id):
+        """
+        A counter bumped by every sync that changed the calendar's mirror;
+        unlike the sync token, it stays put when nothing changed.
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT revision FROM sync_state WHERE calendar_id = ?", (calendar_id,)
+            ).fetchone()
+        return row[0] if row else 0
+
+    def _row(self, event):
+        """
+        The (kind, master_id, original_ts, start_ts, end_ts) columns for an event.
+        """
+        master_id = event.get('recurringEventId')
+        if master_id:
+            original_ts = event_timestamp(event.get('originalStartTime'))
+            if event.get('status') == 'cancelled':
+                return CANCELLED, master_id, original_ts, None, None
+            return (EXCEPTION, master_id, original_ts,
+                    event_timestamp(event.get('start')), event_timestamp(event.get('end')))
+        if event.get('recurrence'):
+            try:
+                last_end = parse_series(event).last_end()
+            except Exception as e:
+                print(f"Error reading recurrence of event {event.get('id')}: {e}")
+                last_end = None
+            return (MASTER, None, None, event_timestamp(event.get('start')),
+                    last_end.timestamp() if last_end else None)
+        return EVENT, None, None, event_timestamp(event.get('start')), event_timestamp(event.get('end'))
+
+    def _apply(self, calendar_id, items, sync_token, full):
+        changed, removed = [], []
+        with self._lock, self._conn:
+            if full:
+                self._conn.execute("DELETE FROM events WHERE calendar_id = ?", (calendar_id,))
+                if self._index is not None:
+                    self._index.remove_where(lambda key: key[0] == calendar_id)
+            for event in items:
+                key = (calendar_id, event['id'])
+                if event.get('status') == 'cancelled' and not event.get('recurringEventId'):
+                    # A deleted event or series; a series takes its exceptions with it
+                    if self._index is not None:
+                        removed.extend((calendar_id, event_id) for (event_id,) in self._conn.execute(
+                            "SELECT event_id FROM events WHERE calendar_id = ? AND (event_id = ? OR master_id = ?)",
+                            (calendar_id, event['id'], event['id'])
+                        ))
+                    self._conn.execute(
+                        "DELETE FROM events WHERE calendar_id = ? AND (event_id = ? OR master_id = ?)",
+                        (calendar_id, event['id'], event['id'])
+                    )
+                    continue
+                if event.get('status') == 'cancelled':
+                    removed.append(key)
+                else:
+                    changed.append((key, event))
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO events "
+                    "(calendar_id, event_id, kind, master_id, original_ts, start_ts, end_ts, data) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (calendar_id, event['id'], *self._row(event), json.dumps(event))
+                )
+            self._conn.execute(
+                "INSERT OR REPLACE INTO sync_state (calendar_id, sync_token, synced_at, revision) VALUES (?, ?, ?, ?)",
+                (calendar_id, sync_token, time.time(), self.revision(calendar_id) + bool(full or items))
+            )
+            if self._index is not None:
+                self._index.update(changed, removed)
+
+    def search_index(self):
+        """
+        The retrieval index over the mirror (see event_index.py), built from
+        its rows on first use and kept up to date by every sync after that.
+        """
+        with self._lock:
+            if self._index is None:
+                index = EventIndex()
+                index.update(((calendar_id, event_id), json.loads(data)) for calendar_id, event_id, data in
+                             self._conn.execute("SELECT calendar_id, event_id, data FROM events WHERE kind != ?",
+                                                (CANCELLED,)))
+                self._index = index
+            return self._index
+
+    def search(self, query, calendar_ids=None, limit=DEFAULT_LIMIT, now=None):
+        """
+        The mirrored events whose title, description or location best match
+        `query`, best first. A recurring series stands as its next occurrence
+        after `now`, or as its master once it has none left.
+        """
+        now = now or datetime.now()
+        hits = self.search_index().search(query, limit if calendar_ids is None else 4 * limit)
+        if calendar_ids is not None:
+            wanted = set(calendar_ids)
+            hits = [hit for hit in hits if hit[0][0] in wanted]
+        events = []
+        with self._lock:
+            for (calendar_id, event_id), _ in hits[:limit]:
+                row = self._conn.execute(
+                    "SELECT kind, data FROM events WHERE calendar_id = ? AND event_id = ?", (calendar_id, event_id)
+                ).fetchone()
+                if row is None:
+                    continue
+                kind, data = row
+                event = json.loads(data)
+                if kind == MASTER:
+                    skip = {original_ts for (original_ts,) in self._conn.execute(
+                        "SELECT original_ts FROM events WHERE calendar_id = ? AND master_id = ?",
+                        (calendar_id, event_id)
+                    )}
+                    event = next(_expand(event, now, now + SERIES_LOOKAHEAD, skip), event)
+                events.append(event)
+        return events
+
+    @traced("calendar.sync")
+    def sync(self, calendar_ids, max_age=DEFAULT_MAX_SYNC_AGE, http_factory=None,
+             max_workers=DEFAULT_MAX_WORKERS, timeout=DEFAULT_CALENDAR_TIMEOUT):
+        """
+        Brings the mirror of each calendar up to date. Network calls run
+        concurrently; the results are written to SQLite on the calling thread.
+
+        Returns the failures keyed by calendar ID.
+        """
+        now = time.time()
+        tokens = {}
+        for calendar_id in calendar_ids:
+            sync_token, synced_at = self.sync_state(calendar_id)
+            if synced_at is None or now - synced_at > max_age:
+                tokens[calendar_id] = sync_token
+        sync_span = current_span().set(calendars=len(calendar_ids), stale=len(tokens))
+        if not tokens:
+            return {}
+
+        calendar_service = self._service_factory()
+
+        def download(calendar_id, http):
+            sync_token = tokens[calendar_id]
+            if sync_token:
+                try:
+                    items, next_token = fetch_changes(calendar_id, sync_token, service=calendar_service, http=http)
+                    return items, next_token, False
+                except SyncTokenExpired:
+                    print(f"Sync token expired for calendar {calendar_id}, running full sync")
+            items, next_token = fetch_changes(calendar_id, service=calendar_service, http=http)
+            return items, next_token, True
+
+        def download_in_span(calendar_id, http):
+            # Requests made on the pool's threads belong to the sync span
+            with activate(sync_span):
+                return download(calendar_id, http)
+
+        results, failures = map_calendars(download_in_span, tokens,
+                                          http_factory=http_factory or self._http_factory,
+                                          max_workers=max_workers, timeout=timeout)
+        for calendar_id, (items, next_token, full) in results.items():
+            self._apply(calendar_id, items, next_token, full)
+        sync_span.set(changes=sum(len(items) for items, _, _ in results.values()), failed=len(failures))
+        return failures
+
+    def iter_events(self, calendar_id, time_min=None, time_max=None):
+        """
+        Lazily yields one calendar's mirrored events that end after `time_min`
+        and start before `time_max` (datetimes; either may be None), ordered by
+        start. Rows are read through a private connection, a batch at a time;
+        recurring series are expanded into their occurrences in the window.
+        """
+        window = ""
+        params = []
+        if time_min is not None:
+            window += " AND (end_ts IS NULL OR end_ts > ?)"
+            params.append(time_min.timestamp())
+        if time_max is not None:
+            window += " AND start_ts < ?"
+            params.append(time_max.timestamp())
+        conn = sqlite3.connect(self.path)
+        try:
+            masters = [json.loads(data) for (data,) in conn.execute(
+                f"SELECT data FROM events WHERE calendar_id = ? AND kind = ?{window}",
+                [calendar_id, MASTER] + params
+            )]
+            skip = {}
+            for master_id, original_ts in conn.execute(
+                "SELECT master_id, original_ts FROM events WHERE calendar_id = ? AND kind IN (?, ?)",
+                (calendar_id, EXCEPTION, CANCELLED)
+            ):
+                skip.setdefault(master_id, set()).add(original_ts)
+
+            def singles():
+                for (data,) in conn.execute(
+                    f"SELECT data FROM events WHERE calendar_id = ? AND kind IN (?, ?){window} ORDER BY start_ts",
+                    [calendar_id, EVENT, EXCEPTION] + params
+                ):
+                    yield json.loads(data)
+
+            streams = [singles()] + [
+                _expand(master, time_min, time_max, skip.get(master['id'], ())) for master in masters
+            ]
+            yield from merge_event_streams(streams)
+        finally:
+            conn.close()
+
+    def events_starting_at(self, calendar_id, timestamps):
+        """
+        The mirrored events, series masters and changed occurrences of a
+        calendar whose start is one of `timestamps` (epoch seconds).
+        """
+        timestamps = list(timestamps)
+        events = []
+        with self._lock:
+            # SQLite limits the parameters of one statement
+            for offset in range(0, len(timestamps), 500):
+                part = timestamps[offset:offset + 500]
+                events.extend(json.loads(data) for (data,) in self._conn.execute(
+                    f"SELECT data FROM events WHERE calendar_id = ? AND kind IN (?, ?, ?) "
+                    f"AND start_ts IN ({', '.join('?' * len(part))})",
+                    [calendar_id, EVENT, MASTER, EXCEPTION] + part
+                ))
+        return events
+
+    def events_between(self, calendar_ids, time_min=None, time_max=None):
+        """
+        Lazily yields the mirrored events of several calendars in start order,
+        merging the per-calendar streams.
+        """
+        return merge_event_streams(
+            self.iter_events(calendar_id, time_min, time_max) for calendar_id in calendar_ids
+        )
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_event_store():
+    """
+    Returns the event mirror shared by every reader in the app.
+    """
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = EventStore()
+    return _store
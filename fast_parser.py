@@ -0,0 +1,368 @@
+import re
+import calendar
+from datetime import datetime, timedelta
+
+from event_schema import EventRecord
+from parsing import parse_relative_date
+from tracing import span
+
+# Inputs parsed at or above this confidence skip GPT-4
+FAST_PATH_THRESHOLD = 0.8
+
+_WEEKDAYS = [day.lower() for day in calendar.day_name]
+_WEEKDAY = r"(?:mon|tues|wednes|thurs|fri|satur|sun)day"
+_MONTHS = {name.lower(): index for index, name in enumerate(calendar.month_name) if name}
+_MONTHS.update({name.lower(): index for index, name in enumerate(calendar.month_abbr) if name})
+_MONTHS["sept"] = 9
+_MONTH = r"(?:" + "|".join(sorted(_MONTHS, key=len, reverse=True)) + r")\.?"
+_CLOCK = r"\d{1,2}(?::\d{2})?\s*(?:am|pm|a\.m\.|p\.m\.)?"
+
+_FILLER = re.compile(
+    r"^(?:please\s+)?(?:(?:schedule|add|create|book(?!\s+(?:club|fair|signing|launch|reading)\b)|put|set up|plan|remind me to|remind me about)\s+)?(?:an?\s+)?",
+    re.IGNORECASE,
+)
+_TRAILING_WORDS = re.compile(r"(?:\s+\b(?:on|at|from|in|for|by|the|a|an|and)\b)+$", re.IGNORECASE)
+# Leftovers that suggest several events or details the rules do not understand
+_MULTI_EVENT_HINT = re.compile(r"\b(?:and then|then|also|after that)\b|[;\n]", re.IGNORECASE)
+# Requests that edit existing events or leave the time open need GPT-4's judgement
+_VAGUE_HINT = re.compile(
+    r"\b(?:move|reschedule|cancel|delete|whenever|sometime|whichever|free|or|before|after|around|ish)\b",
+    re.IGNORECASE,
+)
+
+
+class FastParse:
+    """
+    Result of the rule-based parser: the event fields in the same 'Key: value'
+    layout GPT-4 is asked for, and how sure the rules are about them.
+    """
+
+    FIELDS = ["Title", "Start Date", "End Date", "Start Time", "End Time", "Summary", "Location", "Recurring"]
+
+    def __init__(self, fields, confidence, reasons):
+        self.fields = fields
+        self.confidence = confidence
+        self.reasons = reasons
+
+    @property
+    def is_confident(self):
+        return self.confidence >= FAST_PATH_THRESHOLD
+
+    def to_record(self, today=None):
+        return EventRecord.from_dict(self.fields, today)
+
+    def __repr__(self):
+        return f"FastParse({self.fields!r}, confidence={self.confidence:.2f}, reasons={self.reasons!r})"
+
+
+def _take(pattern, text):
+    """
+    Finds the first match of `pattern` and returns (match, text without it).
+    """
+    match = re.search(pattern, text, re.IGNORECASE)
+    if not match:
+        return None, text
+    return match, (text[:match.start()] + " " + text[match.end():])
+
+
+def _parse_clock(value, default_meridiem=None):
+    """
+    Parses '6', '6pm', '6:30 p.m.' or '18:00'. Returns (hour, minute, explicit)
+    where explicit is False when am/pm had to be guessed.
+    """
+    value = value.lower().replace(".", "").replace(" ", "")
+    meridiem = None
+    if value.endswith(("am", "pm")):
+        meridiem, value = value[-2:], value[:-2]
+    hour, _, minute = value.partition(":")
+    hour, minute = int(hour), int(minute or 0)
+    if hour > 23 or minute > 59 or (meridiem and hour > 12):
+        raise ValueError(value)
+    explicit = meridiem is not None or hour > 12 or hour == 0
+    if not explicit:
+        # Bare hours like 'at 6': 1-7 and 12 are almost always afternoon or evening
+        meridiem = default_meridiem or ("pm" if 1 <= hour <= 7 or hour == 12 else "am")
+    if meridiem == "pm" and hour < 12:
+        hour += 12
+    elif meridiem == "am" and hour == 12:
+        hour = 0
+    return hour, minute, explicit
+
+
+def _format_clock(hour, minute):
+    return datetime(2000, 1, 1, hour, minute).strftime("%I:%M %p").lstrip("0")
+
+
+def _absolute_date(month, day, year, today):
+    """
+    Builds a date from parts; without a year the next such date is used.
+    """
+    if year:
+        year = int(year)
+        return datetime(year + 2000 if year < 100 else year, month, int(day))
+    candidate = datetime(today.year, month, int(day))
+    if candidate < today:
+        candidate = candidate.replace(year=today.year + 1)
+    return candidate
+
+
+def fast_parse(text, now=None):
+    """
+    Parses a single event description such as 'Gym every Monday 6pm' or
+    'Lunch with Sam at Chipotle tomorrow 12:30-1:30pm' without GPT-4.
+    Covers titles, relative and absolute dates, times and ranges, durations,
+    locations and the recurrence phrases parse_recurrence understands.
+    Input the rules misread, like 'Feb 30' or '25:00', gets confidence 0.
+    """
+    try:
+        return _parse_line(text, now)
+    except ValueError as e:
+        return FastParse({}, 0.0, [f"could not read date or time: {e}"])
+
+
+def _parse_line(text, now):
+    now = now or datetime.now()
+    today = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    rest = " " + text.strip() + " "
+    fields = {}
+    reasons = []
+    confidence = 1.0
+
+    # Recurrence
+    recurring = None
+    match, rest = _take(rf"\bevery\s+({_WEEKDAY}s?(?:\s*(?:,|and|&)\s*{_WEEKDAY}s?)*)", rest)
+    if match:
+        days = re.findall(_WEEKDAY, match.group(1), re.IGNORECASE)
+        recurring = "every " + " and ".join(day.capitalize() for day in days)
+    if not recurring:
+        match, rest = _take(rf"\bon\s+({_WEEKDAY}s(?:\s*(?:,|and|&)\s*{_WEEKDAY}s)*)", rest)
+        if match:
+            days = re.findall(_WEEKDAY, match.group(1), re.IGNORECASE)
+            recurring = "every " + " and ".join(day.capitalize() for day in days)
+    if not recurring:
+        match, rest = _take(r"\bevery\s+weekday\b|\bweekdays\b", rest)
+        if match:
+            recurring = "every Monday, Tuesday, Wednesday, Thursday and Friday"
+    if not recurring:
+        match, rest = _take(r"\bevery\s+(other\s+|\d+\s+)?(day|week|month|year)s?\b", rest)
+        if match:
+            count = match.group(1) or ""
+            count = "2 " if count.strip() == "other" else count
+            recurring = f"every {count}{match.group(2).lower()}s" if count else f"every {match.group(2).lower()}"
+    if not recurring:
+        match, rest = _take(r"\b(daily|weekly|monthly|yearly|annually)\b", rest)
+        if match:
+            unit = {"daily": "day", "weekly": "week", "monthly": "month"}.get(match.group(1).lower(), "year")
+            recurring = f"every {unit}"
+
+    # Explicit end of a series: 'for 6 months', 'until December 2025'
+    series_length = None
+    if recurring:
+        match, rest = _take(r"\bfor\s+(?:the\s+next\s+)?(\d+)\s+(weeks?|months?|years?)\b", rest)
+        if match:
+            series_length = (int(match.group(1)), match.group(2).lower().rstrip("s"))
+    until = None
+    match, rest = _take(rf"\buntil\s+({_MONTH}\s+\d{{4}}\b|{_MONTH}\s+\d{{1,2}}(?:st|nd|rd|th)?(?:,?\s*\d{{4}})?|\d{{4}}-\d{{2}}-\d{{2}})", rest)
+    if match:
+        until = match.group(1)
+
+    # ISO dates go first so '2026-11-01' is not read as a time range
+    start_date = None
+    match, rest = _take(r"\b(?:on\s+)?(\d{4})-(\d{2})-(\d{2})\b", rest)
+    if match:
+        start_date = datetime(int(match.group(1)), int(match.group(2)), int(match.group(3)))
+
+    # Time range, single time and duration
+    start_clock = end_clock = None
+    match, rest = _take(rf"\b(?:from\s+)?({_CLOCK})\s*(?:-|–|to|until|till)\s*({_CLOCK})(?=\W)", rest)
+    if match:
+        start_text, end_text = match.group(1), match.group(2)
+        end_clock = _parse_clock(end_text)
+        if re.search(r"[ap]\.?m", start_text, re.IGNORECASE):
+            start_clock = _parse_clock(start_text)
+        else:
+            # '2-3pm' shares the end's am/pm; '11-1pm' starts in the morning
+            start_clock = _parse_clock(start_text, default_meridiem="pm" if end_clock[0] >= 12 else "am")
+            if start_clock[:2] > end_clock[:2] and start_clock[0] >= 12:
+                start_clock = (start_clock[0] - 12, start_clock[1], start_clock[2])
+            start_clock = (start_clock[0], start_clock[1], start_clock[2] or end_clock[2])
+    else:
+        match, rest = _take(r"\b(?:at\s+)?(noon|midnight)\b", rest)
+        if match:
+            start_clock = (12, 0, True) if match.group(1).lower() == "noon" else (0, 0, True)
+        else:
+            match, rest = _take(r"\b(?:at\s+)?(\d{1,2}(?::\d{2})?\s*(?:am|pm|a\.m\.|p\.m\.))(?=\W)", rest)
+            if not match:
+                match, rest = _take(r"\bat\s+(\d{1,2}(?::\d{2})?)(?=\W)", rest)
+            if match:
+                start_clock = _parse_clock(match.group(1))
+    duration = None
+    match, rest = _take(r"\bfor\s+(\d+(?:\.\d+)?|an?|half an)\s*(hours?|hrs?|h|minutes?|mins?)\b", rest)
+    if match:
+        amount = {"a": 1, "an": 1, "half an": 0.5}.get(match.group(1).lower())
+        amount = amount if amount is not None else float(match.group(1))
+        duration = timedelta(hours=amount) if match.group(2).lower().startswith("h") else timedelta(minutes=amount)
+
+    # Date
+    if not start_date:
+        match, rest = _take(rf"\b(?:on\s+)?(?:{_WEEKDAY},?\s+)?({_MONTH})\s+(\d{{1,2}})(?:st|nd|rd|th)?(?:,?\s*(\d{{4}}))?\b", rest)
+        if match:
+            month = _MONTHS[match.group(1).lower().rstrip(".")]
+            start_date = _absolute_date(month, match.group(2), match.group(3), today)
+    if not start_date:
+        match, rest = _take(rf"\b(?:on\s+)?(?:the\s+)?(\d{{1,2}})(?:st|nd|rd|th)?\s+of\s+({_MONTH})(?:,?\s*(\d{{4}}))?\b", rest)
+        if match:
+            month = _MONTHS[match.group(2).lower().rstrip(".")]
+            start_date = _absolute_date(month, match.group(1), match.group(3), today)
+    if not start_date:
+        match, rest = _take(r"\b(?:on\s+)?(\d{1,2})/(\d{1,2})(?:/(\d{2,4}))?\b", rest)
+        if match:
+            start_date = _absolute_date(int(match.group(1)), match.group(2), match.group(3), today)
+    if not start_date:
+        match, rest = _take(r"\b(?:the\s+)?day\s+after\s+tomorrow\b", rest)
+        if match:
+            start_date = today + timedelta(days=2)
+    if not start_date:
+        match, rest = _take(r"\b(today|tonight|tomorrow)\b", rest)
+        if match:
+            word = match.group(1).lower()
+            start_date = today + timedelta(days=1) if word == "tomorrow" else today
+            if word == "tonight" and start_clock is None:
+                reasons.append("'tonight' without a time")
+                confidence -= 0.3
+    if not start_date:
+        match, rest = _take(r"\bin\s+(\d+)\s+(days?|weeks?)\b", rest)
+        if match:
+            days = int(match.group(1)) * (7 if match.group(2).lower().startswith("week") else 1)
+            start_date = today + timedelta(days=days)
+    if not start_date:
+        match, rest = _take(rf"\b(?:on\s+)?((?:this|next)\s+{_WEEKDAY}|{_WEEKDAY})\b", rest)
+        if match:
+            start_date = datetime.strptime(parse_relative_date(match.group(1), today=now), "%Y-%m-%d")
+    if not start_date and recurring:
+        days = re.findall(_WEEKDAY, recurring, re.IGNORECASE)
+        if days:
+            # Series start on the next matching weekday (today counts)
+            offsets = [(_WEEKDAYS.index(day.lower()) - today.weekday()) % 7 for day in days]
+            start_date = today + timedelta(days=min(offsets))
+        else:
+            start_date = today
+    if not start_date:
+        start_date = today
+        reasons.append("no date, assumed today")
+        confidence -= 0.15
+
+    # Location: 'at the gym', '@ Starbucks', 'in room 201'
+    location = ""
+    match, rest = _take(r"(?:\s@\s*|\bat\s+)(?!\d)((?:the\s+)?[\w'&.-]+(?:\s+(?!on\b|from\b|for\b|every\b)[A-Z0-9][\w'&.-]*)*)", rest)
+    if match:
+        location = match.group(1).strip()
+    else:
+        match, rest = _take(r"\bin\s+((?:room|building|conference room|office)\s+[\w-]+)", rest)
+        if match:
+            location = match.group(1).strip()
+
+    # Title: whatever is left
+    title = _FILLER.sub("", re.sub(r"\s+", " ", rest).strip())
+    title = _TRAILING_WORDS.sub("", title).strip(" ,.-")
+    if not title and location:
+        title = re.sub(r"^the\s+", "", location, flags=re.IGNORECASE)
+    if not title:
+        return FastParse({}, 0.0, ["no title"])
+    title = title[0].upper() + title[1:]
+
+    if start_clock is None:
+        reasons.append("no time given")
+        confidence -= 0.5
+        start_clock = (0, 0, True)
+    elif not start_clock[2]:
+        reasons.append("am/pm guessed")
+        confidence -= 0.25
+    if re.search(r"\d", title):
+        reasons.append("unparsed numbers in title")
+        confidence -= 0.35
+    if _VAGUE_HINT.search(title):
+        reasons.append("vague or edits an existing event")
+        confidence -= 0.5
+    if _MULTI_EVENT_HINT.search(title) or len(title.split()) > 8:
+        reasons.append("title looks like more than one event")
+        confidence -= 0.4
+
+    start = start_date.replace(hour=start_clock[0], minute=start_clock[1])
+    if end_clock is not None:
+        end = start_date.replace(hour=end_clock[0], minute=end_clock[1])
+        if end <= start:
+            end += timedelta(days=1)
+    else:
+        end = start + (duration or timedelta(hours=1))
+    if end - start >= timedelta(days=1):
+        # The fields hold only the end's clock time, so whole days would be lost
+        reasons.append("lasts a day or more")
+        confidence -= 0.5
+
+    end_date = ""
+    if until:
+        try:
+            month_year = re.fullmatch(rf"({_MONTH})\s+(\d{{4}})", until, re.IGNORECASE)
+            if month_year:
+                month = _MONTHS[month_year.group(1).lower().rstrip(".")]
+                last_day = calendar.monthrange(int(month_year.group(2)), month)[1]
+                end_date = f"{month_year.group(2)}-{month:02d}-{last_day:02d}"
+            else:
+                end_date = fast_parse_date(until, today).strftime("%Y-%m-%d")
+        except ValueError:
+            reasons.append("could not read end date")
+            confidence -= 0.4
+    elif series_length:
+        num, unit = series_length
+        days = {"week": 7 * num, "month": 30 * num, "year": 365 * num}[unit]
+        end_date = (start_date + timedelta(days=days)).strftime("%Y-%m-%d")
+
+    fields = {
+        "Title": title,
+        "Start Date": start_date.strftime("%Y-%m-%d"),
+        "End Date": end_date,
+        "Start Time": _format_clock(start.hour, start.minute),
+        "End Time": _format_clock(end.hour, end.minute),
+        "Summary": "",
+        "Location": location,
+        "Recurring": f"Yes, {recurring}" if recurring else "No",
+    }
+    return FastParse(fields, max(0.0, round(confidence, 2)), reasons)
+
+
+def fast_parse_date(text, today):
+    """
+    Parses an absolute date like 'Dec 5', 'December 5th, 2026' or '2026-12-05'.
+    """
+    match = re.fullmatch(r"(\d{4})-(\d{2})-(\d{2})", text.strip())
+    if match:
+        return datetime(int(match.group(1)), int(match.group(2)), int(match.group(3)))
+    match = re.fullmatch(rf"({_MONTH})\s+(\d{{1,2}})(?:st|nd|rd|th)?(?:,?\s*(\d{{4}}))?", text.strip(), re.IGNORECASE)
+    if not match:
+        raise ValueError(text)
+    return _absolute_date(_MONTHS[match.group(1).lower().rstrip(".")], match.group(2), match.group(3), today)
+
+
+def fast_parse_events(text, now=None):
+    """
+    Parses input with one event per line. Returns the EventRecords if every
+    line is parsed confidently, otherwise None so the caller falls back to GPT-4.
+    """
+    lines = [line.strip() for line in text.splitlines() if line.strip()]
+    if not lines:
+        return None
+    with span("parse.fast", input_chars=len(text), lines=len(lines)) as parse_span:
+        records = []
+        for line in lines:
+            result = fast_parse(line, now)
+            if not result.is_confident:
+                parse_span.set(confident=False, confidence=round(result.confidence, 2))
+                return None
+            try:
+                records.append(result.to_record(now))
+            except ValueError as e:
+                parse_span.set(confident=False, error=str(e))
+                return None
+        parse_span.set(confident=True, events=len(records))
+        return records
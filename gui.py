@@ -0,0 +1,585 @@
+import sys
+from PyQt5.QtWidgets import (
+   QApplication, QMainWindow, QLabel, QPushButton,
+   QTextEdit, QVBoxLayout, QWidget, QHBoxLayout, QSplitter, QComboBox, QProgressBar,
+   QListWidget, QListWidgetItem, QAbstractItemView, QTabBar, QTabWidget, QFileDialog
+)
+from PyQt5.QtCore import QObject, Qt, QTimer, QUrl, pyqtSignal
+from PyQt5.QtGui import QTextCursor
+from assistant import ChatSession, calendar_events, queue_suggested_events, suggest_events
+from calendar_view import CalendarView
+from calendar_registry import get_calendar_registry
+from event_schema import EventRecord
+from importer import describe, import_file
+from journal import get_journal
+from workers import TaskRunner
+from services import get_credentials, resolve_assistant_calendar_async
+from trace_panel import TracePanel
+from tracing import configure as configure_tracing
+
+# Seconds between background refreshes of the calendar view
+VIEW_REFRESH_INTERVAL = 60
+
+
+class JournalSignals(QObject):
+    """
+    Hands the journal flusher's rounds (done, failed, pending) to the GUI thread.
+    """
+    flushed = pyqtSignal(object, object, int)
+
+
+class CalendarApp(QMainWindow):
+    def __init__(self):
+        super().__init__()
+        self.setWindowTitle("AI Calendar Assistant")
+        self.setGeometry(100, 100, 1200, 700)
+
+        # Main layout setup
+        main_layout = QVBoxLayout()
+
+        # Horizontal splitter for dynamic resizing
+        splitter = QSplitter(Qt.Horizontal)
+
+        # Left panel setup
+        left_layout = QVBoxLayout()
+        left_layout.setContentsMargins(15, 15, 15, 15)
+        left_layout.setSpacing(10)
+
+        # Text input box
+        self.text_input = QTextEdit()
+        self.text_input.setPlaceholderText("Enter event details...")
+
+        # Color selector
+        self.color_selector = QComboBox()
+        self.color_selector.addItems([
+            "Default", "Lavender", "Sage", "Grape", "Flamingo",
+            "Banana", "Tangerine", "Peacock", "Graphite", "Blueberry", "Basil", "Tomato"
+        ])
+        self.color_selector.setToolTip("Select Event Color")
+
+        # Calendar selector dropdown
+        self.calendar_selector = QComboBox()
+        self.calendar_selector.setToolTip("Select Calendar")
+        self.calendar_selector.addItem("Calendar Assistant Calendar")
+
+        # Process button
+        self.process_button = QPushButton("Create Event")
+        self.process_button.clicked.connect(self.process_input)
+        self.process_button.setStyleSheet("""
+            QPushButton {
+                border-radius: 8px;
+                background-color: #007BFF;
+                color: white;
+                padding: 8px 15px;
+            }
+            QPushButton:hover {
+                background-color: #0056b3;
+            }
+        """)
+
+        # Existing schedules are imported from .ics or .csv files without GPT-4
+        self.import_button = QPushButton("Import File...")
+        self.import_button.clicked.connect(self.import_schedule)
+
+        # Result label
+        self.result_label = QLabel("")
+
+        # Suggested events awaiting confirmation; several can be selected at once
+        self.pending_list = QListWidget()
+        self.pending_list.setSelectionMode(QAbstractItemView.ExtendedSelection)
+        self.pending_list.currentItemChanged.connect(lambda current, previous: self.show_next_event())
+        self.pending_list.hide()
+
+        # Confirm and Reject buttons
+        self.confirm_button = QPushButton("Confirm")
+        self.confirm_button.setStyleSheet("""
+            QPushButton {
+                border-radius: 8px;
+                background-color: #4CAF50;
+                color: white;
+                padding: 8px 15px;
+            }
+            QPushButton:hover {
+                background-color: #0A6A47;
+            }
+        """)
+        self.confirm_button.clicked.connect(self.confirm_event)
+        self.confirm_button.hide()
+
+        self.reject_button = QPushButton("Reject")
+        self.reject_button.setStyleSheet("""
+            QPushButton {
+                border-radius: 8px;
+                background-color: #f44336;
+                color: white;
+                padding: 8px 15px;
+            }
+            QPushButton:hover {
+                background-color: #950606;
+            }
+        """)
+        self.reject_button.clicked.connect(self.reject_event)
+        self.reject_button.hide()
+
+        self.confirm_all_button = QPushButton("Confirm All")
+        self.confirm_all_button.setStyleSheet("""
+            QPushButton {
+                border-radius: 8px;
+                background-color: #4CAF50;
+                color: white;
+                padding: 8px 15px;
+            }
+            QPushButton:hover {
+                background-color: #0A6A47;
+            }
+        """)
+        self.confirm_all_button.clicked.connect(self.confirm_all_events)
+        self.confirm_all_button.hide()
+
+        # Dropdown layout
+        dropdown_layout = QHBoxLayout()
+        dropdown_layout.addWidget(self.calendar_selector)
+        dropdown_layout.addWidget(self.color_selector)
+
+        # Add widgets to left layout
+        left_layout.addWidget(self.text_input)
+        left_layout.addLayout(dropdown_layout)  # Add dropdowns first
+        process_layout = QHBoxLayout()
+        process_layout.addWidget(self.process_button, 1)  # Create Event button below dropdowns
+        process_layout.addWidget(self.import_button)
+        left_layout.addLayout(process_layout)
+        left_layout.addWidget(self.result_label)
+        left_layout.addWidget(self.pending_list)
+        confirm_layout = QHBoxLayout()
+        confirm_layout.addWidget(self.confirm_button)
+        confirm_layout.addWidget(self.reject_button)
+        confirm_layout.addWidget(self.confirm_all_button)
+        left_layout.addLayout(confirm_layout)
+
+        # AI Chat Input/Output
+        self.chat_input = QTextEdit()
+        self.chat_input.setPlaceholderText("Ask something like 'When do I have time to grocery shop?'")
+        self.chat_button = QPushButton("Chat with Calendar")
+        self.chat_button.setStyleSheet("""
+            QPushButton {
+                border-radius: 8px;
+                background-color: #007BFF;
+                color: white;
+                padding: 8px 15px;
+            }
+            QPushButton:hover {
+                background-color: #0056b3;
+            }
+        """)
+        self.chat_button.clicked.connect(self.chat_with_calendar)
+        # Follow-up questions continue the conversation until a new chat is started
+        self.chat_session = ChatSession()
+        self.new_chat_button = QPushButton("New Chat")
+        self.new_chat_button.clicked.connect(self.new_chat)
+        self.chat_output = QTextEdit()
+        self.chat_output.setReadOnly(True)
+        chat_buttons = QHBoxLayout()
+        chat_buttons.addWidget(self.chat_button, 1)
+        chat_buttons.addWidget(self.new_chat_button)
+        left_layout.addWidget(self.chat_input)
+        left_layout.addLayout(chat_buttons)
+        left_layout.addWidget(self.chat_output)
+
+        # Background task status: busy indicator, progress message and cancel button
+        self.tasks = TaskRunner(parent=self)
+        self.progress_bar = QProgressBar()
+        self.progress_bar.setRange(0, 0)  # Indeterminate
+        self.progress_bar.setTextVisible(False)
+        self.progress_bar.setMaximumHeight(6)
+        self.status_label = QLabel("")
+        self.cancel_button = QPushButton("Cancel")
+        self.cancel_button.clicked.connect(self.cancel_tasks)
+        # Confirmed events the journal has not created yet
+        self.journal_label = QLabel("")
+        status_layout = QHBoxLayout()
+        status_layout.addWidget(self.status_label, 1)
+        status_layout.addWidget(self.journal_label)
+        status_layout.addWidget(self.cancel_button)
+        left_layout.addWidget(self.progress_bar)
+        left_layout.addLayout(status_layout)
+        self.progress_bar.hide()
+        self.cancel_button.hide()
+
+        # Left panel container
+        left_panel = QWidget()
+        left_panel.setLayout(left_layout)
+
+        # Right panel setup: native view of the synced events; the Google Calendar
+        # web page (a Chromium process) is only created when asked for
+        self.calendar_view = CalendarView()
+        self.calendar_view.range_changed.connect(lambda start, end: self.refresh_calendar_view())
+        self.calendar_view.web_requested.connect(self.open_web_calendar)
+        self.web_view = None
+        self.view_tabs = QTabWidget()
+        self.view_tabs.setTabsClosable(True)
+        self.view_tabs.tabCloseRequested.connect(self.close_view_tab)
+        self.view_tabs.addTab(self.calendar_view, "Calendar")
+        # Recent latencies of LLM calls, API calls and parse steps
+        self.trace_panel = TracePanel()
+        self.view_tabs.addTab(self.trace_panel, "Performance")
+        for index in range(self.view_tabs.count()):
+            for side in (QTabBar.LeftSide, QTabBar.RightSide):
+                self.view_tabs.tabBar().setTabButton(index, side, None)
+        self.view_reload = None
+        self.view_timer = QTimer(self)
+        self.view_timer.timeout.connect(self.refresh_calendar_view)
+        self.view_timer.start(VIEW_REFRESH_INTERVAL * 1000)
+
+        # Splitter configuration
+        splitter.addWidget(left_panel)
+        splitter.addWidget(self.view_tabs)
+        splitter.setStretchFactor(0, 1)
+        splitter.setStretchFactor(1, 2)
+        splitter.setSizes([400, 800])
+
+        # Add splitter to main layout
+        main_layout.addWidget(splitter)
+
+        # Central widget setup
+        container = QWidget()
+        container.setLayout(main_layout)
+        self.setCentralWidget(container)
+
+        # Confirmed events are created by the journal's flusher, including any
+        # left over from the last session
+        self.journal = get_journal()
+        self.journal_signals = JournalSignals(self)
+        self.journal_signals.flushed.connect(self.journal_flushed)
+        self.journal.add_listener(self.journal_signals.flushed.emit)
+        self.show_journal_pending(len(self.journal.pending()))
+        self.journal.start()
+
+        # Fill the calendar dropdown without blocking the window
+        self.run_task(
+            "load_calendars", lambda task: get_calendar_registry().display_names(),
+            on_result=self.add_calendars,
+            on_error=lambda e: print(f"Error loading calendars: {e}"),
+            status="Loading calendars...",
+        )
+        self.refresh_calendar_view()
+
+    def refresh_calendar_view(self, max_age=None):
+        """
+        Loads the events of the range the calendar view shows, syncing the
+        mirror first (only changes are downloaded). Pass max_age=0 after
+        creating events so they show up right away.
+        """
+        time_min, time_max = self.calendar_view.time_range()
+        kwargs = {} if max_age is None else {'max_age': max_age}
+        worker = self.tasks.submit(
+            "load_view", calendar_events, time_min, time_max, **kwargs,
+            on_result=lambda events: self.show_calendar_events((time_min, time_max), events),
+            on_error=lambda e: print(f"Error loading calendar view: {e}"),
+        )
+        if worker is None:
+            # A load is already running; load again once it is done
+            self.view_reload = kwargs
+
+    def show_calendar_events(self, window, events):
+        """
+        Shows loaded events, unless the view has moved on to another range meanwhile.
+        """
+        if self.view_reload is not None:
+            kwargs, self.view_reload = self.view_reload, None
+            QTimer.singleShot(0, lambda: self.refresh_calendar_view(**kwargs))
+        if window == self.calendar_view.time_range():
+            self.calendar_view.set_events(events)
+
+    def open_web_calendar(self):
+        """
+        Opens calendar.google.com in a tab, importing QtWebEngine on first use.
+        """
+        if self.web_view is None:
+            from PyQt5.QtWebEngineWidgets import QWebEngineView
+
+            self.web_view = QWebEngineView()
+            self.web_view.setUrl(QUrl("https://calendar.google.com"))
+            self.view_tabs.addTab(self.web_view, "Google Calendar")
+        self.view_tabs.setCurrentWidget(self.web_view)
+
+    def close_view_tab(self, index):
+        """
+        Closes the web calendar tab, shutting its browser down to free the memory.
+        """
+        widget = self.view_tabs.widget(index)
+        if widget is self.web_view:
+            self.view_tabs.removeTab(index)
+            self.web_view.deleteLater()
+            self.web_view = None
+
+    def add_calendars(self, names):
+        """
+        Adds the user's calendars to the calendar dropdown.
+        """
+        for name in names:
+            if name != "Calendar Assistant Calendar":
+                self.calendar_selector.addItem(name)
+
+    def run_task(self, key, fn, *args, on_result=None, on_error=None, on_partial=None, status=""):
+        """
+        Runs fn(*args) on the thread pool while showing a busy indicator.
+        A task whose key is already running is not started again.
+        """
+        worker = self.tasks.submit(
+            key, fn, *args,
+            on_result=on_result, on_error=on_error, on_partial=on_partial,
+            on_progress=self.status_label.setText, on_done=self.task_done,
+        )
+        if worker is None:
+            self.status_label.setText("Still working on the previous request...")
+            return None
+        self.status_label.setText(status)
+        self.progress_bar.show()
+        self.cancel_button.show()
+        return worker
+
+    def task_done(self):
+        """
+        Hides the busy indicator once no background task is left.
+        """
+        if not self.tasks.has_running():
+            self.progress_bar.hide()
+            self.cancel_button.hide()
+            self.status_label.setText("")
+
+    def cancel_tasks(self):
+        """
+        Cancels the running requests; their results are discarded when they arrive.
+        """
+        self.tasks.cancel_all()
+        self.task_done()
+        self.status_label.setText("Cancelled.")
+
+    def process_input(self):
+        """
+        Processes user input to create multiple tasks or events in Google Calendar.
+        Ensures GPT-4 output adheres to a specific format and handles phrases like "for 6 months."
+        GPT-4's reply is streamed; each event is offered for confirmation as soon as it is complete.
+        """
+        user_input = self.text_input.toPlainText()
+        if not user_input.strip():
+            self.result_label.setText("Input is empty. Please enter event details.")
+            return
+
+        self.run_task(
+            "process_input", suggest_events, user_input,
+            on_partial=self.add_suggestion,
+            on_result=self.show_suggestions,
+            on_error=lambda e: self.result_label.setText(f"Error processing input: {e}"),
+            status="Asking GPT-4 for event details...",
+        )
+
+    def import_schedule(self):
+        """
+        Imports the events of an .ics or .csv file into the selected calendar
+        in the background, showing progress as it goes.
+        """
+        path, _ = QFileDialog.getOpenFileName(self, "Import Events", "", "Calendar files (*.ics *.csv)")
+        if not path:
+            return
+        self.run_task(
+            "import", import_file, path, self.calendar_selector.currentText(), self.color_selector.currentText(),
+            on_result=self.show_import_result,
+            on_error=lambda e: self.result_label.setText(f"Import failed: {e}"),
+            status="Importing...",
+        )
+
+    def show_import_result(self, counts):
+        self.result_label.setText(f"Import done. {describe(counts)}.")
+        if counts['created']:
+            self.refresh_calendar_view(max_age=0)
+
+    def add_suggestion(self, record):
+        """
+        Adds a proposed event to the pending list, showing it right away if nothing else is selected.
+        """
+        item = QListWidgetItem(record.label())
+        item.setData(Qt.UserRole, record)
+        item.setToolTip(record.to_text())
+        self.pending_list.addItem(item)
+        if self.pending_list.currentItem() is None:
+            self.pending_list.setCurrentItem(item)
+        self.show_next_event()
+
+    def show_suggestions(self, result):
+        """
+        Called once every proposed event has arrived.
+        """
+        records, problems = result
+        skipped = "\n".join(problems)
+        if not self.pending_list.count():
+            self.result_label.setText(f"No events found in the AI output.\n\n{skipped}".strip())
+        elif self.pending_list.count() > 1 or problems:
+            message = f"{self.pending_list.count()} events to review. Select some to confirm or reject, or confirm all."
+            if problems:
+                message += f"\n\nSkipped {len(problems)} events that could not be read:\n{skipped}"
+            self.result_label.setText(message)
+        self.text_input.clear()
+
+    def selected_events(self):
+        """
+        The selected pending events, or the current one if none is selected.
+        """
+        items = self.pending_list.selectedItems()
+        if not items and self.pending_list.currentItem() is not None:
+            items = [self.pending_list.currentItem()]
+        return items
+
+    def show_next_event(self):
+        """
+        Display the current pending event for confirmation and prompt the user to confirm or reject.
+        """
+        item = self.pending_list.currentItem()
+        if item is None:
+            if not self.pending_list.count():
+                self.pending_list.hide()
+                self.confirm_button.hide()
+                self.reject_button.hide()
+                self.confirm_all_button.hide()
+            return
+
+        self.result_label.setText(f"Suggested Event:\n\n{item.data(Qt.UserRole).to_text()}")
+        self.pending_list.show()
+        self.confirm_button.show()
+        self.reject_button.show()
+        self.confirm_all_button.setVisible(self.pending_list.count() > 1)
+
+    def confirm_event(self):
+        """
+        Confirms the selected events and creates them in Google Calendar.
+        """
+        items = self.selected_events()
+        if not items:
+            self.result_label.setText("No event to confirm.")
+            return
+        self.commit_events(items)
+
+    def confirm_all_events(self):
+        """
+        Confirms every pending event at once.
+        """
+        self.commit_events([self.pending_list.item(row) for row in range(self.pending_list.count())])
+
+    def commit_events(self, items):
+        """
+        Writes the given pending events to the journal and takes them off the
+        list. The journal creates them in the background, even across
+        restarts; events that fail come back to the list.
+        """
+        selected_color = self.color_selector.currentText()
+        selected_calendar = self.calendar_selector.currentText()
+        records = [item.data(Qt.UserRole) for item in items]
+        try:
+            queue_suggested_events(records, selected_calendar, selected_color, journal=self.journal)
+        except OSError as e:
+            self.result_label.setText(f"Could not save the events: {e}")
+            return
+
+        for item in items:
+            self.pending_list.takeItem(self.pending_list.row(item))
+        self.show_journal_pending(len(self.journal.pending()))
+        self.result_label.setText("Event Confirmed!" if len(items) == 1 else f"{len(items)} Events Confirmed!")
+        self.show_next_event()
+        if self.pending_list.count():
+            return
+
+        self.text_input.clear()  # Clear input box after confirmation
+
+        # Reset dropdowns to default
+        self.color_selector.setCurrentIndex(0)
+        self.calendar_selector.setCurrentIndex(0)
+
+    def journal_flushed(self, done, failed, pending):
+        """
+        Called after each round of the journal's flusher: shows created events
+        in the view and puts events that could not be created back on the
+        pending list, marked with the reason.
+        """
+        self.show_journal_pending(pending)
+        if done:
+            self.refresh_calendar_view(max_age=0)
+        if not failed:
+            return
+        for entry, error in failed:
+            try:
+                record = EventRecord.from_dict(entry['record'])
+            except (KeyError, ValueError) as e:
+                print(f"Error restoring failed event {entry['id']}: {e}")
+                continue
+            self.add_suggestion(record)
+            item = self.pending_list.item(self.pending_list.count() - 1)
+            item.setText(f"{record.label()} (failed: {error})")
+        self.result_label.setText(f"Failed to create {len(failed)} events. Select them and confirm again to retry.")
+
+    def show_journal_pending(self, pending):
+        self.journal_label.setText(f"{pending} events waiting to be created" if pending else "")
+
+    def reject_event(self):
+        """
+        Reject the selected events and remove them from the queue.
+        """
+        items = self.selected_events()
+        for item in items:
+            self.pending_list.takeItem(self.pending_list.row(item))
+        self.result_label.setText("Event rejected." if len(items) == 1 else f"{len(items)} events rejected.")
+        self.show_next_event()
+
+    def chat_with_calendar(self):
+        """
+        Interact with the AI to process user queries while considering all calendars.
+        The calendar sync and GPT-4 call run in the background; the question
+        and its streamed answer are added to the conversation.
+        """
+        user_query = self.chat_input.toPlainText()
+        if not user_query.strip():
+            self.status_label.setText("Please enter a question or request.")
+            return
+
+        worker = self.run_task(
+            "chat_with_calendar", self.chat_session.ask, user_query,
+            on_partial=self.append_chat_output,
+            on_result=lambda answer: self.chat_input.clear(),
+            on_error=lambda e: self.append_chat_output(f"Error: {e}"),
+            status="Reading your calendars...",
+        )
+        if worker is not None:
+            separator = "\n\n" if self.chat_output.toPlainText() else ""
+            self.append_chat_output(f"{separator}You: {user_query.strip()}\n\nAssistant: ")
+
+    def new_chat(self):
+        """
+        Forgets the conversation so the next question starts a new one.
+        """
+        self.tasks.cancel("chat_with_calendar")
+        self.chat_session.reset()
+        self.chat_output.clear()
+
+    def append_chat_output(self, text):
+        """
+        Appends streamed answer text to the chat output.
+        """
+        self.chat_output.moveCursor(QTextCursor.End)
+        self.chat_output.insertPlainText(text)
+
+
+def main():
+    """
+    Launches the desktop app.
+    """
+    # Exporters from CALENDAR_ASSISTANT_TRACE; the Performance panel keeps recent spans either way
+    configure_tracing()
+    # Load the saved token up front (no network when it is still valid) and
+    # resolve the assistant calendar while the window is being built
+    get_credentials()
+    resolve_assistant_calendar_async()
+    # Lets QtWebEngine be imported after the application exists, when the web calendar is opened
+    QApplication.setAttribute(Qt.AA_ShareOpenGLContexts)
+    app = QApplication(sys.argv)
+    main_window = CalendarApp()
+    main_window.show()
+    sys.exit(app.exec_())
@@ -0,0 +1,377 @@
+"""
+Bulk import of an existing schedule from .ics or .csv files, without GPT-4.
+Files are read one event at a time and mapped straight to the event body
+GPT-4's events get, then created in batches a chunk at a time, so memory
+stays flat however long the file is.
+
+Events already in the calendar, with the same title and start, are left
+out, and every event is inserted with an ID derived from its body (see
+journal.event_id): importing the same file twice creates nothing new.
+
+    python importer.py schedule.ics --calendar Work --color Sage
+"""
+import argparse
+import contextlib
+import csv
+import json
+import os
+import re
+import sys
+from datetime import datetime, timedelta, timezone
+from itertools import islice
+from zoneinfo import ZoneInfo
+
+from dateutil import parser
+
+from accounts import get_local_account
+from assistant import get_color_id, get_selected_calendar_id
+from event_batch import MAX_BATCH_SIZE, insert_events
+from event_fetch import event_timestamp
+from event_schema import EventRecord
+from journal import event_id
+from tracing import configure as configure_tracing
+from tracing import span
+
+# Events checked against the calendar and inserted at a time
+DEFAULT_CHUNK_SIZE = 500
+# Problems kept for the report; the rest are only counted
+MAX_PROBLEMS = 20
+
+# CSV columns of Google Calendar's import format that differ from EventRecord fields
+CSV_FIELDS = {"subject": "title", "description": "summary"}
+# iCalendar properties copied into the event's recurrence as they are
+RECURRENCE_PROPERTIES = ("RRULE", "RDATE", "EXDATE")
+
+_DURATION = re.compile(r"^P(?:(\d+)W)?(?:(\d+)D)?(?:T(?:(\d+)H)?(?:(\d+)M)?(?:(\d+)S)?)?$")
+_ESCAPED = re.compile(r"\\(.)")
+
+
+def unfold(stream):
+    """
+    Yields the content lines of an iCalendar stream, joining the lines that
+    were folded onto the next one.
+    """
+    line = None
+    for raw in stream:
+        raw = raw.rstrip("\r\n")
+        if line is not None and raw[:1] in (" ", "\t"):
+            line += raw[1:]
+            continue
+        if line:
+            yield line
+        line = raw
+    if line:
+        yield line
+
+
+def _property(line):
+    """
+    Splits 'NAME;PARAM=value:VALUE' into (name, params, value).
+    """
+    quoted = False
+    for position, character in enumerate(line):
+        if character == '"':
+            quoted = not quoted
+        elif character == ":" and not quoted:
+            break
+    else:
+        return line.upper(), {}, ""
+    name, *params = line[:position].split(";")
+    params = dict(param.split("=", 1) for param in params if "=" in param)
+    return name.upper(), {key.upper(): value.strip('"') for key, value in params.items()}, line[position + 1:]
+
+
+def read_ics(stream):
+    """
+    Yields the VEVENTs of an iCalendar stream one at a time, each a dict of
+    property name -> list of (params, value, line). Components nested in an
+    event, like its alarms, are skipped.
+    """
+    event = None
+    depth = 0
+    for line in unfold(stream):
+        name, params, value = _property(line)
+        if name == "BEGIN":
+            if event is not None:
+                depth += 1
+            elif value.upper() == "VEVENT":
+                event = {}
+        elif name == "END" and event is not None:
+            if depth:
+                depth -= 1
+            elif value.upper() == "VEVENT":
+                yield event
+                event = None
+        elif event is not None and not depth:
+            event.setdefault(name, []).append((params, value, line))
+
+
+def _text(event, name):
+    values = event.get(name)
+    if not values:
+        return ""
+    unescaped = {"n": "\n", "N": "\n"}
+    return _ESCAPED.sub(lambda match: unescaped.get(match.group(1), match.group(1)), values[0][1]).strip()
+
+
+def _ics_time(params, value):
+    """
+    Reads a DTSTART or DTEND value. Returns (date or datetime, time zone
+    name or None); datetimes are aware when their zone is known.
+    """
+    if params.get("VALUE", "").upper() == "DATE" or len(value) == 8:
+        return datetime.strptime(value[:8], "%Y%m%d").date(), None
+    moment = datetime.strptime(value[:15], "%Y%m%dT%H%M%S")
+    if value.endswith("Z"):
+        return moment.replace(tzinfo=timezone.utc), "UTC"
+    zone = params.get("TZID")
+    if zone:
+        try:
+            return moment.replace(tzinfo=ZoneInfo(zone)), zone
+        except (KeyError, ValueError):
+            # e.g. Windows zone names; the time is taken as local time
+            pass
+    return moment, None
+
+
+def _duration(value):
+    match = _DURATION.match(value.strip().lstrip("+"))
+    if not match:
+        raise ValueError(f"Unreadable DURATION {value!r}")
+    weeks, days, hours, minutes, seconds = (int(part or 0) for part in match.groups())
+    return timedelta(weeks=weeks, days=days, hours=hours, minutes=minutes, seconds=seconds)
+
+
+def _when(moment, zone):
+    if not isinstance(moment, datetime):
+        return {'date': moment.isoformat()}
+    return {'dateTime': moment.isoformat(), 'timeZone': zone}
+
+
+def ics_body(event, color_id=None):
+    """
+    The Calendar API body of one VEVENT: the body EventRecord.to_api_body
+    builds, with the event's own times and its RRULE, RDATE and EXDATE lines.
+    Raises ValueError for an event that cannot be imported.
+    """
+    if not event.get("DTSTART"):
+        raise ValueError("Event has no DTSTART")
+    if event.get("RECURRENCE-ID"):
+        raise ValueError("Changed occurrence of a recurring event; the series is imported as it repeats")
+    if _text(event, "STATUS").upper() == "CANCELLED":
+        raise ValueError("Cancelled event")
+    start, zone = _ics_time(*event["DTSTART"][0][:2])
+    all_day = not isinstance(start, datetime)
+    if event.get("DTEND"):
+        end, end_zone = _ics_time(*event["DTEND"][0][:2])
+    elif event.get("DURATION"):
+        end, end_zone = start + _duration(event["DURATION"][0][1]), zone
+    else:
+        end, end_zone = (start + timedelta(days=1), None) if all_day else (start, zone)
+
+    record = EventRecord(
+        _text(event, "SUMMARY") or "Untitled Event", start if all_day else start.date(),
+        start_time=None if all_day else start.time(), end_time=None if all_day else start.time(),
+        summary=_text(event, "DESCRIPTION"), location=_text(event, "LOCATION"),
+    )
+    body = record.to_api_body(color_id)
+    local_zone = body['start'].get('timeZone')
+    body['start'] = _when(start, zone or local_zone)
+    try:
+        end = max(end, start)
+    except TypeError:
+        # A floating end for a start with a time zone, or the other way round
+        end = start
+    body['end'] = _when(end, end_zone or zone or local_zone)
+    recurrence = [line for name in RECURRENCE_PROPERTIES for _, _, line in event.get(name, ())]
+    if recurrence:
+        body['recurrence'] = recurrence
+    return body
+
+
+def csv_body(row, color_id=None):
+    """
+    The Calendar API body of one CSV row, in Google Calendar's import format
+    (Subject, Start Date, Start Time, End Date, End Time, All Day Event,
+    Description, Location) or with EventRecord's field names. End Date is
+    the day the event ends; an optional Recurrence column holds a rule like
+    'every Monday' or an RRULE.
+    Raises ValueError for a row that cannot be imported.
+    """
+    data = {}
+    for key, value in row.items():
+        if key:
+            name = key.strip().lower().replace(" ", "_")
+            data[CSV_FIELDS.get(name, name)] = (value or "").strip()
+    end_day = data.pop("end_date", "")
+    rule = data.pop("recurrence", "")
+    if data.pop("all_day_event", "").lower() in ("true", "yes", "1"):
+        data["start_time"] = data["end_time"] = ""
+    if not rule.upper().startswith(("RRULE:", "FREQ=")):
+        data["recurrence"] = rule
+    record = EventRecord.from_dict(data)
+    body = record.to_api_body(color_id)
+    if rule and 'recurrence' not in data:
+        body['recurrence'] = [rule if rule.upper().startswith("RRULE:") else f"RRULE:{rule}"]
+
+    if end_day:
+        try:
+            last_day = parser.parse(end_day).date()
+        except (ValueError, OverflowError):
+            raise ValueError(f"Unreadable end date {end_day!r}")
+        if last_day > record.start_date:
+            if record.all_day:
+                body['end'] = {'date': (last_day + timedelta(days=1)).isoformat()}
+            else:
+                body['end']['dateTime'] = datetime.combine(last_day, record.end_time).isoformat()
+    return body
+
+
+def _bodies(events, to_body, color_id):
+    for position, event in events:
+        try:
+            yield position, to_body(event, color_id), None
+        except (ValueError, OverflowError) as e:
+            yield position, None, str(e)
+
+
+def file_bodies(path, color_id=None):
+    """
+    Yields (position, body, problem) for every event of an .ics or .csv file,
+    reading it as it goes: the event body, or None and why the event is left
+    out. The position is the event's number in an .ics file and its line in a CSV.
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension not in (".ics", ".csv"):
+        raise ValueError(f"Cannot import {path}: expected an .ics or .csv file")
+    with open(path, encoding="utf-8-sig", newline="") as source:
+        if extension == ".ics":
+            yield from _bodies(enumerate(read_ics(source), 1), ics_body, color_id)
+        else:
+            rows = csv.DictReader(source)
+            # Rows of nothing but commas are left out without a word
+            yield from _bodies(((rows.line_num, row) for row in rows
+                                if any((value or "").strip() for value in row.values() if isinstance(value, str))),
+                               csv_body, color_id)
+
+
+def _key(event):
+    return (event.get('summary') or "").strip().lower(), event_timestamp(event.get('start'))
+
+
+def import_events(bodies, calendar_id, account=None, chunk_size=DEFAULT_CHUNK_SIZE, batch_size=MAX_BATCH_SIZE):
+    """
+    Creates the events of (position, body, problem) triples in a calendar, a
+    chunk at a time. Events already in the calendar's mirror, with the same
+    title and start, are counted as existing and not sent; the others get an
+    ID derived from their body, so an insert answered 409 counts as existing too.
+
+    Yields the running counts after every chunk: events read, created,
+    existing, skipped and failed, and up to MAX_PROBLEMS (position, message)
+    pairs for the skipped and failed ones.
+    """
+    account = account or get_local_account()
+    service = account.calendar_service()
+    store = account.event_store()
+    # Only the changes since the last sync are downloaded
+    failures = store.sync([calendar_id], max_age=0)
+    if calendar_id in failures:
+        print(f"Error syncing events for calendar {calendar_id}: {failures[calendar_id]}")
+    counts = {'read': 0, 'created': 0, 'existing': 0, 'skipped': 0, 'failed': 0, 'problems': []}
+
+    def problem(position, message):
+        if len(counts['problems']) < MAX_PROBLEMS:
+            counts['problems'].append((position, message))
+
+    bodies = iter(bodies)
+    while True:
+        chunk = list(islice(bodies, chunk_size))
+        if not chunk:
+            break
+        with span("import.chunk", events=len(chunk)) as chunk_span:
+            counts['read'] += len(chunk)
+            items, positions = [], []
+            for position, body, reason in chunk:
+                if body is None:
+                    counts['skipped'] += 1
+                    problem(position, reason)
+                else:
+                    body['id'] = event_id(calendar_id, body)
+                    items.append((calendar_id, body))
+                    positions.append(position)
+
+            existing = {_key(event) for event in store.events_starting_at(
+                calendar_id, {event_timestamp(body['start']) for _, body in items})}
+            new = [index for index, (_, body) in enumerate(items) if _key(body) not in existing]
+            counts['existing'] += len(items) - len(new)
+
+            created, errors = insert_events([items[index] for index in new], service=service,
+                                            batch_size=batch_size, existing_ok=True)
+            for sent, index in enumerate(new):
+                if sent in errors:
+                    counts['failed'] += 1
+                    problem(positions[index], errors[sent])
+                elif created[sent] is items[index][1]:
+                    # Answered 409: created by an earlier import
+                    counts['existing'] += 1
+                else:
+                    counts['created'] += 1
+            chunk_span.set(sent=len(new), failed=len(errors))
+        yield dict(counts, problems=list(counts['problems']))
+
+
+def describe(counts):
+    """
+    One line on how far an import got, for progress messages.
+    """
+    return (f"{counts['read']} events read: {counts['created']} created, {counts['existing']} already "
+            f"in the calendar, {counts['skipped']} skipped, {counts['failed']} failed")
+
+
+def import_file(path, selected_calendar, selected_color, task=None, account=None):
+    """
+    Imports an .ics or .csv file into the selected calendar, reporting
+    progress to the task. Returns the final counts (see import_events).
+    """
+    account = account or get_local_account()
+    calendar_id = get_selected_calendar_id(selected_calendar, account) or account.assistant_calendar_id()
+    counts = None
+    for counts in import_events(file_bodies(path, get_color_id(selected_color)), calendar_id, account=account):
+        if task is not None:
+            task.check_cancelled()
+            task.report(f"Importing... {describe(counts)}")
+    return counts or {'read': 0, 'created': 0, 'existing': 0, 'skipped': 0, 'failed': 0, 'problems': []}
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("path", help=".ics or .csv file")
+    arg_parser.add_argument("--calendar", help="Calendar name (defaults to the assistant calendar)")
+    arg_parser.add_argument("--color", help="Event color, e.g. Sage or Tomato")
+    arg_parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE,
+                            help="Events checked and inserted at a time")
+    args = arg_parser.parse_args(argv)
+
+    configure_tracing()
+    # Progress and debug messages go to stderr; stdout gets the final counts as JSON
+    with contextlib.redirect_stdout(sys.stderr):
+        account = get_local_account()
+        calendar_id = (get_selected_calendar_id(args.calendar, account) if args.calendar
+                       else account.assistant_calendar_id())
+        if not calendar_id:
+            print(f"Error: calendar {args.calendar or 'for the assistant'} not found")
+            return 2
+        counts = None
+        try:
+            for counts in import_events(file_bodies(args.path, get_color_id(args.color)), calendar_id,
+                                        account=account, chunk_size=args.chunk_size):
+                print(describe(counts))
+        except (OSError, ValueError) as e:
+            print(f"Error importing {args.path}: {e}")
+            return 2
+    print(json.dumps(counts))
+    return 1 if counts and counts['failed'] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,301 @@
+"""
+Write-ahead journal of confirmed events. Confirming appends the events to an
+append-only file and returns; a background flusher creates them in Google
+Calendar in batches, and picks up where it left off after a restart.
+
+Every event gets a random ID when it is journaled, written with it, and is
+inserted with that ID. Sending it again, after a lost response, a crash or a
+restart, is answered 409 and counted as done, so nothing is created twice.
+An event confirmed twice is journaled twice and created twice, and one
+confirmed again after the first was deleted is created anew, since its ID
+is new.
+
+The file holds one JSON object per line:
+
+    {"op": "put", "id": ..., "calendar": ..., "body": {...}, "record": {...}}
+    {"op": "done", "id": ..., "event": ...}
+    {"op": "failed", "id": ..., "error": ...}
+"""
+import base64
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+import config
+from accounts import get_local_account
+from event_batch import MAX_BATCH_SIZE, send_insert_batches
+from tracing import span
+
+# Characters of the event IDs; Google accepts 5 to 1024 characters a-v and 0-9
+EVENT_ID_LENGTH = 26
+# Seconds before an event that failed with a transient error is sent again; doubled each time it fails
+RETRY_BACKOFF = 1.0
+MAX_RETRY_BACKOFF = 60.0
+# Finished entries after which the file is rewritten with only the pending ones
+COMPACT_AFTER = 1000
+
+
+def event_id(calendar, body):
+    """
+    A client-specified ID derived from an event's calendar and body, in the
+    base32hex alphabet Google requires. The importer uses it so a file
+    imported twice is created once.
+    """
+    body = {key: value for key, value in body.items() if key != 'id'}
+    digest = hashlib.sha256(json.dumps([calendar, body], sort_keys=True).encode()).digest()
+    return base64.b32hexencode(digest).decode().lower()[:EVENT_ID_LENGTH]
+
+
+def new_event_id():
+    """
+    A random client-specified event ID in the base32hex alphabet Google requires.
+    """
+    return base64.b32hexencode(uuid.uuid4().bytes).decode().lower().rstrip("=")
+
+
+class EventJournal:
+    """
+    Pending event inserts, kept in a file and sent by a background thread.
+    add() returns once the events are on disk. Listeners are called from the
+    flusher thread after every round as listener(done, failed, pending):
+    lists of (entry, created event) and (entry, error message), and the
+    number of entries still waiting. An entry is the dict of its "put" line.
+    """
+
+    def __init__(self, path=None, account=None, batch_size=MAX_BATCH_SIZE,
+                 backoff=RETRY_BACKOFF, max_backoff=MAX_RETRY_BACKOFF):
+        self.path = path or config.cache_path("journal.jsonl")
+        self.account = account or get_local_account()
+        self.batch_size = batch_size
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self._condition = threading.Condition()
+        self._pending = OrderedDict()  # event ID -> entry, oldest first
+        self._listeners = []
+        self._finished = 0             # done and failed lines since the last compaction
+        self._attempts = {}            # event ID -> transient failures so far
+        self._not_before = {}          # event ID -> monotonic time it may be sent again
+        self._sending = False
+        self._stopping = False
+        self._thread = None
+        self._replay()
+        self._compact()
+
+    def _replay(self):
+        try:
+            journal_file = open(self.path)
+        except FileNotFoundError:
+            return
+        with journal_file:
+            for number, line in enumerate(journal_file, 1):
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # A line torn by a crash; its add() never returned
+                    print(f"Skipping unreadable line {number} of {self.path}")
+                    continue
+                if record.get('op') == "put":
+                    self._pending[record['id']] = record
+                else:
+                    self._pending.pop(record.get('id'), None)
+
+    def _compact(self):
+        """
+        Rewrites the file with only the pending entries.
+        """
+        temporary = self.path + ".tmp"
+        with open(temporary, "w") as journal_file:
+            for entry in self._pending.values():
+                journal_file.write(json.dumps(entry) + "\n")
+            journal_file.flush()
+            os.fsync(journal_file.fileno())
+        os.replace(temporary, self.path)
+        self._file = open(self.path, "a")
+        self._finished = 0
+
+    def _write(self, records, sync):
+        for record in records:
+            self._file.write(json.dumps(record) + "\n")
+        self._file.flush()
+        if sync:
+            os.fsync(self._file.fileno())
+
+    def add(self, items):
+        """
+        Journals events to create. `items` are (calendar name, event body,
+        record dict) triples; the calendar name is resolved when the event is
+        sent, None meaning the assistant calendar, and the record is what the
+        app shows if the event fails. Returns the events' IDs.
+        """
+        entries = []
+        for calendar, body, record in items:
+            identifier = new_event_id()
+            entries.append({'op': "put", 'id': identifier, 'calendar': calendar,
+                            'body': dict(body, id=identifier), 'record': record, 'time': time.time()})
+        with self._condition:
+            self._write(entries, sync=True)
+            for entry in entries:
+                self._pending[entry['id']] = entry
+            self._condition.notify_all()
+        return [entry['id'] for entry in entries]
+
+    def pending(self):
+        """
+        Entries not sent yet, oldest first.
+        """
+        with self._condition:
+            return list(self._pending.values())
+
+    def add_listener(self, listener):
+        with self._condition:
+            self._listeners.append(listener)
+
+    def start(self):
+        """
+        Starts the flusher thread. Safe to call more than once.
+        """
+        with self._condition:
+            if self._thread is None:
+                self._stopping = False
+                self._thread = threading.Thread(target=self._run, name="event-journal", daemon=True)
+                self._thread.start()
+        return self._thread
+
+    def stop(self, timeout=None):
+        """
+        Stops the flusher after its current round. Pending entries stay in the file.
+        """
+        with self._condition:
+            thread, self._thread = self._thread, None
+            self._stopping = True
+            self._condition.notify_all()
+        if thread is not None:
+            thread.join(timeout)
+
+    def wait(self, timeout=None):
+        """
+        Waits until nothing is pending. Returns False on timeout.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._condition:
+            while self._pending or self._sending:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._condition.wait(remaining)
+        return True
+
+    def close(self):
+        self.stop()
+        with self._condition:
+            self._file.close()
+
+    def _next_round(self):
+        """
+        Waits for entries to send and returns up to batch_size of them, oldest
+        first, skipping those waiting to be retried. Returns None when stopping.
+        """
+        with self._condition:
+            while not self._stopping:
+                now = time.monotonic()
+                ready = [entry for identifier, entry in self._pending.items()
+                         if self._not_before.get(identifier, 0) <= now][:self.batch_size]
+                if ready:
+                    self._sending = True
+                    return ready
+                delay = min(self._not_before.values()) - now if self._pending else None
+                self._condition.wait(delay)
+            return None
+
+    def _run(self):
+        while True:
+            entries = self._next_round()
+            if entries is None:
+                return
+            try:
+                done, failed, retry = self._send(entries)
+            except Exception as e:
+                print(f"Error sending journaled events: {e}")
+                done, failed, retry = [], [], entries
+            self._finish_round(done, failed, retry)
+
+    def _calendar_id(self, name, resolved):
+        """
+        Resolves a calendar name like create_suggested_events does. Raises
+        if it cannot be resolved right now, so the entries are sent again later.
+        """
+        if name not in resolved:
+            calendar_id = self.account.calendar_registry().get_id(name) if name else None
+            calendar_id = calendar_id or self.account.assistant_calendar_id()
+            if not calendar_id:
+                raise RuntimeError(f"Could not resolve calendar {name!r}")
+            resolved[name] = calendar_id
+        return resolved[name]
+
+    def _send(self, entries):
+        with span("journal.flush", events=len(entries)) as flush_span:
+            resolved = {}
+            items = [(self._calendar_id(entry['calendar'], resolved), entry['body']) for entry in entries]
+            created, failures, retry, _ = send_insert_batches(
+                items, list(range(len(items))), self.account.calendar_service(),
+                batch_size=self.batch_size, existing_ok=True)
+            flush_span.set(created=len(created), failed=len(failures), retry=len(retry))
+        retry = set(retry)
+        done = [(entries[index], created[index]) for index in sorted(created)]
+        failed = [(entries[index], failures[index]) for index in sorted(failures) if index not in retry]
+        return done, failed, [entries[index] for index in sorted(retry)]
+
+    def _finish_round(self, done, failed, retry):
+        records = [{'op': "done", 'id': entry['id'], 'event': {key: event.get(key) for key in ("id", "htmlLink")}}
+                   for entry, event in done]
+        records += [{'op': "failed", 'id': entry['id'], 'error': error} for entry, error in failed]
+        with self._condition:
+            # A lost "done" line only means the event is sent again and answered 409
+            self._write(records, sync=False)
+            for record in records:
+                self._pending.pop(record['id'], None)
+                self._attempts.pop(record['id'], None)
+                self._not_before.pop(record['id'], None)
+            self._finished += len(records)
+            # Events to retry wait their turn at the back; the others go on being sent
+            longest = 0.0
+            for entry in retry:
+                attempts = self._attempts[entry['id']] = self._attempts.get(entry['id'], 0) + 1
+                delay = min(self.backoff * 2 ** (attempts - 1), self.max_backoff) * random.uniform(0.5, 1.5)
+                self._not_before[entry['id']] = time.monotonic() + delay
+                self._pending.move_to_end(entry['id'])
+                longest = max(longest, delay)
+            if retry:
+                print(f"Sending {len(retry)} journaled events again within {longest:.1f}s")
+            if self._finished >= COMPACT_AFTER:
+                self._file.close()
+                self._compact()
+            self._sending = False
+            pending = len(self._pending)
+            listeners = list(self._listeners)
+            self._condition.notify_all()
+        for listener in listeners:
+            try:
+                listener(done, failed, pending)
+            except Exception as e:
+                print(f"Error in journal listener: {e}")
+
+
+_journal = None
+_journal_lock = threading.Lock()
+
+
+def get_journal():
+    """
+    Returns the app-wide journal of the local account. Call start() on it to send its events.
+    """
+    global _journal
+    with _journal_lock:
+        if _journal is None:
+            _journal = EventJournal()
+        return _journal
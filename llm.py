@@ -0,0 +1,167 @@
+import time
+
+import openai
+
+from tracing import activate, estimate_tokens, start_span
+from transport import get_openai_session
+
+# Model used for every assistant request
+MODEL = "gpt-4"
+
+# Every completion shares one pooled session that retries transient errors and respects the quota
+openai.requestssession = get_openai_session()
+
+
+class StreamStats:
+    """
+    Timing of one streamed completion. Time to first visible output is the
+    figure users notice: the first token for chat answers, the first complete
+    event for event suggestions.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.started = time.perf_counter()
+        self.first_token = None
+        self.first_block = None
+        self.finished = None
+        self.chunks = 0
+        self.characters = 0
+
+    def token(self, delta):
+        if self.first_token is None:
+            self.first_token = time.perf_counter()
+        self.chunks += 1
+        self.characters += len(delta)
+
+    def block(self):
+        if self.first_block is None:
+            self.first_block = time.perf_counter()
+
+    def finish(self):
+        self.finished = time.perf_counter()
+
+    def _elapsed(self, moment):
+        return None if moment is None else moment - self.started
+
+    @property
+    def time_to_first_token(self):
+        return self._elapsed(self.first_token)
+
+    @property
+    def time_to_first_block(self):
+        return self._elapsed(self.first_block)
+
+    @property
+    def total_time(self):
+        return self._elapsed(self.finished)
+
+    def summary(self):
+        def ms(seconds):
+            return "n/a" if seconds is None else f"{seconds * 1000:.0f} ms"
+        return (
+            f"{self.name}: first token {ms(self.time_to_first_token)}, "
+            f"first block {ms(self.time_to_first_block)}, total {ms(self.total_time)}, "
+            f"{self.chunks} chunks"
+        )
+
+
+def _prompt_size(messages):
+    return sum(len(message.get('content') or "") for message in messages)
+
+
+def _open(name, model, messages, **kwargs):
+    """
+    Starts a streamed completion inside a span that stays open until the stream ends.
+    """
+    prompt_chars = _prompt_size(messages)
+    llm_span = start_span(name, model=model, prompt_chars=prompt_chars,
+                          prompt_tokens=estimate_tokens(prompt_chars))
+    try:
+        with activate(llm_span):
+            response = openai.ChatCompletion.create(model=model, messages=messages, stream=True, **kwargs)
+    except Exception as e:
+        llm_span.finish(e)
+        raise
+    return response, llm_span
+
+
+def _stream(response, extract, stats, llm_span):
+    chunks = characters = 0
+    error = None
+    try:
+        for chunk in response:
+            choices = chunk.get('choices') or [{}]
+            delta = extract(choices[0].get('delta', {}))
+            if delta:
+                if stats is not None:
+                    stats.token(delta)
+                if llm_span and not chunks:
+                    llm_span.set(first_token_ms=round(llm_span.elapsed() * 1000, 1))
+                chunks += 1
+                characters += len(delta)
+                yield delta
+    except Exception as e:
+        error = e
+        raise
+    finally:
+        if stats is not None:
+            stats.finish()
+        # Each streamed chunk carries about one token
+        llm_span.set(completion_chars=characters, completion_tokens=chunks)
+        llm_span.finish(error)
+
+
+def stream_chat(messages, model=MODEL, stats=None, **kwargs):
+    """
+    Streams a chat completion, yielding content deltas as they arrive.
+    """
+    response, llm_span = _open("llm.chat", model, messages, **kwargs)
+    return _stream(response, lambda delta: delta.get('content'), stats, llm_span)
+
+
+def stream_function_call(messages, function, model=MODEL, stats=None, **kwargs):
+    """
+    Streams a completion that must call `function`, yielding fragments of the
+    call's JSON arguments as they arrive.
+    """
+    response, llm_span = _open(
+        "llm.function_call", model, messages, functions=[function], function_call={"name": function["name"]},
+        **kwargs
+    )
+    return _stream(response, lambda delta: (delta.get('function_call') or {}).get('arguments'), stats, llm_span)
+
+
+def split_json_items(fragments, stats=None):
+    """
+    Yields the objects of the array inside a streamed JSON document such as
+    '{"events": [{...}, {...}]}' one by one, each as soon as its closing brace
+    arrives, so the first item can be shown before the reply is complete.
+    """
+    depth = 0
+    in_string = escaped = False
+    item = None
+    for fragment in fragments:
+        for char in fragment:
+            if item is not None:
+                item.append(char)
+            if in_string:
+                if escaped:
+                    escaped = False
+                elif char == "\\":
+                    escaped = True
+                elif char == '"':
+                    in_string = False
+            elif char == '"':
+                in_string = True
+            elif char in "{[":
+                depth += 1
+                if char == "{" and depth == 3:
+                    item = [char]
+            elif char in "}]":
+                if char == "}" and depth == 3 and item is not None:
+                    if stats is not None:
+                        stats.block()
+                    yield "".join(item)
+                    item = None
+                depth -= 1
@@ -0,0 +1,175 @@
+import hashlib
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+import config
+
+# In-process cache limits; least recently used entries go first
+DEFAULT_MAX_MEMORY_BYTES = 2 * 1024 * 1024
+# Entries kept on disk before the least recently used are pruned
+DEFAULT_MAX_DISK_ENTRIES = 5000
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS llm_cache (
+    key TEXT PRIMARY KEY,
+    date_context TEXT NOT NULL,
+    value TEXT NOT NULL,
+    last_used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS llm_cache_by_date ON llm_cache (date_context);
+"""
+
+
+def normalize_input(text):
+    """
+    Canonical form of user input for cache lookups: case, spacing and
+    trailing punctuation do not change what GPT-4 is asked.
+    """
+    text = re.sub(r"\s+", " ", text.strip().lower())
+    return text.rstrip(".!?;, ")
+
+
+def cache_key(prompt, user_input):
+    """
+    Key for a completion: the full system prompt (which embeds the current date)
+    plus the normalized user input.
+    """
+    digest = hashlib.sha256()
+    digest.update(prompt.encode())
+    digest.update(b"\0")
+    digest.update(normalize_input(user_input).encode())
+    return digest.hexdigest()
+
+
+class LLMCache:
+    """
+    Memoizes GPT-4 replies: an in-process LRU bounded by size, backed by an
+    SQLite table so entries survive restarts. Each entry records the date
+    context it was produced for; entries for any other date are expired.
+    """
+
+    def __init__(self, path=None, max_memory_bytes=DEFAULT_MAX_MEMORY_BYTES,
+                 max_disk_entries=DEFAULT_MAX_DISK_ENTRIES):
+        self.path = path or config.cache_path("llm_cache.sqlite3")
+        self.max_memory_bytes = max_memory_bytes
+        self.max_disk_entries = max_disk_entries
+        self._lock = threading.RLock()
+        self._memory = OrderedDict()  # key -> (date_context, value)
+        self._memory_bytes = 0
+        self._date_context = None
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.executescript(_SCHEMA)
+
+    def _expire(self, date_context):
+        """
+        Drops every entry produced for a different date context.
+        """
+        if date_context == self._date_context:
+            return
+        self._date_context = date_context
+        for key in [key for key, (entry_date, _) in self._memory.items() if entry_date != date_context]:
+            self._forget(key)
+        with self._conn:
+            self._conn.execute("DELETE FROM llm_cache WHERE date_context != ?", (date_context,))
+
+    def _forget(self, key):
+        _, value = self._memory.pop(key)
+        self._memory_bytes -= len(value)
+
+    def _remember(self, key, date_context, value):
+        if key in self._memory:
+            self._forget(key)
+        self._memory[key] = (date_context, value)
+        self._memory_bytes += len(value)
+        while self._memory_bytes > self.max_memory_bytes and len(self._memory) > 1:
+            self._forget(next(iter(self._memory)))
+            self.evictions += 1
+
+    def get(self, prompt, user_input, date_context):
+        """
+        Returns the cached reply, or None on a miss.
+        """
+        key = cache_key(prompt, user_input)
+        with self._lock:
+            self._expire(date_context)
+            entry = self._memory.get(key)
+            if entry is not None:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                return entry[1]
+            row = self._conn.execute(
+                "SELECT value FROM llm_cache WHERE key = ? AND date_context = ?", (key, date_context)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            with self._conn:
+                self._conn.execute("UPDATE llm_cache SET last_used = ? WHERE key = ?", (time.time(), key))
+            self._remember(key, date_context, row[0])
+            self.disk_hits += 1
+            return row[0]
+
+    def put(self, prompt, user_input, date_context, value):
+        """
+        Stores a reply in memory and on disk.
+        """
+        key = cache_key(prompt, user_input)
+        with self._lock:
+            self._expire(date_context)
+            self._remember(key, date_context, value)
+            with self._conn:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO llm_cache (key, date_context, value, last_used) VALUES (?, ?, ?, ?)",
+                    (key, date_context, value, time.time())
+                )
+                self._conn.execute(
+                    "DELETE FROM llm_cache WHERE key IN ("
+                    "SELECT key FROM llm_cache ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                    (self.max_disk_entries,)
+                )
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            self._memory_bytes = 0
+            with self._conn:
+                self._conn.execute("DELETE FROM llm_cache")
+
+    def stats(self):
+        """
+        Hit/miss counters and current size.
+        """
+        with self._lock:
+            lookups = self.memory_hits + self.disk_hits + self.misses
+            return {
+                'memory_hits': self.memory_hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'hit_rate': (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0,
+                'evictions': self.evictions,
+                'memory_entries': len(self._memory),
+                'memory_bytes': self._memory_bytes,
+            }
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_llm_cache():
+    """
+    Returns the reply cache shared by the app.
+    """
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = LLMCache()
+    return _cache
@@ -0,0 +1,109 @@
+import re
+import calendar
+from datetime import datetime, timedelta
+from dateutil import parser
+
+from tracing import span
+
+
+def parse_relative_date(date_str, today=None):
+    """
+    Parses relative date expressions like 'next Friday', 'this Monday', 'tomorrow', or defaults to today's date.
+    """
+    today = today or datetime.now()
+    weekdays = list(calendar.day_name)
+    date_str = date_str.strip().lower()
+
+    # Handle "tomorrow"
+    if date_str == "tomorrow":
+        target_date = today + timedelta(days=1)
+        return target_date.strftime("%Y-%m-%d")
+
+    # Handle specific weekdays like "this Friday" or "next Friday"
+    for prefix in ["this", "next"]:
+        if date_str.startswith(prefix):
+            day_name = date_str[len(prefix):].strip().capitalize()
+            if day_name in weekdays:
+                day_index = weekdays.index(day_name)
+                days_ahead = (day_index - today.weekday() + 7) % 7
+                if prefix == "next" or days_ahead == 0:  # Ensure "next" moves to the next week if today matches
+                    days_ahead += 7
+                target_date = today + timedelta(days=days_ahead)
+                return target_date.strftime("%Y-%m-%d")
+
+    # Handle weekdays without prefixes (e.g., "Friday")
+    if date_str.capitalize() in weekdays:
+        day_name = date_str.capitalize()
+        day_index = weekdays.index(day_name)
+        days_ahead = (day_index - today.weekday() + 7) % 7
+        if days_ahead == 0:  # Default to the next week if today matches
+            days_ahead = 7
+        target_date = today + timedelta(days=days_ahead)
+        return target_date.strftime("%Y-%m-%d")
+
+    # Default to today if no valid date is parsed
+    return today.strftime("%Y-%m-%d")
+
+def parse_recurrence(text, start_date=None, end_date=None):
+    """
+    Parses user input to generate an RRULE for recurring events.
+    Handles weekly, monthly, yearly, and custom intervals.
+    """
+    recurrence_rule = ""
+    freq = "WEEKLY"  # Default to weekly recurrence
+    byday = []
+    bymonth = None
+    bymonthday = None
+    interval = 1
+    until = None
+
+    with span("parse.recurrence", input_chars=len(text)) as parse_span:
+        try:
+            # Detect specific dates or annual recurrence (e.g., "annually on July 20")
+            date_match = re.search(r"annually\s+on\s+([\w\s\d]+)", text, re.IGNORECASE)
+            if date_match:
+                freq = "YEARLY"
+                # Parse the specific month and day from the date string
+                date_parts = parser.parse(date_match.group(1), fuzzy=True)
+                bymonth = date_parts.month
+                bymonthday = date_parts.day
+
+            # Detect weekly or monthly patterns
+            day_matches = re.findall(r"(monday|tuesday|wednesday|thursday|friday|saturday|sunday)", text, re.IGNORECASE)
+            if day_matches:
+                byday = [day[:2].upper() for day in day_matches]
+
+            # Detect custom intervals (e.g., "every 2 weeks" or "every year")
+            interval_match = re.search(r"every\s+(\d+)?\s*(days?|weeks?|months?|years?)", text, re.IGNORECASE)
+            if interval_match:
+                interval = int(interval_match.group(1) or 1)
+                freq = {
+                    "day": "DAILY",
+                    "week": "WEEKLY",
+                    "month": "MONTHLY",
+                    "year": "YEARLY"
+                }[interval_match.group(2).lower().rstrip('s')]
+
+            # Detect end date (if provided)
+            if end_date:
+                until = end_date.strftime("%Y%m%dT235959Z")
+
+            # Construct the RRULE
+            rule = f"FREQ={freq};INTERVAL={interval}"
+            if bymonth:
+                rule += f";BYMONTH={bymonth}"
+            if bymonthday:
+                rule += f";BYMONTHDAY={bymonthday}"
+            if byday:
+                rule += f";BYDAY={','.join(byday)}"
+            if until:
+                rule += f";UNTIL={until}"
+
+            recurrence_rule = f"RRULE:{rule}"
+            parse_span.set(rule=recurrence_rule)
+
+        except Exception as e:
+            print(f"Error parsing recurrence: {e}")
+            parse_span.fail(e)
+
+    return [recurrence_rule] if recurrence_rule else []
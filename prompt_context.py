@@ -0,0 +1,226 @@
+import re
+import calendar
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+from event_fetch import event_timestamp
+
+# Default number of prompt tokens the calendar listing may use
+DEFAULT_TOKEN_BUDGET = 2000
+# Prompt tokens the events matching the question may use, on top of the listing
+MATCHES_TOKEN_BUDGET = 400
+# Window used when the query does not mention a time horizon
+DEFAULT_HORIZON_DAYS = 14
+# Window used for open-ended "when is my next ..." questions
+OPEN_ENDED_HORIZON_DAYS = 90
+
+TABLE_HEADER = "date|time|title|location|repeats"
+OMITTED_NOTE = "({} later events omitted)"
+
+# listed_until: start of the first row left out for the budget, or None when every row fits
+CalendarContext = namedtuple(
+    "CalendarContext", ["text", "tokens_used", "events_included", "events_dropped", "window", "listed_until"]
+)
+
+
+def estimate_tokens(text):
+    """
+    Rough token count for GPT-4 style tokenizers (about four characters per token).
+    """
+    return max(1, (len(text) + 3) // 4)
+
+
+def _start_of_day(moment):
+    return moment.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def query_horizon(query, now=None):
+    """
+    Picks the time window a question is about, e.g. 'tomorrow' or 'next week'.
+    Returns (start, end) as naive local datetimes.
+    """
+    now = now or datetime.now()
+    today = _start_of_day(now)
+    text = query.lower()
+
+    match = re.search(r"(?:next|in|within|coming)\s+(\d+)\s+(days?|weeks?|months?)", text)
+    if match:
+        num = int(match.group(1))
+        unit = match.group(2).rstrip("s")
+        days = {"day": num, "week": 7 * num, "month": 31 * num}[unit]
+        return now, today + timedelta(days=days + 1)
+
+    if re.search(r"\b(today|tonight)\b", text):
+        return now, today + timedelta(days=1)
+    if "tomorrow" in text:
+        return today + timedelta(days=1), today + timedelta(days=2)
+    if "weekend" in text:
+        saturday = today + timedelta(days=(5 - today.weekday()) % 7)
+        return max(now, saturday), saturday + timedelta(days=2)
+    if "next week" in text:
+        monday = today + timedelta(days=7 - today.weekday())
+        return monday, monday + timedelta(days=7)
+    if "this week" in text:
+        return now, today + timedelta(days=7 - today.weekday())
+    if "next month" in text:
+        first = (today.replace(day=1) + timedelta(days=32)).replace(day=1)
+        return first, (first + timedelta(days=32)).replace(day=1)
+    if "this month" in text:
+        return now, (today.replace(day=1) + timedelta(days=32)).replace(day=1)
+
+    for index, day_name in enumerate(calendar.day_name):
+        if re.search(rf"\b{day_name.lower()}\b", text):
+            days_ahead = (index - today.weekday()) % 7
+            if "next " + day_name.lower() in text and days_ahead == 0:
+                days_ahead = 7
+            day = today + timedelta(days=days_ahead)
+            return max(now, day), day + timedelta(days=1)
+
+    if re.search(r"\bnext\b|\bupcoming\b|\bwhen\b", text):
+        return now, today + timedelta(days=OPEN_ENDED_HORIZON_DAYS + 1)
+    return now, today + timedelta(days=DEFAULT_HORIZON_DAYS + 1)
+
+
+def _local(when):
+    timestamp = event_timestamp(when)
+    return datetime.fromtimestamp(timestamp) if timestamp is not None else None
+
+
+def _time_range(event):
+    if 'date' in event.get('start', {}):
+        return "all day"
+    start, end = _local(event.get('start')), _local(event.get('end'))
+    if start is None:
+        return ""
+    return f"{start:%H:%M}-{end:%H:%M}" if end else f"{start:%H:%M}"
+
+
+def _describe_repeats(starts):
+    """
+    Summarizes a series of instance start times as a rule, e.g. 'weekly Mon x6'.
+    """
+    count = f"x{len(starts)}"
+    days = sorted({start.date() for start in starts})
+    if len(days) == 1:
+        return f"{count} same day"
+    if len(starts) % len(days) == 0:
+        # Several instances a day, e.g. morning and evening doses
+        count += f" ({len(starts) // len(days)} a day)" if len(starts) > len(days) else ""
+    gaps = {(b - a).days for a, b in zip(days, days[1:])}
+    weekdays = sorted({day.weekday() for day in days})
+    if gaps == {1}:
+        return f"daily {count}"
+    if len(gaps) == 1:
+        gap = next(iter(gaps))
+        if gap == 7:
+            return f"weekly {starts[0]:%a} {count}"
+        if gap % 7 == 0:
+            return f"every {gap // 7} weeks {starts[0]:%a} {count}"
+        return f"every {gap} days {count}"
+    if max(gaps) <= 7:
+        return f"weekly {','.join(calendar.day_abbr[day] for day in weekdays)} {count}"
+    return count
+
+
+def _clean(value):
+    return str(value).replace("|", "/").replace("\n", " ").strip()
+
+
+def _rows(events):
+    """
+    Turns events into (sort_key, row, event_count) tuples, folding expanded
+    instances of the same recurring series into a single row.
+    """
+    series = {}
+    rows = []
+    for event in events:
+        series_id = event.get('recurringEventId')
+        if series_id:
+            if series_id not in series:
+                series[series_id] = []
+                rows.append(('series', series_id))
+            series[series_id].append(event)
+        else:
+            rows.append(('single', event))
+
+    for kind, item in rows:
+        instances = series[item] if kind == 'series' else [item]
+        first = instances[0]
+        starts = [_local(event.get('start')) for event in instances]
+        start = starts[0]
+        repeats = _describe_repeats(starts) if len(instances) > 1 else ""
+        row = "|".join([
+            f"{start:%Y-%m-%d %a}" if start else "",
+            _time_range(first),
+            _clean(first.get('summary', 'No Title')),
+            _clean(first.get('location', '')),
+            repeats,
+        ])
+        yield (start or datetime.min), row, len(instances)
+
+
+def event_rows(events):
+    """
+    Every (start, row) pair the table of these events would have, in start
+    order, with no token budget.
+    """
+    return [(start, row) for start, row, _ in sorted(_rows(events), key=lambda item: item[0])]
+
+
+def build_calendar_context(events, query="", now=None, token_budget=DEFAULT_TOKEN_BUDGET, window=None):
+    """
+    Serializes events into a compact table that fits within `token_budget`.
+    Events outside the query's time window are skipped, recurring instances are
+    folded into one row per series, and rows furthest in the future are dropped
+    first when the budget runs out.
+    """
+    now = now or datetime.now()
+    window = window or query_horizon(query, now)
+    window_start, window_end = window
+    lo, hi = window_start.timestamp(), window_end.timestamp()
+
+    in_window = []
+    for event in events:
+        start = event_timestamp(event.get('start'))
+        end = event_timestamp(event.get('end')) or start
+        if start is None or (end > lo and start < hi):
+            in_window.append(event)
+
+    return _table(in_window, token_budget, window)
+
+
+def build_matches_context(events, token_budget=MATCHES_TOKEN_BUDGET):
+    """
+    Serializes the events found for a question (see EventStore.search) in the
+    same table layout, within `token_budget`.
+    """
+    return _table(events, token_budget, None)
+
+
+def _table(events, token_budget, window):
+    lines = [TABLE_HEADER]
+    tokens_used = estimate_tokens(TABLE_HEADER)
+    # Keep room for the omitted-events note so the total stays within budget
+    row_budget = token_budget - estimate_tokens(OMITTED_NOTE.format(len(events)))
+    included = dropped = 0
+    listed_until = None
+    for start, row, count in sorted(_rows(events), key=lambda item: item[0]):
+        cost = estimate_tokens(row) + 1
+        if dropped or tokens_used + cost > row_budget:
+            if not dropped:
+                listed_until = start
+            dropped += count
+            continue
+        lines.append(row)
+        tokens_used += cost
+        included += count
+
+    if not included:
+        lines = ["No events in this period."]
+        tokens_used = estimate_tokens(lines[0])
+    if dropped:
+        note = OMITTED_NOTE.format(dropped)
+        lines.append(note)
+        tokens_used += estimate_tokens(note)
+
+    return CalendarContext("\n".join(lines), tokens_used, included, dropped, window, listed_until)
@@ -0,0 +1,259 @@
+import bisect
+import re
+import threading
+import time as _time
+from collections import OrderedDict
+from datetime import datetime, time, timedelta, timezone
+
+from dateutil import rrule, tz
+
+from event_fetch import parse_datetime
+
+# Parsed recurrence sets kept in memory; rebuilt when the series is updated
+DEFAULT_CACHE_SIZE = 2048
+# Occurrences are materialized this far (seconds) past the latest window asked for
+MATERIALIZE_AHEAD = 120 * 24 * 3600
+
+_UNTIL = re.compile(r"UNTIL=(\d{8})(?:T(\d{6})(Z?))?", re.IGNORECASE)
+
+
+class Series:
+    """
+    A recurring event's rules in expandable form: a dateutil rruleset anchored
+    at the master's start, the length of each occurrence and whether the
+    series is all-day (naive dates) or timed (aware, in the event's time zone).
+
+    Occurrences are generated once and kept as parallel lists of start times
+    and their epoch seconds, so a window is found by bisecting plain floats
+    instead of comparing time zone aware datetimes.
+    """
+
+    __slots__ = ("rules", "start", "duration", "all_day", "time_zone", "finite",
+                 "_starts", "_times", "_pending", "_lock", "_formatted")
+
+    def __init__(self, rules, start, duration, all_day, time_zone, finite):
+        self.rules = rules
+        self.start = start
+        self.duration = duration
+        self.all_day = all_day
+        self.time_zone = time_zone
+        self.finite = finite
+        self._starts = []
+        self._times = []
+        self._pending = iter(rules)
+        self._lock = threading.Lock()
+        self._formatted = {}
+
+    def _materialize(self, until):
+        """
+        Generates occurrences until one starts at or after epoch `until`,
+        or the series ends (`until` None).
+        """
+        with self._lock:
+            while self._pending is not None and (until is None or not self._times or self._times[-1] < until):
+                occurrence = next(self._pending, None)
+                if occurrence is None:
+                    self._pending = None
+                    break
+                self._starts.append(occurrence)
+                self._times.append(occurrence.timestamp())
+
+    def starts_between(self, time_min, time_max):
+        """
+        Start datetimes of the occurrences starting in [time_min, time_max),
+        given as epoch seconds; either may be None. Without `time_max`, a
+        series that never ends is expanded for MATERIALIZE_AHEAD (120 days)
+        past time_min (or now).
+        """
+        if time_max is None and not self.finite:
+            time_max = max(time_min or 0, _time.time()) + MATERIALIZE_AHEAD
+        if time_max is not None and self._pending is not None and (not self._times or self._times[-1] < time_max):
+            self._materialize(time_max + MATERIALIZE_AHEAD)
+        elif time_max is None:
+            self._materialize(None)
+        low = 0 if time_min is None else bisect.bisect_left(self._times, time_min)
+        high = len(self._times) if time_max is None else bisect.bisect_left(self._times, time_max)
+        return self._starts[low:high], self._times[low:high]
+
+    def formatted(self, start, start_ts):
+        """
+        The (ID suffix, start, end) of an occurrence as the API writes them,
+        computed once per occurrence.
+        """
+        formatted = self._formatted.get(start_ts)
+        if formatted is None:
+            if self.all_day:
+                suffix = f"{start:%Y%m%d}"
+            else:
+                suffix = f"{datetime.fromtimestamp(start_ts, timezone.utc):%Y%m%dT%H%M%SZ}"
+            formatted = (suffix, _when(start, self), _when(start + self.duration, self))
+            self._formatted[start_ts] = formatted
+        return formatted
+
+    def last_end(self):
+        """
+        End of the last occurrence, or None for a series without an end.
+        """
+        if not self.finite:
+            return None
+        self._materialize(None)
+        return (self._starts[-1] if self._starts else self.start) + self.duration
+
+
+def _start_of(when, zone):
+    """
+    Returns (datetime, all_day) for an event 'start'/'end' object.
+    Timed values are converted to `zone` so occurrences keep their wall-clock
+    time across daylight saving changes.
+    """
+    if 'dateTime' in when:
+        value = parse_datetime(when['dateTime'])
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=zone or tz.tzlocal())
+        return value.astimezone(zone) if zone else value, False
+    return datetime.strptime(when['date'], "%Y-%m-%d"), True
+
+
+def _normalize_until(line, all_day):
+    """
+    dateutil needs UNTIL to match DTSTART: a plain date for all-day series,
+    a UTC time for timed ones.
+    """
+    def replace(match):
+        day, clock, _ = match.groups()
+        if all_day:
+            return f"UNTIL={day}"
+        return f"UNTIL={day}T{clock or '235959'}Z"
+    return _UNTIL.sub(replace, line)
+
+
+def _parse_dates(line, start, zone, all_day):
+    """
+    Parses the values of an EXDATE or RDATE line, e.g.
+    'EXDATE;TZID=America/New_York:20261026T180000,20261102T180000'.
+    """
+    head, _, values = line.partition(":")
+    params = dict(param.split("=", 1) for param in head.split(";")[1:] if "=" in param)
+    value_zone = tz.gettz(params['TZID']) if 'TZID' in params else zone
+    dates = []
+    for value in values.split(","):
+        value = value.strip()
+        if not value:
+            continue
+        if "T" not in value:
+            day = datetime.strptime(value, "%Y%m%d")
+            dates.append(day if all_day else datetime.combine(day.date(), start.timetz()))
+            continue
+        moment = datetime.strptime(value.rstrip("Zz"), "%Y%m%dT%H%M%S")
+        if all_day:
+            dates.append(datetime.combine(moment.date(), time()))
+        else:
+            moment = moment.replace(tzinfo=timezone.utc if value[-1] in "Zz" else (value_zone or start.tzinfo))
+            dates.append(moment.astimezone(start.tzinfo))
+    return dates
+
+
+def parse_series(event):
+    """
+    Builds the Series for a master event with a 'recurrence' list
+    (RRULE, EXRULE, RDATE and EXDATE lines, as the Calendar API returns them).
+    """
+    zone = tz.gettz(event['start']['timeZone']) if event['start'].get('timeZone') else None
+    start, all_day = _start_of(event['start'], zone)
+    end, _ = _start_of(event.get('end') or event['start'], zone)
+    duration = max(end - start, timedelta(0))
+
+    rules = rrule.rruleset()
+    finite = True
+    has_rule = False
+    for line in event.get('recurrence', []):
+        kind = line.split(":", 1)[0].split(";", 1)[0].strip().upper()
+        if kind in ("RRULE", "EXRULE"):
+            text = _normalize_until(line.split(":", 1)[1], all_day)
+            parsed = rrule.rrulestr(text, dtstart=start)
+            if kind == "RRULE":
+                rules.rrule(parsed)
+                has_rule = True
+                finite = finite and ("COUNT=" in text.upper() or "UNTIL=" in text.upper())
+            else:
+                rules.exrule(parsed)
+        elif kind == "RDATE":
+            for value in _parse_dates(line, start, zone, all_day):
+                rules.rdate(value)
+        elif kind == "EXDATE":
+            for value in _parse_dates(line, start, zone, all_day):
+                rules.exdate(value)
+    # The master's own start is always the first occurrence
+    rules.rdate(start)
+    return Series(rules, start, duration, all_day, event['start'].get('timeZone'), finite or not has_rule)
+
+
+class SeriesCache:
+    """
+    LRU of parsed series keyed by event ID and last update, so expanding the
+    same masters for every question does not re-parse their rules.
+    """
+
+    def __init__(self, max_size=DEFAULT_CACHE_SIZE):
+        self.max_size = max_size
+        self._series = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, event):
+        key = (event['id'], event.get('updated') or event.get('etag') or repr(event.get('recurrence')))
+        with self._lock:
+            series = self._series.get(key)
+            if series is not None:
+                self._series.move_to_end(key)
+                self.hits += 1
+                return series
+            self.misses += 1
+        series = parse_series(event)
+        with self._lock:
+            self._series[key] = series
+            while len(self._series) > self.max_size:
+                self._series.popitem(last=False)
+        return series
+
+
+_cache = SeriesCache()
+
+
+def _when(value, series):
+    if series.all_day:
+        return {'date': value.strftime("%Y-%m-%d")}
+    when = {'dateTime': value.isoformat()}
+    if series.time_zone:
+        when['timeZone'] = series.time_zone
+    return when
+
+
+def expand_event(master, time_min=None, time_max=None, skip=(), cache=_cache):
+    """
+    Lazily yields the occurrences of a recurring master event that overlap
+    [time_min, time_max), in start order, shaped like the instances the API
+    returns with singleEvents=True. `skip` holds epoch start times of
+    occurrences replaced by exceptions (moved, edited or cancelled).
+    """
+    series = cache.get(master) if cache is not None else parse_series(master)
+    duration = series.duration.total_seconds()
+    window_start = None if time_min is None else time_min.timestamp()
+    low = None if window_start is None else window_start - duration
+    high = None if time_max is None else time_max.timestamp()
+
+    starts, times = series.starts_between(low, high)
+    for start, start_ts in zip(starts, times):
+        if duration and window_start is not None and start_ts + duration <= window_start:
+            continue
+        if start_ts in skip:
+            continue
+        suffix, start_when, end_when = series.formatted(start, start_ts)
+        instance = {key: value for key, value in master.items() if key not in ('recurrence', 'id')}
+        instance['id'] = f"{master['id']}_{suffix}"
+        instance['recurringEventId'] = master['id']
+        instance['originalStartTime'] = dict(start_when)
+        instance['start'] = dict(start_when)
+        instance['end'] = dict(end_when)
+        yield instance
@@ -0,0 +1,385 @@
+"""
+Service mode: the assistant's parse, create and chat operations over HTTP
+for a whole team, each user acting with their own Google credentials.
+
+    python server.py --port 8080
+
+Users are registered with the service token, which an administrator or an
+authenticating proxy holds: PUT /v1/credentials with
+"Authorization: Bearer <CALENDAR_ASSISTANT_SERVER_TOKEN>" and the user in
+the X-User-Id header stores their Google token and answers with an API key
+for that user. The user then sends "Authorization: Bearer <API key>", which
+alone says who they are; X-User-Id is only believed next to the service
+token. Without a service token the server trusts X-User-Id and only listens
+on the loopback interface.
+
+    PUT    /v1/credentials    store the user's authorized-user OAuth token (JSON) -> {"user": ..., "api_key": ...}
+    DELETE /v1/credentials    forget it and the user's API key
+    POST   /v1/events/parse   {"text": ...} -> {"events": [...], "errors": [...]}
+    POST   /v1/events         {"events": [...], "calendar": ..., "color": ...} -> {"events": [...], "errors": [...]}
+    POST   /v1/chat           {"query": ...} -> {"answer": ...}
+    GET    /healthz           queue and pool sizes
+    GET    /metrics           Prometheus text, with the prometheus trace exporter enabled
+
+The assistant's calls block (LLM streams, Calendar requests), so they run on
+a thread pool. Users take turns for its workers, each with a limit on
+requests running at once and a per-minute rate limit.
+"""
+import argparse
+import asyncio
+import functools
+import hmac
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from aiohttp import web
+
+import config
+import tracing
+from accounts import DEFAULT_POOL_SIZE, AccountPool, CredentialStore, UnknownUser, check_user_id
+from assistant import answer_calendar_query, create_suggested_events, suggest_events
+from event_schema import EventRecord
+from transport import TokenBucket
+
+DEFAULT_HOST = "127.0.0.1"
+# Hosts the server may listen on without a service token
+LOOPBACK_HOSTS = {"127.0.0.1", "::1", "localhost"}
+DEFAULT_PORT = 8080
+# Assistant calls running at once across all users
+DEFAULT_WORKERS = 32
+# Requests a user can send at once before the per-minute limit applies
+USER_BURST = 10
+# Largest request body accepted, in bytes
+MAX_BODY_SIZE = 1024 * 1024
+
+SERVICE = web.AppKey("service", object)
+
+
+class FairScheduler:
+    """
+    Runs blocking calls on a thread pool, taking turns between users. Each
+    user has a queue; whenever a worker is free, the next call comes from the
+    first user in line who is running fewer than `per_user` calls, and that
+    user goes to the back of the line. A user who sends hundreds of requests
+    at once only delays their own.
+    Must be used from a single event loop.
+    """
+
+    def __init__(self, workers=DEFAULT_WORKERS, per_user=config.USER_CONCURRENCY):
+        self.workers = workers
+        self.per_user = per_user
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="assistant")
+        self._queues = OrderedDict()  # user ID -> deque of (future, function), next in line first
+        self._running = {}            # user ID -> calls running
+        self._busy = 0
+
+    async def run(self, user_id, function, *args):
+        """
+        Runs function(*args) on a worker when it is the user's turn and returns its result.
+        """
+        future = asyncio.get_running_loop().create_future()
+        self._queues.setdefault(user_id, deque()).append((future, functools.partial(function, *args)))
+        self._dispatch()
+        return await future
+
+    def _next_user(self):
+        for user_id in self._queues:
+            if self._running.get(user_id, 0) < self.per_user:
+                return user_id
+        return None
+
+    def _dispatch(self):
+        loop = asyncio.get_running_loop()
+        while self._busy < self.workers:
+            user_id = self._next_user()
+            if user_id is None:
+                return
+            queue = self._queues.pop(user_id)
+            future, call = queue.popleft()
+            if queue:
+                self._queues[user_id] = queue
+            if future.done():
+                # The client went away while the call was queued
+                continue
+            self._busy += 1
+            self._running[user_id] = self._running.get(user_id, 0) + 1
+            work = loop.run_in_executor(self._executor, call)
+            work.add_done_callback(functools.partial(self._finished, user_id, future))
+
+    def _finished(self, user_id, future, work):
+        self._busy -= 1
+        self._running[user_id] -= 1
+        if not self._running[user_id]:
+            del self._running[user_id]
+        if not future.done():
+            if work.cancelled():
+                future.cancel()
+            elif work.exception() is not None:
+                future.set_exception(work.exception())
+            else:
+                future.set_result(work.result())
+        self._dispatch()
+
+    def stats(self):
+        return {
+            'running': self._busy,
+            'queued': sum(len(queue) for queue in self._queues.values()),
+            'users_waiting': len(self._queues),
+        }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+class UserLimits:
+    """
+    Per-user rate limit: `per_minute` requests, with bursts of up to `burst`.
+    A user's bucket is dropped once they have been idle long enough for it
+    to refill, since a new one starts full.
+    """
+
+    def __init__(self, per_minute=config.USER_REQUESTS_PER_MINUTE, burst=USER_BURST):
+        self.rate = per_minute / 60
+        self.burst = burst
+        self._buckets = OrderedDict()  # user ID -> (bucket, time of the last request), least recent first
+
+    def check(self, user_id):
+        """
+        Counts a request. Returns 0 if it is allowed, otherwise the seconds until it would be.
+        """
+        now = time.monotonic()
+        refill = self.burst / self.rate
+        while self._buckets:
+            first_user, (_, last_seen) = next(iter(self._buckets.items()))
+            if now - last_seen < refill:
+                break
+            del self._buckets[first_user]
+        bucket, _ = self._buckets.pop(user_id, (None, None))
+        if bucket is None:
+            bucket = TokenBucket(self.rate, self.burst)
+        self._buckets[user_id] = (bucket, now)
+        return bucket.try_acquire()
+
+    def __len__(self):
+        return len(self._buckets)
+
+
+def _error(status, message, headers=None):
+    return web.json_response({'error': message}, status=status, headers=headers)
+
+
+async def _body(request):
+    try:
+        body = await request.json()
+    except ValueError:
+        raise web.HTTPBadRequest(text="Request body is not JSON")
+    if not isinstance(body, dict):
+        raise web.HTTPBadRequest(text="Request body must be a JSON object")
+    return body
+
+
+def _text_field(body, name):
+    value = body.get(name)
+    if not isinstance(value, str) or not value.strip():
+        raise web.HTTPBadRequest(text=f"'{name}' must be a non-empty string")
+    return value
+
+
+class AssistantService:
+    """
+    Request handlers. Each user's work runs on the scheduler with their
+    account leased from the pool.
+    """
+
+    def __init__(self, store, pool, scheduler, limits):
+        self.store = store
+        self.pool = pool
+        self.scheduler = scheduler
+        self.limits = limits
+
+    def _with_account(self, user_id, operation, call):
+        with tracing.span(f"server.{operation}", user=user_id), self.pool.lease(user_id) as account:
+            return call(account)
+
+    async def _run(self, request, operation, call):
+        """
+        Applies the user's rate limit, then runs call(account) in their turn.
+        """
+        user_id = request['user_id']
+        wait = self.limits.check(user_id)
+        if wait:
+            raise web.HTTPTooManyRequests(text="Rate limit exceeded", headers={"Retry-After": str(int(wait) + 1)})
+        return await self.scheduler.run(user_id, self._with_account, user_id, operation, call)
+
+    async def put_credentials(self, request):
+        body = await _body(request)
+        user_id = request['user_id']
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self.store.save, user_id, body)
+        self.pool.discard(user_id)
+        key = await loop.run_in_executor(None, self.store.issue_key, user_id)
+        return web.json_response({'user': user_id, 'api_key': key})
+
+    async def delete_credentials(self, request):
+        user_id = request['user_id']
+        await asyncio.get_running_loop().run_in_executor(None, self.store.delete, user_id)
+        self.pool.discard(user_id)
+        return web.Response(status=204)
+
+    async def parse(self, request):
+        text = _text_field(await _body(request), "text")
+        records, problems = await self._run(request, "parse", lambda account: suggest_events(text))
+        return web.json_response({'events': [record.to_dict() for record in records], 'errors': problems})
+
+    async def create(self, request):
+        body = await _body(request)
+        items = body.get('events')
+        if not isinstance(items, list) or not items:
+            raise web.HTTPBadRequest(text="'events' must be a non-empty list")
+        now = datetime.now()
+        records, errors = [], []
+        for index, item in enumerate(items):
+            try:
+                if not isinstance(item, dict):
+                    raise ValueError("event must be an object")
+                records.append(EventRecord.from_dict(item, now))
+            except ValueError as e:
+                errors.append(f"event {index}: {e}")
+        if not records:
+            return web.json_response({'events': [], 'errors': errors}, status=400)
+
+        created, failures = await self._run(request, "create", lambda account: create_suggested_events(
+            records, body.get('calendar'), body.get('color'), account=account))
+        events = []
+        for index, record in enumerate(records):
+            event = record.to_dict()
+            if index in created:
+                event['id'] = created[index].get('id')
+                event['htmlLink'] = created[index].get('htmlLink')
+            else:
+                event['error'] = failures.get(index, "not created")
+            events.append(event)
+        return web.json_response({'events': events, 'errors': errors})
+
+    async def chat(self, request):
+        query = _text_field(await _body(request), "query")
+        answer = await self._run(request, "chat", lambda account: answer_calendar_query(query, account=account))
+        return web.json_response({'answer': answer})
+
+    async def health(self, request):
+        return web.json_response(dict(self.scheduler.stats(), accounts=len(self.pool)))
+
+    async def metrics(self, request):
+        for exporter in tracing.exporters():
+            if isinstance(exporter, tracing.PrometheusExporter):
+                return web.Response(text=exporter.render(), content_type="text/plain")
+        raise web.HTTPNotFound(text="Start the server with CALENDAR_ASSISTANT_TRACE=prometheus")
+
+
+# Paths that need no user
+_PUBLIC_PATHS = {"/healthz", "/metrics"}
+
+
+def _authenticate(store, token):
+    """
+    Finds the request's user: the owner of its API key, or the X-User-Id
+    header when it carries the service token or the server has none.
+    Registering credentials takes the service token, or the user's own key
+    to replace them.
+    """
+    @web.middleware
+    async def middleware(request, handler):
+        if request.path in _PUBLIC_PATHS:
+            return await handler(request)
+        scheme, _, bearer = request.headers.get("Authorization", "").partition(" ")
+        bearer = bearer.strip() if scheme.lower() == "bearer" else ""
+        if not token or (bearer and hmac.compare_digest(bearer, token)):
+            try:
+                request['user_id'] = check_user_id(request.headers.get("X-User-Id"))
+            except ValueError as e:
+                return _error(400, str(e))
+            return await handler(request)
+        user_id = None
+        if bearer:
+            user_id = await asyncio.get_running_loop().run_in_executor(None, store.user_for_key, bearer)
+        if user_id is None:
+            return _error(401, "Missing or wrong bearer token")
+        if request.headers.get("X-User-Id", user_id) != user_id:
+            return _error(403, "X-User-Id does not match the API key")
+        request['user_id'] = user_id
+        return await handler(request)
+    return middleware
+
+
+@web.middleware
+async def _errors(request, handler):
+    """
+    Answers every error with a JSON body.
+    """
+    try:
+        return await handler(request)
+    except web.HTTPException as e:
+        if e.status < 400:
+            raise
+        return _error(e.status, e.text, headers={key: value for key, value in e.headers.items()
+                                                 if key == "Retry-After"})
+    except UnknownUser:
+        return _error(403, "No credentials stored for this user; PUT them to /v1/credentials first")
+    except ValueError as e:
+        return _error(400, str(e))
+    except Exception as e:
+        print(f"Error handling {request.method} {request.path}: {e}")
+        return _error(500, "Internal error")
+
+
+def create_app(store=None, workers=DEFAULT_WORKERS, pool_size=DEFAULT_POOL_SIZE, per_user=config.USER_CONCURRENCY,
+               per_minute=config.USER_REQUESTS_PER_MINUTE, burst=USER_BURST, token=config.SERVER_TOKEN):
+    """
+    Builds the aiohttp application.
+    """
+    store = store or CredentialStore()
+    scheduler = FairScheduler(workers, per_user)
+    service = AssistantService(store, AccountPool(store, pool_size), scheduler, UserLimits(per_minute, burst))
+
+    app = web.Application(middlewares=[_errors, _authenticate(store, token)], client_max_size=MAX_BODY_SIZE)
+    app[SERVICE] = service
+    app.add_routes([
+        web.put("/v1/credentials", service.put_credentials),
+        web.delete("/v1/credentials", service.delete_credentials),
+        web.post("/v1/events/parse", service.parse),
+        web.post("/v1/events", service.create),
+        web.post("/v1/chat", service.chat),
+        web.get("/healthz", service.health),
+        web.get("/metrics", service.metrics),
+    ])
+
+    async def cleanup(app):
+        scheduler.shutdown()
+        service.pool.close()
+
+    app.on_cleanup.append(cleanup)
+    return app
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("--host", default=DEFAULT_HOST)
+    arg_parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    arg_parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="Assistant calls run at once")
+    arg_parser.add_argument("--pool-size", type=int, default=DEFAULT_POOL_SIZE, help="User accounts kept open")
+    arg_parser.add_argument("--user-burst", type=int, default=USER_BURST,
+                            help="Requests a user can send at once before the per-minute limit applies")
+    args = arg_parser.parse_args(argv)
+    if not config.SERVER_TOKEN and args.host not in LOOPBACK_HOSTS:
+        arg_parser.error(f"set CALENDAR_ASSISTANT_SERVER_TOKEN to listen on {args.host}; without it, "
+                         "anyone who can reach the server could act as any user")
+
+    tracing.configure()
+    web.run_app(create_app(workers=args.workers, pool_size=args.pool_size, burst=args.user_burst),
+                host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+import os
+import threading
+
+import config
+
+# Lazily initialized singletons; guarded by _lock so concurrent first use builds them once
+_lock = threading.RLock()
+_creds = None
+_calendar_service = None
+_calendar_id_thread = None
+_calendar_id = None
+
+
+def load_credentials():
+    """
+    Loads OAuth credentials from the token file, refreshing or re-running the
+    browser flow only when there is no usable token on disk.
+    """
+    from google.oauth2.credentials import Credentials
+
+    creds = None
+    if os.path.exists(config.GOOGLE_TOKEN_PATH):
+        try:
+            creds = Credentials.from_authorized_user_file(config.GOOGLE_TOKEN_PATH, config.SCOPES)
+        except Exception as e:
+            print(f"Error reading saved token, re-authorizing: {e}")
+            creds = None
+
+    if creds and creds.valid:
+        return creds
+
+    if creds and creds.expired and creds.refresh_token:
+        from google.auth.transport.requests import Request
+        try:
+            creds.refresh(Request())
+            save_credentials(creds)
+            return creds
+        except Exception as e:
+            print(f"Error refreshing token, re-authorizing: {e}")
+
+    from google_auth_oauthlib.flow import InstalledAppFlow
+    flow = InstalledAppFlow.from_client_secrets_file(config.GOOGLE_CLIENT_SECRET_PATH, config.SCOPES)
+    creds = flow.run_local_server(port=0)
+    save_credentials(creds)
+    return creds
+
+
+def save_credentials(creds, path=None):
+    """
+    Persists refreshable credentials so the next launch can skip the OAuth flow.
+    """
+    path = path or config.GOOGLE_TOKEN_PATH
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, "w") as f:
+        f.write(creds.to_json())
+    os.replace(tmp_path, path)
+
+
+def get_credentials():
+    """
+    Returns the shared credentials, loading them on first use.
+    """
+    global _creds
+    if _creds is None:
+        with _lock:
+            if _creds is None:
+                _creds = load_credentials()
+    return _creds
+
+
+def build_calendar_service(creds, http=None, api_endpoint=None):
+    """
+    Builds a Calendar API client from the discovery document bundled with
+    google-api-python-client, so no discovery round trip is made.
+    """
+    from googleapiclient.discovery import build
+
+    api_endpoint = api_endpoint or config.GOOGLE_API_ENDPOINT
+    client_options = {'api_endpoint': api_endpoint} if api_endpoint else None
+    if http is not None:
+        return build('calendar', 'v3', http=http, client_options=client_options,
+                     static_discovery=True, cache_discovery=False)
+    return build('calendar', 'v3', credentials=creds, client_options=client_options,
+                 static_discovery=True, cache_discovery=False)
+
+
+class ThreadLocalHttp:
+    """
+    HTTP object for the shared Calendar client that gives every thread its own
+    authorized connection, so the client can be used from worker threads.
+    """
+
+    def __init__(self, http_factory):
+        self._http_factory = http_factory
+        self._local = threading.local()
+
+    def _http(self):
+        if not hasattr(self._local, 'http'):
+            self._local.http = self._http_factory()
+        return self._local.http
+
+    def request(self, *args, **kwargs):
+        return self._http().request(*args, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self._http(), name)
+
+
+def get_calendar_service():
+    """
+    Returns the shared Calendar API client, building it on first use.
+    The client is safe to use from any thread.
+    """
+    global _calendar_service
+    if _calendar_service is None:
+        with _lock:
+            if _calendar_service is None:
+                _calendar_service = build_calendar_service(get_credentials(), http=ThreadLocalHttp(authorized_http))
+    return _calendar_service
+
+
+def authorized_http(timeout=None):
+    """
+    Returns a new authorized HTTP object for use outside the main thread.
+    httplib2 connections are not thread-safe, so background work must not share
+    the client's default transport. Requests go through the shared Calendar
+    rate limit and are retried on transient errors.
+    """
+    import httplib2
+    from google_auth_httplib2 import AuthorizedHttp
+    from transport import RetryingHttp
+
+    return RetryingHttp(AuthorizedHttp(get_credentials(), http=httplib2.Http(timeout=timeout)))
+
+
+def get_or_create_calendar(http=None, registry=None, service=None):
+    """
+    Ensure 'Calendar Assistant Calendar' exists, or create it if not found.
+    Uses the app's shared registry and client unless others are given.
+    """
+    from calendar_registry import get_calendar_registry
+
+    registry = registry or get_calendar_registry()
+    try:
+        calendar_id = registry.get_id(config.ASSISTANT_CALENDAR_NAME, http=http)
+        if calendar_id:
+            return calendar_id
+
+        # Create calendar if not found
+        calendar_body = {
+            'summary': config.ASSISTANT_CALENDAR_NAME,
+            'timeZone': 'UTC'
+        }
+        created_calendar = (service or get_calendar_service()).calendars().insert(body=calendar_body).execute(http=http)
+        registry.add(created_calendar)
+        return created_calendar['id']
+    except Exception as e:
+        print(f"Error creating or fetching calendar: {e}")
+        return None
+
+
+def _resolve_calendar_id():
+    global _calendar_id
+    _calendar_id = get_or_create_calendar(http=authorized_http())
+
+
+def resolve_assistant_calendar_async():
+    """
+    Starts resolving the assistant calendar ID on a background thread.
+    Safe to call more than once; only the first call starts the lookup.
+    """
+    global _calendar_id_thread
+    with _lock:
+        if _calendar_id_thread is None:
+            _calendar_id_thread = threading.Thread(
+                target=_resolve_calendar_id, name="calendar-id-resolver", daemon=True
+            )
+            _calendar_id_thread.start()
+    return _calendar_id_thread
+
+
+def get_assistant_calendar_id(timeout=None):
+    """
+    Returns the assistant calendar ID, waiting for the background lookup if it
+    is still running. Retries the lookup if the previous attempt failed.
+    """
+    global _calendar_id_thread
+    resolve_assistant_calendar_async().join(timeout)
+    if _calendar_id is None and not _calendar_id_thread.is_alive():
+        with _lock:
+            _calendar_id_thread = None
+    return _calendar_id
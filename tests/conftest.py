@@ -0,0 +1,81 @@
+import os
+
+import httplib2
+import openai
+import pytest
+
+from benchmarks.fake_google import FakeCalendarServer, FakeCalendarState
+from benchmarks.fake_openai import FakeOpenAIServer, FakeOpenAIState
+from event_store import EventStore
+from services import build_calendar_service
+
+CALENDAR_ID = "cal@example.com"
+
+
+@pytest.fixture
+def fake_openai():
+    """
+    The fake OpenAI endpoint, without latency, with the client pointed at it.
+    Tests change the replies on the state it yields.
+    """
+    state = FakeOpenAIState(first_token_latency=0, token_latency=0)
+    api_base, api_key = openai.api_base, openai.api_key
+    with FakeOpenAIServer(state) as server:
+        openai.api_base = server.url
+        openai.api_key = "fake"
+        state.url = server.url
+        try:
+            yield state
+        finally:
+            openai.api_base, openai.api_key = api_base, api_key
+
+
+@pytest.fixture
+def fake_calendar():
+    """
+    The fake Calendar API, without latency, with one empty calendar, CALENDAR_ID.
+    """
+    state = FakeCalendarState()
+    state.add_calendar(CALENDAR_ID, "Test")
+    with FakeCalendarServer(state) as server:
+        state.url = server.url
+        yield state
+
+
+class FakeAccount:
+    """
+    The parts of an account the journal, the mirror, the importer and chat
+    sessions use, backed by the fake Calendar API. CALENDAR_ID stands in for
+    the assistant calendar and is the only calendar listed.
+    """
+
+    def __init__(self, url, directory):
+        self.url = url
+        self.service = build_calendar_service(None, http=httplib2.Http(timeout=5), api_endpoint=url)
+        self.store = EventStore(os.path.join(directory, "events.sqlite3"), service_factory=self.calendar_service,
+                                http_factory=lambda timeout=None: httplib2.Http(timeout=timeout))
+
+    def calendar_service(self):
+        return self.service
+
+    def calendar_registry(self):
+        return self
+
+    def get_id(self, name):
+        return None
+
+    def calendars(self):
+        return [{'id': CALENDAR_ID, 'summary': "Test"}]
+
+    def assistant_calendar_id(self, timeout=None):
+        return CALENDAR_ID
+
+    def event_store(self):
+        return self.store
+
+
+@pytest.fixture
+def fake_account(fake_calendar, tmp_path):
+    account = FakeAccount(fake_calendar.url, str(tmp_path))
+    yield account
+    account.store.close()
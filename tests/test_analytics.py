@@ -0,0 +1,167 @@
+from datetime import datetime
+
+import numpy as np
+
+from analytics import EventColumns, analytics_summary, load_snapshot
+from tests.conftest import CALENDAR_ID
+
+# A Saturday
+NOW = datetime(2026, 10, 24, 12, 0)
+
+
+def timed(summary, day, start, end, status="confirmed"):
+    return {'id': f"{summary}-{day}-{start}".lower().replace(" ", "").replace(":", ""), 'status': status,
+            'summary': summary, 'start': {'dateTime': f"2026-10-{day}T{start}:00"},
+            'end': {'dateTime': f"2026-10-{day}T{end}:00"}}
+
+
+def all_day(summary, day):
+    return {'id': f"{summary}-{day}".lower(), 'summary': summary,
+            'start': {'date': f"2026-10-{day}"}, 'end': {'date': f"2026-10-{int(day) + 1}"}}
+
+
+WORK = [
+    timed("Standup", 19, "09:00", "09:30"),
+    timed("Design review", 19, "09:15", "10:15"),
+    timed("Standup", 20, "09:00", "09:30"),
+    timed("Offsite", 21, "09:00", "17:00"),
+    timed("Lunch", 21, "12:00", "13:00"),
+    timed("Interview", 21, "14:00", "15:00"),
+    timed("Standup", 22, "09:00", "09:30"),
+    timed("Cancelled sync", 22, "10:00", "11:00", status="cancelled"),
+    all_day("Conference", 23),
+]
+HOME = [
+    timed("Gym", 19, "18:00", "19:00"),
+    timed("Gym", 26, "18:00", "19:00"),
+]
+
+
+def snapshot():
+    return EventColumns.build([("work", WORK), ("home", HOME)])
+
+
+def week(columns, **options):
+    return columns.select(datetime(2026, 10, 19), datetime(2026, 10, 26), **options)
+
+
+def titles(columns, rows):
+    return [columns.titles[columns.columns['title'][row]] for row in rows]
+
+
+def test_build_sorts_by_start_and_leaves_out_cancelled_events():
+    columns = snapshot()
+
+    assert len(columns) == 10
+    assert list(columns.columns['start']) == sorted(columns.columns['start'])
+    assert "Cancelled sync" not in columns.titles
+    assert columns.calendars == ["work", "home"]
+
+
+def test_select_by_window_calendar_and_title():
+    columns = snapshot()
+
+    assert len(week(columns)) == 8
+    assert len(week(columns, all_day=True)) == 9
+    assert titles(columns, week(columns, calendars={"home"})) == ["Gym"]
+    assert titles(columns, week(columns, titles=columns.titles_matching(["standup"]))) == ["Standup"] * 3
+
+
+def test_hours_and_totals():
+    columns = snapshot()
+    rows = week(columns)
+
+    assert columns.hours(rows).sum() == 0.5 + 1 + 1 + 0.5 + 8 + 1 + 1 + 0.5
+    days, hours, counts = columns.totals(rows, "day")
+    assert [str(day) for day in days] == ["2026-10-19", "2026-10-20", "2026-10-21", "2026-10-22"]
+    assert list(hours) == [2.5, 0.5, 10, 0.5]
+    assert list(counts) == [3, 1, 3, 1]
+    weeks, hours, counts = columns.totals(columns.select(datetime(2026, 10, 1), datetime(2026, 11, 1)), "week")
+    assert [str(day) for day in weeks] == ["2026-10-19", "2026-10-26"]
+    assert list(hours) == [13.5, 1]
+    months, hours, _ = columns.totals(rows, "month")
+    assert [str(day) for day in months] == ["2026-10-01"] and list(hours) == [13.5]
+
+
+def test_histograms():
+    columns = snapshot()
+    rows = week(columns)
+
+    weekday_hours, weekday_counts = columns.histogram(rows, "weekday")
+    assert list(weekday_hours) == [2.5, 0.5, 10, 0.5, 0, 0, 0]
+    assert list(weekday_counts) == [3, 1, 3, 1, 0, 0, 0]
+    hour_hours, _ = columns.histogram(rows, "hour")
+    assert hour_hours[9] == 0.5 * 3 + 1 + 8 and hour_hours[18] == 1
+    calendar_hours, _ = columns.histogram(rows, "calendar")
+    assert list(calendar_hours) == [12.5, 1]
+
+
+def test_overlaps():
+    columns = snapshot()
+
+    overlapping, earlier, booked_twice = columns.overlaps(week(columns))
+
+    # Lunch and the interview fall inside the offsite; the review starts during standup
+    assert list(zip(titles(columns, overlapping), titles(columns, earlier))) == [
+        ("Design review", "Standup"), ("Lunch", "Offsite"), ("Interview", "Offsite")]
+    assert booked_twice == 0.25 + 1 + 1
+
+
+def test_overlaps_follow_the_latest_ending_event():
+    columns = EventColumns.build([("work", [
+        timed("A", 19, "09:00", "10:00"),
+        timed("B", 19, "09:30", "11:00"),
+        timed("C", 19, "10:30", "12:00"),
+        timed("D", 19, "12:00", "13:00"),
+    ])])
+
+    overlapping, earlier, booked_twice = columns.overlaps(week(columns))
+
+    # D starts as C ends, which is not an overlap
+    assert list(zip(titles(columns, overlapping), titles(columns, earlier))) == [("B", "A"), ("C", "B")]
+    assert booked_twice == 1.0
+    assert columns.overlaps(week(columns)[:1])[2] == 0.0
+
+
+def test_summary_of_a_week():
+    summary = analytics_summary(snapshot(), "How many hours of meetings did I have last week?",
+                                now=datetime(2026, 10, 31, 12, 0))
+
+    assert "starting between 2026-10-19 00:00 and 2026-10-26 00:00" in summary
+    assert "Total: 13.5 hours in 8 timed events, plus 1 all-day events." in summary
+    assert "Busiest weekday: Wednesday." in summary
+    assert "Busiest day: Wed 2026-10-21, 10.0 hours in 3 events." in summary
+    assert "3 events start before an earlier one ends, 2.2 hours booked twice." in summary
+
+
+def test_summary_limited_to_matching_titles():
+    summary = analytics_summary(snapshot(), "How much time do I spend in standup or yoga per day this week?",
+                                now=NOW)
+
+    assert "events whose titles mention 'standup'" in summary
+    assert "No event titles mention 'yoga'." in summary
+    assert "Total: 1.5 hours in 3 timed events." in summary
+    assert "Hours per day (events):" in summary
+
+
+def test_snapshot_is_rebuilt_only_when_the_mirror_changes(fake_calendar, fake_account):
+    fake_calendar.add_calendar("other@example.com")
+    for event in WORK:
+        fake_calendar.put_event(CALENDAR_ID, event)
+    store = fake_account.store
+    store.sync([CALENDAR_ID], max_age=0)
+    first = load_snapshot(store, [CALENDAR_ID], today=NOW.date())
+    assert len(first) == 8
+
+    # A change elsewhere moves the sync token without touching this calendar
+    fake_calendar.put_event("other@example.com", timed("Elsewhere", 20, "10:00", "11:00"))
+    store.sync([CALENDAR_ID], max_age=0)
+    assert load_snapshot(store, [CALENDAR_ID], today=NOW.date()) is first
+
+    fake_calendar.put_event(CALENDAR_ID, timed("Retro", 22, "15:00", "16:00"))
+    store.sync([CALENDAR_ID], max_age=0)
+    rebuilt = load_snapshot(store, [CALENDAR_ID], today=NOW.date())
+    assert rebuilt is not first
+    assert "Retro" in rebuilt.titles and len(rebuilt) == 9
+    assert np.array_equal(EventColumns.load(f"{store.path[:-len('.sqlite3')]}.columns").columns['start'],
+                          rebuilt.columns['start'])
@@ -0,0 +1,79 @@
+from datetime import datetime, time, timedelta
+
+from availability import BusyIndex, format_slots, is_availability_question, requested_duration
+
+MONDAY = datetime(2026, 10, 19)
+
+
+def at(hour, minute=0, day=0):
+    return MONDAY + timedelta(days=day, hours=hour, minutes=minute)
+
+
+def event(start, end, **fields):
+    return dict({'start': {'dateTime': start.astimezone().isoformat()},
+                 'end': {'dateTime': end.astimezone().isoformat()}}, **fields)
+
+
+def test_overlapping_and_touching_intervals_are_merged():
+    index = BusyIndex([(at(9), at(10)), (at(9, 30), at(11)), (at(11), at(12)), (at(14), at(15)), (at(13), at(13))])
+
+    assert len(index) == 2
+    assert list(index.busy_between(at(0), at(23))) == [(at(9).timestamp(), at(12).timestamp()),
+                                                       (at(14).timestamp(), at(15).timestamp())]
+
+
+def test_busy_between_returns_only_overlapping_intervals():
+    index = BusyIndex([(at(hour), at(hour, 30)) for hour in range(8, 18)])
+
+    busy = list(index.busy_between(at(10, 15), at(12)))
+
+    assert busy == [(at(10).timestamp(), at(10, 30).timestamp()), (at(11).timestamp(), at(11, 30).timestamp())]
+    # An interval ending exactly where the range starts does not overlap it
+    assert list(index.busy_between(at(10, 30), at(11))) == []
+
+
+def test_free_between_skips_gaps_shorter_than_the_minimum():
+    index = BusyIndex([(at(9), at(10)), (at(10, 30), at(12)), (at(14), at(15))])
+
+    free = list(index.free_between(at(8), at(16), timedelta(hours=1)))
+
+    assert free == [(at(8).timestamp(), at(9).timestamp()), (at(12).timestamp(), at(14).timestamp()),
+                    (at(15).timestamp(), at(16).timestamp())]
+
+
+def test_free_slots_stay_within_working_hours_and_weekdays():
+    index = BusyIndex([(at(7), at(9)), (at(12), at(19, 30))])
+
+    slots = index.free_slots(at(0), at(0, day=2), timedelta(hours=2), working_hours=(time(8), time(20)),
+                             weekdays={0})
+
+    assert slots == [(at(9), at(12))]
+
+
+def test_free_slots_start_no_earlier_than_the_window():
+    slots = BusyIndex().free_slots(at(15), at(18), timedelta(hours=1))
+
+    assert slots == [(at(15), at(18))]
+
+
+def test_transparent_cancelled_declined_and_all_day_events_do_not_block():
+    events = [
+        event(at(9), at(10)),
+        event(at(11), at(12), transparency='transparent'),
+        event(at(13), at(14), status='cancelled'),
+        event(at(15), at(16), attendees=[{'self': True, 'responseStatus': 'declined'}]),
+        {'start': {'date': "2026-10-19"}, 'end': {'date': "2026-10-20"}},
+    ]
+
+    index = BusyIndex.from_events(events)
+
+    assert list(index.busy_between(at(0), at(23))) == [(at(9).timestamp(), at(10).timestamp())]
+
+
+def test_questions_and_durations():
+    assert is_availability_question("When do I have time to grocery shop?")
+    assert not is_availability_question("What's on tomorrow?")
+    assert requested_duration("Find me 2 hours for the essay") == timedelta(hours=2)
+    assert requested_duration("any half hour free?") == timedelta(minutes=30)
+    assert requested_duration("when am I free") == timedelta(hours=1)
+    assert format_slots([]) == "No free slots in this period."
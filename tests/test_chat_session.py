@@ -0,0 +1,122 @@
+from datetime import datetime, timedelta
+
+from assistant import ChatSession
+from tests.conftest import CALENDAR_ID
+
+# A Monday morning
+NOW = datetime(2026, 10, 19, 9, 0)
+
+
+def meeting(event_id, summary, start):
+    """
+    A one-hour event starting at `start`, a naive local datetime.
+    """
+    return {'id': event_id, 'status': "confirmed", 'summary': summary,
+            'start': {'dateTime': start.astimezone().isoformat()},
+            'end': {'dateTime': (start + timedelta(hours=1)).astimezone().isoformat()}}
+
+
+def synced(fake_calendar, fake_account, *events):
+    for event in events:
+        fake_calendar.put_event(CALENDAR_ID, event)
+    fake_account.store.sync([CALENDAR_ID], max_age=0)
+    return fake_account.store
+
+
+def turn(session, store, question="What's on today?", now=NOW, names=("Test",), ids=(CALENDAR_ID,)):
+    return session.messages(question, now, list(names), list(ids), store)
+
+
+def test_prefix_is_the_same_every_turn(fake_calendar, fake_account):
+    store = synced(fake_calendar, fake_account, meeting("a", "Planning", NOW + timedelta(hours=2)))
+    session = ChatSession(account=fake_account)
+
+    first = turn(session, store)
+    session.history.append(("What's on today?", "Planning at 11am."))
+    second = turn(session, store, "And tomorrow?", now=NOW + timedelta(minutes=5))
+
+    assert first[:2] == second[:2]
+    assert "Planning" in first[1]['content'] and "2026-10-19" in first[1]['content']
+    # The time only appears in the last message
+    assert [message['role'] for message in second] == ["system", "system", "user", "assistant", "user"]
+    assert "09:05" not in "".join(message['content'] for message in second[:-1])
+    assert second[-1]['content'].startswith("The current time is Monday 2026-10-19 09:05.")
+    assert second[-1]['content'].endswith("User's query: And tomorrow?")
+
+
+def test_changes_since_the_snapshot_are_sent_as_a_delta(fake_calendar, fake_account):
+    store = synced(fake_calendar, fake_account, meeting("a", "Planning", NOW + timedelta(hours=2)),
+                   meeting("b", "Review", NOW + timedelta(days=1)))
+    session = ChatSession(account=fake_account)
+    first = turn(session, store)
+
+    fake_calendar.cancel_event(CALENDAR_ID, "b")
+    synced(fake_calendar, fake_account, meeting("c", "Dentist", NOW + timedelta(days=2)))
+    second = turn(session, store)
+
+    assert second[:2] == first[:2]
+    changes = second[2]
+    assert changes['role'] == "system" and changes['content'].startswith("Changes to the calendar")
+    lines = changes['content'].split("\n")[1:]
+    assert [line[:2] for line in lines] == ["+ ", "- "]
+    assert "Dentist" in lines[0] and "Review" in lines[1]
+    assert "Dentist" not in second[1]['content']
+
+
+def test_large_changes_rebuild_the_snapshot(fake_calendar, fake_account):
+    store = synced(fake_calendar, fake_account, meeting("a", "Planning", NOW + timedelta(hours=2)))
+    session = ChatSession(account=fake_account, delta_budget=20)
+    first = turn(session, store)
+
+    synced(fake_calendar, fake_account, *(meeting(f"n{day}", f"Offsite day {day}", NOW + timedelta(days=day))
+                                          for day in range(1, 6)))
+    second = turn(session, store)
+
+    assert second[1] != first[1]
+    assert "Offsite day 5" in second[1]['content']
+    assert not any(message['content'].startswith("Changes") for message in second)
+    # Once rebuilt, the next turn has nothing to add
+    assert turn(session, store)[:2] == second[:2]
+
+
+def test_snapshot_is_rebuilt_on_a_new_day_or_calendar_list(fake_calendar, fake_account):
+    store = synced(fake_calendar, fake_account, meeting("a", "Planning", NOW + timedelta(hours=2)))
+    session = ChatSession(account=fake_account)
+    first = turn(session, store)
+
+    next_day = turn(session, store, now=NOW + timedelta(days=1))
+    renamed = turn(session, store, now=NOW + timedelta(days=1), names=("Work",))
+
+    assert "2026-10-20" in next_day[1]['content'] and next_day[1] != first[1]
+    assert "Work" in renamed[0]['content'] and renamed[0] != next_day[0]
+
+
+def test_oldest_turns_are_dropped_first(fake_calendar, fake_account):
+    store = synced(fake_calendar, fake_account)
+    session = ChatSession(account=fake_account, history_budget=60)
+    session.history = [(f"Question {n} " + "word " * 20, f"Answer {n}") for n in range(4)]
+
+    messages = turn(session, store)
+
+    questions = [message['content'] for message in messages if message['role'] == "user"][:-1]
+    assert questions and questions[-1].startswith("Question 3")
+    assert not any(question.startswith("Question 0") for question in questions)
+    assert session.history[0][0] == questions[0]
+
+
+def test_ask_keeps_the_conversation(fake_calendar, fake_account, fake_openai):
+    synced(fake_calendar, fake_account, meeting("a", "Planning", datetime.now() + timedelta(hours=1)))
+    fake_openai.reply = lambda messages: f"Answer {len(fake_openai.requests)}"
+    session = ChatSession(account=fake_account)
+
+    assert session.ask("What's next?") == "Answer 1"
+    assert session.ask("And after that?") == "Answer 2"
+
+    first, second = (request['messages'] for request in fake_openai.requests)
+    assert second[:2] == first[:2]
+    assert second[2:4] == [{'role': "user", 'content': "What's next?"}, {'role': "assistant", 'content': "Answer 1"}]
+    assert session.history == [("What's next?", "Answer 1"), ("And after that?", "Answer 2")]
+
+    session.reset()
+    session.ask("Anything else?")
+    assert len(fake_openai.requests[-1]['messages']) == 3
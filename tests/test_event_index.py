@@ -0,0 +1,124 @@
+import math
+
+from event_index import EventIndex, event_terms, tokenize
+
+
+def event(summary, description="", location=""):
+    return {'summary': summary, 'description': description, 'location': location}
+
+
+def index_of(events, calendar="cal"):
+    index = EventIndex()
+    index.update(((calendar, event_id), body) for event_id, body in events.items())
+    return index
+
+
+def keys(hits):
+    return [event_id for (_, event_id), _ in hits]
+
+
+def test_tokenize_drops_stop_words_and_plurals():
+    assert tokenize("When is my next Dentist appointment?") == ["dentist", "appointment"]
+    assert tokenize("Meetings with the Boss") == ["meeting", "boss"]
+    assert tokenize("bus gas") == ["bus", "gas"]
+
+
+def test_title_counts_twice():
+    assert event_terms(event("Dentist", "Bring forms", "Main St")) == [
+        "dentist", "dentist", "bring", "form", "main", "st"]
+
+
+def test_score_is_bm25():
+    index = index_of({
+        "dentist": event("Dentist"),
+        "gym": event("Gym session"),
+        "lunch": event("Lunch with Sam"),
+    })
+
+    [(key, score)] = index.search("dentist")
+
+    # One of three documents matches; its length is 2 against an average of 10/3
+    idf = math.log1p((3 - 1 + 0.5) / (1 + 0.5))
+    norm = 1.2 * (1 - 0.75 + 0.75 * 2 / (10 / 3))
+    assert key == ("cal", "dentist")
+    assert math.isclose(score, idf * 2 * 2.2 / (2 + norm), rel_tol=1e-6)
+
+
+def test_title_match_outranks_description_match():
+    index = index_of({
+        "notes": event("Checkup", "ask the dentist about the crown"),
+        "title": event("Dentist", "checkup"),
+    })
+
+    assert keys(index.search("dentist")) == ["title", "notes"]
+
+
+def test_rare_terms_weigh_more():
+    index = index_of({
+        "both": event("Team review"),
+        "common": event("Team sync"),
+        "rare": event("Budget review"),
+        **{f"team{n}": event(f"Team {n}") for n in range(5)},
+    })
+
+    # 'budget' appears once, 'team' in most events
+    assert keys(index.search("team budget"))[:2] == ["rare", "both"]
+
+
+def test_shorter_events_rank_higher_for_the_same_match():
+    index = index_of({
+        "long": event("Dentist", "bring the insurance card and the forms from last visit", "Suite 400"),
+        "short": event("Dentist"),
+    })
+
+    assert keys(index.search("dentist")) == ["short", "long"]
+
+
+def test_no_match_and_stop_word_queries():
+    index = index_of({"gym": event("Gym")})
+
+    assert index.search("dentist") == []
+    assert index.search("when is my next thing") == []
+    assert EventIndex().search("gym") == []
+
+
+def test_limit_keeps_the_best():
+    index = index_of({f"e{n}": event("Yoga " + "x " * n) for n in range(20)})
+
+    assert keys(index.search("yoga", limit=3)) == ["e0", "e1", "e2"]
+
+
+def test_updates_replace_and_remove_events():
+    index = index_of({"a": event("Dentist"), "b": event("Gym")})
+    assert index.search("dentist")
+
+    index.update(changed=[(("cal", "a"), event("Orthodontist"))], removed=[("cal", "b")])
+
+    assert index.search("dentist") == []
+    assert keys(index.search("orthodontist")) == ["a"]
+    assert index.search("gym") == []
+    assert len(index) == 1
+
+
+def test_remove_where_forgets_a_calendar():
+    index = index_of({"a": event("Dentist")}, calendar="work")
+    index.update([(("home", "b"), event("Dentist"))])
+
+    index.remove_where(lambda key: key[0] == "work")
+
+    assert [key for key, _ in index.search("dentist")] == [("home", "b")]
+
+
+def test_compaction_keeps_results():
+    index = index_of({f"e{n}": event(f"Standup {n}") for n in range(10)})
+    index.search("standup")
+    # Replacing every event leaves more dead documents than live ones
+    for round_number in range(2):
+        index.update((("cal", f"e{n}"), event(f"Standup {n} v{round_number}")) for n in range(10))
+    scores = index.search("standup", limit=20)
+
+    assert len(index._keys) == 10
+    assert sorted(keys(scores)) == sorted(f"e{n}" for n in range(10))
+    assert keys(index.search("7")) == ["e7"]
+    index.update([(("cal", "new"), event("Standup"))])
+    assert keys(index.search("standup"))[0] == "new"
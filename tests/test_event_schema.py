@@ -0,0 +1,148 @@
+from datetime import date, datetime, time
+
+import pytest
+
+from event_schema import EventRecord, validate_event
+
+# A Saturday
+TODAY = datetime(2026, 10, 17, 9, 0)
+
+
+def record(today=TODAY, **fields):
+    return validate_event(dict({"title": "Dentist", "start_date": "2026-10-20"}, **fields), today)
+
+
+def test_well_formed_event_needs_no_repairs():
+    event = record(start_time="14:00", end_time="15:30", recurrence="", location="Main St")
+
+    assert (event.start_date, event.start_time, event.end_time) == (date(2026, 10, 20), time(14), time(15, 30))
+    assert event.location == "Main St" and not event.all_day
+    assert event.repairs == []
+
+
+def test_missing_title():
+    event = record(title="  ")
+
+    assert event.title == "Untitled Event"
+    assert event.repairs == ["title"]
+
+
+@pytest.mark.parametrize("value", ["", "someday", None])
+def test_unusable_start_date_is_rejected(value):
+    with pytest.raises(ValueError):
+        record(start_date=value)
+
+
+@pytest.mark.parametrize("value, expected", [
+    ("Oct 20", date(2026, 10, 20)),
+    ("10/20/2026", date(2026, 10, 20)),
+    ("today", date(2026, 10, 17)),
+    ("tomorrow", date(2026, 10, 18)),
+    ("Tuesday", date(2026, 10, 20)),
+])
+def test_loose_start_dates_are_repaired(value, expected):
+    event = record(start_date=value)
+
+    assert event.start_date == expected
+    assert event.repairs == ["start_date"]
+
+
+def test_end_date_before_start_is_dropped():
+    event = record(end_date="2026-10-01", recurrence="every Monday")
+
+    assert event.end_date is None
+    assert event.repairs == ["end_date"]
+
+
+def test_unreadable_end_date_is_dropped():
+    event = record(end_date="when it's done")
+
+    assert event.end_date is None
+    assert event.repairs == ["end_date"]
+
+
+@pytest.mark.parametrize("value, expected, repaired", [
+    ("18:30", time(18, 30), False),
+    ("6:30 PM", time(18, 30), True),
+    ("6pm", time(18), True),
+    ("12 am", time(0), True),
+    ("12:15pm", time(12, 15), True),
+])
+def test_start_time_formats(value, expected, repaired):
+    event = record(start_time=value, end_time="23:00")
+
+    assert event.start_time == expected
+    assert ("start_time" in event.repairs) == repaired
+
+
+def test_unreadable_start_time_is_dropped():
+    event = record(start_time="after lunch")
+
+    assert event.all_day
+    assert event.repairs == ["start_time"]
+
+
+def test_missing_end_time_defaults_to_an_hour():
+    event = record(start_time="09:00")
+
+    assert event.end_time == time(10)
+    assert event.repairs == ["end_time"]
+
+
+def test_end_time_equal_to_start_defaults_to_an_hour():
+    event = record(start_time="09:00", end_time="09:00")
+
+    assert event.end_time == time(10)
+    assert event.repairs == ["end_time"]
+
+
+def test_missing_start_time_is_an_hour_before_the_end():
+    event = record(end_time="10:00")
+
+    assert event.start_time == time(9)
+    assert event.repairs == ["start_time"]
+
+
+def test_end_before_start_runs_past_midnight():
+    event = record(start_time="22:00", end_time="02:00")
+
+    assert event.repairs == []
+    assert event.end() == datetime(2026, 10, 21, 2, 0)
+
+
+def test_midnight_start_without_an_end_stays_timed():
+    event = record(start_time="00:00")
+
+    assert not event.all_day
+    assert (event.start_time, event.end_time) == (time(0), time(1))
+    assert event.repairs == ["end_time"]
+
+
+def test_midnight_to_midnight_becomes_all_day():
+    event = record(start_time="12:00 AM", end_time="00:00")
+
+    assert event.all_day
+    assert event.end() == datetime(2026, 10, 21)
+    assert event.to_api_body()['start'] == {'date': "2026-10-20"}
+    assert event.repairs == ["start_time", "end_time"]
+
+
+@pytest.mark.parametrize("value, expected", [
+    ("", ""), ("No", ""), ("none", ""), ("Yes, every Monday", "every Monday"), ("every 2 weeks", "every 2 weeks"),
+])
+def test_recurrence_text(value, expected):
+    assert record(recurrence=value).recurrence == expected
+
+
+def test_confirmation_labels_are_accepted():
+    event = validate_event({"Title": "Yoga", "Start Date": "2026-10-21", "Start Time": "7:00 AM",
+                            "End Time": "8:00 AM", "Recurring": "Yes, every Wednesday"}, TODAY)
+
+    assert (event.title, event.start_time, event.end_time) == ("Yoga", time(7), time(8))
+    assert event.recurrence == "every Wednesday"
+
+
+def test_from_dict_round_trips():
+    event = record(start_time="22:00", end_time="02:00", end_date="2026-12-01", recurrence="every Tuesday")
+
+    assert EventRecord.from_dict(event.to_dict(), TODAY).to_dict() == event.to_dict()
@@ -0,0 +1,61 @@
+from datetime import datetime
+
+from tests.conftest import CALENDAR_ID
+
+
+def meeting(event_id, summary, day):
+    return {'id': event_id, 'status': "confirmed", 'summary': summary,
+            'start': {'dateTime': f"2026-10-{day}T10:00:00Z"}, 'end': {'dateTime': f"2026-10-{day}T11:00:00Z"}}
+
+
+def mirrored(store):
+    return [event['summary'] for event in store.events_between([CALENDAR_ID], datetime(2026, 10, 1),
+                                                               datetime(2026, 11, 1))]
+
+
+def test_incremental_sync_applies_changes(fake_calendar, fake_account):
+    fake_calendar.put_event(CALENDAR_ID, meeting("a", "Planning", 20))
+    fake_calendar.put_event(CALENDAR_ID, meeting("b", "Review", 21))
+    store = fake_account.store
+    store.sync([CALENDAR_ID], max_age=0)
+    first_token, _ = store.sync_state(CALENDAR_ID)
+
+    fake_calendar.cancel_event(CALENDAR_ID, "a")
+    fake_calendar.put_event(CALENDAR_ID, meeting("c", "Retro", 22))
+    assert store.sync([CALENDAR_ID], max_age=0) == {}
+
+    assert mirrored(store) == ["Review", "Retro"]
+    assert int(store.sync_state(CALENDAR_ID)[0]) > int(first_token)
+
+
+def test_expired_sync_token_rebuilds_the_mirror(fake_calendar, fake_account):
+    fake_calendar.put_event(CALENDAR_ID, meeting("a", "Planning", 20))
+    fake_calendar.put_event(CALENDAR_ID, meeting("b", "Review", 21))
+    store = fake_account.store
+    store.sync([CALENDAR_ID], max_age=0)
+    assert [event['id'] for event in store.search("planning")] == ["a"]
+    stale_token, _ = store.sync_state(CALENDAR_ID)
+
+    # Google forgets deletions older than the token, so only a full listing can drop "a"
+    with fake_calendar.lock:
+        del fake_calendar.events[CALENDAR_ID]["a"]
+    fake_calendar.put_event(CALENDAR_ID, meeting("c", "Retro", 22))
+    fake_calendar.min_sync_version = fake_calendar.version
+    requests = fake_calendar.request_count
+
+    assert store.sync([CALENDAR_ID], max_age=0) == {}
+
+    # One 410 for the old token, then the full listing
+    assert fake_calendar.request_count - requests == 2
+    assert mirrored(store) == ["Review", "Retro"]
+    assert store.search("planning") == []
+    assert [event['id'] for event in store.search("retro")] == ["c"]
+    new_token, _ = store.sync_state(CALENDAR_ID)
+    assert new_token == str(fake_calendar.version) != stale_token
+
+    # The new token works for the next incremental sync
+    fake_calendar.put_event(CALENDAR_ID, meeting("d", "Demo", 23))
+    requests = fake_calendar.request_count
+    store.sync([CALENDAR_ID], max_age=0)
+    assert fake_calendar.request_count - requests == 1
+    assert mirrored(store) == ["Review", "Retro", "Demo"]
@@ -0,0 +1,56 @@
+import json
+import os
+from datetime import datetime
+
+import pytest
+
+from fast_parser import FAST_PATH_THRESHOLD, fast_parse, fast_parse_events
+
+CORPUS_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), "benchmarks", "parse_corpus.jsonl")
+NOW = datetime(2026, 10, 17, 9, 30)
+
+with open(CORPUS_PATH) as corpus_file:
+    CORPUS = [json.loads(line) for line in corpus_file if line.strip()]
+
+
+@pytest.mark.parametrize("entry", CORPUS, ids=[entry['text'] for entry in CORPUS])
+def test_corpus(entry):
+    result = fast_parse(entry['text'], datetime.fromisoformat(entry['now']))
+
+    assert result.is_confident == entry['fast_path'], result
+    if entry['fast_path']:
+        assert {key: result.fields.get(key) for key in entry['expected']} == entry['expected']
+
+
+@pytest.mark.parametrize("text", ["Dentist Feb 30 at 3pm", "Review 2026-13-01 at 10am", "Standup at 25",
+                                  "Call 13/45 at 9am", "Lunch 14pm", "Meeting 12:30-13:75"])
+def test_misread_dates_and_times_go_to_gpt4(text):
+    result = fast_parse(text, NOW)
+
+    assert result.confidence == 0.0
+    assert fast_parse_events(text, NOW) is None
+
+
+@pytest.mark.parametrize("text", ["Workout 6am for 30 hours", "Hackathon tomorrow 9am for 24 hours"])
+def test_events_of_a_day_or_more_go_to_gpt4(text):
+    result = fast_parse(text, NOW)
+
+    assert result.confidence < FAST_PATH_THRESHOLD
+    assert "lasts a day or more" in result.reasons
+
+
+def test_overnight_event_stays_on_the_fast_path():
+    result = fast_parse("Night shift tomorrow 10pm-6am", NOW)
+
+    assert result.is_confident
+    assert (result.fields["Start Time"], result.fields["End Time"]) == ("10:00 PM", "6:00 AM")
+
+
+def test_one_event_per_line():
+    records = fast_parse_events("Gym every Monday 6pm\nDentist on Oct 22 at 3:30pm for 45 minutes", NOW)
+
+    assert [record.title for record in records] == ["Gym", "Dentist"]
+
+
+def test_one_unsure_line_sends_everything_to_gpt4():
+    assert fast_parse_events("Gym every Monday 6pm\nbuy groceries", NOW) is None
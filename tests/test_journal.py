@@ -0,0 +1,103 @@
+import json
+
+from journal import EventJournal, new_event_id
+from tests.conftest import CALENDAR_ID
+
+
+def body(title, hour=9):
+    return {'summary': title, 'start': {'dateTime': f"2026-11-02T{hour:02d}:00:00", 'timeZone': "UTC"},
+            'end': {'dateTime': f"2026-11-02T{hour:02d}:50:00", 'timeZone': "UTC"}}
+
+
+def journal_at(path, account):
+    return EventJournal(str(path), account=account, backoff=0.01, max_backoff=0.05)
+
+
+def summaries(state, status="confirmed"):
+    return sorted(event['summary'] for event in state.events[CALENDAR_ID].values() if event['status'] == status)
+
+
+def test_new_event_ids_are_random_base32hex():
+    identifiers = {new_event_id() for _ in range(100)}
+
+    assert len(identifiers) == 100
+    assert all(len(identifier) == 26 and set(identifier) <= set("0123456789abcdefghijklmnopqrstuv")
+               for identifier in identifiers)
+
+
+def test_events_are_created_with_their_journaled_ids(fake_calendar, fake_account, tmp_path):
+    journal = journal_at(tmp_path / "journal.jsonl", fake_account)
+    identifiers = journal.add([(None, body("Dentist"), {}), (None, body("Gym", 18), {})])
+    journal.start()
+
+    assert journal.wait(10)
+    journal.close()
+    assert sorted(fake_calendar.events[CALENDAR_ID]) == sorted(identifiers)
+    with open(tmp_path / "journal.jsonl") as journal_file:
+        lines = [json.loads(line) for line in journal_file]
+    assert [line['body']['id'] for line in lines if line['op'] == "put"] == identifiers
+
+
+def test_pending_events_survive_a_restart(fake_calendar, fake_account, tmp_path):
+    path = tmp_path / "journal.jsonl"
+    first = journal_at(path, fake_account)
+    identifiers = first.add([(None, body(f"Lecture {index}", 8 + index), {}) for index in range(3)])
+    # The app exits before the flusher ever runs
+    first.close()
+
+    second = journal_at(path, fake_account)
+    assert [entry['id'] for entry in second.pending()] == identifiers
+    second.start()
+    assert second.wait(10)
+    second.close()
+
+    assert summaries(fake_calendar) == ["Lecture 0", "Lecture 1", "Lecture 2"]
+    assert journal_at(path, fake_account).pending() == []
+
+
+def test_event_created_before_a_crash_is_not_created_again(fake_calendar, fake_account, tmp_path):
+    path = tmp_path / "journal.jsonl"
+    first = journal_at(path, fake_account)
+    [identifier] = first.add([(None, body("Dentist"), {})])
+    first.close()
+    # The insert reached Google, but the app died before writing "done"
+    fake_calendar.put_event(CALENDAR_ID, dict(body("Dentist"), id=identifier, status='confirmed'))
+    with open(path, "a") as journal_file:
+        journal_file.write('{"op": "done", "id": "torn')
+
+    second = journal_at(path, fake_account)
+    done = []
+    second.add_listener(lambda finished, failed, pending: done.extend(finished))
+    second.start()
+    assert second.wait(10)
+    second.close()
+
+    assert summaries(fake_calendar) == ["Dentist"]
+    assert [entry['id'] for entry, _ in done] == [identifier]
+
+
+def test_event_confirmed_again_after_deletion_is_created(fake_calendar, fake_account, tmp_path):
+    journal = journal_at(tmp_path / "journal.jsonl", fake_account)
+    journal.start()
+    [first] = journal.add([(None, body("Dentist"), {})])
+    assert journal.wait(10)
+    # Google keeps a deleted event's ID; only a new ID creates the event again
+    fake_calendar.cancel_event(CALENDAR_ID, first)
+
+    [second] = journal.add([(None, body("Dentist"), {})])
+    assert journal.wait(10)
+    journal.close()
+
+    assert second != first
+    assert summaries(fake_calendar) == ["Dentist"]
+    assert fake_calendar.events[CALENDAR_ID][second]['status'] == "confirmed"
+
+
+def test_identical_events_confirmed_twice_are_both_created(fake_calendar, fake_account, tmp_path):
+    journal = journal_at(tmp_path / "journal.jsonl", fake_account)
+    journal.start()
+    journal.add([(None, body("Standup"), {}), (None, body("Standup"), {})])
+    assert journal.wait(10)
+    journal.close()
+
+    assert summaries(fake_calendar) == ["Standup", "Standup"]
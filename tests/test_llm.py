@@ -0,0 +1,100 @@
+import json
+
+import pytest
+
+import assistant
+import llm_cache
+from benchmarks.fake_openai import DEFAULT_EVENT, DEFAULT_REPLY, function_reply
+from llm import StreamStats, split_json_items, stream_chat, stream_function_call
+
+EVENTS_FUNCTION = {"name": "propose_events", "parameters": {"type": "object", "properties": {}}}
+MESSAGES = [{"role": "user", "content": "Gym every Monday 6pm"}]
+EVENTS = [dict(DEFAULT_EVENT, title=f"Event {index}", summary='Brace } and quote " inside')
+          for index in range(3)]
+
+
+@pytest.fixture
+def llm_cache_path(tmp_path, monkeypatch):
+    monkeypatch.setattr(llm_cache, "_cache", llm_cache.LLMCache(str(tmp_path / "llm_cache.sqlite3")))
+
+
+def test_stream_chat_yields_the_reply_in_chunks(fake_openai):
+    fake_openai.chunk_size = 3
+    stats = StreamStats("chat")
+
+    deltas = list(stream_chat(MESSAGES, stats=stats))
+
+    assert "".join(deltas) == DEFAULT_REPLY
+    assert len(deltas) == -(-len(DEFAULT_REPLY) // 3)
+    assert stats.chunks == len(deltas)
+    assert stats.characters == len(DEFAULT_REPLY)
+    assert stats.time_to_first_token is not None
+    assert stats.total_time >= stats.time_to_first_token
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 7, 1000])
+def test_items_split_whatever_the_chunk_boundaries(fake_openai, chunk_size):
+    fake_openai.chunk_size = chunk_size
+    fake_openai.arguments = function_reply(EVENTS)
+    stats = StreamStats("function_call")
+
+    items = list(split_json_items(stream_function_call(MESSAGES, EVENTS_FUNCTION, stats=stats), stats=stats))
+
+    assert [json.loads(item) for item in items] == EVENTS
+    assert stats.time_to_first_block is not None
+
+
+def test_split_json_items_ignores_braces_in_strings():
+    document = '{"events": [{"title": "a {b}", "note": "\\"}\\""}, {"title": "[c]"}]}'
+    fragments = [document[index:index + 5] for index in range(0, len(document), 5)]
+
+    assert [json.loads(item) for item in split_json_items(fragments)] == [
+        {"title": "a {b}", "note": '"}"'}, {"title": "[c]"}]
+
+
+def test_truncated_stream_yields_only_complete_items(fake_openai):
+    fake_openai.chunk_size = 10
+    fake_openai.arguments = function_reply(EVENTS)
+    # Breaks off inside the second event
+    fake_openai.truncate_after = (len(function_reply(EVENTS[:1])) + 20) // 10
+
+    fragments = list(stream_function_call(MESSAGES, EVENTS_FUNCTION))
+    items = list(split_json_items(fragments))
+
+    assert len("".join(fragments)) < len(fake_openai.arguments)
+    assert [json.loads(item) for item in items] == EVENTS[:1]
+
+
+def test_truncated_stream_keeps_the_events_before_the_break(fake_openai, llm_cache_path):
+    fake_openai.chunk_size = 10
+    fake_openai.arguments = function_reply(EVENTS)
+    fake_openai.truncate_after = (len(function_reply(EVENTS[:2])) + 20) // 10
+
+    records, problems = assistant.suggest_events("Three events, described at length for GPT-4")
+
+    assert [record.title for record in records] == ["Event 0", "Event 1"]
+    assert problems == []
+
+
+def test_reply_without_events_is_reported(fake_openai, llm_cache_path):
+    fake_openai.arguments = "I could not find any events."
+
+    records, problems = assistant.suggest_events("Nothing to schedule here, just thinking aloud")
+
+    assert records == []
+    assert problems == ["GPT-4 returned no events: I could not find any events."]
+
+
+def test_misread_date_falls_back_to_the_streamed_reply(fake_openai, llm_cache_path):
+    records, problems = assistant.suggest_events("Dentist Feb 30 at 3pm")
+
+    assert [record.title for record in records] == [DEFAULT_EVENT["title"]]
+    assert problems == []
+    assert fake_openai.requests[-1]["stream"] is True
+
+
+def test_fast_parser_skips_the_model(fake_openai, llm_cache_path):
+    records, _ = assistant.suggest_events("Gym every Monday 6pm")
+
+    assert len(records) == 1
+    assert fake_openai.requests == []
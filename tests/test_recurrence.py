@@ -0,0 +1,128 @@
+import time
+from datetime import datetime, timedelta, timezone
+
+from dateutil import tz
+
+from recurrence import MATERIALIZE_AHEAD, expand_event, parse_series
+from tests.conftest import CALENDAR_ID
+
+NEW_YORK = tz.gettz("America/New_York")
+
+
+def weekly_gym(*recurrence, event_id="gym"):
+    """
+    Mondays 18:00-19:00 in New York from Oct 19, 2026; daylight saving time ends on Nov 1.
+    """
+    return {'id': event_id, 'status': "confirmed", 'summary': "Gym", 'updated': "2026-10-01T00:00:00Z",
+            'start': {'dateTime': "2026-10-19T18:00:00-04:00", 'timeZone': "America/New_York"},
+            'end': {'dateTime': "2026-10-19T19:00:00-04:00", 'timeZone': "America/New_York"},
+            'recurrence': list(recurrence) or ["RRULE:FREQ=WEEKLY;BYDAY=MO;COUNT=4"]}
+
+
+def utc(*args):
+    return datetime(*args, tzinfo=timezone.utc)
+
+
+def local_starts(events):
+    return [datetime.fromisoformat(event['start']['dateTime']).astimezone(NEW_YORK).strftime("%m-%d %H:%M")
+            for event in events]
+
+
+def test_occurrences_keep_their_wall_clock_time_across_dst():
+    instances = list(expand_event(weekly_gym(), cache=None))
+
+    assert local_starts(instances) == ["10-19 18:00", "10-26 18:00", "11-02 18:00", "11-09 18:00"]
+    # 22:00 UTC before the change, 23:00 after it
+    assert [instance['id'] for instance in instances] == [
+        "gym_20261019T220000Z", "gym_20261026T220000Z", "gym_20261102T230000Z", "gym_20261109T230000Z"]
+    assert all(instance['recurringEventId'] == "gym" and instance['end']['timeZone'] == "America/New_York"
+               for instance in instances)
+
+
+def test_exdate_with_tzid_removes_the_occurrence():
+    master = weekly_gym("RRULE:FREQ=WEEKLY;BYDAY=MO;COUNT=4",
+                        "EXDATE;TZID=America/New_York:20261026T180000,20261109T180000")
+
+    assert local_starts(expand_event(master, cache=None)) == ["10-19 18:00", "11-02 18:00"]
+
+
+def test_exdate_in_utc_after_the_dst_change():
+    master = weekly_gym("RRULE:FREQ=WEEKLY;BYDAY=MO;COUNT=4", "EXDATE:20261102T230000Z")
+
+    assert local_starts(expand_event(master, cache=None)) == ["10-19 18:00", "10-26 18:00", "11-09 18:00"]
+
+
+def test_date_only_until_on_a_timed_series_includes_that_day():
+    master = weekly_gym("RRULE:FREQ=DAILY;UNTIL=20261023")
+
+    assert local_starts(expand_event(master, cache=None)) == [
+        "10-19 18:00", "10-20 18:00", "10-21 18:00", "10-22 18:00", "10-23 18:00"]
+    assert parse_series(master).finite
+
+
+def test_timed_until_on_an_all_day_series_becomes_a_date():
+    master = {'id': "trip", 'summary': "Trip", 'start': {'date': "2026-10-19"}, 'end': {'date': "2026-10-20"},
+              'recurrence': ["RRULE:FREQ=DAILY;UNTIL=20261021T000000Z"]}
+
+    instances = list(expand_event(master, cache=None))
+
+    assert [instance['start'] for instance in instances] == [
+        {'date': "2026-10-19"}, {'date': "2026-10-20"}, {'date': "2026-10-21"}]
+    assert [instance['id'] for instance in instances] == ["trip_20261019", "trip_20261020", "trip_20261021"]
+
+
+def test_window_includes_an_occurrence_that_started_before_it():
+    master = weekly_gym()
+
+    instances = list(expand_event(master, datetime(2026, 10, 26, 18, 30, tzinfo=NEW_YORK),
+                                  datetime(2026, 11, 3, tzinfo=NEW_YORK), cache=None))
+
+    assert local_starts(instances) == ["10-26 18:00", "11-02 18:00"]
+
+
+def test_open_ended_series():
+    master = weekly_gym("RRULE:FREQ=WEEKLY;BYDAY=MO")
+    series = parse_series(master)
+
+    assert not series.finite
+    assert series.last_end() is None
+    since = utc(2026, 12, 1).timestamp()
+    starts, _ = series.starts_between(since, None)
+    horizon = max(since, time.time()) + MATERIALIZE_AHEAD
+    assert starts[-1].timestamp() < horizon <= starts[-1].timestamp() + 7 * 86400
+    far = list(expand_event(master, utc(2030, 1, 1), utc(2030, 1, 15), cache=None))
+    assert local_starts(far) == ["01-07 18:00", "01-14 18:00"]
+
+
+def test_mirror_applies_moved_and_cancelled_occurrences(fake_calendar, fake_account):
+    master = weekly_gym()
+    moved = {'id': "gym_20261026T220000Z", 'status': "confirmed", 'summary': "Gym (late)", 'recurringEventId': "gym",
+             'originalStartTime': {'dateTime': "2026-10-26T18:00:00-04:00", 'timeZone': "America/New_York"},
+             'start': {'dateTime': "2026-10-26T20:00:00-04:00"}, 'end': {'dateTime': "2026-10-26T21:00:00-04:00"}}
+    cancelled = {'id': "gym_20261102T230000Z", 'status': "cancelled", 'recurringEventId': "gym",
+                 'originalStartTime': {'dateTime': "2026-11-02T18:00:00-05:00", 'timeZone': "America/New_York"}}
+    for event in (master, moved, cancelled):
+        fake_calendar.put_event(CALENDAR_ID, event)
+    store = fake_account.store
+
+    assert store.sync([CALENDAR_ID], max_age=0) == {}
+    events = list(store.events_between([CALENDAR_ID], datetime(2026, 10, 18), datetime(2026, 11, 30)))
+
+    assert [(event['summary'], start) for event, start in zip(events, local_starts(events))] == [
+        ("Gym", "10-19 18:00"), ("Gym (late)", "10-26 20:00"), ("Gym", "11-09 18:00")]
+
+
+def test_mirror_follows_a_series_cut_short(fake_calendar, fake_account):
+    # A separate ID, since parsed series are cached by ID and update time
+    fake_calendar.put_event(CALENDAR_ID, weekly_gym("RRULE:FREQ=WEEKLY;BYDAY=MO", event_id="run"))
+    store = fake_account.store
+    store.sync([CALENDAR_ID], max_age=0)
+    window = (datetime(2026, 10, 18), datetime(2026, 12, 1))
+    assert len(list(store.events_between([CALENDAR_ID], *window))) == 7
+
+    # "This and following events" deleted from Nov 2: Google rewrites the master's rule with UNTIL
+    fake_calendar.put_event(CALENDAR_ID, dict(weekly_gym("RRULE:FREQ=WEEKLY;BYDAY=MO;UNTIL=20261101T045959Z", event_id="run"),
+                                              updated="2026-10-20T00:00:00Z"))
+    store.sync([CALENDAR_ID], max_age=0)
+
+    assert local_starts(store.events_between([CALENDAR_ID], *window)) == ["10-19 18:00", "10-26 18:00"]
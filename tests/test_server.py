@@ -0,0 +1,212 @@
+import asyncio
+import json
+import threading
+import time
+
+from aiohttp.test_utils import TestClient, TestServer
+
+import server
+from accounts import AccountPool, CredentialStore
+
+SERVICE_TOKEN = "service-token"
+
+
+def token_info(refresh_token="refresh-1"):
+    return {'token': "access-1", 'refresh_token': refresh_token, 'client_id': "client", 'client_secret': "secret",
+            'expiry': "2099-01-01T00:00:00Z"}
+
+
+def serve(store, token, scenario):
+    """
+    Runs `scenario(client)` against a fresh app; each app is bound to the event loop it first runs on.
+    """
+    async def run():
+        async with TestClient(TestServer(server.create_app(store=store, token=token))) as client:
+            return await scenario(client)
+    return asyncio.run(run())
+
+
+def bearer(token, user_id=None):
+    headers = {"Authorization": f"Bearer {token}"}
+    if user_id:
+        headers["X-User-Id"] = user_id
+    return headers
+
+
+async def register(client, user_id, info=None, headers=None):
+    response = await client.put("/v1/credentials", json=info or token_info(),
+                                headers=headers or bearer(SERVICE_TOKEN, user_id))
+    assert response.status == 200
+    body = await response.json()
+    assert body['user'] == user_id
+    return body['api_key']
+
+
+async def statuses(client, requests):
+    results = []
+    for method, path, headers, body in requests:
+        async with client.request(method, path, headers=headers, json=body) as response:
+            results.append(response.status)
+    return results
+
+
+def test_service_token_registers_users_and_issues_keys(tmp_path):
+    store = CredentialStore(str(tmp_path))
+
+    key = serve(store, SERVICE_TOKEN, lambda client: register(client, "alice"))
+
+    assert key.startswith("alice:")
+    assert store.user_for_key(key) == "alice"
+    assert json.load(open(store.token_path("alice")))['refresh_token'] == "refresh-1"
+
+
+def test_requests_need_a_valid_key(tmp_path):
+    async def scenario(client):
+        key = await register(client, "alice")
+        return await statuses(client, [
+            ("POST", "/v1/chat", {"X-User-Id": "alice"}, {'query': "hi"}),
+            ("POST", "/v1/chat", bearer("alice:wrong"), {'query': "hi"}),
+            ("POST", "/v1/chat", bearer("wrong", "alice"), {'query': "hi"}),
+            ("POST", "/v1/chat", bearer(key, "bob"), {'query': "hi"}),
+            ("PUT", "/v1/credentials", bearer(key, "bob"), token_info()),
+            ("GET", "/healthz", {}, None),
+        ])
+
+    assert serve(CredentialStore(str(tmp_path)), SERVICE_TOKEN, scenario) == [401, 401, 401, 403, 403, 200]
+
+
+def test_users_replace_and_delete_their_own_credentials(tmp_path):
+    store = CredentialStore(str(tmp_path))
+
+    async def scenario(client):
+        key = await register(client, "alice")
+        new_key = await register(client, "alice", token_info("refresh-2"), headers=bearer(key))
+        return new_key, await statuses(client, [
+            ("DELETE", "/v1/credentials", bearer(key), None),
+            ("DELETE", "/v1/credentials", bearer(new_key), None),
+            ("DELETE", "/v1/credentials", bearer(new_key), None),
+        ])
+
+    new_key, results = serve(store, SERVICE_TOKEN, scenario)
+
+    # The replaced key stops working at once, the new one once the user is deleted
+    assert results == [401, 204, 401]
+    assert store.user_for_key(new_key) is None
+
+
+def test_without_a_service_token_the_user_header_is_trusted(tmp_path):
+    async def scenario(client):
+        key = await register(client, "alice", headers={"X-User-Id": "alice"})
+        response = await client.post("/v1/chat", json={'query': "hi"}, headers={"X-User-Id": "bob"})
+        unknown = await response.json()
+        return key, unknown, response.status, await statuses(client, [
+            ("PUT", "/v1/credentials", {"X-User-Id": "../etc"}, token_info()),
+            ("PUT", "/v1/credentials", {}, token_info()),
+        ])
+
+    key, unknown, status, results = serve(CredentialStore(str(tmp_path)), "", scenario)
+
+    assert key.startswith("alice:")
+    assert status == 403 and "No credentials" in unknown['error']
+    assert results == [400, 400]
+
+
+def run_calls(scheduler, calls):
+    """
+    Submits (user ID, function) pairs to the scheduler in order and waits for all of them.
+    """
+    async def submit():
+        try:
+            return await asyncio.gather(*(scheduler.run(user_id, function) for user_id, function in calls))
+        finally:
+            scheduler.shutdown()
+    return asyncio.run(submit())
+
+
+def test_scheduler_takes_turns_between_users():
+    order = []
+
+    def work(name):
+        return lambda: order.append(name) or name
+
+    scheduler = server.FairScheduler(workers=1, per_user=1)
+    calls = [("a", work(f"a{n}")) for n in range(1, 6)] + [("b", work(f"b{n}")) for n in range(1, 3)]
+
+    assert run_calls(scheduler, calls) == ["a1", "a2", "a3", "a4", "a5", "b1", "b2"]
+    # a1 was already running when the rest arrived; after that the two users alternate
+    assert order == ["a1", "a2", "b1", "a3", "b2", "a4", "a5"]
+
+
+def test_scheduler_limits_calls_per_user():
+    lock = threading.Lock()
+    running = {"a": 0, "b": 0}
+    most = {"a": 0, "b": 0}
+    started = []
+
+    def work(user_id):
+        def run():
+            with lock:
+                running[user_id] += 1
+                most[user_id] = max(most[user_id], running[user_id])
+                started.append(user_id)
+            time.sleep(0.05)
+            with lock:
+                running[user_id] -= 1
+        return run
+
+    scheduler = server.FairScheduler(workers=4, per_user=2)
+    run_calls(scheduler, [("a", work("a")) for _ in range(6)] + [("b", work("b"))])
+
+    assert most == {"a": 2, "b": 1}
+    # b does not wait behind a's backlog, though a could have used the free workers
+    assert started.index("b") < 3
+
+
+def test_scheduler_passes_on_errors():
+    def fail():
+        raise ValueError("bad input")
+
+    async def submit():
+        scheduler = server.FairScheduler(workers=1, per_user=1)
+        try:
+            return await asyncio.gather(scheduler.run("a", fail), scheduler.run("a", lambda: "ok"),
+                                        return_exceptions=True)
+        finally:
+            scheduler.shutdown()
+
+    error, result = asyncio.run(submit())
+    assert isinstance(error, ValueError) and result == "ok"
+
+
+def test_refreshed_credentials_are_saved(tmp_path):
+    store = CredentialStore(str(tmp_path))
+    store.save("alice", token_info())
+    pool = AccountPool(store)
+
+    with pool.lease("alice") as account:
+        # What AuthorizedHttp does when the access token has expired
+        account.creds.token = "access-2"
+
+    assert json.load(open(store.token_path("alice")))['token'] == "access-2"
+    assert AccountPool(store)._checkout("alice").creds.token == "access-2"
+    pool.close()
+
+
+def test_refreshed_credentials_do_not_replace_new_ones(tmp_path):
+    store = CredentialStore(str(tmp_path))
+    store.save("alice", token_info())
+    pool = AccountPool(store)
+
+    with pool.lease("alice") as account:
+        account.creds.token = "access-2"
+        store.save("alice", token_info("refresh-2"))
+        pool.discard("alice")
+
+    stored = json.load(open(store.token_path("alice")))
+    assert (stored['token'], stored['refresh_token']) == ("access-1", "refresh-2")
+
+    with pool.lease("alice") as account:
+        account.creds.token = "access-3"
+        store.delete("alice")
+    assert not store.save_refreshed("alice", account.creds)
+    pool.close()
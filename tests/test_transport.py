@@ -0,0 +1,187 @@
+import json
+import time
+
+import httplib2
+import openai
+import pytest
+import requests
+
+from benchmarks.faults import DROP, LOST
+from llm import MODEL
+from transport import RetryingHttp, RetryingSession, TokenBucket, Transport, _retry_after, get_openai_session
+
+EVENTS_PATH = "calendars/cal%40example.com/events"
+EVENT = {'summary': "Dentist", 'start': {'dateTime': "2026-10-20T15:00:00"}, 'end': {'dateTime': "2026-10-20T16:00:00"}}
+
+
+def quick_transport(**kwargs):
+    """
+    A transport with limits too high to throttle and retries a few milliseconds apart.
+    """
+    return Transport("test", rate=1000, burst=1000, backoff=0.001, **kwargs)
+
+
+def calendar_http(transport):
+    return RetryingHttp(httplib2.Http(timeout=5), transport=transport)
+
+
+def test_429_waits_for_retry_after(fake_calendar):
+    fake_calendar.faults.retry_after = 1
+    fake_calendar.faults.fail_next(429)
+    transport = quick_transport()
+
+    start = time.monotonic()
+    resp, content = calendar_http(transport).request(fake_calendar.url + EVENTS_PATH, "GET")
+
+    assert resp.status == 200
+    assert time.monotonic() - start >= 1
+    assert transport.stats.snapshot()['rate_limited'] == 1
+    assert transport.stats.snapshot()['retries'] == 1
+
+
+def test_429_is_retried_for_posts(fake_calendar):
+    fake_calendar.faults.retry_after = 0
+    fake_calendar.faults.fail_next(429)
+    transport = quick_transport()
+
+    resp, content = calendar_http(transport).request(fake_calendar.url + EVENTS_PATH, "POST", json.dumps(EVENT),
+                                                     {"Content-Type": "application/json"})
+
+    assert resp.status == 200
+    assert len(fake_calendar.events["cal@example.com"]) == 1
+
+
+def test_5xx_is_retried_for_idempotent_requests(fake_calendar):
+    fake_calendar.faults.fail_next(503, 500, 502)
+    transport = quick_transport()
+
+    resp, content = calendar_http(transport).request(fake_calendar.url + EVENTS_PATH, "GET")
+
+    assert resp.status == 200
+    assert transport.stats.snapshot()['retries'] == 3
+    assert transport.stats.snapshot()['failures'] == 0
+
+
+def test_5xx_gives_up_after_max_retries(fake_calendar):
+    fake_calendar.faults.fail_next(*[503] * 3)
+    transport = quick_transport(max_retries=2)
+
+    resp, content = calendar_http(transport).request(fake_calendar.url + EVENTS_PATH, "GET")
+
+    assert resp.status == 503
+    assert transport.stats.snapshot()['retries'] == 2
+    assert transport.stats.snapshot()['failures'] == 1
+
+
+def test_5xx_is_not_retried_for_posts(fake_calendar):
+    fake_calendar.faults.fail_next(503)
+    transport = quick_transport()
+
+    resp, content = calendar_http(transport).request(fake_calendar.url + EVENTS_PATH, "POST", json.dumps(EVENT),
+                                                     {"Content-Type": "application/json"})
+
+    assert resp.status == 503
+    assert transport.stats.snapshot()['retries'] == 0
+    assert fake_calendar.request_count == 1
+
+
+def test_lost_post_is_not_sent_twice(fake_calendar):
+    # Through requests: httplib2 itself resends any request whose connection drops on the first try
+    fake_calendar.faults.fail_next(LOST)
+    transport = quick_transport()
+
+    with pytest.raises(requests.ConnectionError):
+        RetryingSession(transport).post(fake_calendar.url + EVENTS_PATH, json=EVENT, timeout=5)
+
+    # The server created the event, and the transport did not create it again
+    assert len(fake_calendar.events["cal@example.com"]) == 1
+    assert fake_calendar.request_count == 1
+    assert transport.stats.snapshot()['failures'] == 1
+
+
+def test_posts_marked_idempotent_are_retried(fake_openai):
+    fake_openai.faults.fail_next(503, DROP)
+    transport = quick_transport(idempotent_methods={"GET", "POST"})
+    session = RetryingSession(transport)
+
+    response = session.post(fake_openai.url + "/chat/completions",
+                            json={'model': MODEL, 'messages': [{'role': "user", 'content': "Hi"}]})
+
+    assert response.status_code == 200
+    assert response.json()['choices'][0]['message']['content'] == fake_openai.reply
+    assert transport.stats.snapshot()['retries'] == 2
+    assert len(fake_openai.requests) == 3
+
+
+def test_openai_client_retries_through_the_shared_session(fake_openai, monkeypatch):
+    fake_openai.faults.retry_after = 0
+    fake_openai.faults.fail_next(429, 502)
+    session = get_openai_session()
+    monkeypatch.setattr(session, "transport", quick_transport(idempotent_methods={"POST"}))
+
+    reply = openai.ChatCompletion.create(model=MODEL, messages=[{'role': "user", 'content': "Hi"}])
+
+    assert reply['choices'][0]['message']['content'] == fake_openai.reply
+    assert session.transport.stats.snapshot()['rate_limited'] == 1
+
+
+def test_connection_errors_are_raised_once_retries_run_out():
+    transport = quick_transport(max_retries=1, idempotent_methods={"GET"})
+    session = RetryingSession(transport)
+
+    with pytest.raises(requests.ConnectionError):
+        # Nothing listens on port 9 of the loopback interface
+        session.get("http://127.0.0.1:9/", timeout=1)
+    assert transport.stats.snapshot()['retries'] == 1
+    assert transport.stats.snapshot()['failures'] == 1
+
+
+def test_retry_after_header_values():
+    assert _retry_after("3") == 3.0
+    assert _retry_after("-1") == 0.0
+    assert _retry_after("Wed, 21 Oct 2015 07:28:00 GMT") == 0.0
+    assert _retry_after("soon") is None
+    assert _retry_after(None) is None
+
+
+def test_token_bucket_allows_a_burst_then_refills():
+    bucket = TokenBucket(rate=100, capacity=3)
+
+    assert [bucket.try_acquire() for _ in range(3)] == [0, 0, 0]
+    wait = bucket.try_acquire()
+    assert 0 < wait <= 0.01
+    time.sleep(wait + 0.005)
+    assert bucket.try_acquire() == 0
+
+
+def test_token_bucket_acquire_waits_for_the_debt():
+    bucket = TokenBucket(rate=50, capacity=1)
+    bucket.acquire()
+
+    start = time.monotonic()
+    waited = bucket.acquire(2)
+
+    assert waited == pytest.approx(0.04, abs=0.01)
+    assert time.monotonic() - start >= 0.035
+
+
+def test_token_bucket_pause_holds_callers_back():
+    bucket = TokenBucket(rate=1000, capacity=10)
+    bucket.pause(0.05)
+
+    assert 0.04 < bucket.try_acquire() <= 0.05
+    time.sleep(0.06)
+    assert bucket.try_acquire() == 0
+
+
+def test_throttled_requests_are_counted(fake_calendar):
+    transport = Transport("test", rate=20, burst=1)
+    http = calendar_http(transport)
+
+    for _ in range(3):
+        assert http.request(fake_calendar.url + EVENTS_PATH, "GET")[0].status == 200
+
+    counts = transport.stats.snapshot()
+    assert counts['requests'] == 3
+    assert counts['throttled'] == 2
+    assert counts['throttle_seconds'] == pytest.approx(0.1, abs=0.03)
@@ -0,0 +1,93 @@
+from PyQt5.QtCore import QTimer
+from PyQt5.QtWidgets import (
+    QHBoxLayout, QHeaderView, QLabel, QPushButton, QTableWidget, QTableWidgetItem, QVBoxLayout, QWidget
+)
+
+from llm_cache import get_llm_cache
+from tracing import recent_spans
+from transport import transport_stats
+
+# Seconds between refreshes while the panel is visible
+REFRESH_INTERVAL = 2
+
+COLUMNS = ["Operation", "Count", "p50", "p95", "Last", "Errors", "Last details"]
+
+
+def _ms(seconds):
+    return f"{seconds * 1000:.0f} ms"
+
+
+def _details(attributes):
+    return ", ".join(f"{key}={value}" for key, value in attributes.items() if value is not None)
+
+
+class TracePanel(QWidget):
+    """
+    Recent latencies of every traced operation (LLM calls, API calls, parse
+    steps), the transports' retry and throttling counters and the reply
+    cache's hit rate. Only refreshed while it is shown.
+    """
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.recent = recent_spans()
+
+        self.table = QTableWidget(0, len(COLUMNS))
+        self.table.setHorizontalHeaderLabels(COLUMNS)
+        self.table.verticalHeader().setVisible(False)
+        self.table.setEditTriggers(QTableWidget.NoEditTriggers)
+        self.table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeToContents)
+        self.table.horizontalHeader().setStretchLastSection(True)
+
+        self.transport_label = QLabel()
+        self.transport_label.setWordWrap(True)
+        self.cache_label = QLabel()
+        clear_button = QPushButton("Clear")
+        clear_button.clicked.connect(self.clear)
+
+        footer = QHBoxLayout()
+        footer.addWidget(self.transport_label, 1)
+        footer.addWidget(clear_button)
+        layout = QVBoxLayout()
+        layout.addWidget(self.table)
+        layout.addWidget(self.cache_label)
+        layout.addLayout(footer)
+        self.setLayout(layout)
+
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.refresh)
+
+    def refresh(self):
+        rows = self.recent.summary()
+        self.table.setRowCount(len(rows))
+        for row, summary in enumerate(rows):
+            values = [
+                summary['name'], str(summary['count']), _ms(summary['p50']), _ms(summary['p95']),
+                _ms(summary['last']), str(summary['errors']), _details(summary['attributes']),
+            ]
+            for column, value in enumerate(values):
+                self.table.setItem(row, column, QTableWidgetItem(value))
+        self.transport_label.setText("\n".join(
+            f"{name}: {counts['requests']} requests, {counts['retries']} retries, "
+            f"{counts['throttled']} throttled, {counts['failures']} failed"
+            for name, counts in transport_stats().items()
+        ))
+        cache = get_llm_cache().stats()
+        self.cache_label.setText(
+            f"Reply cache: {cache['hit_rate']:.0%} hit rate ({cache['memory_hits']} memory, "
+            f"{cache['disk_hits']} disk, {cache['misses']} misses), {cache['memory_entries']} entries "
+            f"in {cache['memory_bytes'] / 1024:.0f} KB, {cache['evictions']} evicted"
+        )
+
+    def clear(self):
+        self.recent.clear()
+        self.refresh()
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        self.refresh()
+        self.timer.start(REFRESH_INTERVAL * 1000)
+
+    def hideEvent(self, event):
+        super().hideEvent(event)
+        self.timer.stop()
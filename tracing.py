@@ -0,0 +1,554 @@
+"""
+Timing spans around LLM calls, API calls and parse steps, sent to pluggable
+exporters: a JSON lines log file, Prometheus text format, OpenTelemetry
+(OTLP/JSON) and an in-memory buffer of recent spans for the app's
+Performance panel.
+
+Tracing is off until an exporter is added; span() then returns a shared
+no-op object, so instrumented code costs one function call per span.
+
+    with span("calendar.http", method="GET") as current:
+        ...
+        current.set(status=200, response_bytes=len(content))
+"""
+import atexit
+import functools
+import json
+import random
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import config
+
+# Upper bounds in seconds of the Prometheus latency histogram buckets
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+# Numeric span attributes the Prometheus exporter also adds up, e.g. tokens sent to OpenAI
+COUNTED_ATTRIBUTES = ("prompt_tokens", "completion_tokens", "request_bytes", "response_bytes", "events")
+# Spans the OTLP exporter collects before sending them in one request
+OTLP_BATCH_SIZE = 64
+# Spans kept for the Performance panel
+RECENT_SPANS = 1000
+SERVICE_NAME = "calendar-assistant"
+
+_exporters = ()
+_enabled = False
+_lock = threading.Lock()
+_local = threading.local()
+
+
+class _NoopSpan:
+    """
+    Returned by span() while tracing is off; every method does nothing.
+    """
+
+    __slots__ = ()
+
+    def set(self, **attributes):
+        return self
+
+    def fail(self, error):
+        return self
+
+    def elapsed(self):
+        return 0.0
+
+    def finish(self, error=None):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def __bool__(self):
+        return False
+
+
+_NOOP = _NoopSpan()
+
+
+def _stack():
+    stack = getattr(_local, 'stack', None)
+    if stack is None:
+        stack = _local.stack = []
+    return stack
+
+
+class Span:
+    """
+    One timed operation. Used as a context manager it becomes the current
+    span of its thread, so spans opened inside it are its children.
+    """
+
+    __slots__ = ("name", "trace_id", "span_id", "parent_id", "attributes", "start_time",
+                 "_start", "duration", "error")
+
+    def __init__(self, name, attributes, parent=None):
+        self.name = name
+        self.trace_id = parent.trace_id if parent else random.getrandbits(128)
+        self.span_id = random.getrandbits(64)
+        self.parent_id = parent.span_id if parent else None
+        self.attributes = attributes
+        self.start_time = time.time_ns()
+        self._start = time.perf_counter_ns()
+        self.duration = None
+        self.error = None
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+        return self
+
+    def fail(self, error):
+        """
+        Marks the span as failed without raising, e.g. for an error that is reported and swallowed.
+        """
+        self.error = f"{type(error).__name__}: {error}" if isinstance(error, BaseException) else str(error)
+        return self
+
+    def elapsed(self):
+        """
+        Seconds since the span started.
+        """
+        return (time.perf_counter_ns() - self._start) / 1e9
+
+    def finish(self, error=None):
+        """
+        Ends the span and hands it to the exporters. Only the first call counts.
+        """
+        if self.duration is not None:
+            return
+        self.duration = self.elapsed()
+        if error is not None:
+            self.fail(error)
+        for exporter in _exporters:
+            try:
+                exporter.export(self)
+            except Exception as e:
+                print(f"Error exporting span: {e}")
+
+    @property
+    def end_time(self):
+        return self.start_time + int((self.duration or 0) * 1e9)
+
+    def to_dict(self):
+        return {
+            'name': self.name,
+            'trace_id': f"{self.trace_id:032x}",
+            'span_id': f"{self.span_id:016x}",
+            'parent_id': f"{self.parent_id:016x}" if self.parent_id else None,
+            'start': self.start_time / 1e9,
+            'duration_ms': round(self.duration * 1000, 3) if self.duration is not None else None,
+            'attributes': self.attributes,
+            'error': self.error,
+        }
+
+    def __enter__(self):
+        _stack().append(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        stack = _stack()
+        if stack and stack[-1] is self:
+            stack.pop()
+        self.finish(exc)
+        return False
+
+    def __bool__(self):
+        return True
+
+
+def span(name, **attributes):
+    """
+    Starts a span; use it with `with`. Returns a no-op span while tracing is off.
+    """
+    if not _enabled:
+        return _NOOP
+    stack = _stack()
+    return Span(name, attributes, stack[-1] if stack else None)
+
+
+def start_span(name, **attributes):
+    """
+    Starts a span that is not made current and is ended with finish(), for
+    work that outlives the caller's frame such as a streamed reply.
+    """
+    return span(name, **attributes)
+
+
+@contextmanager
+def activate(current):
+    """
+    Makes a span started with start_span() current for the duration of the block, without ending it.
+    """
+    if not current:
+        yield current
+        return
+    stack = _stack()
+    stack.append(current)
+    try:
+        yield current
+    finally:
+        stack.remove(current)
+
+
+def traced(name):
+    """
+    Decorator that runs the function inside a span named `name`; the
+    function can add attributes to it through current_span().
+    """
+    def decorate(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return function(*args, **kwargs)
+            with span(name):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def current_span():
+    """
+    The innermost open span of this thread, or a no-op span.
+    """
+    if not _enabled:
+        return _NOOP
+    stack = _stack()
+    return stack[-1] if stack else _NOOP
+
+
+def estimate_tokens(characters):
+    """
+    Rough token count of text `characters` long: about four characters per token.
+    """
+    return characters // 4
+
+
+def add_exporter(exporter):
+    """
+    Sends every finished span to `exporter`, which has an export(span) method. Turns tracing on.
+    """
+    global _exporters, _enabled
+    with _lock:
+        _exporters = _exporters + (exporter,)
+        _enabled = True
+    return exporter
+
+
+def remove_exporter(exporter):
+    """
+    Stops sending spans to `exporter`; tracing is off again once no exporter is left.
+    """
+    global _exporters, _enabled
+    with _lock:
+        _exporters = tuple(other for other in _exporters if other is not exporter)
+        _enabled = bool(_exporters)
+    if hasattr(exporter, 'close'):
+        exporter.close()
+
+
+def exporters():
+    return _exporters
+
+
+class LogExporter:
+    """
+    Appends every span to a file as one JSON object per line.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, "a", encoding="utf-8", buffering=1)
+        self._lock = threading.Lock()
+
+    def export(self, finished):
+        line = json.dumps(finished.to_dict(), default=str)
+        with self._lock:
+            self._file.write(line + "\n")
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+
+def _label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class PrometheusExporter:
+    """
+    Aggregates spans into a latency histogram, an error counter and totals of
+    COUNTED_ATTRIBUTES per span name, rendered in the Prometheus text format.
+    serve(port) exposes them at http://localhost:port/metrics.
+    """
+
+    def __init__(self, prefix="calendar_assistant"):
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        self._buckets = {}
+        self._sums = {}
+        self._errors = {}
+        self._totals = {}
+        self._server = None
+
+    def export(self, finished):
+        with self._lock:
+            counts = self._buckets.get(finished.name)
+            if counts is None:
+                counts = self._buckets[finished.name] = [0] * (len(LATENCY_BUCKETS) + 1)
+                self._sums[finished.name] = 0.0
+                self._errors[finished.name] = 0
+            for index, bound in enumerate(LATENCY_BUCKETS):
+                if finished.duration <= bound:
+                    counts[index] += 1
+            counts[-1] += 1
+            self._sums[finished.name] += finished.duration
+            if finished.error:
+                self._errors[finished.name] += 1
+            for attribute in COUNTED_ATTRIBUTES:
+                value = finished.attributes.get(attribute)
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    key = (finished.name, attribute)
+                    self._totals[key] = self._totals.get(key, 0) + value
+
+    def render(self):
+        """
+        Every metric in the Prometheus text exposition format.
+        """
+        duration = f"{self.prefix}_span_duration_seconds"
+        errors = f"{self.prefix}_span_errors_total"
+        totals = f"{self.prefix}_span_attribute_total"
+        lines = [f"# HELP {duration} Duration of traced operations.", f"# TYPE {duration} histogram"]
+        with self._lock:
+            for name, counts in sorted(self._buckets.items()):
+                label = f'span="{_label(name)}"'
+                for bound, count in zip(LATENCY_BUCKETS, counts):
+                    lines.append(f'{duration}_bucket{{{label},le="{bound}"}} {count}')
+                lines.append(f'{duration}_bucket{{{label},le="+Inf"}} {counts[-1]}')
+                lines.append(f"{duration}_sum{{{label}}} {self._sums[name]:.6f}")
+                lines.append(f"{duration}_count{{{label}}} {counts[-1]}")
+            lines += [f"# HELP {errors} Traced operations that failed.", f"# TYPE {errors} counter"]
+            for name, count in sorted(self._errors.items()):
+                lines.append(f'{errors}{{span="{_label(name)}"}} {count}')
+            lines += [f"# HELP {totals} Sum of numeric span attributes such as tokens and bytes.",
+                      f"# TYPE {totals} counter"]
+            for (name, attribute), total in sorted(self._totals.items()):
+                lines.append(f'{totals}{{span="{_label(name)}",attribute="{attribute}"}} {total}')
+        return "\n".join(lines) + "\n"
+
+    def serve(self, port, host="127.0.0.1"):
+        """
+        Serves render() at /metrics on a daemon thread.
+        """
+        exporter = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = exporter.render().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self._server.server_address[1]
+
+    def close(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+
+def _otlp_value(value):
+    if isinstance(value, bool):
+        return {'boolValue': value}
+    if isinstance(value, int):
+        return {'intValue': str(value)}
+    if isinstance(value, float):
+        return {'doubleValue': value}
+    return {'stringValue': str(value)}
+
+
+class OTLPExporter:
+    """
+    Sends spans in the OpenTelemetry protocol's JSON encoding, in batches,
+    to a collector's /v1/traces endpoint or, without an endpoint, to a file
+    with one export request per line. Batches are sent on a background
+    thread and the rest are flushed at exit.
+    """
+
+    def __init__(self, endpoint=None, path=None, batch_size=OTLP_BATCH_SIZE):
+        if not endpoint and not path:
+            raise ValueError("OTLPExporter needs an endpoint or a path")
+        self.url = endpoint.rstrip("/") + "/v1/traces" if endpoint else None
+        self.path = path
+        self.batch_size = batch_size
+        self._pending = []
+        self._lock = threading.Lock()
+        self._send_lock = threading.Lock()
+        atexit.register(self.flush)
+
+    def export(self, finished):
+        with self._lock:
+            self._pending.append(finished)
+            if len(self._pending) < self.batch_size:
+                return
+            batch, self._pending = self._pending, []
+        threading.Thread(target=self._send, args=(batch,), daemon=True).start()
+
+    def flush(self):
+        with self._lock:
+            batch, self._pending = self._pending, []
+        if batch:
+            self._send(batch)
+
+    def close(self):
+        self.flush()
+        atexit.unregister(self.flush)
+
+    @staticmethod
+    def encode(batch):
+        """
+        An ExportTraceServiceRequest holding the spans of `batch`.
+        """
+        spans = []
+        for finished in batch:
+            encoded = {
+                'traceId': f"{finished.trace_id:032x}",
+                'spanId': f"{finished.span_id:016x}",
+                'name': finished.name,
+                'kind': 1,
+                'startTimeUnixNano': str(finished.start_time),
+                'endTimeUnixNano': str(finished.end_time),
+                'attributes': [{'key': key, 'value': _otlp_value(value)}
+                               for key, value in finished.attributes.items() if value is not None],
+                'status': {'code': 2, 'message': finished.error} if finished.error else {'code': 1},
+            }
+            if finished.parent_id:
+                encoded['parentSpanId'] = f"{finished.parent_id:016x}"
+            spans.append(encoded)
+        return {'resourceSpans': [{
+            'resource': {'attributes': [{'key': "service.name", 'value': {'stringValue': SERVICE_NAME}}]},
+            'scopeSpans': [{'scope': {'name': SERVICE_NAME}, 'spans': spans}],
+        }]}
+
+    def _send(self, batch):
+        payload = json.dumps(self.encode(batch))
+        try:
+            with self._send_lock:
+                if self.url:
+                    # A plain request: the shared OpenAI session is itself traced
+                    import requests
+                    requests.post(self.url, data=payload, headers={"Content-Type": "application/json"},
+                                  timeout=10).raise_for_status()
+                else:
+                    with open(self.path, "a", encoding="utf-8") as trace_file:
+                        trace_file.write(payload + "\n")
+        except Exception as e:
+            print(f"Error exporting {len(batch)} spans: {e}")
+
+
+def _percentile(ordered, fraction):
+    return ordered[min(int(fraction * len(ordered)), len(ordered) - 1)]
+
+
+class RecentSpans:
+    """
+    Keeps the last `size` spans in memory for the Performance panel.
+    """
+
+    def __init__(self, size=RECENT_SPANS):
+        self._spans = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def export(self, finished):
+        with self._lock:
+            self._spans.append(finished)
+
+    def spans(self):
+        with self._lock:
+            return list(self._spans)
+
+    def summary(self):
+        """
+        Latency per span name, most recently seen first: dicts with name, count,
+        errors, p50, p95 and last (seconds), and the attributes of the last span.
+        """
+        by_name = {}
+        for finished in self.spans():
+            by_name.setdefault(finished.name, []).append(finished)
+        rows = []
+        for name, spans in by_name.items():
+            durations = sorted(finished.duration for finished in spans)
+            rows.append({
+                'name': name,
+                'count': len(spans),
+                'errors': sum(1 for finished in spans if finished.error),
+                'p50': _percentile(durations, 0.5),
+                'p95': _percentile(durations, 0.95),
+                'last': spans[-1].duration,
+                'attributes': spans[-1].attributes,
+                'ended': spans[-1].end_time,
+            })
+        rows.sort(key=lambda row: row['ended'], reverse=True)
+        return rows
+
+    def clear(self):
+        with self._lock:
+            self._spans.clear()
+
+
+_recent = None
+
+
+def recent_spans():
+    """
+    Returns the shared RecentSpans buffer, adding it as an exporter on first use.
+    """
+    global _recent
+    with _lock:
+        created = _recent is None
+        if created:
+            _recent = RecentSpans()
+    if created:
+        add_exporter(_recent)
+    return _recent
+
+
+def configure(names=None):
+    """
+    Adds the exporters named in `names` (default: config.TRACE_EXPORTERS),
+    a comma-separated list of log, prometheus and otlp. Returns the exporters added.
+    """
+    names = config.TRACE_EXPORTERS if names is None else names
+    added = []
+    for name in (part.strip().lower() for part in names.split(",")):
+        try:
+            if name == "log":
+                added.append(add_exporter(LogExporter(config.TRACE_LOG_PATH or config.cache_path("traces.jsonl"))))
+            elif name == "prometheus":
+                exporter = add_exporter(PrometheusExporter())
+                if config.METRICS_PORT:
+                    exporter.serve(config.METRICS_PORT)
+                added.append(exporter)
+            elif name == "otlp":
+                path = None if config.OTLP_ENDPOINT else config.cache_path("traces.otlp.jsonl")
+                added.append(add_exporter(OTLPExporter(endpoint=config.OTLP_ENDPOINT, path=path)))
+            elif name:
+                print(f"Error: unknown trace exporter {name!r}")
+        except OSError as e:
+            print(f"Error starting the {name} trace exporter: {e}")
+    return added
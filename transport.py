@@ -0,0 +1,344 @@
+import http.client
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import config
+from tracing import current_span, estimate_tokens, span
+
+# Retries after the first attempt for a transient failure
+DEFAULT_MAX_RETRIES = 4
+# First retry delay in seconds; doubled every retry, with jitter
+DEFAULT_BACKOFF = 0.5
+# Longest single wait between retries, including a server's Retry-After
+MAX_BACKOFF = 30.0
+# Connections kept open per host in the shared OpenAI session
+POOL_SIZE = 10
+# Requests that can be sent at once before the Calendar limit kicks in; one full batch
+CALENDAR_BURST = 50
+# Requests that can be sent at once before the OpenAI request limit kicks in
+OPENAI_BURST = 20
+# Completion tokens assumed for an OpenAI request when reserving token quota
+EXPECTED_COMPLETION_TOKENS = 500
+
+CALENDAR = "Calendar API"
+OPENAI = "OpenAI"
+
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+# Methods that can be repeated without creating something twice
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS", "PUT", "DELETE"}
+
+
+class TokenBucket:
+    """
+    Client-side rate limit: `rate` tokens per second, up to `capacity` saved
+    up for bursts. Callers take tokens in the order they ask; a caller that
+    takes more than are left waits until the debt has been refilled.
+    """
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens=1):
+        """
+        Takes `tokens`, sleeping until they are available. Returns the seconds waited.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= tokens
+            wait = max(-self._tokens / self.rate, self._paused_until - now, 0.0)
+        if wait:
+            time.sleep(wait)
+        return wait
+
+    def try_acquire(self, tokens=1):
+        """
+        Takes `tokens` only if they are available now. Returns 0 if they were
+        taken, otherwise the seconds until they would be; never sleeps.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            wait = max((tokens - self._tokens) / self.rate, self._paused_until - now, 0.0)
+            if not wait:
+                self._tokens -= tokens
+            return wait
+
+    def pause(self, seconds):
+        """
+        Holds every caller back for `seconds`, e.g. after the server said the quota is used up.
+        """
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+
+class TransportStats:
+    """
+    Counters for one transport: requests sent, retries, requests that had to
+    wait for the rate limit (and for how long), 429 answers from the server
+    and requests that failed after every retry.
+    """
+
+    FIELDS = ("requests", "retries", "throttled", "throttle_seconds", "rate_limited", "failures")
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._counts = dict.fromkeys(self.FIELDS, 0)
+
+    def add(self, name, amount=1):
+        with self._lock:
+            self._counts[name] += amount
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self._counts)
+
+    def summary(self):
+        counts = self.snapshot()
+        return (
+            f"{counts['requests']} requests, {counts['retries']} retries, "
+            f"{counts['throttled']} throttled ({counts['throttle_seconds']:.1f}s), "
+            f"{counts['rate_limited']} rate limited by the server, {counts['failures']} failed"
+        )
+
+
+def _retry_after(value):
+    """
+    Seconds asked for by a Retry-After header (a number or an HTTP date), or None.
+    """
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+class Transport:
+    """
+    Rate limiting and retries shared by every request to one API.
+
+    Requests first take tokens from the API's buckets. Transient failures
+    (connection errors, 5xx) are retried with exponential backoff and jitter
+    when the method is idempotent. A 429 is retried for any method, since the
+    server rejected the request without running it; it also pauses the bucket
+    so other threads back off too.
+    """
+
+    def __init__(self, name, rate, burst, token_rate=None, token_burst=None,
+                 max_retries=DEFAULT_MAX_RETRIES, backoff=DEFAULT_BACKOFF, max_backoff=MAX_BACKOFF,
+                 idempotent_methods=IDEMPOTENT_METHODS):
+        self.name = name
+        self.bucket = TokenBucket(rate, burst)
+        self.token_bucket = TokenBucket(token_rate, token_burst or token_rate) if token_rate else None
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.idempotent_methods = idempotent_methods
+        self.stats = TransportStats()
+
+    def delay(self, attempt, retry_after=None):
+        """
+        Seconds to wait before retry number `attempt` (0 for the first retry).
+        """
+        delay = self.backoff * (2 ** attempt) * random.uniform(0.5, 1.5)
+        if retry_after is not None:
+            delay = max(delay, retry_after)
+        return min(delay, self.max_backoff)
+
+    def _throttle(self, cost, tokens):
+        waited = self.bucket.acquire(cost)
+        if self.token_bucket is not None and tokens:
+            waited += self.token_bucket.acquire(tokens)
+        self.stats.add("requests")
+        if waited:
+            self.stats.add("throttled")
+            self.stats.add("throttle_seconds", waited)
+        return waited
+
+    def call(self, method, send, cost=1, tokens=0, errors=(OSError,), release=None):
+        """
+        Sends a request through the rate limits, retrying transient failures.
+        `send()` makes one attempt and returns (status, Retry-After header,
+        response); `errors` are the connection errors worth retrying and
+        `release(response)` frees a response that is thrown away for a retry.
+        Returns the last response; errors are re-raised once retries run out.
+        The attempts and the time spent throttled are added to the current span.
+        """
+        idempotent = method.upper() in self.idempotent_methods
+        request_span = current_span()
+        throttled = 0.0
+        attempt = 0
+        while True:
+            throttled += self._throttle(cost, tokens)
+            request_span.set(attempts=attempt + 1, throttle_ms=round(throttled * 1000, 1))
+            try:
+                status, retry_after, response = send()
+            except errors as e:
+                if not idempotent or attempt >= self.max_retries:
+                    self.stats.add("failures")
+                    raise
+                print(f"Error reaching the {self.name}, retrying: {e}")
+                delay = self.delay(attempt)
+            else:
+                if status == 429:
+                    self.stats.add("rate_limited")
+                if status not in RETRYABLE_STATUSES:
+                    return response
+                if (status != 429 and not idempotent) or attempt >= self.max_retries:
+                    self.stats.add("failures")
+                    return response
+                delay = self.delay(attempt, _retry_after(retry_after))
+                if status == 429:
+                    self.bucket.pause(delay)
+                if release is not None:
+                    release(response)
+                print(f"{self.name} answered {status}, retrying in {delay:.1f}s")
+            self.stats.add("retries")
+            time.sleep(delay)
+            attempt += 1
+
+
+def _batch_size(uri, body):
+    """
+    Quota units used by a request: one per call inside a batch request.
+    """
+    if "/batch" not in uri or not body:
+        return 1
+    marker = b"Content-ID:" if isinstance(body, bytes) else "Content-ID:"
+    return max(body.count(marker), 1)
+
+
+class RetryingHttp:
+    """
+    httplib2-compatible HTTP object for the Calendar client that sends every
+    request through a Transport. Each thread's connection is kept alive by
+    the wrapped object, so this can wrap a ThreadLocalHttp.
+    """
+
+    def __init__(self, http, transport=None):
+        self._http = http
+        self._transport = transport or get_transport(CALENDAR)
+
+    def request(self, uri, method="GET", body=None, headers=None, *args, **kwargs):
+        import httplib2
+
+        def send():
+            resp, content = self._http.request(uri, method, body, headers, *args, **kwargs)
+            return resp.status, resp.get('retry-after'), (resp, content)
+
+        cost = _batch_size(uri, body)
+        with span("calendar.http", method=method, path=urlsplit(uri).path, calls=cost,
+                  request_bytes=len(body) if body else 0) as http_span:
+            resp, content = self._transport.call(
+                method, send, cost=cost,
+                errors=(OSError, http.client.HTTPException, httplib2.ServerNotFoundError),
+            )
+            http_span.set(status=resp.status, response_bytes=len(content) if content else 0)
+            return resp, content
+
+    def __getattr__(self, name):
+        return getattr(self._http, name)
+
+
+class RetryingSession(requests.Session):
+    """
+    requests session for the OpenAI client that pools connections across
+    threads and sends every request through a Transport.
+    """
+
+    def __init__(self, transport=None, pool_size=POOL_SIZE):
+        super().__init__()
+        self.transport = transport or get_transport(OPENAI)
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.mount("https://", adapter)
+        self.mount("http://", adapter)
+
+    def request(self, method, url, *args, **kwargs):
+        data = kwargs.get('data')
+        # Room for the reply on top of the prompt
+        tokens = (estimate_tokens(len(data)) + EXPECTED_COMPLETION_TOKENS) if data else 0
+
+        def send():
+            response = super(RetryingSession, self).request(method, url, *args, **kwargs)
+            return response.status_code, response.headers.get("Retry-After"), response
+
+        with span("openai.http", method=method, path=urlsplit(url).path,
+                  request_bytes=len(data) if data else 0) as http_span:
+            response = self.transport.call(
+                method, send, tokens=tokens,
+                errors=(requests.ConnectionError, requests.Timeout), release=lambda response: response.close(),
+            )
+            # A streamed body is still being read; its size is on the llm span
+            http_span.set(status=response.status_code)
+            return response
+
+
+def _new_transport(name):
+    if name == CALENDAR:
+        return Transport(CALENDAR, config.CALENDAR_QUERIES_PER_MINUTE / 60, CALENDAR_BURST)
+    if name == OPENAI:
+        # Completions have no side effects, so a failed POST can be sent again
+        return Transport(
+            OPENAI, config.OPENAI_REQUESTS_PER_MINUTE / 60, OPENAI_BURST,
+            token_rate=config.OPENAI_TOKENS_PER_MINUTE / 60, token_burst=config.OPENAI_TOKENS_PER_MINUTE,
+            idempotent_methods=IDEMPOTENT_METHODS | {"POST"},
+        )
+    raise ValueError(f"Unknown transport: {name}")
+
+
+_lock = threading.Lock()
+_transports = {}
+_openai_session = None
+
+
+def get_transport(name):
+    """
+    Returns the shared transport for CALENDAR or OPENAI, creating it on first use.
+    """
+    with _lock:
+        if name not in _transports:
+            _transports[name] = _new_transport(name)
+        return _transports[name]
+
+
+def get_openai_session():
+    """
+    Returns the session every OpenAI call shares; install it with
+    openai.requestssession = get_openai_session().
+    """
+    global _openai_session
+    transport = get_transport(OPENAI)
+    with _lock:
+        if _openai_session is None:
+            _openai_session = RetryingSession(transport)
+        return _openai_session
+
+
+def transport_stats():
+    """
+    Counters of every transport in use, keyed by API name.
+    """
+    with _lock:
+        return {name: transport.stats.snapshot() for name, transport in _transports.items()}
@@ -0,0 +1,133 @@
+import threading
+
+from PyQt5.QtCore import QObject, QRunnable, QThreadPool, pyqtSignal
+
+
+class Cancelled(Exception):
+    """
+    Raised inside a task that noticed it was cancelled.
+    """
+
+
+class WorkerSignals(QObject):
+    """
+    Signals a Worker uses to hand results back to the GUI thread.
+    """
+    finished = pyqtSignal(object)
+    failed = pyqtSignal(object)
+    progress = pyqtSignal(str)
+    partial = pyqtSignal(object)
+    done = pyqtSignal()
+
+
+class Worker(QRunnable):
+    """
+    Runs a blocking function on the thread pool. The function receives a
+    `task` keyword argument with report(message) for progress updates,
+    emit(value) for partial results and check_cancelled() for cooperative
+    cancellation.
+    """
+
+    def __init__(self, fn, *args, **kwargs):
+        super().__init__()
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.signals = WorkerSignals()
+        self._cancelled = threading.Event()
+
+    def cancel(self):
+        self._cancelled.set()
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    def report(self, message):
+        if not self.cancelled:
+            self.signals.progress.emit(message)
+
+    def emit(self, value):
+        if not self.cancelled:
+            self.signals.partial.emit(value)
+
+    def check_cancelled(self):
+        if self.cancelled:
+            raise Cancelled()
+
+    def run(self):
+        try:
+            result = self.fn(*self.args, task=self, **self.kwargs)
+        except Cancelled:
+            pass
+        except Exception as e:
+            if not self.cancelled:
+                self.signals.failed.emit(e)
+        else:
+            if not self.cancelled:
+                self.signals.finished.emit(result)
+        finally:
+            self.signals.done.emit()
+
+
+class TaskRunner(QObject):
+    """
+    Submits Workers to a QThreadPool, keyed so that a second request for work
+    that is already in flight (e.g. a double click) is ignored.
+    Results are delivered through signals on the GUI thread.
+    """
+
+    def __init__(self, pool=None, parent=None):
+        super().__init__(parent)
+        self.pool = pool or QThreadPool.globalInstance()
+        self._running = {}
+
+    def is_running(self, key):
+        return key in self._running
+
+    def has_running(self):
+        return bool(self._running)
+
+    def submit(self, key, fn, *args, on_result=None, on_error=None, on_progress=None, on_partial=None,
+               on_done=None, **kwargs):
+        """
+        Starts fn(*args, **kwargs) in the background unless `key` is already running.
+        Returns the Worker, or None if the request was a duplicate.
+        """
+        if key in self._running:
+            return None
+        worker = Worker(fn, *args, **kwargs)
+        if on_result:
+            worker.signals.finished.connect(on_result)
+        if on_error:
+            worker.signals.failed.connect(on_error)
+        if on_progress:
+            worker.signals.progress.connect(on_progress)
+        if on_partial:
+            worker.signals.partial.connect(on_partial)
+        worker.signals.done.connect(lambda: self._finish(key, worker))
+        if on_done:
+            worker.signals.done.connect(on_done)
+        self._running[key] = worker
+        self.pool.start(worker)
+        return worker
+
+    def _finish(self, key, worker):
+        if self._running.get(key) is worker:
+            del self._running[key]
+
+    def cancel(self, key):
+        """
+        Cancels a running task. Its result, if any, is discarded.
+        """
+        worker = self._running.pop(key, None)
+        if worker:
+            worker.cancel()
+        return worker is not None
+
+    def cancel_all(self):
+        """
+        Cancels every running task.
+        """
+        for key in list(self._running):
+            self.cancel(key)